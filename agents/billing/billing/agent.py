@@ -1,8 +1,8 @@
 """Billing specialist: consume ticket.triaged.billing, produce ticket.resolved."""
 from shared.topics import TOPIC_TRIAGED_BILLING
-from shared.specialist_base import run_specialist
+from shared.specialist_base import SpecialistDefinition, run_specialists
 
-from .llm import generate_response
+from .llm import SYSTEM_PROMPT, generate_response, warm_up
 from .telemetry import get_trace_id, BILLING_RESOLVED, BILLING_PROCESSING_SECONDS
 from .config import KAFKA_BOOTSTRAP_SERVERS
 
@@ -11,12 +11,16 @@ def on_processed(ticket_id: str, response: str) -> None:
     BILLING_RESOLVED.inc()
 
 
+SPECIALIST = SpecialistDefinition(
+    name="billing",
+    input_topic=TOPIC_TRIAGED_BILLING,
+    generate_response=generate_response,
+    get_trace_id=get_trace_id,
+    on_processed=on_processed,
+    system_prompt=SYSTEM_PROMPT,
+    warm_up=warm_up,
+)
+
+
 def run() -> None:
-    run_specialist(
-        agent_name="billing",
-        input_topic=TOPIC_TRIAGED_BILLING,
-        bootstrap_servers=KAFKA_BOOTSTRAP_SERVERS,
-        generate_response=generate_response,
-        get_trace_id=get_trace_id,
-        on_processed=on_processed,
-    )
+    run_specialists([SPECIALIST], KAFKA_BOOTSTRAP_SERVERS)
@@ -0,0 +1 @@
+"""LLM gateway: OpenAI-compatible proxy with request coalescing, shared cache and per-upstream limits."""
@@ -0,0 +1,37 @@
+"""Entrypoint: python -m gateway"""
+import structlog
+
+from .config import (
+    LOG_LEVEL,
+    GATEWAY_PORT,
+    GATEWAY_UPSTREAMS,
+    GATEWAY_MODEL_ROUTES,
+    GATEWAY_MAX_CONCURRENCY,
+    GATEWAY_RATE_LIMIT_RPS,
+    GATEWAY_UPSTREAM_TIMEOUT_SEC,
+    GATEWAY_CACHE_TTL_SEC,
+    GATEWAY_CACHE_MAX_ENTRIES,
+)
+from .server import Gateway, make_server
+from .telemetry import configure_logging, start_metrics_server
+
+
+def main():
+    configure_logging(log_level=LOG_LEVEL)
+    start_metrics_server()
+    gateway = Gateway(
+        GATEWAY_UPSTREAMS,
+        GATEWAY_MODEL_ROUTES,
+        max_concurrency=GATEWAY_MAX_CONCURRENCY,
+        rate_limit_rps=GATEWAY_RATE_LIMIT_RPS,
+        timeout=GATEWAY_UPSTREAM_TIMEOUT_SEC,
+        cache_ttl_sec=GATEWAY_CACHE_TTL_SEC,
+        cache_max_entries=GATEWAY_CACHE_MAX_ENTRIES,
+    )
+    server = make_server(gateway, port=GATEWAY_PORT)
+    structlog.get_logger().info("LLM gateway listening", port=GATEWAY_PORT, upstreams=list(GATEWAY_UPSTREAMS))
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""Load configuration from environment."""
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+GATEWAY_PORT = int(os.environ.get("GATEWAY_PORT", "8080"))
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "9094"))
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "json").lower()
+
+# Upstreams as comma-separated name=base_url pairs (OpenAI-compatible base URLs ending in /v1).
+# The first upstream is the default route.
+GATEWAY_UPSTREAMS = {
+    name.strip(): url.strip().rstrip("/")
+    for name, _, url in (
+        pair.partition("=")
+        for pair in os.environ.get(
+            "GATEWAY_UPSTREAMS", "ollama=http://ollama.support-agents.svc:11434/v1"
+        ).split(",")
+        if "=" in pair
+    )
+}
+# Model-prefix routes as comma-separated prefix=upstream pairs, e.g. "gpt-=openai".
+GATEWAY_MODEL_ROUTES = {
+    prefix.strip(): name.strip()
+    for prefix, _, name in (
+        pair.partition("=")
+        for pair in os.environ.get("GATEWAY_MODEL_ROUTES", "").split(",")
+        if "=" in pair
+    )
+}
+# Global limits, applied separately to each upstream across all agents using the gateway.
+GATEWAY_MAX_CONCURRENCY = int(os.environ.get("GATEWAY_MAX_CONCURRENCY", "8"))
+GATEWAY_RATE_LIMIT_RPS = float(os.environ.get("GATEWAY_RATE_LIMIT_RPS", "0"))  # 0 = unlimited
+GATEWAY_UPSTREAM_TIMEOUT_SEC = float(os.environ.get("GATEWAY_UPSTREAM_TIMEOUT_SEC", "120"))
+# Shared response cache for identical non-streaming requests. TTL 0 disables caching.
+GATEWAY_CACHE_TTL_SEC = float(os.environ.get("GATEWAY_CACHE_TTL_SEC", "300"))
+GATEWAY_CACHE_MAX_ENTRIES = int(os.environ.get("GATEWAY_CACHE_MAX_ENTRIES", "10000"))
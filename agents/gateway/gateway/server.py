@@ -0,0 +1,305 @@
+"""OpenAI-compatible HTTP gateway in front of the LLM upstreams.
+
+POST /v1/chat/completions is routed to an upstream by model prefix. Identical concurrent
+non-streaming requests are coalesced into one upstream call, successful responses are kept
+in a shared TTL/LRU cache, and each upstream has one global concurrency and rate limit.
+Streaming requests are relayed as-is (limited, but not coalesced or cached).
+"""
+import hashlib
+import http.client
+import json
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator
+from urllib.parse import urlsplit
+
+import structlog  # type: ignore[import-untyped]
+
+from .coalesce import ResponseCache, SingleFlight, TokenBucket
+from .telemetry import (
+    GATEWAY_INFLIGHT,
+    GATEWAY_QUEUE_SECONDS,
+    GATEWAY_REQUEST_SECONDS,
+    GATEWAY_REQUESTS,
+    GATEWAY_TOKENS,
+    GATEWAY_UPSTREAM_SECONDS,
+)
+
+logger = structlog.get_logger(__name__)
+
+# Request headers forwarded to the upstream.
+_FORWARD_HEADERS = ("authorization", "content-type", "openai-organization", "openai-project")
+
+# An unreachable upstream raises OSError; one that answers with a malformed response
+# (e.g. a bad status line) raises an HTTPException. Both become a 502.
+_UPSTREAM_ERRORS = (OSError, http.client.HTTPException)
+
+
+@dataclass
+class UpstreamResponse:
+    status: int
+    content_type: str
+    body: bytes
+
+
+class Upstream:
+    """One upstream base URL with a keep-alive connection pool and global limits."""
+
+    def __init__(self, name: str, base_url: str, max_concurrency: int, rate_limit_rps: float, timeout: float):
+        self.name = name
+        parts = urlsplit(base_url)
+        self._https = parts.scheme == "https"
+        self._host = parts.hostname or "localhost"
+        self._port = parts.port or (443 if self._https else 80)
+        self.path_prefix = parts.path.rstrip("/")
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max(1, max_concurrency))
+        self._bucket = TokenBucket(rate_limit_rps)
+        self._pool: queue.LifoQueue[http.client.HTTPConnection] = queue.LifoQueue()
+
+    def _new_connection(self) -> http.client.HTTPConnection:
+        cls = http.client.HTTPSConnection if self._https else http.client.HTTPConnection
+        return cls(self._host, self._port, timeout=self.timeout)
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """Hold one of this upstream's concurrency slots (after the rate limiter admits the call)."""
+        t0 = time.perf_counter()
+        self._slots.acquire()
+        try:
+            self._bucket.acquire()
+            GATEWAY_QUEUE_SECONDS.labels(upstream=self.name).observe(time.perf_counter() - t0)
+            GATEWAY_INFLIGHT.labels(upstream=self.name).inc()
+            try:
+                yield
+            finally:
+                GATEWAY_INFLIGHT.labels(upstream=self.name).dec()
+        finally:
+            self._slots.release()
+
+    def request(self, method: str, path: str, body: bytes | None, headers: dict[str, str]) -> UpstreamResponse:
+        """Send a request over a pooled connection; retry once if a reused connection went stale."""
+        for attempt in range(2):
+            try:
+                conn = self._pool.get_nowait()
+                reused = True
+            except queue.Empty:
+                conn = self._new_connection()
+                reused = False
+            try:
+                conn.request(method, self.path_prefix + path, body=body, headers=headers)
+                resp = conn.getresponse()
+                data = resp.read()
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                conn.close()
+                if reused and attempt == 0:
+                    continue
+                raise
+            except Exception:
+                conn.close()
+                raise
+            if resp.will_close:
+                conn.close()
+            else:
+                self._pool.put(conn)
+            return UpstreamResponse(resp.status, resp.getheader("Content-Type", "application/json"), data)
+        raise ConnectionError(f"upstream {self.name} unavailable")
+
+    def open_stream(self, path: str, body: bytes, headers: dict[str, str]):
+        """Open a dedicated connection for a streaming response. Caller closes the connection."""
+        conn = self._new_connection()
+        conn.request("POST", self.path_prefix + path, body=body, headers=headers)
+        return conn, conn.getresponse()
+
+
+class Gateway:
+    """Routing, coalescing and caching for chat completion requests."""
+
+    def __init__(
+        self,
+        upstreams: dict[str, str],
+        model_routes: dict[str, str] | None = None,
+        max_concurrency: int = 8,
+        rate_limit_rps: float = 0.0,
+        timeout: float = 120.0,
+        cache_ttl_sec: float = 300.0,
+        cache_max_entries: int = 10000,
+    ):
+        if not upstreams:
+            raise ValueError("At least one upstream is required (GATEWAY_UPSTREAMS)")
+        self.upstreams = {
+            name: Upstream(name, url, max_concurrency, rate_limit_rps, timeout)
+            for name, url in upstreams.items()
+        }
+        self.default_upstream = next(iter(self.upstreams.values()))
+        self.model_routes = {p: n for p, n in (model_routes or {}).items() if n in self.upstreams}
+        self.cache = ResponseCache(max_entries=cache_max_entries, ttl_sec=cache_ttl_sec)
+        self.singleflight = SingleFlight()
+
+    def route(self, model: str) -> Upstream:
+        for prefix, name in self.model_routes.items():
+            if model.startswith(prefix):
+                return self.upstreams[name]
+        return self.default_upstream
+
+    @staticmethod
+    def request_key(upstream: Upstream, payload: dict, headers: dict[str, str]) -> str:
+        """Fingerprint of upstream, credentials and canonical request body."""
+        h = hashlib.sha256()
+        h.update(upstream.name.encode("utf-8"))
+        h.update(b"\0")
+        h.update(headers.get("authorization", "").encode("utf-8"))
+        h.update(b"\0")
+        h.update(json.dumps(payload, sort_keys=True, separators=(",", ":")).encode("utf-8"))
+        return h.hexdigest()
+
+    def chat_completion(self, payload: dict, headers: dict[str, str], use_cache: bool = True) -> tuple[UpstreamResponse, str]:
+        """Serve a non-streaming chat completion. Returns (response, outcome)."""
+        model = str(payload.get("model", ""))
+        upstream = self.route(model)
+        key = self.request_key(upstream, payload, headers)
+        if use_cache:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached, "cache_hit"
+
+        body = json.dumps(payload).encode("utf-8")
+
+        def call_upstream() -> UpstreamResponse:
+            with upstream.slot():
+                t0 = time.perf_counter()
+                resp = upstream.request("POST", "/chat/completions", body, headers)
+                GATEWAY_UPSTREAM_SECONDS.labels(upstream=upstream.name, model=model).observe(time.perf_counter() - t0)
+            if resp.status == 200:
+                self._record_tokens(upstream.name, model, resp.body)
+                self.cache.put(key, resp)
+            return resp
+
+        resp, shared = self.singleflight.do(key, call_upstream)
+        if resp.status != 200:
+            return resp, "upstream_error"
+        return resp, "coalesced" if shared else "upstream"
+
+    @staticmethod
+    def _record_tokens(upstream: str, model: str, body: bytes) -> None:
+        try:
+            usage = json.loads(body).get("usage") or {}
+        except (ValueError, AttributeError):
+            return
+        GATEWAY_TOKENS.labels(upstream=upstream, model=model, type="input").inc(usage.get("prompt_tokens", 0) or 0)
+        GATEWAY_TOKENS.labels(upstream=upstream, model=model, type="output").inc(usage.get("completion_tokens", 0) or 0)
+
+
+def _make_handler(gateway: Gateway):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):  # noqa: A002 - BaseHTTPRequestHandler signature
+            logger.debug("http", request=format % args)
+
+        def _forward_headers(self) -> dict[str, str]:
+            headers = {k: v for k, v in ((h, self.headers.get(h)) for h in _FORWARD_HEADERS) if v}
+            headers.setdefault("content-type", "application/json")
+            return headers
+
+        def _send(self, status: int, body: bytes, content_type: str = "application/json", extra: dict | None = None):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for k, v in (extra or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _error(self, status: int, message: str):
+            body = json.dumps({"error": {"message": message, "type": "gateway_error"}}).encode("utf-8")
+            self._send(status, body)
+
+        def do_GET(self):
+            if self.path in ("/healthz", "/ready"):
+                self._send(200, b'{"status":"ok"}')
+                return
+            if self.path.startswith("/v1/"):
+                upstream = gateway.default_upstream
+                try:
+                    resp = upstream.request("GET", self.path[len("/v1"):], None, self._forward_headers())
+                except _UPSTREAM_ERRORS as e:
+                    self._error(502, f"upstream {upstream.name} unavailable: {e}")
+                    return
+                self._send(resp.status, resp.body, resp.content_type)
+                return
+            self._error(404, "not found")
+
+        def do_POST(self):
+            if self.path not in ("/v1/chat/completions", "/chat/completions"):
+                self._error(404, "only /v1/chat/completions is supported")
+                return
+            try:
+                length = int(self.headers.get("Content-Length", "0"))
+                if length < 0:
+                    raise ValueError(f"negative Content-Length {length}")
+            except ValueError:
+                self._error(400, "invalid Content-Length")
+                return
+            try:
+                payload = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                self._error(400, "invalid JSON body")
+                return
+            headers = self._forward_headers()
+            if payload.get("stream"):
+                self._relay_stream(payload, headers)
+                return
+            use_cache = "no-cache" not in (self.headers.get("Cache-Control") or "")
+            upstream = gateway.route(str(payload.get("model", "")))
+            t0 = time.perf_counter()
+            try:
+                resp, outcome = gateway.chat_completion(payload, headers, use_cache=use_cache)
+            except _UPSTREAM_ERRORS as e:
+                outcome = "error"
+                self._error(502, f"upstream {upstream.name} unavailable: {e}")
+            else:
+                self._send(resp.status, resp.body, resp.content_type, {"X-Gateway-Outcome": outcome})
+            GATEWAY_REQUESTS.labels(upstream=upstream.name, model=str(payload.get("model", "")), outcome=outcome).inc()
+            GATEWAY_REQUEST_SECONDS.labels(upstream=upstream.name, outcome=outcome).observe(time.perf_counter() - t0)
+
+        def _relay_stream(self, payload: dict, headers: dict[str, str]):
+            model = str(payload.get("model", ""))
+            upstream = gateway.route(model)
+            t0 = time.perf_counter()
+            with upstream.slot():
+                try:
+                    conn, resp = upstream.open_stream("/chat/completions", json.dumps(payload).encode("utf-8"), headers)
+                except _UPSTREAM_ERRORS as e:
+                    self._error(502, f"upstream {upstream.name} unavailable: {e}")
+                    GATEWAY_REQUESTS.labels(upstream=upstream.name, model=model, outcome="error").inc()
+                    return
+                try:
+                    self.send_response(resp.status)
+                    self.send_header("Content-Type", resp.getheader("Content-Type", "text/event-stream"))
+                    self.send_header("Connection", "close")
+                    self.end_headers()
+                    self.close_connection = True
+                    while True:
+                        chunk = resp.read1(8192)
+                        if not chunk:
+                            break
+                        self.wfile.write(chunk)
+                        self.wfile.flush()
+                finally:
+                    conn.close()
+            GATEWAY_UPSTREAM_SECONDS.labels(upstream=upstream.name, model=model).observe(time.perf_counter() - t0)
+            GATEWAY_REQUESTS.labels(upstream=upstream.name, model=model, outcome="stream").inc()
+
+    return Handler
+
+
+def make_server(gateway: Gateway, host: str = "0.0.0.0", port: int = 8080) -> ThreadingHTTPServer:
+    """Create (but do not start) the gateway HTTP server."""
+    server = ThreadingHTTPServer((host, port), _make_handler(gateway))
+    server.daemon_threads = True
+    return server
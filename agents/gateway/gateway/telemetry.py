@@ -0,0 +1,84 @@
+"""Observability for the LLM gateway."""
+import logging
+import sys
+import threading
+
+import structlog  # type: ignore[import-untyped]
+from prometheus_client import Counter, Gauge, Histogram, start_http_server  # type: ignore[import-untyped]
+
+from .config import LOG_FORMAT, METRICS_PORT
+
+GATEWAY_REQUESTS = Counter(
+    "gateway_requests_total",
+    "Chat completion requests by how they were served (cache, coalesced, upstream, error)",
+    ["upstream", "model", "outcome"],
+)
+GATEWAY_REQUEST_SECONDS = Histogram(
+    "gateway_request_seconds",
+    "Gateway latency per request including queueing",
+    ["upstream", "outcome"],
+    buckets=(0.005, 0.05, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+GATEWAY_UPSTREAM_SECONDS = Histogram(
+    "gateway_upstream_latency_seconds",
+    "Upstream LLM call latency",
+    ["upstream", "model"],
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+GATEWAY_QUEUE_SECONDS = Histogram(
+    "gateway_queue_wait_seconds",
+    "Time waiting for an upstream concurrency slot or rate-limit token",
+    ["upstream"],
+    buckets=(0.001, 0.01, 0.1, 0.5, 1.0, 5.0, 30.0),
+)
+GATEWAY_INFLIGHT = Gauge(
+    "gateway_upstream_inflight",
+    "Requests currently in flight to each upstream",
+    ["upstream"],
+)
+GATEWAY_TOKENS = Counter(
+    "gateway_tokens_total",
+    "Tokens reported by upstreams (type: input, output)",
+    ["upstream", "model", "type"],
+)
+
+
+def configure_logging(log_level: str = "INFO") -> None:
+    level = getattr(logging, log_level.upper(), logging.INFO)
+    shared_processors = [
+        structlog.contextvars.merge_contextvars,
+        structlog.stdlib.add_logger_name,
+        structlog.stdlib.add_log_level,
+        structlog.processors.TimeStamper(fmt="iso"),
+        structlog.processors.StackInfoRenderer(),
+    ]
+    foreign_pre_chain = [
+        structlog.contextvars.merge_contextvars,
+        structlog.stdlib.add_logger_name,
+        structlog.stdlib.PositionalArgumentsFormatter(),
+        structlog.stdlib.add_log_level,
+        structlog.processors.TimeStamper(fmt="iso"),
+        structlog.processors.StackInfoRenderer(),
+    ]
+    renderer = structlog.processors.JSONRenderer() if LOG_FORMAT == "json" else structlog.dev.ConsoleRenderer()
+    structlog.configure(
+        processors=shared_processors + [structlog.stdlib.ProcessorFormatter.wrap_for_formatter],
+        logger_factory=structlog.stdlib.LoggerFactory(),
+        cache_logger_on_first_use=True,
+    )
+    formatter = structlog.stdlib.ProcessorFormatter(
+        foreign_pre_chain=foreign_pre_chain,
+        processors=[structlog.stdlib.ProcessorFormatter.remove_processors_meta, renderer],
+    )
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(formatter)
+    root = logging.getLogger()
+    root.addHandler(handler)
+    root.setLevel(level)
+
+
+def start_metrics_server() -> None:
+    def _serve():
+        start_http_server(METRICS_PORT, addr="0.0.0.0")
+    t = threading.Thread(target=_serve, daemon=True)
+    t.start()
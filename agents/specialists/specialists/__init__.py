@@ -0,0 +1 @@
+"""Specialist host: run billing, technical and feature in one process on one consumer."""
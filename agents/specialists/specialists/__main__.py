@@ -0,0 +1,30 @@
+"""Entrypoint: python -m specialists"""
+import sys
+
+import structlog
+
+from shared import shutdown
+from shared.warmup import run_warmup
+
+from .config import KAFKA_BOOTSTRAP_SERVERS, LOG_LEVEL
+from .host import load_definitions, run
+from .telemetry import configure_logging, start_metrics_server
+
+
+def main():
+    configure_logging(log_level=LOG_LEVEL)
+    start_metrics_server()
+    log = structlog.get_logger()
+    if not KAFKA_BOOTSTRAP_SERVERS:
+        log.error("KAFKA_BOOTSTRAP_SERVERS is required")
+        sys.exit(1)
+    definitions = load_definitions()
+    log.info("Hosting specialists", specialists={d.name: d.input_topic for d in definitions})
+    # LLM clients are pooled per process, so one warm-up step per specialist primes its model once.
+    run_warmup("specialists", [(d.name, d.warm_up) for d in definitions if d.warm_up])
+    shutdown.install()
+    run(definitions)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+"""Load configuration from environment."""
+import os
+from dotenv import load_dotenv
+
+from shared.config import SPECIALIST_CONCURRENCY
+
+load_dotenv()
+
+KAFKA_BOOTSTRAP_SERVERS = os.environ.get("KAFKA_BOOTSTRAP_SERVERS", "")
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "json").lower()
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "9095"))
+
+# Specialist packages to host, comma-separated. Each must expose agent.SPECIALIST.
+SPECIALISTS = [s.strip() for s in os.environ.get("SPECIALISTS", "billing,technical,feature").split(",") if s.strip()]
+# Worker threads per specialist as comma-separated name=n pairs; unlisted specialists get SPECIALIST_CONCURRENCY.
+SPECIALIST_QUOTAS = {
+    name.strip(): int(n)
+    for name, _, n in (
+        pair.partition("=")
+        for pair in os.environ.get("SPECIALIST_QUOTAS", "").split(",")
+        if "=" in pair
+    )
+}
+DEFAULT_QUOTA = SPECIALIST_CONCURRENCY
+# Not "<name>-agent": the host must not join the single-specialist groups it replaces.
+SPECIALISTS_GROUP_ID = os.environ.get("SPECIALISTS_GROUP_ID", "specialists-agent")
@@ -0,0 +1,35 @@
+"""Load specialist definitions and run them on one consumer, producer and LLM client pool."""
+import dataclasses
+import importlib
+
+from shared.specialist_base import SpecialistDefinition, run_specialists
+
+from .config import DEFAULT_QUOTA, KAFKA_BOOTSTRAP_SERVERS, SPECIALIST_QUOTAS, SPECIALISTS, SPECIALISTS_GROUP_ID
+from .telemetry import SPECIALIST_QUOTA
+
+
+def load_definitions(
+    names: list[str] = SPECIALISTS,
+    quotas: dict[str, int] = SPECIALIST_QUOTAS,
+    default_quota: int = DEFAULT_QUOTA,
+) -> list[SpecialistDefinition]:
+    """Import <name>.agent.SPECIALIST for each name and apply its concurrency quota."""
+    unknown = set(quotas) - set(names)
+    if unknown:
+        raise ValueError(f"SPECIALIST_QUOTAS names specialists that are not hosted: {sorted(unknown)}")
+    definitions = []
+    for name in names:
+        definition = importlib.import_module(f"{name}.agent").SPECIALIST
+        quota = max(1, quotas.get(name, default_quota))
+        definitions.append(dataclasses.replace(definition, concurrency=quota))
+        SPECIALIST_QUOTA.labels(specialist=name).set(quota)
+    return definitions
+
+
+def run(definitions: list[SpecialistDefinition]) -> None:
+    run_specialists(
+        definitions,
+        KAFKA_BOOTSTRAP_SERVERS,
+        group_id=SPECIALISTS_GROUP_ID,
+        agent_label="specialists",
+    )
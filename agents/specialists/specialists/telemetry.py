@@ -0,0 +1,55 @@
+"""Observability for the specialist host (per-specialist metrics come from each specialist package)."""
+import logging
+import sys
+
+import structlog  # type: ignore[import-untyped]
+from prometheus_client import Gauge  # type: ignore[import-untyped]
+
+from shared.health import start_health_server
+
+from .config import LOG_FORMAT, METRICS_PORT
+
+SPECIALIST_QUOTA = Gauge(
+    "specialist_worker_quota",
+    "Worker threads allotted to each hosted specialist",
+    ["specialist"],
+)
+
+
+def configure_logging(log_level: str = "INFO") -> None:
+    level = getattr(logging, log_level.upper(), logging.INFO)
+    shared_processors = [
+        structlog.contextvars.merge_contextvars,
+        structlog.stdlib.add_logger_name,
+        structlog.stdlib.add_log_level,
+        structlog.processors.TimeStamper(fmt="iso"),
+        structlog.processors.StackInfoRenderer(),
+    ]
+    foreign_pre_chain = [
+        structlog.contextvars.merge_contextvars,
+        structlog.stdlib.add_logger_name,
+        structlog.stdlib.PositionalArgumentsFormatter(),
+        structlog.stdlib.add_log_level,
+        structlog.processors.TimeStamper(fmt="iso"),
+        structlog.processors.StackInfoRenderer(),
+    ]
+    renderer = structlog.processors.JSONRenderer() if LOG_FORMAT == "json" else structlog.dev.ConsoleRenderer()
+    structlog.configure(
+        processors=shared_processors + [structlog.stdlib.ProcessorFormatter.wrap_for_formatter],
+        logger_factory=structlog.stdlib.LoggerFactory(),
+        cache_logger_on_first_use=True,
+    )
+    formatter = structlog.stdlib.ProcessorFormatter(
+        foreign_pre_chain=foreign_pre_chain,
+        processors=[structlog.stdlib.ProcessorFormatter.remove_processors_meta, renderer],
+    )
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(formatter)
+    root = logging.getLogger()
+    root.addHandler(handler)
+    root.setLevel(level)
+
+
+def start_metrics_server() -> None:
+    """Serve /metrics and the /ready probe (503 until warm-up finishes) in a daemon thread."""
+    start_health_server(METRICS_PORT)
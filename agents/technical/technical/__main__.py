@@ -4,7 +4,11 @@ import sys
 import structlog
 
 from .config import KAFKA_BOOTSTRAP_SERVERS, LOG_LEVEL
+from shared import shutdown
+from shared.warmup import run_warmup
+
 from .agent import run
+from .llm import warm_up as warm_up_llm
 from .telemetry import configure_logging, start_metrics_server
 
 
@@ -15,6 +19,9 @@ def main():
     if not KAFKA_BOOTSTRAP_SERVERS:
         log.error("KAFKA_BOOTSTRAP_SERVERS is required")
         sys.exit(1)
+    # Warm up before subscribing so the first ticket doesn't pay for model load and connection setup.
+    run_warmup("technical", [("llm", warm_up_llm)])
+    shutdown.install()
     run()
 
 
@@ -8,63 +8,111 @@ from .config import (
     OLLAMA_MODEL,
     MOCK_LLM,
 )
+from shared.cassette import replaying, through_cassette
+from shared.circuit_breaker import get_breaker
+from shared.config import SPECIALIST_STREAMING
+from shared.llm_clients import anthropic_client, openai_client, prime
+from shared.specialist_base import format_ticket_prompt
+from shared.streaming import stream_anthropic, stream_openai
+from shared.usage import record_anthropic_usage, record_openai_usage, select_provider
 
 logger = logging.getLogger(__name__)
 
+OPENAI_MODEL = "gpt-4o-mini"
+ANTHROPIC_MODEL = "claude-3-5-haiku-20241022"
+
 SYSTEM_PROMPT = """You are a technical support specialist. Given a support ticket, write a brief, helpful draft response (2-4 sentences). Be professional and solution-oriented. Include troubleshooting steps or next actions where appropriate. Output the response text only, no JSON."""
 
 
-def _call_openai(ticket_id: str, subject: str, body: str, reasoning: str) -> str:
-    from openai import OpenAI
+def _call_openai(ticket_id: str, subject: str, body: str, reasoning: str, context: str = "") -> str:
     if not OPENAI_API_KEY:
         raise ValueError("OPENAI_API_KEY is required when LLM_PROVIDER=openai")
-    client = OpenAI(api_key=OPENAI_API_KEY)
+    client = openai_client(OPENAI_API_KEY)
+    user_content = format_ticket_prompt(ticket_id, subject, body, reasoning, context)
+    if SPECIALIST_STREAMING:
+        return stream_openai("technical", "openai", client, OPENAI_MODEL, SYSTEM_PROMPT, user_content, temperature=0.3)
     resp = client.chat.completions.create(
-        model="gpt-4o-mini",
+        model=OPENAI_MODEL,
         messages=[
             {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": f"Ticket: {ticket_id}\nSubject: {subject}\nTriage reasoning: {reasoning}\nBody:\n{body}"},
+            {"role": "user", "content": user_content},
         ],
         temperature=0.3,
     )
-    return (resp.choices[0].message.content or "").strip()
+    text = (resp.choices[0].message.content or "").strip()
+    record_openai_usage("technical", "openai", OPENAI_MODEL, resp, SYSTEM_PROMPT + user_content, text)
+    return text
 
 
-def _call_ollama(ticket_id: str, subject: str, body: str, reasoning: str) -> str:
-    from openai import OpenAI
-    client = OpenAI(base_url=OLLAMA_BASE_URL, api_key="ollama")
+def _call_ollama(ticket_id: str, subject: str, body: str, reasoning: str, context: str = "") -> str:
+    client = openai_client("ollama", OLLAMA_BASE_URL)
+    user_content = format_ticket_prompt(ticket_id, subject, body, reasoning, context)
+    if SPECIALIST_STREAMING:
+        return stream_openai("technical", "ollama", client, OLLAMA_MODEL, SYSTEM_PROMPT, user_content, temperature=0.3)
     resp = client.chat.completions.create(
         model=OLLAMA_MODEL,
         messages=[
             {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": f"Ticket: {ticket_id}\nSubject: {subject}\nTriage reasoning: {reasoning}\nBody:\n{body}"},
+            {"role": "user", "content": user_content},
         ],
         temperature=0.3,
     )
-    return (resp.choices[0].message.content or "").strip()
+    text = (resp.choices[0].message.content or "").strip()
+    record_openai_usage("technical", "ollama", OLLAMA_MODEL, resp, SYSTEM_PROMPT + user_content, text)
+    return text
 
 
-def _call_anthropic(ticket_id: str, subject: str, body: str, reasoning: str) -> str:
-    from anthropic import Anthropic
+def _call_anthropic(ticket_id: str, subject: str, body: str, reasoning: str, context: str = "") -> str:
     if not ANTHROPIC_API_KEY:
         raise ValueError("ANTHROPIC_API_KEY is required when LLM_PROVIDER=anthropic")
-    client = Anthropic()
+    client = anthropic_client()
+    user_content = format_ticket_prompt(ticket_id, subject, body, reasoning, context)
+    if SPECIALIST_STREAMING:
+        return stream_anthropic("technical", client, ANTHROPIC_MODEL, SYSTEM_PROMPT, user_content, max_tokens=256)
     msg = client.messages.create(
-        model="claude-3-5-haiku-20241022",
+        model=ANTHROPIC_MODEL,
         max_tokens=256,
         system=SYSTEM_PROMPT,
-        messages=[{"role": "user", "content": f"Ticket: {ticket_id}\nSubject: {subject}\nTriage reasoning: {reasoning}\nBody:\n{body}"}],
+        messages=[{"role": "user", "content": user_content}],
     )
-    return msg.content[0].text.strip()
+    text = msg.content[0].text.strip()
+    record_anthropic_usage("technical", ANTHROPIC_MODEL, msg, SYSTEM_PROMPT + user_content, text)
+    return text
+
 
+def _dispatch(provider: str, ticket_id: str, subject: str, body: str, reasoning: str, context: str = "") -> str:
+    breaker = get_breaker("technical", provider)
+    if provider == "anthropic":
+        return breaker.call(_call_anthropic, ticket_id, subject, body, reasoning, context)
+    if provider == "ollama":
+        return breaker.call(_call_ollama, ticket_id, subject, body, reasoning, context)
+    return breaker.call(_call_openai, ticket_id, subject, body, reasoning, context)
 
-def generate_response(ticket_id: str, subject: str, body: str, reasoning: str) -> str:
+
+def generate_response(ticket_id: str, subject: str, body: str, reasoning: str, context: str = "") -> str:
     """Return a draft technical support response."""
     if MOCK_LLM:
         logger.info("MOCK_LLM enabled: returning fixed technical response")
         return "Thank you for contacting technical support. We've identified the issue you're experiencing. Please try clearing your browser cache and retrying. If the problem persists, our engineering team will investigate and follow up within 24 hours."
-    if LLM_PROVIDER == "anthropic":
-        return _call_anthropic(ticket_id, subject, body, reasoning)
-    if LLM_PROVIDER == "ollama":
-        return _call_ollama(ticket_id, subject, body, reasoning)
-    return _call_openai(ticket_id, subject, body, reasoning)
+    # Keyed by the provider actually called (the budget fallback may switch it). Ticket id is
+    # left out of the cassette fingerprint so replays match regenerated tickets.
+    provider = select_provider("technical", LLM_PROVIDER)
+    return through_cassette(
+        "technical",
+        provider,
+        _model(provider),
+        (subject, body, reasoning) + ((context,) if context else ()),
+        lambda: _dispatch(provider, ticket_id, subject, body, reasoning, context),
+    )
+
+
+def _model(provider: str) -> str:
+    """Model this agent calls on provider."""
+    return {"anthropic": ANTHROPIC_MODEL, "ollama": OLLAMA_MODEL}.get(provider, OPENAI_MODEL)
+
+
+def warm_up() -> None:
+    """Create the pooled client for LLM_PROVIDER and send a one-token priming completion."""
+    if MOCK_LLM or replaying():
+        return
+    prime(LLM_PROVIDER, _model(LLM_PROVIDER), openai_api_key=OPENAI_API_KEY, ollama_base_url=OLLAMA_BASE_URL)
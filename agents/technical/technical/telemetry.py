@@ -1,11 +1,12 @@
 """Observability for technical agent."""
 import logging
 import sys
-import threading
 import uuid
 
 import structlog  # type: ignore[import-untyped]
-from prometheus_client import Counter, Histogram, start_http_server  # type: ignore[import-untyped]
+from prometheus_client import Counter, Histogram  # type: ignore[import-untyped]
+
+from shared.health import start_health_server
 
 from .config import LOG_FORMAT, METRICS_PORT
 
@@ -64,7 +65,5 @@ def configure_logging(log_level: str = "INFO") -> None:
 
 
 def start_metrics_server() -> None:
-    def _serve():
-        start_http_server(METRICS_PORT, addr="0.0.0.0")
-    t = threading.Thread(target=_serve, daemon=True)
-    t.start()
+    """Serve /metrics and the /ready probe (503 until warm-up finishes) in a daemon thread."""
+    start_health_server(METRICS_PORT)
@@ -3,6 +3,10 @@ import sys
 
 import structlog
 
+from shared import shutdown
+from shared.aws.dynamodb import warm_up as warm_up_dynamodb
+from shared.warmup import run_warmup
+
 from .config import (
     LOG_LEVEL,
     LOG_FORMAT,
@@ -10,8 +14,10 @@ from .config import (
     LLM_PROVIDER,
     OPENAI_API_KEY,
     ANTHROPIC_API_KEY,
+    DYNAMODB_TABLE,
 )
 from .agent import run
+from .llm import warm_up as warm_up_llm
 from .telemetry import configure_logging, start_metrics_server
 
 def main():
@@ -28,6 +34,12 @@ def main():
     if LLM_PROVIDER == "anthropic" and not ANTHROPIC_API_KEY:
         log.error("ANTHROPIC_API_KEY is required when LLM_PROVIDER=anthropic")
         sys.exit(1)
+    # Warm up before subscribing so the first ticket doesn't pay for model load and connection setup.
+    run_warmup("triage", [
+        ("llm", warm_up_llm),
+        ("dynamodb", lambda: warm_up_dynamodb(DYNAMODB_TABLE)),
+    ])
+    shutdown.install()
     run()
 
 if __name__ == "__main__":
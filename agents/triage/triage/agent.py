@@ -4,13 +4,34 @@ import time
 from datetime import datetime, timezone
 
 import structlog  # type: ignore[import-untyped]
-from confluent_kafka import Consumer, Producer
-from confluent_kafka import KafkaError
+from confluent_kafka import KafkaError, Producer
 
 from .config import KAFKA_BOOTSTRAP_SERVERS, KAFKA_TOPIC, CONFIDENCE_THRESHOLD
+from shared import headers, kafka, shutdown, transactions
+from shared.backpressure import PartitionPauser
+from shared.autoscaling import ScalingSignal
+from shared.circuit_breaker import BackendUnavailableError
+from shared.config import (
+    AUTOSCALING_INTERVAL_SEC,
+    AUTOSCALING_TARGET_DRAIN_SEC,
+    AUTOSCALING_WINDOW_SEC,
+    FAIRNESS_ENABLED,
+    FAIRNESS_LOOKAHEAD,
+    FAIRNESS_QUANTUM,
+    FAIRNESS_REPORT_INTERVAL_SEC,
+    FAIRNESS_TOP_TALKERS,
+    PRIORITY_LANES_ENABLED,
+    RETRY_ENABLED,
+    RETRY_TIERS,
+)
+from shared.fairness import FairConsumer
+from shared.rebalance import RebalanceListener, drain_and_close
+from shared.retry import RetryPublisher, parse_tiers, start_retry_scheduler
 from shared.topics import topic_for_triage_type
+from shared.usage import observe_ticket, start_ticket, ticket_summary
 from .enricher import enrich_payload
 from .llm import classify_ticket
+from .shadow import get_shadow
 from .telemetry import (
     PROCESSING_SECONDS,
     TICKETS_ENRICHED,
@@ -31,6 +52,7 @@ def build_triaged_event(
     subject: str,
     body: str,
     customer: dict | None = None,
+    usage: dict | None = None,
 ) -> dict:
     """Build the ticket.triaged event payload. Used by the agent and unit tests."""
     triaged = {
@@ -47,6 +69,8 @@ def build_triaged_event(
     }
     if customer is not None:
         triaged["customer"] = customer
+    if usage is not None:
+        triaged["usage"] = usage
     confidence = result.get("confidence")
     if confidence is not None:
         triaged["confidence"] = confidence
@@ -55,22 +79,158 @@ def build_triaged_event(
     return triaged
 
 
+def handle_message(msg, producer: Producer, retry: RetryPublisher | None = None) -> None:
+    """Triage one ticket.created message and produce ticket.triaged.
+
+    Returns normally when the message is done (produced, handed to retry, or deliberately skipped).
+    Raises BackendUnavailableError when the LLM backend is down so the caller can
+    rewind to this message instead of advancing past it.
+    With retry, failed classifications go to the retry topics and invalid JSON to the DLQ.
+    """
+    envelope = headers.read(msg)
+    if envelope.trace_id:
+        structlog.contextvars.bind_contextvars(trace_id=envelope.trace_id)
+    if headers.skip(msg, envelope, "ticket.created", "triage"):
+        return
+    try:
+        value = json.loads(msg.value().decode("utf-8"))
+    except (json.JSONDecodeError, AttributeError) as e:
+        logger.warning("Invalid message value", error=str(e))
+        TICKETS_FAILED.labels(reason="invalid_json").inc()
+        if retry is not None:
+            retry.dead_letter(msg, "invalid_json", str(e))
+        return
+
+    event_type = value.get("event_type")
+    ticket_id = value.get("ticket_id")
+    trace_id = envelope.trace_id or get_or_create_trace_id(value)
+    structlog.contextvars.bind_contextvars(trace_id=trace_id, ticket_id=ticket_id)
+
+    logger.info("Received message", event_type=event_type)
+    if event_type != "ticket.created":
+        return
+
+    customer_id = value.get("customer_id")
+    subject = value.get("subject", "")
+    body = value.get("body", "")
+    channel = value.get("channel", "portal")
+
+    if not ticket_id or not customer_id:
+        logger.warning("Skipping message missing ticket_id or customer_id")
+        TICKETS_FAILED.labels(reason="missing_ids").inc()
+        return
+
+    start_time = time.perf_counter()
+    enriched = enrich_payload(value, customer_id)
+    if "customer" in enriched:
+        TICKETS_ENRICHED.inc()
+
+    logger.info("Triage starting")
+    start_ticket()
+    try:
+        t0 = time.perf_counter()
+        result = classify_ticket(subject=subject, body=body, channel=channel)
+        llm_latency = time.perf_counter() - t0
+        LLM_LATENCY_SECONDS.observe(llm_latency)
+    except BackendUnavailableError:
+        raise
+    except Exception as e:
+        logger.exception("LLM classification failed", error=str(e))
+        TICKETS_FAILED.labels(reason="llm_error").inc()
+        if retry is not None:
+            retry.schedule(msg, "llm_error", str(e))
+        return
+
+    triaged = build_triaged_event(
+        ticket_id=ticket_id,
+        customer_id=customer_id,
+        trace_id=trace_id,
+        result=result,
+        subject=subject,
+        body=body,
+        customer=enriched.get("customer"),
+        usage=ticket_summary(),
+    )
+    observe_ticket("triage", result["type"], triaged["usage"])
+    out_value = json.dumps(triaged).encode("utf-8")
+    confidence = result.get("confidence", 1.0)
+    route_to_human = (
+        confidence < CONFIDENCE_THRESHOLD or result["type"] == "unknown"
+    )
+    out_topic = topic_for_triage_type(
+        result["type"],
+        route_to_human=route_to_human,
+        priority=result["priority"] if PRIORITY_LANES_ENABLED else None,
+    )
+    producer.produce(
+        out_topic,
+        key=ticket_id.encode("utf-8"),
+        value=out_value,
+        headers=headers.event_headers(
+            "ticket.triaged", trace_id, priority=result["priority"], customer_id=customer_id
+        ),
+        callback=lambda err, _: logger.error("Produce error", error=str(err)) if err else None,
+    )
+    producer.flush(timeout=10)
+    PROCESSING_SECONDS.observe(time.perf_counter() - start_time)
+    TICKETS_PROCESSED.labels(type=result["type"], priority=result["priority"]).inc()
+    logger.info("Produced ticket.triaged", type=result["type"], priority=result["priority"])
+
+    # Shadow evaluation runs after produce in its own pool; it only records a comparison.
+    shadow = get_shadow()
+    if shadow is not None:
+        shadow.submit(ticket_id, trace_id, subject, body, channel, result, llm_latency)
+
+
 def run():
     logger.debug("Starting triage agent Kafka consumer/producer loop")
-    # Reduce rdkafka stderr noise (e.g. "connection closed by peer") so app logs are visible; 4 = warning.
-    kafka_common = {
-        "bootstrap.servers": KAFKA_BOOTSTRAP_SERVERS,
-        "log_level": 4,
-    }
-    consumer = Consumer({
-        **kafka_common,
-        "group.id": "triage-agent",
-        "auto.offset.reset": "earliest",
-    })
-    producer = Producer(kafka_common)
-    consumer.subscribe([KAFKA_TOPIC])
-
-    while True:
+    transactions.check_supported("triage", FAIRNESS_ENABLED=FAIRNESS_ENABLED)
+    consumer = kafka.create_consumer(
+        KAFKA_BOOTSTRAP_SERVERS, "triage-agent", settings=transactions.consumer_settings(), agent="triage"
+    )
+    if FAIRNESS_ENABLED:
+        consumer = FairConsumer(
+            consumer,
+            "triage",
+            quantum=FAIRNESS_QUANTUM,
+            lookahead=FAIRNESS_LOOKAHEAD,
+            top_talkers=FAIRNESS_TOP_TALKERS,
+            report_interval_sec=FAIRNESS_REPORT_INTERVAL_SEC,
+            track_offsets=True,
+        )
+    producer = kafka.create_producer(
+        KAFKA_BOOTSTRAP_SERVERS, settings=transactions.producer_settings("triage-agent"), agent="triage"
+    )
+    # The retry scheduler produces from its own thread, outside the loop's transactions.
+    redelivery_producer = producer
+    batch = None
+    if transactions.enabled():
+        batch = transactions.TransactionBatch("triage", consumer, producer)
+        consumer, producer = batch.consumer, batch.producer
+        redelivery_producer = kafka.create_producer(KAFKA_BOOTSTRAP_SERVERS, agent="triage")
+    # The loop is serial, so nothing is in flight when poll() runs the rebalance callbacks.
+    RebalanceListener("triage", transaction=batch).subscribe(consumer, [KAFKA_TOPIC])
+    pauser = PartitionPauser("triage")
+    scaling = ScalingSignal(
+        "triage",
+        target_drain_sec=AUTOSCALING_TARGET_DRAIN_SEC,
+        window_sec=AUTOSCALING_WINDOW_SEC,
+        interval_sec=AUTOSCALING_INTERVAL_SEC,
+    )
+    retry = None
+    retry_scheduler = None
+    if RETRY_ENABLED:
+        tiers = parse_tiers(RETRY_TIERS)
+        retry = RetryPublisher("triage", producer, tiers)
+        retry_scheduler = start_retry_scheduler(
+            "triage", KAFKA_BOOTSTRAP_SERVERS, [KAFKA_TOPIC], tiers, redelivery_producer, "triage-agent-retry"
+        )
+
+    while not shutdown.requested():
+        if batch is not None:
+            batch.maybe_commit()
+        pauser.maybe_resume(consumer)
+        scaling.maybe_update(consumer)
         msg = consumer.poll(timeout=1.0)
         if msg is None:
             continue
@@ -85,71 +245,13 @@ def run():
             logger.error("Consumer error", error=str(msg.error()))
             TICKETS_FAILED.labels(reason="consumer_error").inc()
             continue
+        start = time.perf_counter()
         try:
-            value = json.loads(msg.value().decode("utf-8"))
-        except (json.JSONDecodeError, AttributeError) as e:
-            logger.warning("Invalid message value", error=str(e))
-            TICKETS_FAILED.labels(reason="invalid_json").inc()
-            continue
-
-        event_type = value.get("event_type")
-        ticket_id = value.get("ticket_id")
-        trace_id = get_or_create_trace_id(value)
-        structlog.contextvars.bind_contextvars(trace_id=trace_id, ticket_id=ticket_id)
-
-        logger.info("Received message", event_type=event_type)
-        if event_type != "ticket.created":
+            handle_message(msg, producer, retry)
+        except BackendUnavailableError as e:
+            logger.warning("LLM backend unavailable, rewinding to retry ticket", error=str(e))
+            pauser.rewind(consumer, msg, e.breaker)
             continue
-
-        customer_id = value.get("customer_id")
-        subject = value.get("subject", "")
-        body = value.get("body", "")
-        channel = value.get("channel", "portal")
-
-        if not ticket_id or not customer_id:
-            logger.warning("Skipping message missing ticket_id or customer_id")
-            TICKETS_FAILED.labels(reason="missing_ids").inc()
-            continue
-
-        start_time = time.perf_counter()
-        enriched = enrich_payload(value, customer_id)
-        if "customer" in enriched:
-            TICKETS_ENRICHED.inc()
-
-        logger.info("Triage starting")
-        try:
-            t0 = time.perf_counter()
-            result = classify_ticket(subject=subject, body=body, channel=channel)
-            LLM_LATENCY_SECONDS.observe(time.perf_counter() - t0)
-        except Exception as e:
-            logger.exception("LLM classification failed", error=str(e))
-            TICKETS_FAILED.labels(reason="llm_error").inc()
-            continue
-
-        triaged = build_triaged_event(
-            ticket_id=ticket_id,
-            customer_id=customer_id,
-            trace_id=trace_id,
-            result=result,
-            subject=subject,
-            body=body,
-            customer=enriched.get("customer"),
-        )
-        out_value = json.dumps(triaged).encode("utf-8")
-        headers = [("trace_id", trace_id.encode("utf-8"))]
-        confidence = result.get("confidence", 1.0)
-        route_to_human = (
-            confidence < CONFIDENCE_THRESHOLD or result["type"] == "unknown"
-        )
-        out_topic = topic_for_triage_type(result["type"], route_to_human=route_to_human)
-        producer.produce(
-            out_topic,
-            key=ticket_id.encode("utf-8"),
-            value=out_value,
-            headers=headers,
-            callback=lambda err, _: logger.error("Produce error", error=str(err)) if err else None,
-        )
-        producer.flush(timeout=10)
-        PROCESSING_SECONDS.observe(time.perf_counter() - start_time)
-        TICKETS_PROCESSED.labels(type=result["type"], priority=result["priority"]).inc()
-        logger.info("Produced ticket.triaged", type=result["type"], priority=result["priority"])
+        scaling.record(time.perf_counter() - start)
+        consumer.store_offsets(message=msg)
+    drain_and_close("triage", consumer, producer, retry_scheduler=retry_scheduler, transaction=batch)
@@ -28,3 +28,17 @@ TRIAGE_PRIORITIES = ("low", "medium", "high", "critical")
 
 # Confidence threshold (0–1): when LLM confidence is below this, route to human queue.
 CONFIDENCE_THRESHOLD = float(os.environ.get("CONFIDENCE_THRESHOLD", "0.7"))
+
+# Shadow evaluation: send a sample of tickets to a candidate model/prompt off the critical path
+# and compare with the primary classification. 0 disables. The routed decision is never affected.
+SHADOW_SAMPLE_RATE = float(os.environ.get("SHADOW_SAMPLE_RATE", "0"))
+SHADOW_PROVIDER = os.environ.get("SHADOW_PROVIDER", "ollama").lower()
+SHADOW_MODEL = os.environ.get("SHADOW_MODEL", "")
+SHADOW_BASE_URL = os.environ.get("SHADOW_BASE_URL", "").rstrip("/") or None
+# Optional file with a candidate system prompt; defaults to the primary triage prompt.
+SHADOW_PROMPT_FILE = os.environ.get("SHADOW_PROMPT_FILE", "")
+SHADOW_MAX_CONCURRENCY = int(os.environ.get("SHADOW_MAX_CONCURRENCY", "2"))
+# Shadow calls waiting beyond this are dropped rather than queued.
+SHADOW_MAX_PENDING = int(os.environ.get("SHADOW_MAX_PENDING", "20"))
+# JSONL file for per-ticket comparisons (empty = metrics only).
+SHADOW_RESULTS_PATH = os.environ.get("SHADOW_RESULTS_PATH", "shadow-results.jsonl")
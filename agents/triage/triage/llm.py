@@ -11,9 +11,16 @@ from .config import (
     TRIAGE_PRIORITIES,
     MOCK_LLM,
 )
+from shared.cassette import replaying, through_cassette
+from shared.circuit_breaker import get_breaker
+from shared.llm_clients import anthropic_client, openai_client, prime
+from shared.usage import record_anthropic_usage, record_openai_usage, select_provider
 
 logger = logging.getLogger(__name__)
 
+OPENAI_MODEL = "gpt-4o-mini"
+ANTHROPIC_MODEL = "claude-3-5-haiku-20241022"
+
 # "unknown" is for fallback when LLM returns a type not in the known set
 _KNOWN_TYPES = tuple(t for t in TRIAGE_TYPES if t != "unknown")
 
@@ -51,72 +58,108 @@ def _normalize_result(out: dict) -> dict:
     }
 
 
+def format_triage_prompt(subject: str, body: str, channel: str) -> str:
+    """User message sent to the LLM for a ticket.created event."""
+    return f"Subject: {subject}\nChannel: {channel}\nBody:\n{body}"
+
+
+def parse_classification(text: str) -> dict:
+    """Parse the model's JSON reply (optionally fenced in ```) into a normalized result."""
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1].rsplit("```", 1)[0].strip()
+    return _normalize_result(json.loads(text))
+
+
 def _call_openai(subject: str, body: str, channel: str) -> dict:
-    from openai import OpenAI
     if not OPENAI_API_KEY:
         raise ValueError(
             "OPENAI_API_KEY is required when LLM_PROVIDER=openai. "
             "For in-cluster Ollama set LLM_PROVIDER=ollama and OLLAMA_BASE_URL in the ConfigMap."
         )
-    client = OpenAI(api_key=OPENAI_API_KEY)
+    client = openai_client(OPENAI_API_KEY)
+    user_content = format_triage_prompt(subject, body, channel)
     resp = client.chat.completions.create(
-        model="gpt-4o-mini",
+        model=OPENAI_MODEL,
         messages=[
             {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": f"Subject: {subject}\nChannel: {channel}\nBody:\n{body}"},
+            {"role": "user", "content": user_content},
         ],
         temperature=0.2,
     )
     text = resp.choices[0].message.content.strip()
-    if text.startswith("```"):
-        text = text.split("\n", 1)[1].rsplit("```", 1)[0].strip()
-    out = json.loads(text)
-    return _normalize_result(out)
+    record_openai_usage("triage", "openai", OPENAI_MODEL, resp, SYSTEM_PROMPT + user_content, text)
+    return parse_classification(text)
 
 
 def _call_ollama(subject: str, body: str, channel: str) -> dict:
-    from openai import OpenAI
-    client = OpenAI(base_url=OLLAMA_BASE_URL, api_key="ollama")
+    client = openai_client("ollama", OLLAMA_BASE_URL)
+    user_content = format_triage_prompt(subject, body, channel)
     resp = client.chat.completions.create(
         model=OLLAMA_MODEL,
         messages=[
             {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": f"Subject: {subject}\nChannel: {channel}\nBody:\n{body}"},
+            {"role": "user", "content": user_content},
         ],
         temperature=0.2,
     )
     text = (resp.choices[0].message.content or "").strip()
-    if text.startswith("```"):
-        text = text.split("\n", 1)[1].rsplit("```", 1)[0].strip()
-    out = json.loads(text)
-    return _normalize_result(out)
+    record_openai_usage("triage", "ollama", OLLAMA_MODEL, resp, SYSTEM_PROMPT + user_content, text)
+    return parse_classification(text)
 
 
 def _call_anthropic(subject: str, body: str, channel: str) -> dict:
-    from anthropic import Anthropic
     if not ANTHROPIC_API_KEY:
         raise ValueError("ANTHROPIC_API_KEY is required when LLM_PROVIDER=anthropic")
-    client = Anthropic()
+    client = anthropic_client()
+    user_content = format_triage_prompt(subject, body, channel)
     msg = client.messages.create(
-        model="claude-3-5-haiku-20241022",
+        model=ANTHROPIC_MODEL,
         max_tokens=256,
         system=SYSTEM_PROMPT,
-        messages=[{"role": "user", "content": f"Subject: {subject}\nChannel: {channel}\nBody:\n{body}"}],
+        messages=[{"role": "user", "content": user_content}],
     )
     text = msg.content[0].text.strip()
-    if text.startswith("```"):
-        text = text.split("\n", 1)[1].rsplit("```", 1)[0].strip()
-    out = json.loads(text)
-    return _normalize_result(out)
+    record_anthropic_usage("triage", ANTHROPIC_MODEL, msg, SYSTEM_PROMPT + user_content, text)
+    return parse_classification(text)
+
+
+def _dispatch(provider: str, subject: str, body: str, channel: str) -> dict:
+    breaker = get_breaker("triage", provider)
+    if provider == "anthropic":
+        return breaker.call(_call_anthropic, subject, body, channel)
+    if provider == "ollama":
+        return breaker.call(_call_ollama, subject, body, channel)
+    return breaker.call(_call_openai, subject, body, channel)
 
 
 def classify_ticket(subject: str, body: str, channel: str = "portal") -> dict:
-    """Return dict with type, priority, reasoning, confidence."""
+    """Return dict with type, priority, reasoning, confidence.
+
+    Calls go through the provider's circuit breaker; raises
+    shared.circuit_breaker.BackendUnavailableError when the backend is down.
+    With LLM_CASSETTE_MODE set, results are recorded to / replayed from a cassette.
+    """
     if MOCK_LLM:
         logger.info("MOCK_LLM enabled: returning fixed triage (no API call)")
         return {"type": "billing", "priority": "high", "reasoning": "Mock classification for e2e/CI.", "confidence": 1.0}
-    if LLM_PROVIDER == "anthropic":
-        return _call_anthropic(subject, body, channel)
-    if LLM_PROVIDER == "ollama":
-        return _call_ollama(subject, body, channel)
-    return _call_openai(subject, body, channel)
+    # Keyed by the provider actually called (the budget fallback may switch it).
+    provider = select_provider("triage", LLM_PROVIDER)
+    return through_cassette(
+        "triage",
+        provider,
+        _model(provider),
+        (subject, body, channel),
+        lambda: _dispatch(provider, subject, body, channel),
+    )
+
+
+def _model(provider: str) -> str:
+    """Model this agent calls on provider."""
+    return {"anthropic": ANTHROPIC_MODEL, "ollama": OLLAMA_MODEL}.get(provider, OPENAI_MODEL)
+
+
+def warm_up() -> None:
+    """Create the pooled client for LLM_PROVIDER and send a one-token priming completion."""
+    if MOCK_LLM or replaying():
+        return
+    prime(LLM_PROVIDER, _model(LLM_PROVIDER), openai_api_key=OPENAI_API_KEY, ollama_base_url=OLLAMA_BASE_URL)
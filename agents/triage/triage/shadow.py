@@ -0,0 +1,216 @@
+"""Shadow evaluation of a candidate triage model/prompt on sampled live traffic.
+
+Sampled tickets are classified again by the candidate in a small thread pool after the
+primary result is produced. The candidate never goes through the budget, circuit breaker
+or cassette, and its result is only compared and recorded, so the routed decision and
+the primary's latency are unaffected.
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+from shared.llm_clients import anthropic_client, openai_client
+from shared.topics import topic_for_triage_type
+from shared.usage import estimate_cost, estimate_tokens
+
+from .config import (
+    CONFIDENCE_THRESHOLD,
+    OLLAMA_BASE_URL,
+    OPENAI_API_KEY,
+    SHADOW_BASE_URL,
+    SHADOW_MAX_CONCURRENCY,
+    SHADOW_MAX_PENDING,
+    SHADOW_MODEL,
+    SHADOW_PROMPT_FILE,
+    SHADOW_PROVIDER,
+    SHADOW_RESULTS_PATH,
+    SHADOW_SAMPLE_RATE,
+)
+from .llm import SYSTEM_PROMPT, format_triage_prompt, parse_classification
+from .telemetry import SHADOW_AGREEMENT, SHADOW_LATENCY_SECONDS, SHADOW_REQUESTS, SHADOW_TOKENS
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT_MODELS = {"anthropic": "claude-3-5-haiku-20241022", "openai": "gpt-4o-mini", "ollama": "llama3.2"}
+
+
+def sampled(ticket_id: str, rate: float) -> bool:
+    """Deterministic per-ticket sampling, so a redelivered ticket gets the same decision."""
+    if rate <= 0:
+        return False
+    if rate >= 1:
+        return True
+    bucket = int(hashlib.sha1(ticket_id.encode("utf-8")).hexdigest()[:8], 16) / 0xFFFFFFFF
+    return bucket < rate
+
+
+def _route(result: dict) -> str:
+    confidence = result.get("confidence", 1.0)
+    to_human = confidence < CONFIDENCE_THRESHOLD or result["type"] == "unknown"
+    return topic_for_triage_type(result["type"], route_to_human=to_human)
+
+
+class ShadowEvaluator:
+    def __init__(
+        self,
+        provider: str,
+        model: str,
+        system_prompt: str = SYSTEM_PROMPT,
+        sample_rate: float = 0.0,
+        max_concurrency: int = 2,
+        max_pending: int = 20,
+        results_path: str | Path | None = None,
+        base_url: str | None = None,
+    ):
+        self.provider = provider
+        self.model = model or _DEFAULT_MODELS.get(provider, "")
+        self.system_prompt = system_prompt
+        self.sample_rate = sample_rate
+        self.base_url = base_url
+        self.candidate = f"{provider}:{self.model}"
+        self.results_path = Path(results_path) if results_path else None
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_concurrency), thread_name_prefix="shadow")
+        self._pending = threading.BoundedSemaphore(max(1, max_pending))
+        self._write_lock = threading.Lock()
+
+    def classify(self, subject: str, body: str, channel: str) -> tuple[dict, int, int]:
+        """Classify with the candidate. Returns (result, input_tokens, output_tokens)."""
+        user_content = format_triage_prompt(subject, body, channel)
+        if self.provider == "anthropic":
+            msg = anthropic_client().messages.create(
+                model=self.model,
+                max_tokens=256,
+                system=self.system_prompt,
+                messages=[{"role": "user", "content": user_content}],
+            )
+            text = msg.content[0].text.strip()
+            usage = getattr(msg, "usage", None)
+            in_tok, out_tok = getattr(usage, "input_tokens", None), getattr(usage, "output_tokens", None)
+        else:
+            if self.provider == "ollama":
+                client = openai_client("ollama", self.base_url or OLLAMA_BASE_URL)
+            else:
+                client = openai_client(OPENAI_API_KEY, self.base_url)
+            resp = client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": self.system_prompt},
+                    {"role": "user", "content": user_content},
+                ],
+                temperature=0.2,
+            )
+            text = (resp.choices[0].message.content or "").strip()
+            usage = getattr(resp, "usage", None)
+            in_tok, out_tok = getattr(usage, "prompt_tokens", None), getattr(usage, "completion_tokens", None)
+        if in_tok is None or out_tok is None:
+            in_tok, out_tok = estimate_tokens(self.system_prompt + user_content), estimate_tokens(text)
+        return parse_classification(text), int(in_tok), int(out_tok)
+
+    def submit(
+        self,
+        ticket_id: str,
+        trace_id: str,
+        subject: str,
+        body: str,
+        channel: str,
+        primary: dict,
+        primary_latency: float,
+    ) -> bool:
+        """Queue a shadow classification if the ticket is sampled. Never raises, never blocks."""
+        if not sampled(ticket_id, self.sample_rate):
+            return False
+        if not self._pending.acquire(blocking=False):
+            SHADOW_REQUESTS.labels(candidate=self.candidate, outcome="dropped").inc()
+            return False
+        try:
+            self._executor.submit(
+                self._evaluate, ticket_id, trace_id, subject, body, channel, dict(primary), primary_latency
+            )
+        except RuntimeError:
+            self._pending.release()
+            return False
+        return True
+
+    def _evaluate(self, ticket_id, trace_id, subject, body, channel, primary, primary_latency) -> None:
+        record = {
+            "ticket_id": ticket_id,
+            "trace_id": trace_id,
+            "evaluated_at": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+            "candidate": self.candidate,
+            "primary": {k: primary.get(k) for k in ("type", "priority", "confidence")},
+            "primary_latency_ms": round(primary_latency * 1000, 1),
+        }
+        try:
+            t0 = time.perf_counter()
+            result, in_tok, out_tok = self.classify(subject, body, channel)
+            latency = time.perf_counter() - t0
+        except Exception as e:
+            SHADOW_REQUESTS.labels(candidate=self.candidate, outcome="error").inc()
+            logger.warning("Shadow classification failed for ticket_id=%s: %s", ticket_id, e)
+            record["error"] = str(e)
+        else:
+            SHADOW_REQUESTS.labels(candidate=self.candidate, outcome="completed").inc()
+            SHADOW_LATENCY_SECONDS.labels(candidate=self.candidate).observe(latency)
+            SHADOW_TOKENS.labels(candidate=self.candidate, type="input").inc(in_tok)
+            SHADOW_TOKENS.labels(candidate=self.candidate, type="output").inc(out_tok)
+            agreement = {
+                "type": result["type"] == primary.get("type"),
+                "priority": result["priority"] == primary.get("priority"),
+                "route": _route(result) == _route(primary),
+            }
+            for field, agree in agreement.items():
+                SHADOW_AGREEMENT.labels(candidate=self.candidate, field=field, agree=str(agree).lower()).inc()
+            record.update({
+                "result": {k: result.get(k) for k in ("type", "priority", "confidence")},
+                "agree": agreement,
+                "latency_ms": round(latency * 1000, 1),
+                "input_tokens": in_tok,
+                "output_tokens": out_tok,
+                "cost_usd": estimate_cost(self.model, in_tok, out_tok),
+            })
+        finally:
+            self._pending.release()
+        self._write(record)
+
+    def _write(self, record: dict) -> None:
+        if self.results_path is None:
+            return
+        try:
+            with self._write_lock, self.results_path.open("a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+        except OSError as e:
+            logger.warning("Could not write shadow result to %s: %s", self.results_path, e)
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
+
+
+_evaluator: ShadowEvaluator | None = None
+_evaluator_lock = threading.Lock()
+
+
+def get_shadow() -> ShadowEvaluator | None:
+    """Process-wide evaluator from SHADOW_* settings, or None when shadow mode is off."""
+    global _evaluator
+    if SHADOW_SAMPLE_RATE <= 0:
+        return None
+    with _evaluator_lock:
+        if _evaluator is None:
+            prompt = Path(SHADOW_PROMPT_FILE).read_text(encoding="utf-8") if SHADOW_PROMPT_FILE else SYSTEM_PROMPT
+            _evaluator = ShadowEvaluator(
+                SHADOW_PROVIDER,
+                SHADOW_MODEL,
+                system_prompt=prompt,
+                sample_rate=SHADOW_SAMPLE_RATE,
+                max_concurrency=SHADOW_MAX_CONCURRENCY,
+                max_pending=SHADOW_MAX_PENDING,
+                results_path=SHADOW_RESULTS_PATH or None,
+                base_url=SHADOW_BASE_URL,
+            )
+            logger.info("Shadow mode on: candidate=%s sample_rate=%s", _evaluator.candidate, SHADOW_SAMPLE_RATE)
+    return _evaluator
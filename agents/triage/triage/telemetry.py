@@ -1,11 +1,12 @@
 """Observability: structured logging, trace IDs, Prometheus metrics."""
 import logging
 import sys
-import threading
 import uuid
 
 import structlog  # type: ignore[import-untyped]
-from prometheus_client import Counter, Histogram, start_http_server  # type: ignore[import-untyped]
+from prometheus_client import Counter, Histogram  # type: ignore[import-untyped]
+
+from shared.health import start_health_server
 
 from .config import LOG_FORMAT, METRICS_PORT
 
@@ -37,6 +38,27 @@ TICKETS_ENRICHED = Counter(
     "triage_tickets_enriched_total",
     "Tickets enriched with customer data from DynamoDB",
 )
+SHADOW_REQUESTS = Counter(
+    "triage_shadow_requests_total",
+    "Shadow classifications by outcome (completed, error, dropped)",
+    ["candidate", "outcome"],
+)
+SHADOW_AGREEMENT = Counter(
+    "triage_shadow_agreement_total",
+    "Candidate vs primary comparisons per field (type, priority, route)",
+    ["candidate", "field", "agree"],
+)
+SHADOW_LATENCY_SECONDS = Histogram(
+    "triage_shadow_latency_seconds",
+    "Candidate model classification latency",
+    ["candidate"],
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0),
+)
+SHADOW_TOKENS = Counter(
+    "triage_shadow_tokens_total",
+    "Tokens used by shadow classifications (type: input, output)",
+    ["candidate", "type"],
+)
 
 
 def get_or_create_trace_id(payload: dict) -> str:
@@ -99,9 +121,5 @@ def configure_logging(log_level: str = "INFO") -> None:
 
 
 def start_metrics_server() -> None:
-    """Start Prometheus HTTP server in a daemon thread."""
-    def _serve():
-        start_http_server(METRICS_PORT, addr="0.0.0.0")
-
-    t = threading.Thread(target=_serve, daemon=True)
-    t.start()
+    """Serve /metrics and the /ready probe (503 until warm-up finishes) in a daemon thread."""
+    start_health_server(METRICS_PORT)
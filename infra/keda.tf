@@ -0,0 +1,12 @@
+# KEDA scales the agent deployments on the lag-based autoscaling_desired_replicas metric
+# (agents/*/k8s/scaledobject.yaml) read from the Prometheus stack, instead of CPU.
+
+resource "helm_release" "keda" {
+  name       = "keda"
+  repository = "https://kedacore.github.io/charts"
+  chart      = "keda"
+  version    = var.keda_chart_version
+  namespace  = "keda"
+
+  create_namespace = true
+}
@@ -26,3 +26,9 @@ variable "prometheus_stack_chart_version" {
   type        = string
   default     = "67.3.0"
 }
+
+variable "keda_chart_version" {
+  description = "Helm chart version for KEDA (autoscales the agents on Kafka backlog via Prometheus)."
+  type        = string
+  default     = "2.16.1"
+}
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark guardrail checks as the forbidden-phrase list grows.
+
+Compares the compiled single-pass engine (shared.guardrails.GuardrailEngine) with the
+previous approach of one substring scan per phrase and one regex scan per PII pattern,
+on the same generated responses.
+
+Usage:
+  python scripts/bench-guardrails.py
+  python scripts/bench-guardrails.py --rules 100,1000,10000 --responses 500 --linear-time
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Add repo root for shared imports
+repo_root = Path(__file__).resolve().parent.parent
+if str(repo_root) not in sys.path:
+    sys.path.insert(0, str(repo_root))
+
+from shared.guardrails import FORBIDDEN_PHRASES, PII_PATTERNS, GuardrailEngine  # noqa: E402
+
+_WORDS = (
+    "thanks for reaching out your invoice was updated and the refund will appear on the next statement "
+    "please reset the password from the login page then sign in again we have escalated the sync error "
+    "to the integrations team and will follow up by email once the webhook is fixed"
+).split()
+
+
+def synthetic_phrases(n: int, seed: int = 3) -> list[str]:
+    rng = random.Random(seed)
+    phrases = list(FORBIDDEN_PHRASES)
+    while len(phrases) < n:
+        phrases.append(" ".join(rng.choices(_WORDS, k=rng.randint(2, 4))) + f" rule{len(phrases)}")
+    return phrases[:n]
+
+
+def synthetic_responses(n: int, seed: int = 5) -> list[str]:
+    rng = random.Random(seed)
+    return [" ".join(rng.choices(_WORDS, k=rng.randint(80, 300))) for _ in range(n)]
+
+
+def per_rule_check(text: str, phrases: list[str]) -> bool:
+    """The old check: lowercase, one substring search per phrase, one regex scan per PII pattern."""
+    lower = text.lower()
+    lowered = [p.lower() for p in phrases]
+    if any(p in lower for p in lowered):
+        return False
+    return not any(pat.search(text) for pat in PII_PATTERNS.values())
+
+
+def timed(fn, texts: list[str]) -> tuple[float, float]:
+    latencies = []
+    for text in texts:
+        t0 = time.perf_counter()
+        fn(text)
+        latencies.append(time.perf_counter() - t0)
+    latencies.sort()
+    return statistics.median(latencies), latencies[int(len(latencies) * 0.99) - 1]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark guardrail checks against rule count")
+    parser.add_argument("--rules", default="10,100,1000,10000", help="Comma-separated forbidden phrase counts")
+    parser.add_argument("--responses", type=int, default=300, help="Responses checked per rule count")
+    parser.add_argument("--linear-time", action="store_true", help="Compile the engine with RE2")
+    args = parser.parse_args()
+
+    texts = synthetic_responses(args.responses)
+    print(f"{args.responses} responses, avg {statistics.mean(len(t) for t in texts):.0f} chars")
+    print(f"{'rules':>7} {'compile':>9} {'per-rule p50':>13} {'p99':>9} {'engine p50':>11} {'p99':>9} {'batch/resp':>11}")
+    for n in (int(x) for x in args.rules.split(",")):
+        phrases = synthetic_phrases(n)
+        t0 = time.perf_counter()
+        engine = GuardrailEngine(phrases, linear_time=args.linear_time)
+        compile_sec = time.perf_counter() - t0
+        old_p50, old_p99 = timed(lambda t: per_rule_check(t, phrases), texts)
+        new_p50, new_p99 = timed(engine.scan, texts)
+        t0 = time.perf_counter()
+        engine.scan("\0".join(texts))
+        batch = (time.perf_counter() - t0) / len(texts)
+        print(f"{n:>7} {compile_sec * 1e3:>7.0f}ms {old_p50 * 1e6:>11.0f}us {old_p99 * 1e6:>7.0f}us "
+              f"{new_p50 * 1e6:>9.0f}us {new_p99 * 1e6:>7.0f}us {batch * 1e6:>9.0f}us")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
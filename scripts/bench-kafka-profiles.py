@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Benchmark the Kafka client profiles (shared.kafka.PROFILES) on the same workload.
+
+For each profile a consumer (same profile) reads a fresh topic while the producer writes
+ticket-sized JSON events to it. Reports producer throughput, delivery (ack) latency and
+end-to-end latency (produce -> consumer poll, from a timestamp header).
+
+Two send modes:
+  burst        produce everything, flush once (backfills, replays)
+  per-message  flush after every message, as the triage and specialist loops do
+
+Needs a running broker (e.g. docker compose up kafka).
+
+Usage:
+  python scripts/bench-kafka-profiles.py --bootstrap localhost:9092
+  python scripts/bench-kafka-profiles.py --profiles low-latency,high-throughput --messages 20000 --mode burst
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import statistics
+import struct
+import sys
+import threading
+import time
+import uuid
+from pathlib import Path
+
+# Add repo root for shared imports
+repo_root = Path(__file__).resolve().parent.parent
+if str(repo_root) not in sys.path:
+    sys.path.insert(0, str(repo_root))
+
+from confluent_kafka import KafkaError  # noqa: E402
+from confluent_kafka.admin import AdminClient, NewTopic  # noqa: E402
+
+from shared import kafka  # noqa: E402
+
+_WORDS = (
+    "hello my invoice shows a duplicate charge for the annual plan and the refund has not arrived "
+    "after the password reset the mobile app keeps signing me out and sync fails with error 502 "
+    "could you add an export to csv for the usage dashboard our finance team needs it monthly"
+).split()
+
+
+def synthetic_events(n: int, seed: int = 7) -> list[bytes]:
+    rng = random.Random(seed)
+    events = []
+    for i in range(n):
+        events.append(json.dumps({
+            "event_type": "ticket.created",
+            "ticket_id": f"TKT-{i:06d}",
+            "customer_id": f"cust-{rng.randint(1, 500)}",
+            "subject": " ".join(rng.choices(_WORDS, k=8)),
+            "body": " ".join(rng.choices(_WORDS, k=rng.randint(60, 250))),
+        }).encode("utf-8"))
+    return events
+
+
+def create_topic(bootstrap: str, topic: str, partitions: int) -> None:
+    admin = AdminClient({"bootstrap.servers": bootstrap})
+    for future in admin.create_topics([NewTopic(topic, partitions, 1)]).values():
+        try:
+            future.result()
+        except Exception as e:  # noqa: BLE001
+            if e.args and e.args[0].code() != KafkaError.TOPIC_ALREADY_EXISTS:
+                raise
+
+
+def pct(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else float("nan")
+
+
+def run_profile(bootstrap: str, profile: str, events: list[bytes], mode: str, partitions: int) -> dict:
+    topic = f"bench.kafka-profiles.{profile}.{uuid.uuid4().hex[:8]}"
+    create_topic(bootstrap, topic, partitions)
+
+    consumer = kafka.create_consumer(bootstrap, f"bench-{topic}", profile, {"enable.auto.commit": False})
+    assigned = threading.Event()
+    consumer.subscribe([topic], on_assign=lambda c, parts: assigned.set())
+    end_to_end: list[float] = []
+    done = threading.Event()
+
+    def consume() -> None:
+        while len(end_to_end) < len(events) and not done.is_set():
+            msg = consumer.poll(0.1)
+            if msg is None or msg.error():
+                continue
+            sent = struct.unpack(">d", dict(msg.headers())["sent"])[0]
+            end_to_end.append(time.time() - sent)
+
+    while not assigned.is_set():
+        consumer.poll(0.1)
+    reader = threading.Thread(target=consume, daemon=True)
+    reader.start()
+
+    producer = kafka.create_producer(bootstrap, profile)
+    acks: list[float] = []
+
+    def on_delivery(started: float):
+        return lambda err, _: acks.append(time.perf_counter() - started) if err is None else None
+
+    t0 = time.perf_counter()
+    for i, value in enumerate(events):
+        started = time.perf_counter()
+        while True:
+            try:
+                producer.produce(
+                    topic,
+                    key=f"TKT-{i:06d}".encode("utf-8"),
+                    value=value,
+                    headers=[("sent", struct.pack(">d", time.time()))],
+                    callback=on_delivery(started),
+                )
+                break
+            except BufferError:
+                producer.poll(0.05)
+        if mode == "per-message":
+            producer.flush(timeout=10)
+        else:
+            producer.poll(0)
+    producer.flush(timeout=60)
+    produce_sec = time.perf_counter() - t0
+
+    reader.join(timeout=60)
+    done.set()
+    consumer.close()
+    total_bytes = sum(len(v) for v in events)
+    return {
+        "profile": profile,
+        "msgs_per_sec": len(events) / produce_sec,
+        "mb_per_sec": total_bytes / produce_sec / 1e6,
+        "ack_p50_ms": pct(acks, 0.5) * 1e3,
+        "ack_p99_ms": pct(acks, 0.99) * 1e3,
+        "e2e_p50_ms": pct(end_to_end, 0.5) * 1e3,
+        "e2e_p99_ms": pct(end_to_end, 0.99) * 1e3,
+        "received": len(end_to_end),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark Kafka client profiles on the same workload")
+    parser.add_argument("--bootstrap", default="localhost:9092", help="Kafka bootstrap servers")
+    parser.add_argument("--profiles", default=",".join(kafka.PROFILES), help="Comma-separated profile names")
+    parser.add_argument("--messages", type=int, default=5000, help="Events produced per profile")
+    parser.add_argument("--mode", choices=("burst", "per-message"), default="per-message")
+    parser.add_argument("--partitions", type=int, default=3, help="Partitions of each benchmark topic")
+    args = parser.parse_args()
+
+    events = synthetic_events(args.messages)
+    print(f"{args.messages} events, avg {statistics.mean(len(e) for e in events):.0f} bytes, mode={args.mode}")
+    print(f"{'profile':>16} {'msg/s':>9} {'MB/s':>7} {'ack p50':>9} {'p99':>8} {'e2e p50':>9} {'p99':>8} {'recv':>7}")
+    for profile in args.profiles.split(","):
+        r = run_profile(args.bootstrap, profile.strip(), events, args.mode, args.partitions)
+        print(f"{r['profile']:>16} {r['msgs_per_sec']:>9.0f} {r['mb_per_sec']:>7.2f} "
+              f"{r['ack_p50_ms']:>7.1f}ms {r['ack_p99_ms']:>6.1f}ms {r['e2e_p50_ms']:>7.1f}ms "
+              f"{r['e2e_p99_ms']:>6.1f}ms {r['received']:>7}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Benchmark exactly-once processing throughput against the transaction batch size.
+
+Fills an input topic with ticket-sized JSON events once, then for each batch size runs the
+consume-transform-produce loop the agents use in exactly-once mode (shared.transactions):
+a fresh consumer group reads the input, produces one output event per message through a
+transactional producer, and commits output and offsets every N messages. Reports
+throughput, transactions committed, commit latency, and checks with a read_committed
+consumer that the output holds each input exactly once.
+
+Batch size 1 is the per-message synchronous commit; larger batches amortize the commit's
+broker round trips (send offsets, end transaction markers on every partition touched).
+--work-ms adds simulated per-ticket processing time.
+
+Needs a running broker (e.g. docker compose up kafka).
+
+Usage:
+  python scripts/bench-transactions.py --bootstrap localhost:9092
+  python scripts/bench-transactions.py --batch-sizes 1,10,100,500 --messages 5000 --work-ms 1
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+import uuid
+from pathlib import Path
+
+# Add repo root for shared imports
+repo_root = Path(__file__).resolve().parent.parent
+if str(repo_root) not in sys.path:
+    sys.path.insert(0, str(repo_root))
+
+from confluent_kafka import KafkaError  # noqa: E402
+from confluent_kafka.admin import AdminClient, NewTopic  # noqa: E402
+
+from shared import kafka  # noqa: E402
+from shared.transactions import TransactionBatch  # noqa: E402
+
+
+def synthetic_events(n: int, seed: int = 7) -> list[bytes]:
+    rng = random.Random(seed)
+    words = "invoice refund charge password reset sync error export dashboard plan account".split()
+    return [
+        json.dumps({
+            "event_type": "ticket.created",
+            "ticket_id": f"TKT-{i:06d}",
+            "customer_id": f"cust-{rng.randint(1, 500)}",
+            "subject": " ".join(rng.choices(words, k=6)),
+            "body": " ".join(rng.choices(words, k=rng.randint(60, 250))),
+        }).encode("utf-8")
+        for i in range(n)
+    ]
+
+
+def create_topic(bootstrap: str, topic: str, partitions: int) -> None:
+    admin = AdminClient({"bootstrap.servers": bootstrap})
+    for future in admin.create_topics([NewTopic(topic, partitions, 1)]).values():
+        try:
+            future.result()
+        except Exception as e:  # noqa: BLE001
+            if e.args and e.args[0].code() != KafkaError.TOPIC_ALREADY_EXISTS:
+                raise
+
+
+def pct(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else float("nan")
+
+
+def fill_input(bootstrap: str, topic: str, events: list[bytes]) -> None:
+    producer = kafka.create_producer(bootstrap, "high-throughput")
+    for i, value in enumerate(events):
+        while True:
+            try:
+                producer.produce(topic, key=f"TKT-{i:06d}".encode("utf-8"), value=value)
+                break
+            except BufferError:
+                producer.poll(0.05)
+    producer.flush(timeout=60)
+
+
+def count_committed(bootstrap: str, topic: str, expected: int, timeout_sec: float = 30.0) -> tuple[int, int]:
+    """(records, distinct keys) visible to a read_committed consumer of topic."""
+    consumer = kafka.create_consumer(bootstrap, f"bench-verify-{uuid.uuid4().hex[:8]}", "exactly-once")
+    consumer.subscribe([topic])
+    keys: list[bytes] = []
+    deadline = time.monotonic() + timeout_sec
+    while len(keys) < expected and time.monotonic() < deadline:
+        msg = consumer.poll(0.5)
+        if msg is not None and not msg.error():
+            keys.append(msg.key())
+    # Read a little longer so duplicates would show up.
+    end = time.monotonic() + 2.0
+    while time.monotonic() < end:
+        msg = consumer.poll(0.2)
+        if msg is not None and not msg.error():
+            keys.append(msg.key())
+    consumer.close()
+    return len(keys), len(set(keys))
+
+
+def run_batch_size(bootstrap: str, input_topic: str, n: int, batch_size: int, partitions: int, work_ms: float) -> dict:
+    output_topic = f"bench.transactions.out.{batch_size}.{uuid.uuid4().hex[:8]}"
+    create_topic(bootstrap, output_topic, partitions)
+    group = f"bench-transactions-{batch_size}-{uuid.uuid4().hex[:8]}"
+    consumer = kafka.create_consumer(bootstrap, group, "exactly-once", {"enable.auto.commit": False})
+    producer = kafka.create_producer(bootstrap, "exactly-once", {"transactional.id": f"{group}-0"})
+    # max_ms is large so only the batch size decides when to commit.
+    batch = TransactionBatch(f"bench-{batch_size}", consumer, producer, max_messages=batch_size, max_ms=3_600_000)
+    consumer, producer = batch.consumer, batch.producer
+    consumer.subscribe([input_topic])
+
+    commit_ms: list[float] = []
+    transactions = 0
+    consumed = 0
+    t0 = None
+    while consumed < n:
+        msg = consumer.poll(1.0)
+        if msg is None or msg.error():
+            continue
+        if t0 is None:
+            t0 = time.perf_counter()
+        if work_ms:
+            time.sleep(work_ms / 1000)
+        producer.produce(output_topic, key=msg.key(), value=msg.value())
+        consumer.store_offsets(message=msg)
+        consumed += 1
+        started = time.perf_counter()
+        if batch.maybe_commit():
+            commit_ms.append((time.perf_counter() - started) * 1e3)
+            transactions += 1
+    if batch.open:
+        started = time.perf_counter()
+        batch.commit()
+        commit_ms.append((time.perf_counter() - started) * 1e3)
+        transactions += 1
+    elapsed = time.perf_counter() - (t0 or time.perf_counter())
+    consumer.close()
+
+    records, distinct = count_committed(bootstrap, output_topic, n)
+    return {
+        "batch_size": batch_size,
+        "msgs_per_sec": n / elapsed if elapsed else float("nan"),
+        "transactions": transactions,
+        "commit_p50_ms": pct(commit_ms, 0.5),
+        "commit_p99_ms": pct(commit_ms, 0.99),
+        "records": records,
+        "distinct": distinct,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark exactly-once throughput against transaction batch size")
+    parser.add_argument("--bootstrap", default="localhost:9092", help="Kafka bootstrap servers")
+    parser.add_argument("--batch-sizes", default="1,10,50,100,500", help="Comma-separated messages per transaction")
+    parser.add_argument("--messages", type=int, default=2000, help="Events processed per batch size")
+    parser.add_argument("--partitions", type=int, default=3, help="Partitions of the input and output topics")
+    parser.add_argument("--work-ms", type=float, default=0.0, help="Simulated processing time per ticket")
+    args = parser.parse_args()
+
+    events = synthetic_events(args.messages)
+    input_topic = f"bench.transactions.in.{uuid.uuid4().hex[:8]}"
+    create_topic(args.bootstrap, input_topic, args.partitions)
+    fill_input(args.bootstrap, input_topic, events)
+    print(
+        f"{args.messages} events, avg {statistics.mean(len(e) for e in events):.0f} bytes, "
+        f"{args.partitions} partitions, work={args.work_ms}ms/ticket"
+    )
+    print(f"{'batch':>6} {'msg/s':>9} {'txns':>6} {'commit p50':>11} {'p99':>8} {'output':>8} {'exactly-once':>13}")
+    for size in (int(s) for s in args.batch_sizes.split(",")):
+        r = run_batch_size(args.bootstrap, input_topic, args.messages, size, args.partitions, args.work_ms)
+        exact = r["records"] == r["distinct"] == args.messages
+        print(f"{r['batch_size']:>6} {r['msgs_per_sec']:>9.0f} {r['transactions']:>6} "
+              f"{r['commit_p50_ms']:>9.1f}ms {r['commit_p99_ms']:>6.1f}ms {r['records']:>8} {'yes' if exact else 'NO':>13}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Build the help-center knowledge-base index used by the specialist agents (KB_INDEX_PATH).
+
+Reads *.md / *.json articles from a directory (format in shared/kb.py) and writes the
+memory-mappable BM25 index to the output directory. Rebuild and redeploy the directory
+whenever articles change; agents open the index once at startup.
+
+Usage:
+  python scripts/build-kb-index.py --src kb/articles --out kb/index
+  python scripts/build-kb-index.py --src kb/articles --out kb/index --bench 1000
+  python scripts/build-kb-index.py --synthetic 50000 --out /tmp/kb-index --bench 2000
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Add repo root for shared imports
+repo_root = Path(__file__).resolve().parent.parent
+if str(repo_root) not in sys.path:
+    sys.path.insert(0, str(repo_root))
+
+from shared.kb import Article, KnowledgeBase, build_index, load_articles  # noqa: E402
+
+_WORDS = (
+    "invoice billing refund charge payment card plan upgrade downgrade subscription account login password "
+    "reset sso saml export import api key token webhook integration slack error timeout sync mobile app "
+    "notification email report dashboard team member role permission seat trial cancel renew tax receipt"
+).split()
+
+
+def _zipf_vocabulary(size: int) -> tuple[list[str], list[float]]:
+    """Support words first, then filler terms, with Zipf-like cumulative weights."""
+    words = _WORDS + [f"term{i}" for i in range(size - len(_WORDS))]
+    cum, total = [], 0.0
+    for rank in range(1, len(words) + 1):
+        total += 1 / rank
+        cum.append(total)
+    return words, cum
+
+
+def synthetic_articles(n: int, seed: int = 7, vocabulary: int = 20000) -> list[Article]:
+    """Random articles with a Zipf-distributed vocabulary, for sizing and latency checks."""
+    rng = random.Random(seed)
+    words, cum = _zipf_vocabulary(vocabulary)
+    articles = []
+    for i in range(n):
+        title = " ".join(rng.choices(words, cum_weights=cum, k=5))
+        body = " ".join(rng.choices(words, cum_weights=cum, k=rng.randint(80, 400)))
+        articles.append(Article(id=f"synthetic-{i}", title=title, body=body, template=f"See article {i}."))
+    return articles
+
+
+def bench(index_dir: Path, queries: int) -> None:
+    kb = KnowledgeBase(index_dir)
+    rng = random.Random(11)
+    words, cum = _zipf_vocabulary(20000)
+    texts = [" ".join(rng.choices(words, cum_weights=cum, k=rng.randint(4, 30))) for _ in range(queries)]
+    for text in texts[:50]:
+        kb.search(text, k=3)  # fault in the mapped pages
+    latencies = []
+    for text in texts:
+        t0 = time.perf_counter()
+        kb.search(text, k=3)
+        latencies.append(time.perf_counter() - t0)
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"{queries} queries over {kb.n_docs} articles: "
+          f"p50={statistics.median(latencies) * 1e6:.0f}us p99={p99 * 1e6:.0f}us")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Build the KB BM25 index for specialist agents")
+    parser.add_argument("--src", help="Directory of *.md / *.json articles")
+    parser.add_argument("--synthetic", type=int, default=0, help="Index N generated articles instead of --src")
+    parser.add_argument("--out", required=True, help="Output index directory (KB_INDEX_PATH)")
+    parser.add_argument("--k1", type=float, default=1.2, help="BM25 k1 (default 1.2)")
+    parser.add_argument("--b", type=float, default=0.75, help="BM25 b (default 0.75)")
+    parser.add_argument("--bench", type=int, default=0, help="Run N random queries against the built index")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        articles = synthetic_articles(args.synthetic)
+    elif args.src:
+        articles = load_articles(args.src)
+    else:
+        parser.error("--src or --synthetic is required")
+    if not articles:
+        print(f"No articles found in {args.src}", file=sys.stderr)
+        return 1
+
+    t0 = time.perf_counter()
+    meta = build_index(articles, args.out, k1=args.k1, b=args.b)
+    size = sum(p.stat().st_size for p in Path(args.out).iterdir())
+    print(f"Indexed {meta['n_docs']} articles, {meta['n_terms']} terms, {meta['n_postings']} postings "
+          f"in {time.perf_counter() - t0:.1f}s -> {args.out} ({size / 1e6:.1f} MB)")
+    if args.bench:
+        bench(Path(args.out), args.bench)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -17,7 +17,22 @@ TOPICS=(
   "ticket.triaged.other"
   "ticket.triaged.human"
   "ticket.resolved"
+  "ticket.resolution.partial"
 )
+# Priority lanes (PRIORITY_LANES_ENABLED): ticket.triaged.<type>.p0 (critical) .. p3 (low).
+# The human queue has no lanes.
+for type in billing technical feature_request account other; do
+  for lane in p0 p1 p2 p3; do
+    TOPICS+=("ticket.triaged.$type.$lane")
+  done
+done
+# Retry tiers and dead-letter topics (RETRY_ENABLED, default RETRY_TIERS=30s,5m,30m).
+for base in ticket.events ticket.triaged.billing ticket.triaged.technical ticket.triaged.feature_request ticket.triaged.account ticket.triaged.other; do
+  for tier in 30s 5m 30m; do
+    TOPICS+=("$base.retry.$tier")
+  done
+  TOPICS+=("$base.dlq")
+done
 
 echo "Creating topics (bootstrap=$BOOTSTRAP, namespace=$NAMESPACE)..."
 for topic in "${TOPICS[@]}"; do
@@ -28,7 +43,7 @@ kubectl run kafka-client --rm -i --restart=Never \
   --image="$IMAGE" \
   -n "$NAMESPACE" \
   -- bash -c "
-    for t in ticket.events ticket.triaged.billing ticket.triaged.technical ticket.triaged.feature_request ticket.triaged.account ticket.triaged.other ticket.triaged.human ticket.resolved; do
+    for t in ${TOPICS[*]}; do
       kafka-topics --bootstrap-server $BOOTSTRAP --create --topic \$t --partitions 6 --replication-factor 3 2>/dev/null || true
     done
     echo '---'
@@ -5,7 +5,7 @@ Provision the entire Support Resolution System.
 Runs in order:
   1. (Optional) Kafka platform – terraform-aws-confluent-platform (terraform + manifests + DNS)
   2. Infra – Terraform (DynamoDB, Prometheus, Pod Identity)
-  3. Kafka topics – Create ticket.events, ticket.triaged.*, ticket.resolved
+  3. Kafka topics – Create ticket.events, ticket.triaged.* (incl. priority lanes), ticket.resolved, ticket.resolution.partial
   4. Build & push – Docker images for triage, billing, technical, feature
   5. Deploy – Namespace, ConfigMaps, Ollama, secrets, agent deployments
 
@@ -51,6 +51,22 @@ KAFKA_TOPICS = [
     "ticket.triaged.other",
     "ticket.triaged.human",  # Fallback: unknown types, low-confidence
     "ticket.resolved",
+    "ticket.resolution.partial",  # Opt-in draft-so-far events (PARTIAL_EVENTS_ENABLED)
+    # Priority lanes (PRIORITY_LANES_ENABLED): p0 = critical .. p3 = low; none for the human queue
+    *(
+        f"ticket.triaged.{t}.{lane}"
+        for t in ("billing", "technical", "feature_request", "account", "other")
+        for lane in ("p0", "p1", "p2", "p3")
+    ),
+    # Retry tiers and dead-letter topics (RETRY_ENABLED, default RETRY_TIERS=30s,5m,30m)
+    *(
+        f"{base}.{suffix}"
+        for base in (
+            "ticket.events",
+            *(f"ticket.triaged.{t}" for t in ("billing", "technical", "feature_request", "account", "other")),
+        )
+        for suffix in ("retry.30s", "retry.5m", "retry.30m", "dlq")
+    ),
 ]
 
 
@@ -0,0 +1,144 @@
+"""Lag-based autoscaling signal: the replicas needed to drain the backlog within a target time.
+
+The agents wait on LLM calls, so CPU says nothing about whether they keep up. Every
+interval each replica computes its share of the desired replica count from what it sees:
+
+    capacity  = workers / mean ticket latency          (tickets/s one replica can finish)
+    required  = recent processing rate + lag / AUTOSCALING_TARGET_DRAIN_SEC
+    desired   = min(required / capacity, assigned partitions)
+
+lag is summed over the replica's assigned partitions (cached high watermark minus
+position), and rate and latency come from the tickets it finished in the last
+AUTOSCALING_WINDOW_SEC. Summed over the replicas of an agent, autoscaling_desired_replicas
+is the replica count for the whole consumer group, and it never exceeds the partition
+count because each replica is capped at the partitions it owns. A replica without
+partitions exports 0. The KEDA ScaledObjects in agents/*/k8s scale on that sum.
+"""
+import math
+import threading
+import time
+from collections import deque
+from typing import Callable
+
+import structlog  # type: ignore[import-untyped]
+from confluent_kafka import KafkaException
+from prometheus_client import Gauge  # type: ignore[import-untyped]
+
+logger = structlog.get_logger(__name__)
+
+DESIRED_REPLICAS = Gauge(
+    "autoscaling_desired_replicas",
+    "This replica's share of the replicas needed to drain the backlog in the target time; sum over replicas",
+    ["agent"],
+)
+LAG = Gauge(
+    "autoscaling_lag_messages",
+    "Messages behind on the partitions assigned to this replica",
+    ["agent"],
+)
+PROCESSING_RATE = Gauge(
+    "autoscaling_processing_rate",
+    "Tickets finished per second over the window",
+    ["agent"],
+)
+TICKET_LATENCY = Gauge(
+    "autoscaling_ticket_latency_seconds",
+    "Mean processing time of the tickets finished in the window",
+    ["agent"],
+)
+ASSIGNED_PARTITIONS = Gauge(
+    "autoscaling_assigned_partitions",
+    "Partitions assigned to this replica (cap on its desired replicas)",
+    ["agent"],
+)
+
+
+def desired_replicas(
+    lag: int,
+    rate: float,
+    latency_sec: float | None,
+    workers: int,
+    partitions: int,
+    target_drain_sec: float,
+) -> float:
+    """Replicas needed to keep up with rate and drain lag within target_drain_sec, capped at partitions."""
+    if partitions <= 0:
+        return 0.0
+    if latency_sec is None or latency_sec <= 0:
+        # Nothing finished in the window: keep this replica while it has a backlog.
+        return 1.0 if lag > 0 else 0.0
+    capacity = max(1, workers) / latency_sec
+    required = rate + lag / max(target_drain_sec, 1e-9)
+    return min(required / capacity, float(partitions))
+
+
+class ScalingSignal:
+    """Collects ticket latencies and refreshes the autoscaling gauges every interval_sec.
+
+    record() is called from whichever thread finished the ticket; maybe_update() from the
+    poll loop, since it reads the consumer's positions.
+    """
+
+    def __init__(
+        self,
+        agent: str,
+        workers: int = 1,
+        target_drain_sec: float = 300.0,
+        window_sec: float = 60.0,
+        interval_sec: float = 15.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.agent = agent
+        self.workers = workers
+        self.target_drain_sec = target_drain_sec
+        self.window_sec = window_sec
+        self.interval_sec = interval_sec
+        self.clock = clock
+        self._finished: deque[tuple[float, float]] = deque()
+        self._lock = threading.Lock()
+        self._started = clock()
+        self._next = 0.0
+
+    def record(self, seconds: float) -> None:
+        """One ticket finished after seconds of processing."""
+        with self._lock:
+            self._finished.append((self.clock(), seconds))
+
+    def window(self) -> tuple[float, float | None]:
+        """(tickets per second, mean latency or None) over the last window_sec."""
+        now = self.clock()
+        with self._lock:
+            while self._finished and self._finished[0][0] < now - self.window_sec:
+                self._finished.popleft()
+            latencies = [seconds for _, seconds in self._finished]
+        if not latencies:
+            return 0.0, None
+        span = min(self.window_sec, max(now - self._started, 1e-9))
+        return len(latencies) / span, math.fsum(latencies) / len(latencies)
+
+    def maybe_update(self, consumer) -> None:
+        now = self.clock()
+        if now < self._next:
+            return
+        self._next = now + self.interval_sec
+        try:
+            positions = consumer.position(consumer.assignment())
+        except KafkaException as e:
+            logger.debug("Could not read consumer positions", error=str(e))
+            return
+        lag = 0
+        for tp in positions:
+            _, high = consumer.get_watermark_offsets(tp, cached=True) or (-1, -1)
+            if high >= 0 and tp.offset >= 0:
+                lag += max(0, high - tp.offset)
+        self.update(lag, len(positions))
+
+    def update(self, lag: int, partitions: int) -> float:
+        rate, latency = self.window()
+        desired = desired_replicas(lag, rate, latency, self.workers, partitions, self.target_drain_sec)
+        DESIRED_REPLICAS.labels(agent=self.agent).set(desired)
+        LAG.labels(agent=self.agent).set(lag)
+        PROCESSING_RATE.labels(agent=self.agent).set(rate)
+        TICKET_LATENCY.labels(agent=self.agent).set(latency or 0)
+        ASSIGNED_PARTITIONS.labels(agent=self.agent).set(partitions)
+        return desired
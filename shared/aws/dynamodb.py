@@ -1,9 +1,21 @@
 """DynamoDB client for customer/user lookups. Used by agents to enrich ticket payloads."""
 import logging
+from functools import lru_cache
 from typing import Any
 
 logger = logging.getLogger(__name__)
 
+# Partition key used by warm_up(); never a real customer.
+WARMUP_CUSTOMER_ID = "__warmup__"
+
+
+@lru_cache(maxsize=1)
+def _client():
+    """Process-wide DynamoDB client (credential resolution and connection pool are reused)."""
+    import boto3
+
+    return boto3.client("dynamodb")
+
 
 def get_customer(customer_id: str, table_name: str | None = None) -> dict[str, Any] | None:
     """
@@ -14,12 +26,10 @@ def get_customer(customer_id: str, table_name: str | None = None) -> dict[str, A
         return None
 
     try:
-        import boto3
         from boto3.dynamodb.types import TypeDeserializer
         from botocore.exceptions import ClientError
 
-        client = boto3.client("dynamodb")
-        resp = client.get_item(
+        resp = _client().get_item(
             TableName=table_name,
             Key={"customer_id": {"S": customer_id}},
         )
@@ -38,3 +48,14 @@ def get_customer(customer_id: str, table_name: str | None = None) -> dict[str, A
     except Exception as e:
         logger.exception("DynamoDB get_customer failed for customer_id=%s: %s", customer_id, e)
         return None
+
+
+def warm_up(table_name: str | None) -> None:
+    """Create the client and issue one GetItem so credentials, DNS and TLS are ready.
+
+    Uses GetItem rather than DescribeTable because agent pods are only granted read access.
+    Raises on failure so the caller can record it.
+    """
+    if not table_name:
+        return
+    _client().get_item(TableName=table_name, Key={"customer_id": {"S": WARMUP_CUSTOMER_ID}})
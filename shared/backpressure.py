@@ -0,0 +1,67 @@
+"""Kafka backpressure: rewind and pause partitions while an LLM backend is unavailable.
+
+Used with enable.auto.offset.store=false: the failed message's offset is never stored,
+the consumer seeks back to it, and all assigned partitions stay paused until the
+breaker allows a half-open trial. The re-polled message is that trial call.
+"""
+import time
+
+import structlog  # type: ignore[import-untyped]
+from confluent_kafka import TopicPartition
+from prometheus_client import Counter, Gauge  # type: ignore[import-untyped]
+
+from .circuit_breaker import OPEN, CircuitBreaker
+
+logger = structlog.get_logger(__name__)
+
+CONSUMER_PAUSED = Gauge(
+    "kafka_consumer_paused",
+    "1 while the consumer is paused because an LLM backend is unavailable",
+    ["agent"],
+)
+CONSUMER_PAUSED_SECONDS = Counter(
+    "kafka_consumer_paused_seconds_total",
+    "Time spent with partitions paused because an LLM backend is unavailable",
+    ["agent"],
+)
+
+
+class PartitionPauser:
+    """Rewinds to the failed message and pauses the assignment while the breaker is open."""
+
+    def __init__(self, agent: str):
+        self.agent = agent
+        self._breaker: CircuitBreaker | None = None
+        self._paused_since: float | None = None
+
+    @property
+    def paused(self) -> bool:
+        return self._paused_since is not None
+
+    def rewind(self, consumer, msg, breaker: CircuitBreaker) -> None:
+        """Seek back to msg so it is redelivered; pause all partitions if the breaker is open."""
+        consumer.seek(TopicPartition(msg.topic(), msg.partition(), msg.offset()))
+        if breaker.state != OPEN or self.paused:
+            return
+        consumer.pause(consumer.assignment())
+        self._breaker = breaker
+        self._paused_since = time.monotonic()
+        CONSUMER_PAUSED.labels(agent=self.agent).set(1)
+        logger.warning("Paused consumption: LLM backend circuit open", backend=breaker.backend)
+
+    def maybe_resume(self, consumer) -> bool:
+        """Resume once the breaker allows a trial call. Returns True while still paused."""
+        if self._paused_since is None or self._breaker is None:
+            return False
+        assignment = consumer.assignment()
+        if not self._breaker.ready():
+            # Keep partitions assigned during a rebalance paused as well.
+            consumer.pause(assignment)
+            return True
+        consumer.resume(assignment)
+        CONSUMER_PAUSED_SECONDS.labels(agent=self.agent).inc(time.monotonic() - self._paused_since)
+        CONSUMER_PAUSED.labels(agent=self.agent).set(0)
+        logger.info("Resumed consumption: probing LLM backend", backend=self._breaker.backend)
+        self._breaker = None
+        self._paused_since = None
+        return False
@@ -0,0 +1,379 @@
+"""Deferred bulk resolution via provider batch APIs.
+
+Low-priority specialist tickets are accumulated and submitted as one batch job
+(Anthropic Message Batches or OpenAI Batch API, or LocalBatchBackend for tests and
+Ollama). DeferredBatcher.tick() is called from the consumer loop: it submits a batch
+when it is full or old enough, polls running jobs, and hands each result back via
+on_result so the specialist can run guardrails and produce ticket.resolved.
+
+Each request's custom_id names its source message (topic, partition, offset), not the
+ticket: under at-least-once delivery the same ticket_id can be deferred twice, and the
+batch APIs reject duplicate custom_ids.
+"""
+import hashlib
+import json
+import re
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Callable, Protocol
+
+import structlog  # type: ignore[import-untyped]
+from prometheus_client import Counter, Gauge, Histogram  # type: ignore[import-untyped]
+
+logger = structlog.get_logger(__name__)
+
+BATCH_JOBS = Counter(
+    "specialist_batch_jobs_total",
+    "Deferred batch jobs by final status",
+    ["agent", "status"],
+)
+BATCH_TURNAROUND_SECONDS = Histogram(
+    "specialist_batch_turnaround_seconds",
+    "Time from batch submission to results landing",
+    ["agent"],
+    buckets=(10, 60, 300, 900, 1800, 3600, 7200, 21600, 86400),
+)
+DEFERRED_TICKETS = Gauge(
+    "specialist_deferred_tickets",
+    "Tickets waiting for a batch (accumulating or submitted)",
+    ["agent"],
+)
+
+# Providers bill batch requests at half the real-time price.
+BATCH_COST_MULTIPLIER = 0.5
+
+_CUSTOM_ID_UNSAFE = re.compile(r"[^A-Za-z0-9_-]")
+_CUSTOM_ID_MAX = 64  # Anthropic and OpenAI: [A-Za-z0-9_-]{1,64}
+
+IN_PROGRESS = "in_progress"
+ENDED = "ended"
+FAILED = "failed"
+
+
+def request_custom_id(topic: str, partition: int, offset: int) -> str:
+    """Batch custom_id unique to one consumed message, in the charset the batch APIs accept."""
+    suffix = f"-{partition}-{offset}"
+    name = _CUSTOM_ID_UNSAFE.sub("_", topic)
+    if len(name) + len(suffix) > _CUSTOM_ID_MAX:
+        name = hashlib.sha256(topic.encode("utf-8")).hexdigest()[: _CUSTOM_ID_MAX - len(suffix)]
+    return name + suffix
+
+
+@dataclass
+class BatchResult:
+    """One request's outcome. text is None when the request errored."""
+
+    text: str | None
+    input_tokens: int = 0
+    output_tokens: int = 0
+    error: str | None = None
+
+
+class BatchBackend(Protocol):
+    provider: str
+    model: str
+
+    def submit(self, requests: list[dict]) -> str: ...
+
+    def status(self, job_id: str) -> str: ...
+
+    def results(self, job_id: str) -> dict[str, BatchResult]: ...
+
+
+class AnthropicBatchBackend:
+    """Anthropic Message Batches API."""
+
+    provider = "anthropic"
+
+    def __init__(self, model: str, client: Any = None):
+        self.model = model
+        if client is None:
+            from anthropic import Anthropic
+            client = Anthropic()
+        self._client = client
+
+    def submit(self, requests: list[dict]) -> str:
+        batch = self._client.messages.batches.create(requests=[
+            {
+                "custom_id": r["custom_id"],
+                "params": {
+                    "model": self.model,
+                    "max_tokens": r["max_tokens"],
+                    "system": r["system"],
+                    "messages": [{"role": "user", "content": r["user"]}],
+                },
+            }
+            for r in requests
+        ])
+        return batch.id
+
+    def status(self, job_id: str) -> str:
+        batch = self._client.messages.batches.retrieve(job_id)
+        return ENDED if batch.processing_status == "ended" else IN_PROGRESS
+
+    def results(self, job_id: str) -> dict[str, BatchResult]:
+        out = {}
+        for entry in self._client.messages.batches.results(job_id):
+            if entry.result.type == "succeeded":
+                message = entry.result.message
+                out[entry.custom_id] = BatchResult(
+                    text=message.content[0].text.strip(),
+                    input_tokens=message.usage.input_tokens,
+                    output_tokens=message.usage.output_tokens,
+                )
+            else:
+                out[entry.custom_id] = BatchResult(text=None, error=entry.result.type)
+        return out
+
+
+class OpenAIBatchBackend:
+    """OpenAI Batch API over /v1/chat/completions (JSONL input file)."""
+
+    provider = "openai"
+
+    def __init__(self, model: str, client: Any = None):
+        self.model = model
+        if client is None:
+            from openai import OpenAI
+            client = OpenAI()
+        self._client = client
+
+    def submit(self, requests: list[dict]) -> str:
+        lines = [
+            json.dumps({
+                "custom_id": r["custom_id"],
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": self.model,
+                    "max_tokens": r["max_tokens"],
+                    "messages": [
+                        {"role": "system", "content": r["system"]},
+                        {"role": "user", "content": r["user"]},
+                    ],
+                },
+            })
+            for r in requests
+        ]
+        input_file = self._client.files.create(
+            file=("batch.jsonl", "\n".join(lines).encode("utf-8")),
+            purpose="batch",
+        )
+        batch = self._client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+        )
+        return batch.id
+
+    def status(self, job_id: str) -> str:
+        batch = self._client.batches.retrieve(job_id)
+        if batch.status == "completed" or (batch.status == "expired" and batch.output_file_id):
+            return ENDED
+        if batch.status in ("failed", "expired", "cancelled"):
+            return FAILED
+        return IN_PROGRESS
+
+    def results(self, job_id: str) -> dict[str, BatchResult]:
+        batch = self._client.batches.retrieve(job_id)
+        out = {}
+        content = self._client.files.content(batch.output_file_id).text
+        for line in content.splitlines():
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            response = row.get("response") or {}
+            if response.get("status_code") != 200:
+                out[row["custom_id"]] = BatchResult(text=None, error=str(row.get("error") or response.get("status_code")))
+                continue
+            body = response["body"]
+            usage = body.get("usage") or {}
+            out[row["custom_id"]] = BatchResult(
+                text=(body["choices"][0]["message"].get("content") or "").strip(),
+                input_tokens=usage.get("prompt_tokens", 0),
+                output_tokens=usage.get("completion_tokens", 0),
+            )
+        return out
+
+
+class LocalBatchBackend:
+    """In-process stand-in with batch-API semantics (tests, Ollama, MOCK_LLM).
+
+    generate(request) produces each response; the job reports ended after complete_after seconds.
+    """
+
+    provider = "local"
+
+    def __init__(
+        self,
+        generate: Callable[[dict], str],
+        model: str = "local",
+        complete_after: float = 0.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.model = model
+        self._generate = generate
+        self._complete_after = complete_after
+        self._clock = clock
+        self._jobs: dict[str, tuple[float, list[dict]]] = {}
+
+    def submit(self, requests: list[dict]) -> str:
+        job_id = f"local-{uuid.uuid4().hex[:12]}"
+        self._jobs[job_id] = (self._clock(), list(requests))
+        return job_id
+
+    def status(self, job_id: str) -> str:
+        submitted_at, _ = self._jobs[job_id]
+        return ENDED if self._clock() - submitted_at >= self._complete_after else IN_PROGRESS
+
+    def results(self, job_id: str) -> dict[str, BatchResult]:
+        _, requests = self._jobs.pop(job_id)
+        out = {}
+        for r in requests:
+            try:
+                out[r["custom_id"]] = BatchResult(text=self._generate(r))
+            except Exception as e:
+                out[r["custom_id"]] = BatchResult(text=None, error=str(e))
+        return out
+
+
+@dataclass
+class DeferredTicket:
+    """A ticket waiting for a batch result, with its source message coordinates."""
+
+    request: dict
+    payload: dict
+    trace_id: str
+    topic: str
+    partition: int
+    offset: int
+    headers: list = field(default_factory=list)
+    attempts: int = 0
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def custom_id(self) -> str:
+        return self.request["custom_id"]
+
+
+class DeferredBatcher:
+    """Accumulates deferred tickets, submits batch jobs and polls them to completion.
+
+    on_result(ticket, result) is called for each ticket once its batch has landed.
+    Failed requests are re-queued up to max_attempts, then reported with text=None.
+    """
+
+    def __init__(
+        self,
+        agent: str,
+        backend: BatchBackend,
+        on_result: Callable[[DeferredTicket, BatchResult], None],
+        max_size: int = 100,
+        max_wait_sec: float = 300.0,
+        poll_interval_sec: float = 60.0,
+        max_attempts: int = 3,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.agent = agent
+        self.backend = backend
+        self.on_result = on_result
+        self.max_size = max(1, max_size)
+        self.max_wait_sec = max_wait_sec
+        self.poll_interval_sec = poll_interval_sec
+        self.max_attempts = max_attempts
+        self._clock = clock
+        self._buffer: list[DeferredTicket] = []
+        # add() may be called from worker threads (parallel consumer) while tick() runs on the loop.
+        self._lock = threading.Lock()
+        # job_id -> (submitted_at, last_polled_at, tickets by custom_id)
+        self._jobs: dict[str, tuple[float, float, dict[str, DeferredTicket]]] = {}
+        self._pending: set[str] = set()  # custom_ids buffered or submitted
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._buffer) + sum(len(j[2]) for j in self._jobs.values())
+
+    def add(self, ticket: DeferredTicket) -> None:
+        """Queue ticket. A message redelivered while its first copy is pending (a rewind) is dropped."""
+        ticket.enqueued_at = self._clock()
+        with self._lock:
+            if ticket.custom_id in self._pending:
+                logger.info("Message already deferred, skipping", custom_id=ticket.custom_id)
+                return
+            self._pending.add(ticket.custom_id)
+            self._buffer.append(ticket)
+        DEFERRED_TICKETS.labels(agent=self.agent).set(self.pending_count)
+
+    def drop_partitions(self, partitions: set[tuple[str, int]]) -> int:
+        """Forget tickets of revoked partitions; their new owner resolves them. Returns how many."""
+        dropped = []
+        with self._lock:
+            dropped += [t.custom_id for t in self._buffer if (t.topic, t.partition) in partitions]
+            self._buffer = [t for t in self._buffer if (t.topic, t.partition) not in partitions]
+            # Submitted requests still run; their results are ignored.
+            for _, _, tickets in self._jobs.values():
+                for custom_id, ticket in list(tickets.items()):
+                    if (ticket.topic, ticket.partition) in partitions:
+                        del tickets[custom_id]
+                        dropped.append(custom_id)
+            self._pending.difference_update(dropped)
+        if dropped:
+            logger.info("Dropped deferred tickets of revoked partitions", count=len(dropped))
+        DEFERRED_TICKETS.labels(agent=self.agent).set(self.pending_count)
+        return len(dropped)
+
+    def tick(self) -> None:
+        """Submit a due batch and poll running jobs. Cheap when nothing is due."""
+        now = self._clock()
+        with self._lock:
+            due = bool(self._buffer) and (
+                len(self._buffer) >= self.max_size or now - self._buffer[0].enqueued_at >= self.max_wait_sec
+            )
+        if due:
+            self._submit(now)
+        for job_id, (submitted_at, polled_at, tickets) in list(self._jobs.items()):
+            if now - polled_at < self.poll_interval_sec:
+                continue
+            self._poll(job_id, submitted_at, tickets, now)
+        DEFERRED_TICKETS.labels(agent=self.agent).set(self.pending_count)
+
+    def _submit(self, now: float) -> None:
+        with self._lock:
+            tickets, self._buffer = self._buffer[: self.max_size], self._buffer[self.max_size:]
+        try:
+            job_id = self.backend.submit([t.request for t in tickets])
+        except Exception as e:
+            logger.warning("Batch submission failed, will retry", error=str(e), size=len(tickets))
+            with self._lock:
+                self._buffer = tickets + self._buffer
+            return
+        # Poll on the next tick so stand-in backends that finish instantly land quickly.
+        self._jobs[job_id] = (now, now - self.poll_interval_sec, {t.custom_id: t for t in tickets})
+        logger.info("Submitted batch job", job_id=job_id, size=len(tickets), provider=self.backend.provider)
+
+    def _poll(self, job_id: str, submitted_at: float, tickets: dict[str, DeferredTicket], now: float) -> None:
+        try:
+            status = self.backend.status(job_id)
+            if status == IN_PROGRESS:
+                self._jobs[job_id] = (submitted_at, now, tickets)
+                return
+            results = self.backend.results(job_id) if status == ENDED else {}
+        except Exception as e:
+            logger.warning("Batch poll failed, will retry", job_id=job_id, error=str(e))
+            self._jobs[job_id] = (submitted_at, now, tickets)
+            return
+        del self._jobs[job_id]
+        BATCH_JOBS.labels(agent=self.agent, status=status).inc()
+        BATCH_TURNAROUND_SECONDS.labels(agent=self.agent).observe(now - submitted_at)
+        logger.info("Batch job finished", job_id=job_id, status=status, size=len(tickets))
+        for custom_id, ticket in tickets.items():
+            result = results.get(custom_id) or BatchResult(text=None, error=f"batch {status}")
+            with self._lock:
+                self._pending.discard(custom_id)
+            if result.text is None and ticket.attempts + 1 < self.max_attempts:
+                ticket.attempts += 1
+                self.add(ticket)
+                continue
+            self.on_result(ticket, result)
@@ -0,0 +1,110 @@
+"""Record/replay layer for LLM calls.
+
+In record mode each call's result and observed latency are appended to a JSONL cassette
+keyed by a fingerprint of (agent, provider, model, call arguments), so a cassette recorded
+against one model never answers for another. In replay mode results are served from
+the cassette, optionally sleeping for the recorded latency so pipeline benchmarks keep
+realistic LLM timing without a live model. Repeated fingerprints replay in recorded order.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import defaultdict
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable
+
+import structlog  # type: ignore[import-untyped]
+
+from .config import LLM_CASSETTE_LATENCY_SCALE, LLM_CASSETTE_MODE, LLM_CASSETTE_PATH
+
+logger = structlog.get_logger(__name__)
+
+OFF = ""
+RECORD = "record"
+REPLAY = "replay"
+
+
+class CassetteMissError(LookupError):
+    """Replay mode found no recording for the call."""
+
+
+class Cassette:
+    def __init__(
+        self,
+        mode: str,
+        path: str | Path,
+        latency_scale: float = 0.0,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        if mode not in (OFF, RECORD, REPLAY):
+            raise ValueError(f"LLM_CASSETTE_MODE must be record, replay or empty, got {mode!r}")
+        self.mode = mode
+        self.path = Path(path)
+        self.latency_scale = latency_scale
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._entries: dict[str, list[dict]] = defaultdict(list)
+        self._cursor: dict[str, int] = defaultdict(int)
+        if mode == REPLAY:
+            self._load()
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            raise FileNotFoundError(f"Cassette {self.path} not found; record one with LLM_CASSETTE_MODE=record")
+        with self.path.open(encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._entries[entry["k"]].append(entry)
+        logger.info("Loaded LLM cassette", path=str(self.path), calls=sum(len(v) for v in self._entries.values()))
+
+    @staticmethod
+    def fingerprint(agent: str, provider: str, model: str, args: tuple) -> str:
+        raw = json.dumps([agent, provider, model, list(args)], sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+    def call(self, agent: str, provider: str, model: str, args: tuple, fn: Callable[[], Any]) -> Any:
+        """Run fn through the cassette: passthrough (off), record, or replay."""
+        if self.mode == OFF:
+            return fn()
+        key = self.fingerprint(agent, provider, model, args)
+        if self.mode == REPLAY:
+            with self._lock:
+                recorded = self._entries.get(key)
+                if not recorded:
+                    raise CassetteMissError(f"No cassette entry for {agent} call {key} ({provider}/{model})")
+                entry = recorded[self._cursor[key] % len(recorded)]
+                self._cursor[key] += 1
+            if self.latency_scale > 0:
+                self._sleep(entry["latency_ms"] / 1000.0 * self.latency_scale)
+            return entry["response"]
+
+        start = time.perf_counter()
+        result = fn()
+        latency_ms = round((time.perf_counter() - start) * 1000.0, 1)
+        line = json.dumps(
+            {"k": key, "agent": agent, "provider": provider, "model": model, "latency_ms": latency_ms, "response": result},
+            separators=(",", ":"),
+        )
+        with self._lock:
+            with self.path.open("a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        return result
+
+
+@lru_cache(maxsize=1)
+def get_cassette() -> Cassette:
+    """Process-wide cassette configured from LLM_CASSETTE_* settings."""
+    return Cassette(LLM_CASSETTE_MODE, LLM_CASSETTE_PATH, LLM_CASSETTE_LATENCY_SCALE)
+
+
+def through_cassette(agent: str, provider: str, model: str, args: tuple, fn: Callable[[], Any]) -> Any:
+    """Shortcut used by the agents' LLM entry points (provider and model as configured)."""
+    return get_cassette().call(agent, provider, model, args, fn)
+
+
+def replaying() -> bool:
+    """True when LLM calls are served from a cassette (no live backend needed)."""
+    return LLM_CASSETTE_MODE == REPLAY
@@ -0,0 +1,171 @@
+"""Per-backend circuit breaker for LLM calls.
+
+A breaker opens after consecutive backend failures, rejects calls while open, and
+after a cool-down lets a single half-open trial call through: success closes it,
+failure re-opens it. Agents pause their Kafka partitions while a breaker is open
+(see shared.backpressure) so no offsets advance past unprocessed tickets.
+"""
+import threading
+import time
+from typing import Any, Callable
+
+from prometheus_client import Counter, Gauge  # type: ignore[import-untyped]
+
+from .config import CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT_SEC
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+CIRCUIT_STATE = Gauge(
+    "llm_circuit_state",
+    "LLM backend circuit breaker state (0 = closed, 1 = half-open, 2 = open)",
+    ["agent", "backend"],
+)
+CIRCUIT_TRANSITIONS = Counter(
+    "llm_circuit_transitions_total",
+    "LLM backend circuit breaker state transitions",
+    ["agent", "backend", "state"],
+)
+
+# Exceptions raised after the backend answered (bad JSON, missing fields, config errors).
+# They say nothing about backend health, so they do not trip the breaker.
+NON_BACKEND_ERRORS: tuple[type[BaseException], ...] = (ValueError, KeyError, TypeError, AttributeError)
+
+# HTTP statuses that mean the backend is overloaded or down rather than the request being bad.
+BACKEND_STATUS_CODES = frozenset({408, 429})
+
+
+def is_backend_failure(error: BaseException) -> bool:
+    """True for connection errors, timeouts, 429 and 5xx; False for errors specific to the ticket.
+
+    Provider SDK errors carry the HTTP status (openai/anthropic APIStatusError.status_code,
+    urllib HTTPError.code). Other 4xx (context too long, auth, unknown model) fail the same
+    way on every retry, so they go to the ticket's error path instead of pausing the agent.
+    """
+    if isinstance(error, NON_BACKEND_ERRORS):
+        return False
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(error, "code", None)
+    if isinstance(status, int) and 400 <= status < 600:
+        return status >= 500 or status in BACKEND_STATUS_CODES
+    return True
+
+
+class BackendUnavailableError(Exception):
+    """The LLM backend failed or its circuit is open; the ticket should be retried, not skipped."""
+
+    def __init__(self, breaker: "CircuitBreaker", cause: BaseException | None = None):
+        self.breaker = breaker
+        self.cause = cause
+        detail = f": {cause}" if cause else ""
+        super().__init__(f"LLM backend {breaker.backend!r} unavailable ({breaker.state}){detail}")
+
+
+class CircuitOpenError(BackendUnavailableError):
+    """Call rejected without contacting the backend because the circuit is open."""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a single half-open trial call."""
+
+    def __init__(
+        self,
+        agent: str,
+        backend: str,
+        failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+        reset_timeout: float = CIRCUIT_RESET_TIMEOUT_SEC,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.agent = agent
+        self.backend = backend
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        CIRCUIT_STATE.labels(agent=agent, backend=backend).set(_STATE_VALUES[CLOSED])
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    def _set_state(self, state: str) -> None:
+        if state == self._state:
+            return
+        self._state = state
+        CIRCUIT_STATE.labels(agent=self.agent, backend=self.backend).set(_STATE_VALUES[state])
+        CIRCUIT_TRANSITIONS.labels(agent=self.agent, backend=self.backend, state=state).inc()
+
+    def ready(self) -> bool:
+        """True when a call would be allowed (closed, or open long enough for a half-open trial)."""
+        with self._lock:
+            if self._state == OPEN:
+                return self._clock() - self._opened_at >= self.reset_timeout
+            return not (self._state == HALF_OPEN and self._trial_in_flight)
+
+    def allow(self) -> bool:
+        """Reserve a call. In half-open state only one trial call is allowed at a time."""
+        with self._lock:
+            if self._state == OPEN:
+                if self._clock() - self._opened_at < self.reset_timeout:
+                    return False
+                self._set_state(HALF_OPEN)
+            if self._state == HALF_OPEN:
+                if self._trial_in_flight:
+                    return False
+                self._trial_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._trial_in_flight = False
+            self._set_state(CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = self._clock()
+                self._set_state(OPEN)
+
+    def call(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Call fn through the breaker.
+
+        Raises CircuitOpenError without calling when open, and BackendUnavailableError
+        (wrapping the cause) when the backend fails (is_backend_failure). Other errors,
+        such as NON_BACKEND_ERRORS and client 4xx responses, propagate unchanged.
+        """
+        if not self.allow():
+            raise CircuitOpenError(self)
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            if not is_backend_failure(e):
+                # The backend answered; the request itself was bad.
+                self.record_success()
+                raise
+            self.record_failure()
+            raise BackendUnavailableError(self, e) from e
+        self.record_success()
+        return result
+
+
+_breakers: dict[tuple[str, str], CircuitBreaker] = {}
+_registry_lock = threading.Lock()
+
+
+def get_breaker(agent: str, backend: str) -> CircuitBreaker:
+    """Return the process-wide breaker for (agent, backend), creating it on first use."""
+    with _registry_lock:
+        breaker = _breakers.get((agent, backend))
+        if breaker is None:
+            breaker = _breakers[(agent, backend)] = CircuitBreaker(agent, backend)
+        return breaker
@@ -0,0 +1,172 @@
+"""Configuration for shared modules, loaded from environment.
+
+Agent-specific settings stay in each agent's config.py; values here apply to
+every agent that imports the shared libraries.
+"""
+import json
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# LLM pricing (USD per 1M tokens) used for cost accounting. Override or extend with
+# LLM_PRICING='{"model": {"input": 0.8, "output": 4.0}}'. Unknown models cost 0.
+LLM_PRICING = {
+    "claude-3-5-haiku-20241022": {"input": 0.80, "output": 4.00},
+    "gpt-4o-mini": {"input": 0.15, "output": 0.60},
+    **json.loads(os.environ.get("LLM_PRICING", "") or "{}"),
+}
+# Hourly LLM budget per process. 0 = unlimited.
+LLM_HOURLY_TOKEN_BUDGET = int(os.environ.get("LLM_HOURLY_TOKEN_BUDGET", "0"))
+LLM_HOURLY_COST_BUDGET_USD = float(os.environ.get("LLM_HOURLY_COST_BUDGET_USD", "0"))
+# Fraction (0–1) of the budget after which calls shift to LLM_BUDGET_FALLBACK_PROVIDER.
+LLM_BUDGET_SOFT_LIMIT = float(os.environ.get("LLM_BUDGET_SOFT_LIMIT", "0.9"))
+# Cheaper provider used once the soft limit is reached (empty = never shift).
+LLM_BUDGET_FALLBACK_PROVIDER = os.environ.get("LLM_BUDGET_FALLBACK_PROVIDER", "ollama").lower()
+
+# Circuit breaker per LLM backend: open after this many consecutive failures,
+# then allow one half-open trial call after the reset timeout.
+CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_TIMEOUT_SEC = float(os.environ.get("CIRCUIT_RESET_TIMEOUT_SEC", "30"))
+
+# Deferred bulk resolution (specialists): low-priority tickets go to provider batch APIs.
+DEFERRED_BATCH_ENABLED = os.environ.get("DEFERRED_BATCH_ENABLED", "").lower() in ("1", "true", "yes")
+# Comma-separated ticket.triaged priorities that are deferred.
+DEFERRED_PRIORITIES = tuple(
+    p.strip() for p in os.environ.get("DEFERRED_PRIORITIES", "low").lower().split(",") if p.strip()
+)
+# anthropic | openai | local (in-process stand-in). Default follows LLM_PROVIDER; ollama uses local.
+DEFERRED_BATCH_BACKEND = (
+    os.environ.get("DEFERRED_BATCH_BACKEND", "") or os.environ.get("LLM_PROVIDER", "anthropic")
+).lower()
+DEFERRED_BATCH_MODEL = os.environ.get("DEFERRED_BATCH_MODEL", "")
+DEFERRED_BATCH_MAX_SIZE = int(os.environ.get("DEFERRED_BATCH_MAX_SIZE", "100"))
+DEFERRED_BATCH_MAX_WAIT_SEC = float(os.environ.get("DEFERRED_BATCH_MAX_WAIT_SEC", "300"))
+DEFERRED_POLL_INTERVAL_SEC = float(os.environ.get("DEFERRED_POLL_INTERVAL_SEC", "60"))
+
+# Startup warm-up (SDK import, pooled clients, one-token priming completion, DynamoDB read)
+# before the consumer subscribes. /ready on the metrics port reports 503 until it finishes.
+WARMUP_ENABLED = os.environ.get("WARMUP_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Record/replay of LLM calls beneath classify_ticket / generate_response (benchmarks, offline evals).
+# "" = off, "record" = call the LLM and append to the cassette, "replay" = serve from the cassette.
+LLM_CASSETTE_MODE = os.environ.get("LLM_CASSETTE_MODE", "").strip().lower()
+LLM_CASSETTE_PATH = os.environ.get("LLM_CASSETTE_PATH", "llm-cassette.jsonl")
+# Replay: multiply recorded latencies by this factor (0 = respond instantly, 1 = original timing).
+LLM_CASSETTE_LATENCY_SCALE = float(os.environ.get("LLM_CASSETTE_LATENCY_SCALE", "0"))
+
+# Parallel specialist consumption. 1 = process one ticket at a time (previous behavior).
+SPECIALIST_CONCURRENCY = int(os.environ.get("SPECIALIST_CONCURRENCY", "1"))
+# Messages with the same key run in order: "ticket_id" (Kafka message key) or "customer_id".
+SPECIALIST_ORDERING_KEY = os.environ.get("SPECIALIST_ORDERING_KEY", "ticket_id").lower()
+# Stop polling while this many messages / payload bytes are dispatched but unfinished.
+SPECIALIST_MAX_INFLIGHT = int(os.environ.get("SPECIALIST_MAX_INFLIGHT", "100"))
+SPECIALIST_MAX_INFLIGHT_BYTES = int(os.environ.get("SPECIALIST_MAX_INFLIGHT_BYTES", str(8 * 1024 * 1024)))
+
+# Stream specialist responses and enforce guardrails per chunk: a forbidden phrase or PII
+# stops generation immediately, and generation ends at MAX_RESPONSE_LENGTH.
+SPECIALIST_STREAMING = os.environ.get("SPECIALIST_STREAMING", "true").lower() in ("1", "true", "yes")
+
+# Publish ticket.resolution.partial events (draft so far) while a streamed response is generated.
+# An event goes out once PARTIAL_EVENTS_EVERY_TOKENS new tokens or PARTIAL_EVENTS_EVERY_MS have passed.
+PARTIAL_EVENTS_ENABLED = os.environ.get("PARTIAL_EVENTS_ENABLED", "false").lower() in ("1", "true", "yes")
+PARTIAL_EVENTS_EVERY_TOKENS = int(os.environ.get("PARTIAL_EVENTS_EVERY_TOKENS", "20"))
+PARTIAL_EVENTS_EVERY_MS = float(os.environ.get("PARTIAL_EVENTS_EVERY_MS", "250"))
+
+# Specialist response cache for repeated questions (normalized subject/body, triage type,
+# prompt version). SIMILARITY is the word-bigram Jaccard score for near-duplicate hits; 1 = exact only.
+RESPONSE_CACHE_ENABLED = os.environ.get("RESPONSE_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+RESPONSE_CACHE_TTL_SEC = float(os.environ.get("RESPONSE_CACHE_TTL_SEC", "3600"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+RESPONSE_CACHE_SIMILARITY = float(os.environ.get("RESPONSE_CACHE_SIMILARITY", "0.9"))
+
+# Help-center knowledge base (index built by scripts/build-kb-index.py). "" disables lookups.
+# The top hit answers from its template when its BM25 score is >= KB_DIRECT_MIN_SCORE and
+# >= KB_DIRECT_MARGIN x the runner-up; otherwise hits scoring >= KB_CONTEXT_MIN_SCORE are
+# passed to the LLM as KB_TOP_K snippets of up to KB_SNIPPET_CHARS each.
+KB_INDEX_PATH = os.environ.get("KB_INDEX_PATH", "")
+KB_TOP_K = int(os.environ.get("KB_TOP_K", "3"))
+KB_DIRECT_MIN_SCORE = float(os.environ.get("KB_DIRECT_MIN_SCORE", "8"))
+KB_DIRECT_MARGIN = float(os.environ.get("KB_DIRECT_MARGIN", "1.5"))
+KB_CONTEXT_MIN_SCORE = float(os.environ.get("KB_CONTEXT_MIN_SCORE", "2"))
+KB_SNIPPET_CHARS = int(os.environ.get("KB_SNIPPET_CHARS", "400"))
+
+# Priority lanes: triage routes to ticket.triaged.<type>.p0..p3 by priority, and specialists
+# consume all lanes of their type (plus the unlaned topic) with weighted fair polling.
+# Weights are messages per round; a lane that used its share is paused until the round ends.
+PRIORITY_LANES_ENABLED = os.environ.get("PRIORITY_LANES_ENABLED", "false").lower() in ("1", "true", "yes")
+PRIORITY_LANE_WEIGHTS = {
+    lane.strip(): int(weight)
+    for lane, _, weight in (
+        item.partition("=") for item in os.environ.get("PRIORITY_LANE_WEIGHTS", "p0=8,p1=4,p2=2,p3=1").split(",")
+    )
+    if lane.strip() and weight.strip()
+}
+# How often per-lane consumer lag is refreshed from the cached high watermarks.
+PRIORITY_LANE_LAG_INTERVAL_SEC = float(os.environ.get("PRIORITY_LANE_LAG_INTERVAL_SEC", "15"))
+
+# Non-blocking retries (shared.retry): a ticket that failed generation or the guardrails is
+# republished to <input topic>.retry.<tier> and redelivered after the tier's delay; after the
+# last tier it goes to <input topic>.dlq. Tiers are comma-separated durations (s, m, h).
+RETRY_ENABLED = os.environ.get("RETRY_ENABLED", "false").lower() in ("1", "true", "yes")
+RETRY_TIERS = os.environ.get("RETRY_TIERS", "30s,5m,30m")
+
+# Guardrail handling of PII in generated responses: "redact" masks validated card numbers
+# (Luhn), SSNs and email addresses in place and marks ticket.resolved as redacted; "reject"
+# drops the response. Forbidden content is always rejected.
+GUARDRAIL_PII_MODE = os.environ.get("GUARDRAIL_PII_MODE", "redact").strip().lower()
+# Email domains that may appear in responses (e.g. the support address), comma-separated.
+GUARDRAIL_ALLOWED_EMAIL_DOMAINS = tuple(
+    d.strip().lower() for d in os.environ.get("GUARDRAIL_ALLOWED_EMAIL_DOMAINS", "").split(",") if d.strip()
+)
+# Extra forbidden phrases, one per line ("#" starts a comment), added to the built-in list.
+# All phrases are compiled into one pattern when an agent starts.
+GUARDRAIL_FORBIDDEN_PHRASES_FILE = os.environ.get("GUARDRAIL_FORBIDDEN_PHRASES_FILE", "")
+# Run the guardrail patterns on RE2 (the optional re2 module), which guarantees time linear
+# in the response length whatever the rules are. Startup fails if re2 is not installed.
+GUARDRAIL_LINEAR_TIME = os.environ.get("GUARDRAIL_LINEAR_TIME", "false").lower() in ("1", "true", "yes")
+
+# Per-customer fairness (shared.fairness): consumers buffer up to FAIRNESS_LOOKAHEAD polled
+# messages and serve customers by deficit round robin, FAIRNESS_QUANTUM messages per turn,
+# so one customer's burst cannot monopolize the loop. Nothing is dropped: a customer over
+# its share only waits behind the others.
+FAIRNESS_ENABLED = os.environ.get("FAIRNESS_ENABLED", "false").lower() in ("1", "true", "yes")
+FAIRNESS_QUANTUM = int(os.environ.get("FAIRNESS_QUANTUM", "1"))
+FAIRNESS_LOOKAHEAD = int(os.environ.get("FAIRNESS_LOOKAHEAD", "100"))
+# Customers exported in fairness_top_talker_messages, refreshed every interval.
+FAIRNESS_TOP_TALKERS = int(os.environ.get("FAIRNESS_TOP_TALKERS", "10"))
+FAIRNESS_REPORT_INTERVAL_SEC = float(os.environ.get("FAIRNESS_REPORT_INTERVAL_SEC", "30"))
+
+# Kafka client tuning (shared.kafka): low-latency | high-throughput | exactly-once.
+KAFKA_PROFILE = os.environ.get("KAFKA_PROFILE", "low-latency").strip().lower()
+# Extra librdkafka properties applied on top of the profile, e.g. "linger.ms=20,compression.type=lz4".
+KAFKA_PRODUCER_OVERRIDES = os.environ.get("KAFKA_PRODUCER_OVERRIDES", "")
+KAFKA_CONSUMER_OVERRIDES = os.environ.get("KAFKA_CONSUMER_OVERRIDES", "")
+# librdkafka statistics (lag, queue depth, batch sizes, broker RTT) exported every interval; 0 = off.
+KAFKA_STATS_INTERVAL_MS = int(os.environ.get("KAFKA_STATS_INTERVAL_MS", "15000"))
+
+# Autoscaling signal (shared.autoscaling): each replica exports its share of the replicas needed
+# to drain its partitions' lag within AUTOSCALING_TARGET_DRAIN_SEC at the throughput and mean
+# ticket latency seen over AUTOSCALING_WINDOW_SEC, refreshed every AUTOSCALING_INTERVAL_SEC.
+AUTOSCALING_TARGET_DRAIN_SEC = float(os.environ.get("AUTOSCALING_TARGET_DRAIN_SEC", "300"))
+AUTOSCALING_WINDOW_SEC = float(os.environ.get("AUTOSCALING_WINDOW_SEC", "60"))
+AUTOSCALING_INTERVAL_SEC = float(os.environ.get("AUTOSCALING_INTERVAL_SEC", "15"))
+
+# Consumer group membership (shared.rebalance): consumers use the cooperative-sticky assignor and,
+# with KAFKA_STATIC_MEMBERSHIP and POD_NAME set (downward API), join as static members with
+# group.instance.id = POD_NAME so a restarted pod rejoins without a rebalance. Off by default:
+# it needs stable pod names (a StatefulSet); a Deployment's replacement pod gets a new name, and
+# the old static member holds its partitions until session.timeout.ms expires.
+KAFKA_STATIC_MEMBERSHIP = os.environ.get("KAFKA_STATIC_MEMBERSHIP", "false").lower() in ("1", "true", "yes")
+POD_NAME = os.environ.get("POD_NAME", "")
+# How long a revocation waits for the revoked partitions' in-flight tickets before handing them over.
+REBALANCE_DRAIN_SEC = float(os.environ.get("REBALANCE_DRAIN_SEC", "10"))
+# On SIGTERM: time for in-flight tickets to finish before the producer is flushed and offsets are
+# committed. Keep terminationGracePeriodSeconds above it.
+SHUTDOWN_GRACE_SEC = float(os.environ.get("SHUTDOWN_GRACE_SEC", "45"))
+
+# Exactly-once mode (shared.transactions), on with KAFKA_PROFILE=exactly-once: the triage and
+# specialist loops commit consumed offsets and produced events in one transaction, which spans
+# up to KAFKA_TRANSACTION_MAX_MESSAGES tickets or KAFKA_TRANSACTION_MAX_MS, whichever comes first.
+KAFKA_TRANSACTION_MAX_MESSAGES = int(os.environ.get("KAFKA_TRANSACTION_MAX_MESSAGES", "100"))
+KAFKA_TRANSACTION_MAX_MS = int(os.environ.get("KAFKA_TRANSACTION_MAX_MS", "1000"))
@@ -0,0 +1,259 @@
+"""Per-customer fair consumption: deficit round robin over customer sub-queues.
+
+FairConsumer wraps the consumer of the triage and specialist loops. poll() keeps up to
+`lookahead` fetched messages buffered in one FIFO per customer_id (header first, payload
+otherwise) and hands them out by deficit round robin: each customer with buffered messages
+takes up to `quantum` messages per turn. A customer flooding the topic gets one turn per
+round like everyone else; its excess is deferred, never dropped, and when it is the only
+customer left it gets the whole loop, so throughput stays at capacity.
+
+Buffered messages have not reached the loop yet, so the wrapper keeps stored offsets from
+passing them, drops them when their partition is rewound (seek) or revoked, and does not
+hand out messages of paused partitions.
+"""
+import time
+from collections import Counter as Tally
+from collections import deque
+from typing import Callable
+
+import structlog  # type: ignore[import-untyped]
+from confluent_kafka import TopicPartition
+from prometheus_client import Counter, Gauge  # type: ignore[import-untyped]
+
+from . import headers
+from .offsets import OffsetTracker
+
+logger = structlog.get_logger(__name__)
+
+FAIR_BUFFERED = Gauge(
+    "fairness_buffered_messages",
+    "Fetched messages waiting for their customer's turn",
+    ["agent"],
+)
+FAIR_CUSTOMERS = Gauge(
+    "fairness_active_customers",
+    "Customers with buffered messages",
+    ["agent"],
+)
+FAIR_DEFERRED = Counter(
+    "fairness_deferred_total",
+    "Messages that arrived while their customer already had a full quantum waiting, so other customers go first",
+    ["agent"],
+)
+FAIR_TOP_TALKERS = Gauge(
+    "fairness_top_talker_messages",
+    "Messages received in the last report interval from each of the busiest customers",
+    ["agent", "customer"],
+)
+
+UNKNOWN_CUSTOMER = "unknown"
+
+
+class FairConsumer:
+    """Consumer wrapper that hands out polled messages by deficit round robin over customers.
+
+    Other Consumer methods pass through. With track_offsets the loop stores one message at a
+    time (store_offsets(message=...)) and the wrapper turns that into positions that never
+    pass a buffered or unfinished message; otherwise the loop tracks in-flight offsets itself
+    and store_offsets(offsets=...) is only clamped below the buffered ones.
+    """
+
+    def __init__(
+        self,
+        consumer,
+        agent: str,
+        quantum: int = 1,
+        lookahead: int = 100,
+        top_talkers: int = 10,
+        report_interval_sec: float = 30.0,
+        track_offsets: bool = False,
+        customer_of: Callable[[object], str | None] = headers.customer_id,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._consumer = consumer
+        self.agent = agent
+        self.quantum = max(1, quantum)
+        self.lookahead = max(1, lookahead)
+        self.top_talkers = top_talkers
+        self.report_interval_sec = report_interval_sec
+        self.customer_of = customer_of
+        self.clock = clock
+        self._queues: dict[str, deque] = {}
+        self._deficit: dict[str, int] = {}
+        self._turns: deque[str] = deque()  # customers with buffered messages, in turn order
+        self._buffered: dict[tuple[str, int], set[int]] = {}
+        self._paused: set[tuple[str, int]] = set()
+        self._size = 0
+        self._tracker = OffsetTracker() if track_offsets else None
+        self._received: Tally = Tally()
+        self._exported: set[str] = set()
+        self._next_report = clock() + report_interval_sec
+
+    def __getattr__(self, name):
+        return getattr(self._consumer, name)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def poll(self, timeout: float = -1):
+        """Top the buffer up from the consumer, then return the next message in fair order.
+
+        Blocks (up to timeout) only while nothing buffered can be handed out; consumer
+        errors are returned as they arrive.
+        """
+        while self._size < self.lookahead or not self._servable():
+            msg = self._consumer.poll(timeout=0 if self._servable() else timeout)
+            if msg is None:
+                break
+            if msg.error():
+                return msg
+            self._push(msg)
+        msg = self._pop()
+        FAIR_BUFFERED.labels(agent=self.agent).set(self._size)
+        FAIR_CUSTOMERS.labels(agent=self.agent).set(len(self._queues))
+        self._maybe_report()
+        return msg
+
+    def store_offsets(self, message=None, offsets=None):
+        if message is not None and self._tracker is not None:
+            self._tracker.done(message.topic(), message.partition(), message.offset())
+            offsets = self._tracker.committable()
+            if not offsets:
+                return None
+            return self._consumer.store_offsets(offsets=offsets)
+        if message is not None:
+            offsets = [TopicPartition(message.topic(), message.partition(), message.offset() + 1)]
+        clamped = []
+        for tp in offsets:
+            waiting = self._buffered.get((tp.topic, tp.partition))
+            if waiting and tp.offset > min(waiting):
+                tp = TopicPartition(tp.topic, tp.partition, min(waiting))
+            clamped.append(tp)
+        return self._consumer.store_offsets(offsets=clamped)
+
+    def seek(self, partition):
+        """Seek, dropping the buffered messages the consumer will now deliver again."""
+        tp = (partition.topic, partition.partition)
+        self._drop(lambda m: (m.topic(), m.partition()) == tp and m.offset() >= partition.offset)
+        if self._tracker is not None:
+            self._tracker.discard(partition.topic, partition.partition, partition.offset)
+        return self._consumer.seek(partition)
+
+    def pause(self, partitions):
+        self._paused.update((tp.topic, tp.partition) for tp in partitions)
+        return self._consumer.pause(partitions)
+
+    def resume(self, partitions):
+        self._paused.difference_update((tp.topic, tp.partition) for tp in partitions)
+        return self._consumer.resume(partitions)
+
+    def subscribe(self, topics, on_assign=None, on_revoke=None, on_lost=None):
+        def revoked(callback):
+            def handler(consumer, partitions):
+                self.revoke(partitions)
+                if callback is not None:
+                    callback(consumer, partitions)
+            return handler
+
+        callbacks = {"on_revoke": revoked(on_revoke), "on_lost": revoked(on_lost)}
+        if on_assign is not None:
+            callbacks["on_assign"] = on_assign
+        return self._consumer.subscribe(topics, **callbacks)
+
+    def revoke(self, partitions) -> None:
+        """Forget buffered messages of partitions this consumer no longer owns."""
+        gone = {(tp.topic, tp.partition) for tp in partitions}
+        self._drop(lambda m: (m.topic(), m.partition()) in gone)
+        self._paused -= gone
+        if self._tracker is not None:
+            for topic, partition in gone:
+                self._tracker.drop_partition(topic, partition)
+
+    def _push(self, msg) -> None:
+        customer = self.customer_of(msg) or UNKNOWN_CUSTOMER
+        queue = self._queues.get(customer)
+        if queue is None:
+            queue = self._queues[customer] = deque()
+            self._deficit[customer] = 0
+            self._turns.append(customer)
+        elif len(queue) >= self.quantum:
+            FAIR_DEFERRED.labels(agent=self.agent).inc()
+        queue.append(msg)
+        self._buffered.setdefault((msg.topic(), msg.partition()), set()).add(msg.offset())
+        if self._tracker is not None:
+            self._tracker.begin(msg.topic(), msg.partition(), msg.offset())
+        self._size += 1
+        self._received[customer] += 1
+
+    def _pop(self):
+        for _ in range(len(self._turns)):
+            customer = self._turns[0]
+            queue = self._queues[customer]
+            if self._deficit[customer] <= 0:
+                self._deficit[customer] += self.quantum
+            msg = self._take(queue)
+            if msg is None:
+                # Everything this customer has waiting is on a paused partition.
+                self._turns.rotate(-1)
+                continue
+            self._deficit[customer] -= 1
+            if not queue:
+                del self._queues[customer], self._deficit[customer]
+                self._turns.popleft()
+            elif self._deficit[customer] <= 0:
+                self._turns.rotate(-1)
+            self._unbuffer(msg)
+            return msg
+        return None
+
+    def _take(self, queue: deque):
+        if not self._paused:
+            return queue.popleft()
+        for i, msg in enumerate(queue):
+            if (msg.topic(), msg.partition()) not in self._paused:
+                del queue[i]
+                return msg
+        return None
+
+    def _servable(self) -> bool:
+        if not self._paused:
+            return self._size > 0
+        return any(offsets and tp not in self._paused for tp, offsets in self._buffered.items())
+
+    def _unbuffer(self, msg) -> None:
+        tp = (msg.topic(), msg.partition())
+        waiting = self._buffered[tp]
+        waiting.discard(msg.offset())
+        if not waiting:
+            del self._buffered[tp]
+        self._size -= 1
+
+    def _drop(self, match: Callable[[object], bool]) -> None:
+        for customer in list(self._turns):
+            queue = self._queues[customer]
+            kept = deque(m for m in queue if not match(m))
+            for msg in queue:
+                if match(msg):
+                    self._unbuffer(msg)
+                    if self._tracker is not None:
+                        self._tracker.discard(msg.topic(), msg.partition(), msg.offset())
+            if kept:
+                self._queues[customer] = kept
+            else:
+                del self._queues[customer], self._deficit[customer]
+                self._turns.remove(customer)
+
+    def _maybe_report(self) -> None:
+        now = self.clock()
+        if now < self._next_report:
+            return
+        self._next_report = now + self.report_interval_sec
+        top = dict(self._received.most_common(self.top_talkers))
+        for customer in self._exported - top.keys():
+            FAIR_TOP_TALKERS.remove(self.agent, customer)
+        for customer, count in top.items():
+            FAIR_TOP_TALKERS.labels(agent=self.agent, customer=customer).set(count)
+        self._exported = set(top)
+        if top:
+            logger.info("Top talkers", customers=top, buffered=self._size)
+        self._received.clear()
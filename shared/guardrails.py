@@ -2,18 +2,68 @@
 
 Runs before specialist agents emit ticket.resolved. Catches policy violations
 (e.g. PII leakage, excessive length, forbidden content) and raises for retry or human review.
+StreamingGuard applies the same checks while a response is still being generated.
+
+PII is masked in place by default (GUARDRAIL_PII_MODE=redact), so a paid-for response is
+not discarded; only forbidden content is rejected. Card numbers must pass the Luhn check,
+which keeps order and reference numbers from being treated as cards.
+
+The forbidden phrases (built in plus GUARDRAIL_FORBIDDEN_PHRASES_FILE) and the PII patterns
+are compiled once per process into a single regex (GuardrailEngine): the phrases as a
+case-insensitive trie, so a check is one pass over the text however many rules there are.
+GUARDRAIL_LINEAR_TIME=true compiles it with RE2 instead of re, which guarantees linear time.
 """
 import re
-from typing import Sequence
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Iterable, Iterator, Sequence
+
+from prometheus_client import Counter, Histogram  # type: ignore[import-untyped]
+
+from .config import (
+    GUARDRAIL_ALLOWED_EMAIL_DOMAINS,
+    GUARDRAIL_FORBIDDEN_PHRASES_FILE,
+    GUARDRAIL_LINEAR_TIME,
+    GUARDRAIL_PII_MODE,
+)
+
+GUARDRAIL_REDACTIONS = Counter(
+    "guardrail_redactions_total",
+    "PII matches masked in responses (pattern: card, ssn, email)",
+    ["agent", "pattern"],
+)
+GUARDRAIL_POLICY_SECONDS = Histogram(
+    "guardrail_policy_seconds",
+    "Time of one guardrail scan, of a response or a check_responses batch (policy: the policies it covered)",
+    ["policy"],
+    buckets=(0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1),
+)
 
 # Max response length (chars). Excess gets truncated with a disclaimer.
 MAX_RESPONSE_LENGTH = 4000
+TRUNCATION_NOTICE = "\n\n[Response truncated for length.]"
+
+# "redact" or "reject"; read when a check runs, so tests and callers may override it.
+PII_MODE = GUARDRAIL_PII_MODE
 
 # Patterns that suggest PII leakage (basic heuristics; not comprehensive)
-PII_PATTERNS = (
-    re.compile(r"\b\d{4}[-\s]?\d{4}[-\s]?\d{4}[-\s]?\d{4}\b"),  # Credit card
-    re.compile(r"\b\d{3}-\d{2}-\d{4}\b"),  # SSN
-)
+_PII_SOURCES = {
+    "card": r"\b(?:\d[ -]?){12,18}\d\b",  # 13-19 digits, validated with Luhn
+    "ssn": r"\b\d{3}-\d{2}-\d{4}\b",
+    "email": r"\b[\w.+-]+@[\w-]+(?:\.[\w-]+)+\b",
+}
+# The same patterns for the backtracking re engine. Each starts with a character class and
+# checks the boundary with a lookbehind after it, so re can rule out a branch at a position
+# from one char. An email may only start where a run of address chars starts; otherwise text
+# like "a.a.a.a..." is rescanned from every dot (quadratic). A leading "." or "-" is masked too.
+_BACKTRACKING_SOURCES = {
+    "card": r"\d(?<!\w\d)(?:[ -]?\d){12,18}\b",
+    "ssn": r"\d(?<!\w\d)\d\d-\d\d-\d{4}\b",
+    "email": r"[\w.+-](?<![\w.+-][\w.+-])[\w.+-]*@[\w-]+(?:\.[\w-]+)+\b",
+}
+PII_PATTERNS = {name: re.compile(src) for name, src in _PII_SOURCES.items()}
+REDACTION_MASKS = {"card": "[REDACTED CARD]", "ssn": "[REDACTED SSN]", "email": "[REDACTED EMAIL]"}
 
 # Forbidden phrases that should not appear in support responses
 FORBIDDEN_PHRASES = (
@@ -24,30 +74,392 @@ FORBIDDEN_PHRASES = (
     "100% refund",
 )
 
+# Chars of already-scanned text re-checked with each new chunk, so a phrase or PII match
+# split across chunks is still found. Must cover the longest possible match plus a boundary char.
+# (A card number with separators is up to 37 chars.) GuardrailEngine.overlap extends it for
+# longer forbidden phrases.
+_SCAN_OVERLAP = 40
+
+_REGEX_SPECIAL = frozenset("\\.^$*+?{}[]|()")
+
+
+def luhn_valid(digits: str) -> bool:
+    total = 0
+    for i, ch in enumerate(reversed(digits)):
+        d = int(ch)
+        if i % 2:
+            d = d * 2 - 9 if d > 4 else d * 2
+        total += d
+    return total % 10 == 0
+
+
+def _is_pii(name: str, match) -> bool:
+    if name == "card":
+        return luhn_valid(re.sub(r"\D", "", match.group(0)))
+    if name == "email":
+        domain = match.group(0).rsplit("@", 1)[1].lower()
+        return not any(domain == d or domain.endswith("." + d) for d in GUARDRAIL_ALLOWED_EMAIL_DOMAINS)
+    return True
+
+
+def load_phrases(path: str) -> list[str]:
+    """Forbidden phrases from a file: one per line, blank lines and "#" comments ignored."""
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+
+def _trie_branches(phrases: Iterable[str]) -> list[str]:
+    """Regex alternatives matching any of phrases, one per first char, with shared prefixes
+    factored out so at most one branch per level can match. A phrase that is a prefix of
+    another ends its branch (the shorter one already matches)."""
+    trie: dict = {}
+    for phrase in phrases:
+        node = trie
+        for ch in phrase:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def emit(node: dict) -> str:
+        if "" in node:
+            return ""
+        branches = [_escape(ch) + emit(child) for ch, child in sorted(node.items())]
+        return branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+
+    return [_escape(ch) + emit(child) for ch, child in sorted(trie.items())]
+
+
+def _escape(ch: str) -> str:
+    return "\\" + ch if ch in _REGEX_SPECIAL else ch
+
+
+def _lower(text: str) -> str:
+    """text.lower(), keeping each char at its index (for the few chars whose lowercase is longer)."""
+    lower = text.lower()
+    if len(lower) == len(text):
+        return lower
+    return "".join(low if len(low) == 1 else ch for ch, low in ((ch, ch.lower()) for ch in text))
+
+
+def _re2_compile():
+    try:
+        import re2  # type: ignore[import-not-found]
+    except ImportError as e:
+        raise ImportError("GUARDRAIL_LINEAR_TIME=true requires the re2 module (pip install google-re2)") from e
+    options = re2.Options()
+    # Room for the DFA of a trie with thousands of phrases; at the 8 MB default RE2 falls
+    # back to its slower (still linear) NFA.
+    options.max_mem = 64 << 20
+    return lambda pattern: re2.compile(pattern, options)
+
+
+class GuardrailEngine:
+    """Forbidden phrases and PII patterns compiled into one regex per policy combination.
+
+    Text is lowercased once and scanned in one pass, trying every rule at each position;
+    the phrases form a trie, so the cost per position does not grow with their number.
+    scan() returns the violations in text order as (kind, match), kind being "forbidden"
+    or a PII_PATTERNS name; matches are against the lowercased text, at the same indexes.
+    A card or email match that fails validation (Luhn, allowed domain) is retried against
+    the other rules within its span, so it cannot hide an SSN next to it.
+    """
+
+    def __init__(self, phrases: Iterable[str] = FORBIDDEN_PHRASES, linear_time: bool = False):
+        self.phrases = tuple(dict.fromkeys(p.strip() for p in phrases if p.strip()))
+        self.linear_time = linear_time
+        self.overlap = max(_SCAN_OVERLAP, max((len(p) for p in self.phrases), default=0) + 1)
+        self._phrase_for = {_lower(p): p for p in self.phrases}
+        compile = _re2_compile() if linear_time else re.compile
+        sources = _PII_SOURCES if linear_time else _BACKTRACKING_SOURCES
+        # No capturing groups: a group in front of a branch would stop re from skipping it on
+        # the first char. kind() tells the rules apart from the matched text instead.
+        branches = {"forbidden": _trie_branches(self._phrase_for), **{k: [v] for k, v in sources.items()}}
+        phrase_kinds = ("forbidden",) if self.phrases else ()
+        self._kinds = {
+            frozenset({"forbidden"}): phrase_kinds,
+            frozenset({"pii"}): tuple(sources),
+            frozenset({"forbidden", "pii"}): phrase_kinds + tuple(sources),
+        }
+        self._patterns = {
+            kinds: compile("|".join(b for k in names for b in branches[k]))
+            for kinds, names in self._kinds.items()
+            if names
+        }
+        # For retrying a match that failed validation: the same rules without its kind.
+        self._without = {
+            (kinds, kind): compile("|".join(b for k in names if k != kind for b in branches[k]))
+            for kinds, names in self._kinds.items()
+            for kind in ("card", "email")
+            if kind in names and len(names) > 1
+        }
+
+    def kind(self, match, names: Sequence[str] = ("forbidden", "card", "ssn", "email")) -> str:
+        """Which of names (rule kinds, in alternation order) produced match."""
+        found = match.group(0)
+        if names[0] == "forbidden" and found in self._phrase_for:
+            return "forbidden"
+        if "@" in found:
+            return "email"
+        return "ssn" if PII_PATTERNS["ssn"].fullmatch(found) else "card"
+
+    def scan(self, text: str, policies: Iterable[str] = ("forbidden", "pii")) -> list[tuple[str, re.Match]]:
+        """Forbidden-phrase and PII matches in text (PII already validated)."""
+        kinds = frozenset(policies) & {"forbidden", "pii"}
+        if kinds not in self._patterns:
+            return []
+        return list(self._iter(_lower(text), kinds))
+
+    def phrase(self, match) -> str:
+        """The configured forbidden phrase a "forbidden" match is for."""
+        return self._phrase_for.get(match.group(0), match.group(0))
 
-def check_response(text: str, policies: Sequence[str] | None = None) -> str:
+    def redact(
+        self, text: str, matches: Sequence[tuple[str, re.Match]] | None = None, offset: int = 0
+    ) -> tuple[str, dict[str, int]]:
+        """Mask PII in place, given the scan() matches of text (or of a string text starts at
+        offset in). Returns (text, matches per pattern)."""
+        if matches is None:
+            matches = self.scan(text, ("pii",))
+        counts: dict[str, int] = {}
+        parts, pos = [], 0
+        for kind, m in matches:
+            if kind == "forbidden":
+                continue
+            parts += [text[pos:m.start() - offset], REDACTION_MASKS[kind]]
+            pos = m.end() - offset
+            counts[kind] = counts.get(kind, 0) + 1
+        return ("".join(parts) + text[pos:] if parts else text), counts
+
+    def _iter(self, text: str, kinds: frozenset) -> Iterator[tuple[str, re.Match]]:
+        pattern, names = self._patterns[kinds], self._kinds[kinds]
+        pos = 0
+        while True:
+            m = pattern.search(text, pos)
+            if m is None:
+                return
+            kind = self.kind(m, names)
+            pos = m.end()
+            if kind == "forbidden" or _is_pii(kind, m):
+                yield kind, m
+                continue
+            retry = self._without.get((kinds, kind))
+            if retry is None:
+                continue
+            rest = tuple(k for k in names if k != kind)
+            for start in range(m.start(), m.end()):
+                alt = retry.match(text, start)
+                if alt is None:
+                    continue
+                alt_kind = self.kind(alt, rest)
+                if alt_kind == "forbidden" or _is_pii(alt_kind, alt):
+                    yield alt_kind, alt
+                    pos = alt.end()
+                    break
+
+
+@lru_cache(maxsize=None)
+def get_engine() -> GuardrailEngine:
+    """Process-wide engine for the configured rules, compiled on first use (agents call it at startup)."""
+    phrases = list(FORBIDDEN_PHRASES)
+    if GUARDRAIL_FORBIDDEN_PHRASES_FILE:
+        phrases += load_phrases(GUARDRAIL_FORBIDDEN_PHRASES_FILE)
+    return GuardrailEngine(phrases, linear_time=GUARDRAIL_LINEAR_TIME)
+
+
+def find_pii(text: str) -> list[tuple[str, re.Match]]:
+    """(pattern name, match) for each PII match in text, in text order."""
+    return get_engine().scan(text, ("pii",))
+
+
+def redact_pii(text: str) -> tuple[str, dict[str, int]]:
+    """Mask PII in place. Returns (text, matches per pattern)."""
+    return get_engine().redact(text)
+
+
+class GuardrailViolation(ValueError):
+    """The response violates a policy that cannot be auto-fixed."""
+
+    def __init__(self, message: str, policy: str):
+        super().__init__(message)
+        self.policy = policy
+
+
+@dataclass
+class GuardrailResult:
+    text: str
+    redactions: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def redacted(self) -> bool:
+        return bool(self.redactions)
+
+
+def check_response(text: str, policies: Sequence[str] | None = None, max_length: int = MAX_RESPONSE_LENGTH) -> str:
     """Apply policy rule checks. Returns (possibly modified) response or raises.
 
     Policies: "pii", "length", "forbidden". Default: all.
-    Raises ValueError if policy is violated in a way that cannot be auto-fixed.
+    Raises GuardrailViolation (a ValueError) if policy is violated in a way that cannot be auto-fixed.
     Forbidden and PII checks run on the original text before any truncation.
     """
+    return apply_guardrails(text, policies, max_length).text
+
+
+def apply_guardrails(
+    text: str,
+    policies: Sequence[str] | None = None,
+    max_length: int = MAX_RESPONSE_LENGTH,
+    agent: str = "",
+    pii_mode: str | None = None,
+) -> GuardrailResult:
+    """check_response that also reports what was redacted (for marking ticket.resolved)."""
     policies = policies or ("pii", "length", "forbidden")
     result = str(text).strip()
+    engine = get_engine()
+    scanned = _scanned_policies(policies)
+    matches = []
+    if scanned:
+        with GUARDRAIL_POLICY_SECONDS.labels(policy="+".join(scanned)).time():
+            matches = engine.scan(result, scanned)
+    return _resolve(engine, result, matches, 0, policies, max_length, agent, pii_mode or PII_MODE)
 
+
+def check_responses(
+    texts: Sequence[str],
+    policies: Sequence[str] | None = None,
+    max_length: int = MAX_RESPONSE_LENGTH,
+    agent: str = "",
+    pii_mode: str | None = None,
+) -> list[GuardrailResult | GuardrailViolation]:
+    """apply_guardrails for a batch of responses, scanned together in one pass.
+
+    A response that violates a policy gets its GuardrailViolation in its place in the
+    returned list instead of raising, so one bad response does not fail the batch.
+    """
+    policies = policies or ("pii", "length", "forbidden")
+    pii_mode = pii_mode or PII_MODE
+    engine = get_engine()
+    stripped = [str(t).strip() for t in texts]
+    scanned = _scanned_policies(policies)
+    per_text: list[list] = [[] for _ in stripped]
+    offsets = []
+    pos = 0
+    for t in stripped:
+        offsets.append(pos)
+        pos += len(t) + 1
+    if scanned and stripped:
+        # NUL cannot be part of a phrase, card, SSN or email, so no match spans two responses.
+        with GUARDRAIL_POLICY_SECONDS.labels(policy="+".join(scanned)).time():
+            matches = engine.scan("\0".join(stripped), scanned)
+        for kind, m in matches:
+            per_text[bisect_right(offsets, m.start()) - 1].append((kind, m))
+    results: list[GuardrailResult | GuardrailViolation] = []
+    for t, matches, offset in zip(stripped, per_text, offsets):
+        try:
+            results.append(_resolve(engine, t, matches, offset, policies, max_length, agent, pii_mode))
+        except GuardrailViolation as e:
+            results.append(e)
+    return results
+
+
+def _scanned_policies(policies: Sequence[str]) -> tuple[str, ...]:
+    return tuple(p for p in ("forbidden", "pii") if p in policies)
+
+
+def _resolve(
+    engine: GuardrailEngine,
+    text: str,
+    matches: list[tuple[str, re.Match]],
+    offset: int,
+    policies: Sequence[str],
+    max_length: int,
+    agent: str,
+    pii_mode: str,
+) -> GuardrailResult:
+    """Raise for, or redact, the scan matches of text (offset: where text starts in the scanned string)."""
+    redactions: dict[str, int] = {}
     # Check rejection policies on original text before truncation
-    if "forbidden" in policies:
-        lower = result.lower()
-        for phrase in FORBIDDEN_PHRASES:
-            if phrase.lower() in lower:
-                raise ValueError(f"Response contains forbidden phrase: {phrase!r}")
+    for kind, m in matches:
+        if kind == "forbidden":
+            raise GuardrailViolation(f"Response contains forbidden phrase: {engine.phrase(m)!r}", "forbidden")
+    if matches:
+        if pii_mode == "reject":
+            raise GuardrailViolation("Response appears to contain PII (e.g. card number, SSN, email)", "pii")
+        text, redactions = engine.redact(text, matches, offset)
+        for name, n in redactions.items():
+            GUARDRAIL_REDACTIONS.labels(agent=agent, pattern=name).inc(n)
+
+    if "length" in policies and len(text) > max_length:
+        text = text[: max_length - 50] + TRUNCATION_NOTICE
+
+    return GuardrailResult(text, redactions)
+
+
+class StreamingGuard:
+    """Incremental check_response for a response that arrives in chunks.
+
+    feed() scans each chunk together with the tail of the text before it and raises
+    GuardrailViolation as soon as a forbidden phrase or PII appears, so the caller can
+    abort generation. A PII match touching the end of the buffer is only reported once
+    more text (or finish()) shows it is complete, matching what check_response would see.
+    feed() returns False once the text passes MAX_RESPONSE_LENGTH; generation should stop.
+
+    In redact mode PII never stops the stream: safe_text is masked, and finish() leaves the
+    masking of the final text to the check before ticket.resolved, which records it.
+    """
+
+    def __init__(
+        self,
+        policies: Sequence[str] | None = None,
+        max_length: int = MAX_RESPONSE_LENGTH,
+        pii_mode: str | None = None,
+    ):
+        self.policies = tuple(policies or ("pii", "length", "forbidden"))
+        self.max_length = max_length
+        self.pii_mode = pii_mode or PII_MODE
+        self.engine = get_engine()
+        self.text = ""
+        self.truncated = False
+        self._scanned = 0
+
+    @property
+    def safe_text(self) -> str:
+        """Prefix of the text that no later chunk can turn into a violation (excludes the re-scanned tail)."""
+        cut = max(0, self._scanned - self.engine.overlap)
+        if self.pii_mode == "reject" or "pii" not in self.policies:
+            return self.text[:cut]
+        # Never show part of a card, SSN or email that straddles the cut.
+        for _, m in self.engine.scan(self.text[: self._scanned], ("pii",)):
+            if m.start() < cut < m.end():
+                cut = m.start()
+        return self.engine.redact(self.text[:cut])[0]
 
-    if "pii" in policies:
-        for pat in PII_PATTERNS:
-            if pat.search(result):
-                raise ValueError("Response appears to contain PII (e.g. card number, SSN, email)")
+    def feed(self, chunk: str) -> bool:
+        """Add a chunk. Returns False when generation should stop; raises GuardrailViolation."""
+        if self.truncated:
+            return False
+        self.text += chunk
+        self._scan(final=False)
+        if "length" in self.policies and len(self.text.strip()) > self.max_length:
+            self.truncated = True
+            return False
+        return True
 
-    if "length" in policies and len(result) > MAX_RESPONSE_LENGTH:
-        result = result[: MAX_RESPONSE_LENGTH - 50] + "\n\n[Response truncated for length.]"
+    def _scan(self, final: bool) -> None:
+        start = max(0, self._scanned - self.engine.overlap)
+        end = len(self.text)
+        policies = _scanned_policies(self.policies)
+        if self.pii_mode != "reject":
+            policies = tuple(p for p in policies if p != "pii")
+        for kind, m in self.engine.scan(self.text[start:], policies):
+            if kind == "forbidden":
+                raise GuardrailViolation(f"Response contains forbidden phrase: {self.engine.phrase(m)!r}", "forbidden")
+            if final or start + m.end() < end:
+                raise GuardrailViolation("Response appears to contain PII (e.g. card number, SSN, email)", "pii")
+        self._scanned = end
 
-    return result
+    def finish(self) -> str:
+        """Final check of the complete (or length-stopped) text; same result as check_response (without redaction)."""
+        self._scan(final=True)
+        if self.pii_mode == "reject" or "pii" not in self.policies:
+            return check_response(self.text, self.policies, self.max_length)
+        rest = tuple(p for p in self.policies if p != "pii")
+        return check_response(self.text, rest, self.max_length) if rest else self.text.strip()
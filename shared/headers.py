@@ -0,0 +1,112 @@
+"""Kafka headers stamped on every event, so consumers can route without decoding the body.
+
+Producers add event_type, schema_version, trace_id and (where known) priority and
+customer_id as headers next to the JSON payload. Consumers read them first: a message whose
+event_type header is not the one they handle is discarded without json.loads, and the
+trace_id header is bound to the log context before the body is decoded. Messages without
+headers (older producers, the portal writing ticket.created) fall back to the payload.
+"""
+import json
+from dataclasses import dataclass
+
+import structlog  # type: ignore[import-untyped]
+from prometheus_client import Counter  # type: ignore[import-untyped]
+
+logger = structlog.get_logger(__name__)
+
+EVENT_TYPE = "event_type"
+SCHEMA_VERSION = "schema_version"
+TRACE_ID = "trace_id"
+PRIORITY = "priority"
+CUSTOMER_ID = "customer_id"
+_ENVELOPE = (EVENT_TYPE, SCHEMA_VERSION, TRACE_ID, PRIORITY, CUSTOMER_ID)
+
+# Payload schema version per event (events/*.schema.json). Bump on incompatible changes.
+SCHEMA_VERSIONS = {
+    "ticket.created": "1",
+    "ticket.triaged": "1",
+    "ticket.resolved": "1",
+    "ticket.resolution.partial": "1",
+}
+
+HEADER_SKIPS = Counter(
+    "event_header_skips_total",
+    "Messages discarded on their event_type header without decoding the body",
+    ["agent", "event_type"],
+)
+DECODE_BYTES_AVOIDED = Counter(
+    "event_decode_bytes_avoided_total",
+    "Payload bytes not JSON-decoded because the headers were enough to discard the message",
+    ["agent"],
+)
+HEADERLESS_MESSAGES = Counter(
+    "event_headerless_messages_total",
+    "Messages without an event_type header, filtered by decoding the body instead",
+    ["agent"],
+)
+
+
+@dataclass(frozen=True)
+class Envelope:
+    """Header values of a message; None where the producer did not stamp the header."""
+
+    event_type: str | None = None
+    schema_version: str | None = None
+    trace_id: str | None = None
+    priority: str | None = None
+    customer_id: str | None = None
+
+
+def event_headers(
+    event_type: str,
+    trace_id: str,
+    priority: str | None = None,
+    customer_id: str | None = None,
+) -> list[tuple[str, bytes]]:
+    """Headers for producing an event_type event."""
+    headers = [
+        (EVENT_TYPE, event_type.encode("utf-8")),
+        (SCHEMA_VERSION, SCHEMA_VERSIONS.get(event_type, "1").encode("utf-8")),
+        (TRACE_ID, trace_id.encode("utf-8")),
+    ]
+    if priority:
+        headers.append((PRIORITY, priority.encode("utf-8")))
+    if customer_id:
+        headers.append((CUSTOMER_ID, customer_id.encode("utf-8")))
+    return headers
+
+
+def read(msg) -> Envelope:
+    """The envelope headers of msg (the last value wins if a header repeats)."""
+    found: dict[str, str] = {}
+    for key, value in msg.headers() or ():
+        if key in _ENVELOPE and value is not None:
+            found[key] = value.decode("utf-8", errors="replace") if isinstance(value, bytes) else str(value)
+    return Envelope(**found) if found else Envelope()
+
+
+def customer_id(msg) -> str | None:
+    """customer_id header, or the payload's customer_id for messages produced without it."""
+    found = read(msg).customer_id
+    if found is None:
+        try:
+            found = json.loads(msg.value()).get("customer_id")
+        except (TypeError, ValueError, AttributeError):
+            return None
+    return str(found) if found else None
+
+
+def skip(msg, envelope: Envelope, expected: str, agent: str) -> bool:
+    """True if msg's event_type header says it is not an expected event (counted, not decoded).
+
+    Without the header it returns False and the caller checks the decoded payload.
+    """
+    if envelope.event_type is None:
+        HEADERLESS_MESSAGES.labels(agent=agent).inc()
+        return False
+    if envelope.event_type == expected:
+        return False
+    HEADER_SKIPS.labels(agent=agent, event_type=envelope.event_type).inc()
+    DECODE_BYTES_AVOIDED.labels(agent=agent).inc(len(msg.value() or b""))
+    logger.debug("Skipping message by event_type header", event_type=envelope.event_type)
+    return True
@@ -0,0 +1,52 @@
+"""Metrics and readiness HTTP server shared by the agents.
+
+Serves /metrics (Prometheus), /ready (200 once warm-up finished, 503 before) and /healthz.
+"""
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest  # type: ignore[import-untyped]
+
+_ready = threading.Event()
+
+
+def mark_ready() -> None:
+    _ready.set()
+
+
+def is_ready() -> bool:
+    return _ready.is_set()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str = "text/plain; charset=utf-8") -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path == "/metrics":
+            self._send(200, generate_latest(REGISTRY), CONTENT_TYPE_LATEST)
+        elif path == "/ready":
+            if is_ready():
+                self._send(200, b"ready\n")
+            else:
+                self._send(503, b"warming up\n")
+        elif path == "/healthz":
+            self._send(200, b"ok\n")
+        else:
+            self._send(404, b"not found\n")
+
+
+def start_health_server(port: int, addr: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Start the metrics/readiness server in a daemon thread."""
+    server = ThreadingHTTPServer((addr, port), _Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,176 @@
+"""Kafka client factory: consumers and producers built from named tuning profiles.
+
+Every agent used to hand-build its client config with only bootstrap.servers, so clients
+ran on librdkafka defaults: no compression, no idempotence, default linger and fetch sizes.
+Clients are now created here from one of PROFILES, selected with KAFKA_PROFILE:
+
+- low-latency: send immediately (linger.ms=0) with cheap lz4 compression; consumers
+  return a fetch as soon as any data is there. For the interactive ticket path.
+- high-throughput: linger up to 50ms to fill large zstd-compressed batches; consumers wait
+  for bigger fetches. For backfills, replays and bulk resolution.
+- exactly-once: idempotent producer with acks=all and consumers that only read committed
+  transactional data. The triage and specialist loops then commit their output and offsets
+  in transactions (shared.transactions).
+
+All producers are idempotent, so a broker retry never duplicates or reorders a ticket.
+KAFKA_PRODUCER_OVERRIDES / KAFKA_CONSUMER_OVERRIDES ("key=value,...") set any librdkafka
+property on top of the profile, and per-call settings (group.id, offset storage) win last.
+Clients created with an agent label export librdkafka statistics every
+KAFKA_STATS_INTERVAL_MS (shared.kafka_stats). Consumers use the cooperative-sticky assignor,
+and static membership with KAFKA_STATIC_MEMBERSHIP in a pod (shared.rebalance).
+"""
+import structlog  # type: ignore[import-untyped]
+from confluent_kafka import Consumer, Producer
+
+from .config import (
+    KAFKA_CONSUMER_OVERRIDES,
+    KAFKA_PRODUCER_OVERRIDES,
+    KAFKA_PROFILE,
+    KAFKA_STATIC_MEMBERSHIP,
+    KAFKA_STATS_INTERVAL_MS,
+    POD_NAME,
+)
+from .kafka_stats import KafkaStatsExporter
+
+logger = structlog.get_logger(__name__)
+
+# Reduce rdkafka stderr noise (e.g. "connection closed by peer") so app logs are visible; 4 = warning.
+_COMMON = {"log_level": 4}
+
+PROFILES: dict[str, dict[str, dict]] = {
+    "low-latency": {
+        "producer": {
+            "enable.idempotence": True,
+            "acks": "all",
+            "linger.ms": 0,
+            "compression.type": "lz4",
+            "socket.nagle.disable": True,
+        },
+        "consumer": {
+            "fetch.min.bytes": 1,
+            "fetch.wait.max.ms": 10,
+            "socket.nagle.disable": True,
+        },
+    },
+    "high-throughput": {
+        "producer": {
+            "enable.idempotence": True,
+            "acks": "all",
+            "linger.ms": 50,
+            "batch.size": 1024 * 1024,
+            "batch.num.messages": 10000,
+            "compression.type": "zstd",
+        },
+        "consumer": {
+            "fetch.min.bytes": 64 * 1024,
+            "fetch.wait.max.ms": 100,
+            "max.partition.fetch.bytes": 4 * 1024 * 1024,
+            "queued.min.messages": 100000,
+        },
+    },
+    "exactly-once": {
+        "producer": {
+            "enable.idempotence": True,
+            "acks": "all",
+            "max.in.flight.requests.per.connection": 5,
+            "linger.ms": 10,
+            "compression.type": "zstd",
+        },
+        "consumer": {
+            "isolation.level": "read_committed",
+            "fetch.wait.max.ms": 100,
+        },
+    },
+}
+
+
+def parse_overrides(spec: str) -> dict[str, str]:
+    """Parse "key=value,key=value" librdkafka properties; values are passed as strings."""
+    overrides = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        key, sep, value = item.partition("=")
+        if not sep or not key.strip():
+            raise ValueError(f"Invalid Kafka override {item!r}, expected key=value")
+        overrides[key.strip()] = value.strip()
+    return overrides
+
+
+def _profile(name: str | None) -> tuple[str, dict[str, dict]]:
+    name = (name or KAFKA_PROFILE).strip().lower()
+    if name not in PROFILES:
+        raise ValueError(f"Unknown Kafka profile {name!r}, expected one of {sorted(PROFILES)}")
+    return name, PROFILES[name]
+
+
+def producer_config(bootstrap_servers: str, profile: str | None = None, settings: dict | None = None) -> dict:
+    """Producer config for profile (default KAFKA_PROFILE), env overrides, then settings."""
+    _, chosen = _profile(profile)
+    return {
+        **_COMMON,
+        "bootstrap.servers": bootstrap_servers,
+        **chosen["producer"],
+        **parse_overrides(KAFKA_PRODUCER_OVERRIDES),
+        **(settings or {}),
+    }
+
+
+def consumer_config(
+    bootstrap_servers: str,
+    group_id: str,
+    profile: str | None = None,
+    settings: dict | None = None,
+) -> dict:
+    """Consumer config for profile (default KAFKA_PROFILE), env overrides, then settings.
+
+    Offsets are stored only after a message is done, so an LLM outage never skips tickets;
+    pass "enable.auto.offset.store" in settings to change that. Rebalances are cooperative
+    (only moved partitions are revoked); with POD_NAME set the consumer is a static member.
+    """
+    _, chosen = _profile(profile)
+    membership = {"group.instance.id": POD_NAME} if KAFKA_STATIC_MEMBERSHIP and POD_NAME else {}
+    return {
+        **_COMMON,
+        "bootstrap.servers": bootstrap_servers,
+        "group.id": group_id,
+        "auto.offset.reset": "earliest",
+        "enable.auto.offset.store": False,
+        "partition.assignment.strategy": "cooperative-sticky",
+        **membership,
+        **chosen["consumer"],
+        **parse_overrides(KAFKA_CONSUMER_OVERRIDES),
+        **(settings or {}),
+    }
+
+
+def _with_stats(conf: dict, agent: str | None) -> dict:
+    if agent and KAFKA_STATS_INTERVAL_MS > 0 and "stats_cb" not in conf:
+        conf.setdefault("statistics.interval.ms", KAFKA_STATS_INTERVAL_MS)
+        conf["stats_cb"] = KafkaStatsExporter(agent)
+    return conf
+
+
+def create_producer(
+    bootstrap_servers: str,
+    profile: str | None = None,
+    settings: dict | None = None,
+    agent: str | None = None,
+):
+    """Producer for profile; with agent, its librdkafka statistics are exported under that label."""
+    conf = _with_stats(producer_config(bootstrap_servers, profile, settings), agent)
+    logger.info("Creating Kafka producer", profile=_profile(profile)[0])
+    return Producer(conf)
+
+
+def create_consumer(
+    bootstrap_servers: str,
+    group_id: str,
+    profile: str | None = None,
+    settings: dict | None = None,
+    agent: str | None = None,
+):
+    """Consumer for profile; with agent, its librdkafka statistics are exported under that label."""
+    conf = _with_stats(consumer_config(bootstrap_servers, group_id, profile, settings), agent)
+    logger.info("Creating Kafka consumer", profile=_profile(profile)[0], group_id=group_id)
+    return Consumer(conf)
@@ -0,0 +1,165 @@
+"""librdkafka statistics exported as Prometheus metrics.
+
+With KAFKA_STATS_INTERVAL_MS > 0, clients from shared.kafka get statistics.interval.ms and
+a KafkaStatsExporter as stats_cb. librdkafka then hands the callback a JSON document of its
+internal counters from inside poll()/flush(), every interval. The exporter reads only the
+fields below and updates gauges:
+
+- consumers: per-partition lag (behind the stored offset) and fetch queue depth;
+- producers: messages/bytes waiting in the producer queue, and per-topic batch sizes;
+- both: round-trip time to each broker.
+
+librdkafka reports batch sizes and RTT as rolling-window percentiles, not raw samples, so
+they are exported as gauges with a quantile label rather than re-bucketed into histograms.
+Partitions that drop out of the statistics (revoked, or no longer reporting lag) have their
+series removed. Parsing is a json.loads and a walk over the assigned partitions; its cost
+is recorded in kafka_stats_parse_seconds.
+"""
+import json
+import time
+
+import structlog  # type: ignore[import-untyped]
+from prometheus_client import Gauge, Histogram  # type: ignore[import-untyped]
+
+logger = structlog.get_logger(__name__)
+
+CONSUMER_LAG = Gauge(
+    "kafka_consumer_lag_messages",
+    "Messages between the partition's high watermark and the stored (else committed) offset",
+    ["agent", "topic", "partition"],
+)
+FETCH_QUEUE_MESSAGES = Gauge(
+    "kafka_consumer_fetch_queue_messages",
+    "Messages fetched and waiting in the client for poll()",
+    ["agent", "topic", "partition"],
+)
+FETCH_QUEUE_BYTES = Gauge(
+    "kafka_consumer_fetch_queue_bytes",
+    "Bytes fetched and waiting in the client for poll()",
+    ["agent", "topic", "partition"],
+)
+PRODUCER_QUEUE_MESSAGES = Gauge(
+    "kafka_producer_queue_messages",
+    "Messages produced but not yet acknowledged by the broker",
+    ["agent"],
+)
+PRODUCER_QUEUE_BYTES = Gauge(
+    "kafka_producer_queue_bytes",
+    "Bytes produced but not yet acknowledged by the broker",
+    ["agent"],
+)
+BATCH_SIZE_BYTES = Gauge(
+    "kafka_producer_batch_size_bytes",
+    "Producer batch size in bytes over librdkafka's rolling window",
+    ["agent", "topic", "quantile"],
+)
+BATCH_MESSAGES = Gauge(
+    "kafka_producer_batch_messages",
+    "Messages per producer batch over librdkafka's rolling window",
+    ["agent", "topic", "quantile"],
+)
+BROKER_RTT = Gauge(
+    "kafka_broker_rtt_seconds",
+    "Request round-trip time to the broker over librdkafka's rolling window",
+    ["agent", "client", "broker", "quantile"],
+)
+STATS_PARSE_SECONDS = Histogram(
+    "kafka_stats_parse_seconds",
+    "Time to parse one librdkafka statistics document and update the metrics",
+    ["agent"],
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1),
+)
+
+# librdkafka window field -> quantile label.
+_QUANTILES = (("p50", "0.5"), ("p99", "0.99"), ("avg", "avg"))
+
+
+class KafkaStatsExporter:
+    """stats_cb for one client: parses librdkafka statistics JSON into the gauges above."""
+
+    def __init__(self, agent: str):
+        self.agent = agent
+        self._partitions: set[tuple[str, str]] = set()
+        self._lagging: set[tuple[str, str]] = set()
+        self._batches: set[str] = set()
+        self._brokers: set[tuple[str, str]] = set()
+        # Fetch queue gauge children per partition; labels() lookups dominate the parse time.
+        self._children: dict[tuple[str, str], tuple] = {}
+
+    def __call__(self, stats_json: str) -> None:
+        start = time.perf_counter()
+        try:
+            self.update(json.loads(stats_json))
+        except (ValueError, TypeError, AttributeError) as e:
+            logger.warning("Could not parse Kafka statistics", error=str(e))
+        STATS_PARSE_SECONDS.labels(agent=self.agent).observe(time.perf_counter() - start)
+
+    def update(self, stats: dict) -> None:
+        client = stats.get("type", "")
+        if client == "producer":
+            PRODUCER_QUEUE_MESSAGES.labels(agent=self.agent).set(stats.get("msg_cnt", 0))
+            PRODUCER_QUEUE_BYTES.labels(agent=self.agent).set(stats.get("msg_size", 0))
+
+        partitions: set[tuple[str, str]] = set()
+        lagging: set[tuple[str, str]] = set()
+        batches: set[str] = set()
+        for topic, t in stats.get("topics", {}).items():
+            if client == "producer" and t.get("batchcnt", {}).get("cnt"):
+                batches.add(topic)
+                self._set_window(BATCH_SIZE_BYTES, t["batchsize"], agent=self.agent, topic=topic)
+                self._set_window(BATCH_MESSAGES, t["batchcnt"], agent=self.agent, topic=topic)
+            if client != "consumer":
+                continue
+            for partition, p in t.get("partitions", {}).items():
+                # -1 is librdkafka's internal unassigned partition; fetch_state "none" = not ours.
+                if partition == "-1" or p.get("fetch_state", "none") == "none":
+                    continue
+                key = (topic, partition)
+                partitions.add(key)
+                children = self._children.get(key)
+                if children is None:
+                    children = self._children[key] = (
+                        FETCH_QUEUE_MESSAGES.labels(self.agent, topic, partition),
+                        FETCH_QUEUE_BYTES.labels(self.agent, topic, partition),
+                    )
+                children[0].set(p.get("fetchq_cnt", 0))
+                children[1].set(p.get("fetchq_size", 0))
+                lag = p.get("consumer_lag_stored", -1)
+                if lag < 0:
+                    lag = p.get("consumer_lag", -1)
+                if lag >= 0:
+                    lagging.add(key)
+                    CONSUMER_LAG.labels(self.agent, topic, partition).set(lag)
+
+        brokers: set[tuple[str, str]] = set()
+        for b in stats.get("brokers", {}).values():
+            # Bootstrap and logical brokers (nodeid -1) would duplicate the real ones.
+            rtt = b.get("rtt", {})
+            if b.get("nodeid", -1) < 0 or not rtt.get("cnt"):
+                continue
+            name = b.get("nodename") or b.get("name", "")
+            brokers.add((client, name))
+            self._set_window(BROKER_RTT, rtt, scale=1e-6, agent=self.agent, client=client, broker=name)
+
+        self._expire(partitions, lagging, batches, brokers)
+
+    @staticmethod
+    def _set_window(gauge: Gauge, window: dict, scale: float = 1.0, **labels) -> None:
+        for field, quantile in _QUANTILES:
+            gauge.labels(quantile=quantile, **labels).set(window.get(field, 0) * scale)
+
+    def _expire(self, partitions, lagging, batches, brokers) -> None:
+        for topic, partition in self._partitions - partitions:
+            del self._children[(topic, partition)]
+            for gauge in (FETCH_QUEUE_MESSAGES, FETCH_QUEUE_BYTES):
+                gauge.remove(self.agent, topic, partition)
+        for topic, partition in self._lagging - lagging:
+            CONSUMER_LAG.remove(self.agent, topic, partition)
+        for topic in self._batches - batches:
+            for _, quantile in _QUANTILES:
+                BATCH_SIZE_BYTES.remove(self.agent, topic, quantile)
+                BATCH_MESSAGES.remove(self.agent, topic, quantile)
+        for client, broker in self._brokers - brokers:
+            for _, quantile in _QUANTILES:
+                BROKER_RTT.remove(self.agent, client, broker, quantile)
+        self._partitions, self._lagging, self._batches, self._brokers = partitions, lagging, batches, brokers
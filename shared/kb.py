@@ -0,0 +1,358 @@
+"""Help-center knowledge base: BM25 index builder and query API.
+
+build_index() turns KB articles into an inverted index stored as .npy arrays. BM25 term
+weights are computed per posting at build time and each term's postings are stored best
+first, so a query is one bincount over the head of each term's postings plus a top-k
+selection, with no per-document Python work.
+KnowledgeBase(path) memory-maps the arrays (np.load(mmap_mode="r")), so startup is cheap
+and replicas on one node share the pages.
+
+Articles are Markdown files with optional front matter, or JSON objects with the same fields:
+
+    ---
+    id: invoice-copy
+    types: billing
+    ---
+    # How do I get a copy of an invoice?
+    Invoices are under Billing > Invoices ...
+
+    ## Response
+    You can download any invoice from Billing > Invoices ...
+
+The "## Response" section (JSON: "template") is the canned answer; it is not indexed and
+may use $ticket_id / $subject placeholders. "types" limits which specialists may answer
+from the article directly (empty = any).
+"""
+import json
+import math
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+from string import Template
+from typing import Iterable
+
+import numpy as np
+import structlog  # type: ignore[import-untyped]
+from prometheus_client import Counter, Histogram  # type: ignore[import-untyped]
+
+from .config import KB_INDEX_PATH
+
+logger = structlog.get_logger(__name__)
+
+KB_QUERIES = Counter(
+    "specialist_kb_queries_total",
+    "Knowledge-base lookups (outcome: direct = answered from template, context = snippets sent to the LLM, none)",
+    ["agent", "outcome"],
+)
+KB_QUERY_SECONDS = Histogram(
+    "specialist_kb_query_seconds",
+    "Knowledge-base query latency",
+    ["agent"],
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01),
+)
+
+FORMAT_VERSION = 1
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by can do does for from has have how i if in is it its me my "
+    "of on or our please so that the their there this to was we what when where which who why "
+    "will with you your".split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase word tokens without stopwords, with plural endings folded ("invoices" -> "invoice")."""
+    tokens = []
+    for tok in _TOKEN.findall(text.lower()):
+        if tok in _STOPWORDS:
+            continue
+        if len(tok) > 4 and tok.endswith("ies"):
+            tok = tok[:-3] + "y"
+        elif len(tok) > 3 and tok.endswith("s") and not tok.endswith("ss"):
+            tok = tok[:-1]
+        tokens.append(tok)
+    return tokens
+
+
+@dataclass
+class Article:
+    id: str
+    title: str
+    body: str
+    template: str = ""
+    types: tuple[str, ...] = ()
+    url: str = ""
+
+    def to_dict(self) -> dict:
+        return {"id": self.id, "title": self.title, "body": self.body, "template": self.template,
+                "types": list(self.types), "url": self.url}
+
+
+def _split_types(value) -> tuple[str, ...]:
+    if isinstance(value, str):
+        value = value.split(",")
+    return tuple(str(v).strip().lower() for v in value or () if str(v).strip())
+
+
+def parse_markdown(text: str, default_id: str) -> Article:
+    meta: dict[str, str] = {}
+    if text.startswith("---\n"):
+        header, sep, rest = text[4:].partition("\n---\n")
+        if sep:
+            text = rest
+            for line in header.splitlines():
+                key, _, value = line.partition(":")
+                if value:
+                    meta[key.strip().lower()] = value.strip()
+    title = meta.get("title", "")
+    lines = text.strip().splitlines()
+    if lines and lines[0].startswith("# "):
+        title = title or lines[0][2:].strip()
+        lines = lines[1:]
+    body, _, template = "\n".join(lines).partition("\n## Response\n")
+    return Article(
+        id=meta.get("id", default_id),
+        title=title or default_id,
+        body=body.strip(),
+        template=template.strip(),
+        types=_split_types(meta.get("types", "")),
+        url=meta.get("url", ""),
+    )
+
+
+def load_articles(src: str | Path) -> list[Article]:
+    """Read *.md and *.json articles under src (recursively), sorted by path."""
+    articles = []
+    for path in sorted(Path(src).rglob("*")):
+        if path.suffix == ".md":
+            articles.append(parse_markdown(path.read_text(encoding="utf-8"), path.stem))
+        elif path.suffix == ".json":
+            data = json.loads(path.read_text(encoding="utf-8"))
+            for item in data if isinstance(data, list) else [data]:
+                articles.append(Article(
+                    id=str(item.get("id") or path.stem),
+                    title=item.get("title", ""),
+                    body=item.get("body", ""),
+                    template=item.get("template", ""),
+                    types=_split_types(item.get("types")),
+                    url=item.get("url", ""),
+                ))
+    return articles
+
+
+def build_index(articles: Iterable[Article], out_dir: str | Path, k1: float = 1.2, b: float = 0.75) -> dict:
+    """Write the index for articles to out_dir. Returns the metadata written to meta.json."""
+    articles = list(articles)
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+
+    doc_terms: list[dict[str, int]] = []
+    lengths = []
+    for article in articles:
+        # Title terms count twice; titles are short and usually phrase the question.
+        tokens = tokenize(f"{article.title} {article.title} {article.body}")
+        counts: dict[str, int] = {}
+        for tok in tokens:
+            counts[tok] = counts.get(tok, 0) + 1
+        doc_terms.append(counts)
+        lengths.append(len(tokens))
+
+    n_docs = len(articles)
+    avgdl = (sum(lengths) / n_docs) if n_docs else 0.0
+    postings: dict[str, list[tuple[int, int]]] = {}
+    for doc_id, counts in enumerate(doc_terms):
+        for term, tf in counts.items():
+            postings.setdefault(term, []).append((doc_id, tf))
+
+    vocab = sorted(postings)
+    offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+    docs = np.empty(sum(len(p) for p in postings.values()), dtype=np.int32)
+    weights = np.empty(len(docs), dtype=np.float32)
+    pos = 0
+    for term_id, term in enumerate(vocab):
+        plist = postings[term]
+        idf = math.log(1 + (n_docs - len(plist) + 0.5) / (len(plist) + 0.5))
+        impacts = []
+        for doc_id, tf in plist:
+            norm = k1 * (1 - b + b * lengths[doc_id] / avgdl) if avgdl else k1
+            impacts.append((idf * tf * (k1 + 1) / (tf + norm), doc_id))
+        # Highest impact first, so queries can read just the head of a very common term's list.
+        impacts.sort(reverse=True)
+        for weight, doc_id in impacts:
+            docs[pos] = doc_id
+            weights[pos] = weight
+            pos += 1
+        offsets[term_id + 1] = pos
+
+    blobs = [json.dumps(a.to_dict()).encode("utf-8") for a in articles]
+    article_offsets = np.zeros(n_docs + 1, dtype=np.int64)
+    np.cumsum([len(blob) for blob in blobs], out=article_offsets[1:])
+
+    np.save(out / "term_offsets.npy", offsets)
+    np.save(out / "postings_docs.npy", docs)
+    np.save(out / "postings_weights.npy", weights)
+    np.save(out / "article_offsets.npy", article_offsets)
+    (out / "articles.bin").write_bytes(b"".join(blobs))
+    (out / "vocab.json").write_text(json.dumps(vocab), encoding="utf-8")
+    meta = {
+        "format_version": FORMAT_VERSION,
+        "n_docs": n_docs,
+        "n_terms": len(vocab),
+        "n_postings": int(len(docs)),
+        "avgdl": avgdl,
+        "k1": k1,
+        "b": b,
+        "built_at": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+    }
+    (out / "meta.json").write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    return meta
+
+
+@dataclass
+class Hit:
+    article: Article
+    score: float
+    snippet: str = ""
+
+
+@dataclass
+class KBAnswer:
+    """Result of a specialist lookup: a canned response, snippets for the LLM, or neither."""
+    hits: list[Hit] = field(default_factory=list)
+    direct: Hit | None = None
+
+    def render(self, **values: str) -> str:
+        return Template(self.direct.article.template).safe_substitute(**values) if self.direct else ""
+
+    def context(self) -> str:
+        return "\n\n".join(f"[{h.article.title}]\n{h.snippet}" for h in self.hits)
+
+
+class KnowledgeBase:
+    """Memory-mapped BM25 index. Thread-safe for concurrent queries."""
+
+    def __init__(self, path: str | Path, max_postings: int = 1024):
+        self.path = Path(path)
+        self.max_postings = max_postings
+        meta = json.loads((self.path / "meta.json").read_text(encoding="utf-8"))
+        if meta.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported KB index format {meta.get('format_version')!r} in {self.path}")
+        self.meta = meta
+        self.n_docs = int(meta["n_docs"])
+        self._term_ids = {term: i for i, term in enumerate(json.loads((self.path / "vocab.json").read_text(encoding="utf-8")))}
+        # Plain ndarray views over the maps: np.memmap's per-slice Python overhead dominates small queries.
+        self._offsets = self._map("term_offsets.npy")
+        self._docs = self._map("postings_docs.npy")
+        self._weights = self._map("postings_weights.npy")
+        self._article_offsets = self._map("article_offsets.npy")
+        self._articles = np.memmap(self.path / "articles.bin", dtype=np.uint8, mode="r") if self._article_offsets[-1] else None
+        self._cache: dict[int, Article] = {}
+        self._lock = threading.Lock()
+
+    def _map(self, name: str) -> np.ndarray:
+        return np.load(self.path / name, mmap_mode="r").view(np.ndarray)
+
+    def article(self, doc_id: int) -> Article:
+        with self._lock:
+            cached = self._cache.get(doc_id)
+        if cached is not None:
+            return cached
+        start, end = int(self._article_offsets[doc_id]), int(self._article_offsets[doc_id + 1])
+        data = json.loads(bytes(self._articles[start:end]))
+        article = Article(data["id"], data["title"], data["body"], data["template"], tuple(data["types"]), data["url"])
+        with self._lock:
+            if len(self._cache) < 4096:
+                self._cache[doc_id] = article
+        return article
+
+    def search(self, text: str, k: int = 3) -> list[tuple[int, float]]:
+        """Top-k (doc_id, BM25 score) for text, best first.
+
+        Postings are impact-ordered and at most max_postings are read per term. Only very
+        common terms are cut, and their remaining postings carry the smallest weights.
+        """
+        term_ids = {self._term_ids[t] for t in tokenize(text) if t in self._term_ids}
+        if not term_ids or k <= 0:
+            return []
+        spans = [
+            (lo, min(hi, lo + self.max_postings))
+            for lo, hi in ((int(self._offsets[t]), int(self._offsets[t + 1])) for t in term_ids)
+        ]
+        if len(spans) == 1:
+            ((lo, hi),) = spans
+            docs, weights = self._docs[lo:hi], self._weights[lo:hi]
+        else:
+            docs = np.concatenate([self._docs[lo:hi] for lo, hi in spans])
+            weights = np.concatenate([self._weights[lo:hi] for lo, hi in spans])
+        scores = np.bincount(docs, weights=weights)
+        # Select among the postings read rather than the dense, mostly-zero score array. A document
+        # appears at most once per term, so the best k * terms postings hold the k best documents.
+        posting_scores = scores[docs]
+        m = min(len(docs), k * len(spans))
+        if m < len(docs):
+            docs = docs[np.argpartition(posting_scores, -m)[-m:]]
+        candidates = np.unique(docs)
+        top = candidates[np.argsort(scores[candidates])[::-1][:k]]
+        return [(int(d), float(scores[d])) for d in top]
+
+    def hits(self, text: str, k: int = 3, snippet_chars: int = 400) -> list[Hit]:
+        query_terms = set(tokenize(text))
+        return [
+            Hit(article, score, _snippet(article.body, query_terms, snippet_chars))
+            for article, score in ((self.article(d), s) for d, s in self.search(text, k))
+        ]
+
+
+def _snippet(body: str, query_terms: set[str], max_chars: int) -> str:
+    """Paragraph of body sharing the most terms with the query, cut to max_chars."""
+    paragraphs = [p.strip() for p in body.split("\n\n") if p.strip()] or [body]
+    best = max(paragraphs, key=lambda p: len(query_terms.intersection(tokenize(p))))
+    return best if len(best) <= max_chars else best[: max_chars].rsplit(" ", 1)[0] + " ..."
+
+
+def answer(
+    kb: KnowledgeBase,
+    agent: str,
+    triage_type: str,
+    subject: str,
+    body: str,
+    k: int = 3,
+    direct_min_score: float = 8.0,
+    direct_margin: float = 1.5,
+    context_min_score: float = 2.0,
+    snippet_chars: int = 400,
+) -> KBAnswer:
+    """Look up a ticket. The top hit answers directly when it has a template for this specialist,
+    scores at least direct_min_score and beats the runner-up by direct_margin x."""
+    t0 = time.perf_counter()
+    hits = kb.hits(f"{subject}\n{body}", k=max(k, 2), snippet_chars=snippet_chars)
+    KB_QUERY_SECONDS.labels(agent=agent).observe(time.perf_counter() - t0)
+    result = KBAnswer()
+    if hits:
+        top = hits[0]
+        runner_up = hits[1].score if len(hits) > 1 else 0.0
+        allowed = not top.article.types or agent in top.article.types or triage_type in top.article.types
+        if top.article.template and allowed and top.score >= direct_min_score and top.score >= runner_up * direct_margin:
+            result.direct = top
+        result.hits = [h for h in hits[:k] if h.score >= context_min_score]
+    outcome = "direct" if result.direct else "context" if result.hits else "none"
+    KB_QUERIES.labels(agent=agent, outcome=outcome).inc()
+    return result
+
+
+@lru_cache(maxsize=None)
+def get_kb() -> KnowledgeBase | None:
+    """Process-wide index from KB_INDEX_PATH, opened once; None when unset or unreadable."""
+    if not KB_INDEX_PATH:
+        return None
+    try:
+        kb = KnowledgeBase(KB_INDEX_PATH)
+    except (OSError, ValueError, KeyError) as e:
+        logger.error("Could not open KB index, continuing without it", path=KB_INDEX_PATH, error=str(e))
+        return None
+    logger.info("Opened KB index", path=KB_INDEX_PATH, articles=kb.n_docs, terms=kb.meta["n_terms"])
+    return kb
@@ -0,0 +1,140 @@
+"""Weighted fair polling across priority lane topics (ticket.triaged.<type>.p0..p3).
+
+Each lane may take its weight in messages per round. A lane that has used its share is
+paused while another lane that has had traffic recently still has credit left. A new round
+starts, and paused lanes resume, once no such lane is left or a poll comes back empty.
+High lanes therefore get most of the capacity under load, and every lane with a backlog
+gets at least its weight each round. While a lane is paused the loop polls with a short
+timeout, so a drained high lane does not hold back the low ones for long.
+
+The unlaned type topic (tickets produced before lanes were enabled) counts as DEFAULT_LANE.
+"""
+import time
+
+import structlog  # type: ignore[import-untyped]
+from confluent_kafka import KafkaException
+from prometheus_client import Counter, Gauge, Histogram  # type: ignore[import-untyped]
+
+from .topics import DEFAULT_LANE, lane_of
+
+logger = structlog.get_logger(__name__)
+
+LANE_MESSAGES = Counter(
+    "specialist_lane_messages_total",
+    "Messages consumed per priority lane",
+    ["agent", "lane"],
+)
+LANE_LAG = Gauge(
+    "specialist_lane_lag_messages",
+    "Consumer lag per priority lane (high watermark minus position, summed over assigned partitions)",
+    ["agent", "lane"],
+)
+LANE_LATENCY = Histogram(
+    "specialist_lane_latency_seconds",
+    "Time from ticket.triaged being produced to the specialist finishing with it, per priority lane",
+    ["agent", "lane"],
+    buckets=(0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0),
+)
+LANE_ROUNDS = Counter(
+    "specialist_lane_rounds_total",
+    "Weighted polling rounds started (credits refilled and paused lanes resumed)",
+    ["agent"],
+)
+
+
+def lane_label(topic: str) -> str:
+    return lane_of(topic) or "none"
+
+
+def observe_latency(agent: str, msg) -> None:
+    """Record produce-to-done latency for msg's lane (uses the Kafka message timestamp)."""
+    _, ts_ms = msg.timestamp()
+    if ts_ms > 0:
+        LANE_LATENCY.labels(agent=agent, lane=lane_label(msg.topic())).observe(max(0.0, time.time() - ts_ms / 1000))
+
+
+class LaneScheduler:
+    """Credit-based weighted round robin over topics, enforced with consumer pause/resume.
+
+    Only the polling thread may call it; all consumer calls stay there.
+    """
+
+    def __init__(self, agent: str, topics: list[str], weights: dict[str, int], idle_poll_sec: float = 0.1):
+        self.agent = agent
+        self.idle_poll_sec = idle_poll_sec
+        self.weights = {t: max(1, int(weights.get(lane_of(t) or DEFAULT_LANE, 1))) for t in topics}
+        self.credits = dict(self.weights)
+        self.paused: set[str] = set()
+        self._active: set[str] = set()  # lanes that delivered in this round
+        self._previous: set[str] = set()  # ...and in the last one
+
+    def poll_timeout(self, default: float) -> float:
+        return min(default, self.idle_poll_sec) if self.paused else default
+
+    def on_message(self, consumer, topic: str, keep_paused: set[str] = frozenset()) -> None:
+        """Charge topic one credit; pause it or start a new round when its share is used."""
+        if topic not in self.credits:
+            return
+        self._active.add(topic)
+        self.credits[topic] -= 1
+        if self.credits[topic] > 0:
+            return
+        contenders = (self._active | self._previous) - self.paused - {topic}
+        if any(self.credits[t] > 0 for t in contenders):
+            self.paused.add(topic)
+            consumer.pause([tp for tp in consumer.assignment() if tp.topic == topic])
+        else:
+            self.new_round(consumer, keep_paused)
+
+    def on_idle(self, consumer, keep_paused: set[str] = frozenset()) -> None:
+        """Poll returned nothing: the unpaused lanes are drained, so start a new round."""
+        if self.paused or self._active:
+            self.new_round(consumer, keep_paused)
+
+    def new_round(self, consumer, keep_paused: set[str] = frozenset()) -> None:
+        """Refill credits and resume paused lanes, except topics paused by someone else (keep_paused)."""
+        resume = self.paused - set(keep_paused)
+        if resume:
+            consumer.resume([tp for tp in consumer.assignment() if tp.topic in resume])
+        self.paused.clear()
+        self.credits = dict(self.weights)
+        self._previous, self._active = self._active, set()
+        LANE_ROUNDS.labels(agent=self.agent).inc()
+
+    def apply(self, consumer) -> None:
+        """Re-pause lanes after a rebalance or a blanket resume (backpressure) resumed them."""
+        if self.paused:
+            consumer.pause([tp for tp in consumer.assignment() if tp.topic in self.paused])
+
+
+class LaneLagReporter:
+    """Refreshes LANE_LAG from cached high watermarks and consumer positions every interval_sec."""
+
+    def __init__(self, agent_for_topic: dict[str, str], interval_sec: float = 15.0):
+        self.agent_for_topic = agent_for_topic
+        self.interval_sec = interval_sec
+        self._next = 0.0
+
+    def maybe_update(self, consumer) -> None:
+        now = time.monotonic()
+        if now < self._next:
+            return
+        self._next = now + self.interval_sec
+        lag: dict[tuple[str, str], int] = {
+            (agent, lane_label(topic)): 0 for topic, agent in self.agent_for_topic.items()
+        }
+        try:
+            positions = consumer.position(consumer.assignment())
+        except KafkaException as e:
+            logger.debug("Could not read consumer positions", error=str(e))
+            return
+        for tp in positions:
+            agent = self.agent_for_topic.get(tp.topic)
+            if agent is None:
+                continue
+            _, high = consumer.get_watermark_offsets(tp, cached=True) or (-1, -1)
+            if high < 0 or tp.offset < 0:
+                continue
+            lag[(agent, lane_label(tp.topic))] += max(0, high - tp.offset)
+        for (agent, lane), value in lag.items():
+            LANE_LAG.labels(agent=agent, lane=lane).set(value)
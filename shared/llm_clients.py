@@ -0,0 +1,36 @@
+"""Process-wide LLM SDK clients.
+
+Each SDK client owns an HTTP connection pool; reusing one client per (provider, endpoint)
+keeps DNS, TCP and TLS setup off the per-ticket path.
+"""
+from functools import lru_cache
+
+PRIMING_PROMPT = "ping"
+
+
+@lru_cache(maxsize=None)
+def openai_client(api_key: str, base_url: str | None = None):
+    """OpenAI-compatible client (OpenAI or Ollama). base_url None uses the SDK default / OPENAI_BASE_URL."""
+    from openai import OpenAI
+    return OpenAI(api_key=api_key, base_url=base_url)
+
+
+@lru_cache(maxsize=None)
+def anthropic_client():
+    """Anthropic client; reads ANTHROPIC_API_KEY (and ANTHROPIC_BASE_URL) from the environment."""
+    from anthropic import Anthropic
+    return Anthropic()
+
+
+def prime(provider: str, model: str, openai_api_key: str = "", ollama_base_url: str = "") -> None:
+    """Create the provider's pooled client and send a one-token completion.
+
+    For Ollama this also loads the model into memory, which is the bulk of first-call latency.
+    """
+    messages = [{"role": "user", "content": PRIMING_PROMPT}]
+    if provider == "anthropic":
+        anthropic_client().messages.create(model=model, max_tokens=1, messages=messages)
+    elif provider == "ollama":
+        openai_client("ollama", ollama_base_url).chat.completions.create(model=model, max_tokens=1, messages=messages)
+    else:
+        openai_client(openai_api_key).chat.completions.create(model=model, max_tokens=1, messages=messages)
@@ -0,0 +1,88 @@
+"""Per-partition offset tracking for out-of-order completion.
+
+Messages that finish later than newer ones (deferred batch tickets, parallel workers)
+must not be committed past. OffsetTracker reports, per partition, the lowest offset that
+is still in flight, or the next offset after the highest completed one.
+"""
+import threading
+from collections import defaultdict
+
+from confluent_kafka import TopicPartition
+
+
+class OffsetTracker:
+    """Tracks in-flight offsets and yields contiguous committable positions."""
+
+    def __init__(self) -> None:
+        self._pending: dict[tuple[str, int], set[int]] = defaultdict(set)
+        self._next: dict[tuple[str, int], int] = {}
+        # Lowest discarded offset per partition, awaiting redelivery after a seek.
+        self._rewound: dict[tuple[str, int], int] = {}
+        self._dirty: set[tuple[str, int]] = set()
+        self._lock = threading.Lock()
+
+    def begin(self, topic: str, partition: int, offset: int) -> None:
+        tp = (topic, partition)
+        with self._lock:
+            self._pending[tp].add(offset)
+            if self._rewound.get(tp, offset + 1) <= offset:
+                # Redelivery reached the rewound position; pending now holds it back.
+                del self._rewound[tp]
+
+    def done(self, topic: str, partition: int, offset: int) -> None:
+        """Mark a message as finished (produced or deliberately skipped)."""
+        tp = (topic, partition)
+        with self._lock:
+            self._pending[tp].discard(offset)
+            self._next[tp] = max(self._next.get(tp, 0), offset + 1)
+            self._dirty.add(tp)
+
+    def discard(self, topic: str, partition: int, offset: int) -> None:
+        """Forget an in-flight message that will be redelivered (e.g. after a seek).
+
+        Until it is begun again, committable() stays at or below this offset even if
+        newer messages on the partition complete in the meantime.
+        """
+        tp = (topic, partition)
+        with self._lock:
+            self._pending[tp].discard(offset)
+            self._rewound[tp] = min(offset, self._rewound.get(tp, offset))
+            self._dirty.add(tp)
+
+    def drop_partition(self, topic: str, partition: int) -> None:
+        """Forget all state for a revoked partition."""
+        tp = (topic, partition)
+        with self._lock:
+            self._pending.pop(tp, None)
+            self._next.pop(tp, None)
+            self._rewound.pop(tp, None)
+            self._dirty.discard(tp)
+
+    def is_pending(self, topic: str, partition: int, offset: int) -> bool:
+        """True if offset was begun and is not done (False once its partition is dropped)."""
+        with self._lock:
+            return offset in self._pending.get((topic, partition), ())
+
+    def in_flight(self, topic: str | None = None, partition: int | None = None) -> int:
+        with self._lock:
+            if topic is not None and partition is not None:
+                return len(self._pending.get((topic, partition), ()))
+            return sum(len(p) for p in self._pending.values())
+
+    def committable(self) -> list[TopicPartition]:
+        """Return positions changed since the last call, never past an in-flight offset."""
+        out = []
+        with self._lock:
+            for tp in self._dirty:
+                floor = set(self._pending.get(tp, ()))
+                if tp in self._rewound:
+                    floor.add(self._rewound[tp])
+                if floor:
+                    offset = min(floor)
+                elif tp in self._next:
+                    offset = self._next[tp]
+                else:
+                    continue
+                out.append(TopicPartition(tp[0], tp[1], offset))
+            self._dirty.clear()
+        return out
@@ -0,0 +1,200 @@
+"""Key-ordered parallel dispatch for Kafka consumers.
+
+Messages are handed to a bounded worker pool. Messages with the same ordering key run one
+at a time in offset order; different keys run concurrently. Completion is recorded in an
+OffsetTracker, so only contiguous completed ranges are ever stored. The poll loop stops
+taking new messages while the in-flight count or bytes limit is reached.
+
+All Kafka consumer calls (poll, seek, pause, store) stay on the polling thread: workers
+report BackendUnavailableError through failures() for the loop to rewind.
+"""
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+import structlog  # type: ignore[import-untyped]
+from prometheus_client import Gauge  # type: ignore[import-untyped]
+
+from . import headers
+from .circuit_breaker import BackendUnavailableError
+from .offsets import OffsetTracker
+
+logger = structlog.get_logger(__name__)
+
+CONSUMER_INFLIGHT_MESSAGES = Gauge(
+    "consumer_inflight_messages",
+    "Messages dispatched to workers and not yet finished",
+    ["agent"],
+)
+CONSUMER_INFLIGHT_BYTES = Gauge(
+    "consumer_inflight_bytes",
+    "Payload bytes of messages dispatched to workers and not yet finished",
+    ["agent"],
+)
+
+
+def ordering_key(msg, field: str = "ticket_id") -> str:
+    """Key whose messages must be processed in order.
+
+    "ticket_id" uses the Kafka message key (producers key by ticket_id); "customer_id"
+    reads the customer_id header, or the JSON payload for messages produced without it.
+    Falls back to the partition, which keeps the sequential behavior for messages without
+    a usable key.
+    """
+    if field == "customer_id":
+        customer_id = headers.customer_id(msg)
+        if customer_id:
+            return f"customer:{customer_id}"
+    else:
+        key = msg.key()
+        if key:
+            return key.decode("utf-8", errors="replace") if isinstance(key, bytes) else str(key)
+    return f"partition:{msg.topic()}:{msg.partition()}"
+
+
+class KeyOrderedDispatcher:
+    """Bounded worker pool that preserves per-key order.
+
+    handler(msg) -> bool runs in a worker thread; True marks the offset done, False means
+    someone else will (e.g. a deferred batch ticket).
+    """
+
+    def __init__(
+        self,
+        agent: str,
+        handler: Callable[[object], bool],
+        tracker: OffsetTracker,
+        max_workers: int = 4,
+        max_inflight: int = 100,
+        max_inflight_bytes: int = 8 * 1024 * 1024,
+        key_fn: Callable[[object], str] = ordering_key,
+        condition: threading.Condition | None = None,
+    ):
+        self.agent = agent
+        self.handler = handler
+        self.tracker = tracker
+        self.max_inflight = max(1, max_inflight)
+        self.max_inflight_bytes = max(1, max_inflight_bytes)
+        self.key_fn = key_fn
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix=f"{agent}-worker")
+        # Dispatchers in one process may share a condition so the poll loop can wait on any of them.
+        self._cond = condition or threading.Condition()
+        self._queues: dict[str, deque] = {}  # key -> messages waiting behind the running one
+        self._inflight = 0
+        self._inflight_bytes = 0
+        self._failures: list[tuple[object, BackendUnavailableError]] = []
+
+    @property
+    def inflight(self) -> int:
+        return self._inflight
+
+    @property
+    def condition(self) -> threading.Condition:
+        return self._cond
+
+    def _saturated(self) -> bool:
+        return self._inflight >= self.max_inflight or self._inflight_bytes >= self.max_inflight_bytes
+
+    def saturated(self) -> bool:
+        with self._cond:
+            return self._saturated()
+
+    def wait_for_capacity(self, timeout: float) -> bool:
+        """Block until below both in-flight limits (or timeout). Returns True if there is capacity."""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._saturated(), timeout=timeout)
+
+    def wait_idle(self, timeout: float | None = None) -> bool:
+        with self._cond:
+            return self._cond.wait_for(lambda: self._inflight == 0, timeout=timeout)
+
+    def submit(self, msg) -> None:
+        """Dispatch msg (already begun in the tracker). Runs now unless its key is busy."""
+        key = self.key_fn(msg)
+        size = len(msg.value() or b"")
+        with self._cond:
+            self._inflight += 1
+            self._inflight_bytes += size
+            self._set_gauges()
+            waiting = self._queues.get(key)
+            if waiting is not None:
+                waiting.append(msg)
+                return
+            self._queues[key] = deque()
+        self._executor.submit(self._run, key, msg)
+
+    def failures(self) -> list[tuple[object, BackendUnavailableError]]:
+        """Messages whose handler raised BackendUnavailableError since the last call."""
+        with self._cond:
+            out, self._failures = self._failures, []
+        return out
+
+    def _run(self, key: str, msg) -> None:
+        structlog.contextvars.clear_contextvars()
+        structlog.contextvars.bind_contextvars(partition=msg.partition(), offset=msg.offset())
+        failed: BackendUnavailableError | None = None
+        try:
+            finished = self.handler(msg)
+        except BackendUnavailableError as e:
+            failed = e
+            finished = False
+        except Exception as e:  # handler bugs must not wedge the key or the offsets
+            logger.exception("Worker failed on message", error=str(e))
+            finished = True
+        if finished:
+            self.tracker.done(msg.topic(), msg.partition(), msg.offset())
+
+        with self._cond:
+            self._finish(msg)
+            if failed is not None:
+                self.tracker.discard(msg.topic(), msg.partition(), msg.offset())
+                self._failures.append((msg, failed))
+                self._drop_queued_after(msg)
+            waiting = self._queues.get(key)
+            nxt = waiting.popleft() if waiting else None
+            if nxt is None:
+                self._queues.pop(key, None)
+            self._cond.notify_all()
+        if nxt is not None:
+            self._executor.submit(self._run, key, nxt)
+
+    def _finish(self, msg) -> None:
+        self._inflight -= 1
+        self._inflight_bytes -= len(msg.value() or b"")
+        self._set_gauges()
+
+    def _drop_queued_after(self, failed) -> None:
+        """Forget not-yet-started messages on the failed partition; the rewind redelivers them."""
+        tp = (failed.topic(), failed.partition())
+        for waiting in self._queues.values():
+            keep = deque()
+            for m in waiting:
+                if (m.topic(), m.partition()) == tp and m.offset() > failed.offset():
+                    self.tracker.discard(m.topic(), m.partition(), m.offset())
+                    self._finish(m)
+                else:
+                    keep.append(m)
+            waiting.clear()
+            waiting.extend(keep)
+
+    def _set_gauges(self) -> None:
+        CONSUMER_INFLIGHT_MESSAGES.labels(agent=self.agent).set(self._inflight)
+        CONSUMER_INFLIGHT_BYTES.labels(agent=self.agent).set(self._inflight_bytes)
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
+
+
+def wait_for_any_capacity(dispatchers: list[KeyOrderedDispatcher], timeout: float) -> bool:
+    """Block until any of dispatchers is below its in-flight limits (or timeout).
+
+    The dispatchers must share one condition. Returns True if one has capacity.
+    """
+    if not dispatchers:
+        return True
+    cond = dispatchers[0].condition
+    if any(d.condition is not cond for d in dispatchers):
+        raise ValueError("wait_for_any_capacity needs dispatchers sharing one condition")
+    with cond:
+        return cond.wait_for(lambda: not all(d._saturated() for d in dispatchers), timeout=timeout)
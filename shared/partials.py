@@ -0,0 +1,134 @@
+"""Incremental ticket.resolution.partial events for streamed specialist responses.
+
+While a response streams, the guardrail-checked prefix of the draft is published every
+PARTIAL_EVENTS_EVERY_TOKENS tokens or PARTIAL_EVENTS_EVERY_MS milliseconds, whichever
+comes first. Each event carries the whole draft so far and a per-ticket sequence number,
+so consumers can drop stale or duplicate events. The run still ends with the
+guardrail-checked ticket.resolved; if the guardrail aborts the stream instead, a last
+event with aborted=true tells consumers to discard the draft.
+
+The publisher for the ticket being handled lives in a context variable, so the streaming
+helpers beneath each specialist's generate_response need no extra arguments.
+"""
+import json
+import time
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Callable
+
+import structlog  # type: ignore[import-untyped]
+from prometheus_client import Counter, Histogram  # type: ignore[import-untyped]
+
+from .headers import event_headers
+from .topics import TOPIC_RESOLUTION_PARTIAL
+from .usage import estimate_tokens
+
+logger = structlog.get_logger(__name__)
+
+PARTIAL_EVENTS = Counter(
+    "specialist_partial_events_total",
+    "ticket.resolution.partial events published",
+    ["agent"],
+)
+TIME_TO_FIRST_PARTIAL = Histogram(
+    "specialist_time_to_first_partial_seconds",
+    "Start of generation to the first ticket.resolution.partial event",
+    ["agent"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+TIME_TO_FINAL = Histogram(
+    "specialist_time_to_final_seconds",
+    "Start of generation to ticket.resolved being produced",
+    ["agent"],
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+
+
+class PartialPublisher:
+    """Publishes draft-so-far events for one ticket."""
+
+    def __init__(
+        self,
+        producer: Any,
+        agent: str,
+        ticket_id: str,
+        trace_id: str,
+        every_tokens: int = 20,
+        every_ms: float = 250.0,
+        clock: Callable[[], float] = time.perf_counter,
+    ):
+        self.producer = producer
+        self.agent = agent
+        self.ticket_id = ticket_id
+        self.trace_id = trace_id
+        self.every_tokens = max(1, every_tokens)
+        self.every_sec = max(0.0, every_ms) / 1000
+        self.clock = clock
+        self.started = clock()
+        self.sequence = 0
+        self._last_emit = self.started
+        self._last_len = 0
+
+    def update(self, draft: str) -> None:
+        """Offer the latest safe draft; publishes when enough new text or time has accumulated."""
+        if len(draft) <= self._last_len:
+            return
+        now = self.clock()
+        new_tokens = estimate_tokens(draft[self._last_len:])
+        if new_tokens < self.every_tokens and now - self._last_emit < self.every_sec:
+            return
+        if self.sequence == 0:
+            TIME_TO_FIRST_PARTIAL.labels(agent=self.agent).observe(now - self.started)
+        self._publish(draft=draft, aborted=False)
+        self._last_emit = now
+        self._last_len = len(draft)
+
+    def abort(self) -> None:
+        """Tell consumers to discard the draft (only if one was published)."""
+        if self.sequence:
+            self._publish(draft="", aborted=True)
+
+    def _publish(self, draft: str, aborted: bool) -> None:
+        self.sequence += 1
+        event = {
+            "event_type": "ticket.resolution.partial",
+            "ticket_id": self.ticket_id,
+            "trace_id": self.trace_id,
+            "resolved_by": self.agent,
+            "sequence": self.sequence,
+            "draft": draft,
+            "aborted": aborted,
+            "emitted_at": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+        }
+        try:
+            self.producer.produce(
+                TOPIC_RESOLUTION_PARTIAL,
+                key=self.ticket_id.encode("utf-8"),
+                value=json.dumps(event).encode("utf-8"),
+                headers=event_headers("ticket.resolution.partial", self.trace_id),
+            )
+            self.producer.poll(0)
+        except BufferError as e:
+            # Partials are best-effort; never hold up the ticket for one.
+            logger.warning("Dropped partial event, producer queue full", error=str(e))
+            return
+        PARTIAL_EVENTS.labels(agent=self.agent).inc()
+
+
+_current: ContextVar[PartialPublisher | None] = ContextVar("partial_publisher", default=None)
+
+
+def begin(publisher: PartialPublisher | None) -> None:
+    """Set (or clear) the publisher for the ticket handled in the current context."""
+    _current.set(publisher)
+
+
+def current() -> PartialPublisher | None:
+    return _current.get()
+
+
+def publish_draft(draft: str) -> None:
+    """Called by the streaming helpers with the guardrail-safe draft; no-op when partials are off."""
+    publisher = _current.get()
+    if publisher is not None:
+        publisher.update(draft)
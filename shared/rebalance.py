@@ -0,0 +1,195 @@
+"""Consumer group membership: rebalance callbacks, rebalance metrics and drain-on-close.
+
+Consumers from shared.kafka use the cooperative-sticky assignor, so a rebalance only moves
+the partitions that change owner instead of revoking everyone's assignment. With
+KAFKA_STATIC_MEMBERSHIP and POD_NAME set they join as static members (group.instance.id),
+so a restarted pod gets its partitions back without a rebalance at all; that needs pod
+names that survive a restart (a StatefulSet), so it is off for the Deployments.
+
+RebalanceListener subscribes the consumer with callbacks that, when partitions are revoked,
+wait up to REBALANCE_DRAIN_SEC for their in-flight tickets, commit the finished offsets so
+the new owner starts after them, and count what was still in flight. Deferred batch tickets
+of revoked or lost partitions are dropped from their batchers, since the new owner
+resolves them again. drain_and_close()
+does the same for the whole assignment when the agent shuts down.
+"""
+import time
+from typing import Callable, Iterable
+
+import structlog  # type: ignore[import-untyped]
+from confluent_kafka import KafkaError, KafkaException
+from prometheus_client import Counter, Histogram  # type: ignore[import-untyped]
+
+from . import shutdown
+from .config import REBALANCE_DRAIN_SEC
+from .offsets import OffsetTracker
+
+logger = structlog.get_logger(__name__)
+
+REBALANCES = Counter(
+    "kafka_rebalances_total",
+    "Rebalance callbacks by event (assign, revoke, lost)",
+    ["agent", "event"],
+)
+REBALANCE_SECONDS = Histogram(
+    "kafka_rebalance_seconds",
+    "Time from revocation (or subscribe) to the assignment that completes the rebalance",
+    ["agent"],
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+)
+REVOKED_INFLIGHT = Counter(
+    "kafka_revoked_inflight_total",
+    "Tickets still in flight when their partition was revoked, lost or closed; their new owner reprocesses them",
+    ["agent", "reason"],
+)
+
+
+def commit_offsets(consumer, tracker: OffsetTracker | None = None, transaction=None) -> None:
+    """Store the tracker's committable positions, then commit stored offsets synchronously.
+
+    With a transaction (shared.transactions) the positions are committed by it instead.
+    """
+    offsets = tracker.committable() if tracker is not None else []
+    if transaction is not None:
+        transaction.record(offsets)
+        transaction.commit()
+        return
+    if offsets:
+        try:
+            consumer.store_offsets(offsets=offsets)
+        except KafkaException as e:
+            logger.debug("Could not store offsets", error=str(e))
+    try:
+        consumer.commit(asynchronous=False)
+    except KafkaException as e:
+        if e.args[0].code() != KafkaError._NO_OFFSET:
+            logger.warning("Could not commit offsets", error=str(e))
+
+
+class RebalanceListener:
+    """Rebalance callbacks for one consumer; tracker/condition are those of its worker pools.
+
+    batchers are the loop's DeferredBatchers, whose tickets of a revoked partition are dropped.
+
+    With a transaction (exactly-once mode) a revocation commits it and a loss aborts it.
+    """
+
+    def __init__(
+        self,
+        agent: str,
+        tracker: OffsetTracker | None = None,
+        condition=None,
+        drain_sec: float = REBALANCE_DRAIN_SEC,
+        clock: Callable[[], float] = time.monotonic,
+        transaction=None,
+        batchers: Iterable = (),
+    ):
+        self.agent = agent
+        self.tracker = tracker
+        self.condition = condition
+        self.transaction = transaction
+        self.batchers = list(batchers)
+        self.drain_sec = drain_sec
+        self.clock = clock
+        self._started: float | None = None
+
+    def subscribe(self, consumer, topics: list[str]) -> None:
+        self._started = self.clock()
+        consumer.subscribe(topics, on_assign=self.on_assign, on_revoke=self.on_revoke, on_lost=self.on_lost)
+
+    def on_assign(self, consumer, partitions) -> None:
+        REBALANCES.labels(agent=self.agent, event="assign").inc()
+        if self._started is not None:
+            REBALANCE_SECONDS.labels(agent=self.agent).observe(self.clock() - self._started)
+            self._started = None
+        if self.tracker is not None:
+            # State left from an earlier time this consumer owned the partition is stale.
+            for tp in partitions:
+                self.tracker.drop_partition(tp.topic, tp.partition)
+        if partitions:
+            logger.info("Partitions assigned", partitions=_names(partitions))
+
+    def on_revoke(self, consumer, partitions) -> None:
+        REBALANCES.labels(agent=self.agent, event="revoke").inc()
+        if self._started is None:
+            self._started = self.clock()
+        if not partitions:
+            return
+        abandoned = self._wait_inflight(partitions, self.drain_sec)
+        commit_offsets(consumer, self.tracker, self.transaction)
+        self._forget(partitions, abandoned, "revoke")
+        logger.info("Partitions revoked", partitions=_names(partitions), abandoned_inflight=abandoned)
+
+    def on_lost(self, consumer, partitions) -> None:
+        # The group already reassigned these (session timeout); committing would fail.
+        REBALANCES.labels(agent=self.agent, event="lost").inc()
+        if self._started is None:
+            self._started = self.clock()
+        abandoned = self._inflight(partitions)
+        if self.transaction is not None:
+            # The transaction holds offsets of the lost partitions and would be fenced.
+            self.transaction.abort()
+        self._forget(partitions, abandoned, "lost")
+        logger.warning("Partitions lost", partitions=_names(partitions), abandoned_inflight=abandoned)
+
+    def _inflight(self, partitions: Iterable) -> int:
+        if self.tracker is None:
+            return 0
+        return sum(self.tracker.in_flight(tp.topic, tp.partition) for tp in partitions)
+
+    def _wait_inflight(self, partitions, timeout: float) -> int:
+        """Wait (up to timeout) for in-flight tickets on partitions. Returns how many are left."""
+        if self.condition is not None and timeout > 0 and self._inflight(partitions):
+            with self.condition:
+                self.condition.wait_for(lambda: self._inflight(partitions) == 0, timeout=timeout)
+        return self._inflight(partitions)
+
+    def _forget(self, partitions, abandoned: int, reason: str) -> None:
+        if abandoned:
+            REVOKED_INFLIGHT.labels(agent=self.agent, reason=reason).inc(abandoned)
+        if self.tracker is not None:
+            for tp in partitions:
+                self.tracker.drop_partition(tp.topic, tp.partition)
+        revoked = {(tp.topic, tp.partition) for tp in partitions}
+        for batcher in self.batchers:
+            batcher.drop_partitions(revoked)
+
+
+def drain_and_close(
+    agent: str,
+    consumer,
+    producer,
+    tracker: OffsetTracker | None = None,
+    dispatchers: Iterable = (),
+    retry_scheduler=None,
+    transaction=None,
+) -> None:
+    """Finish in-flight work within the shutdown grace period, flush, commit and close.
+
+    Tickets still running when the grace period ends are counted in kafka_revoked_inflight_total
+    (reason="shutdown"); their offsets are not committed, so the next owner reprocesses them.
+    With a transaction, committing it delivers what it produced before the final flush.
+    """
+    dispatchers = list(dispatchers)
+    for dispatcher in dispatchers:
+        dispatcher.wait_idle(timeout=shutdown.remaining())
+    abandoned = tracker.in_flight() if tracker is not None else 0
+    if abandoned:
+        REVOKED_INFLIGHT.labels(agent=agent, reason="shutdown").inc(abandoned)
+    if retry_scheduler is not None:
+        retry_scheduler.stop()
+    if transaction is not None:
+        commit_offsets(consumer, tracker, transaction)
+    undelivered = producer.flush(max(shutdown.remaining(), 5.0))
+    if undelivered:
+        logger.warning("Messages not delivered before shutdown", count=undelivered)
+    if transaction is None:
+        commit_offsets(consumer, tracker)
+    consumer.close()
+    for dispatcher in dispatchers:
+        dispatcher.shutdown(wait=False)
+    logger.info("Consumer closed", abandoned_inflight=abandoned, undelivered=undelivered)
+
+
+def _names(partitions) -> list[str]:
+    return [f"{tp.topic}[{tp.partition}]" for tp in partitions]
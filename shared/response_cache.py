@@ -0,0 +1,197 @@
+"""Specialist response cache for repeated questions.
+
+Entries are keyed on the normalized subject/body, triage type and a hash of the
+specialist's system prompt (the prompt version). Normalization lowercases the text and
+masks emails, URLs and numbers, so "copy of invoice 1234" and "copy of invoice 5678" share
+an entry. Customer and ticket fields (ids, enrichment, triage reasoning) are never part of
+the key. A response that repeats any of the masked values or customer fields is not
+stored, so one customer's details are never served to another.
+
+Misses fall back to near-duplicate matching: word-bigram Jaccard similarity against
+entries for the same triage type and prompt version, found through an inverted index.
+Only responses that passed the guardrails are stored (the caller stores after producing).
+"""
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Iterable
+
+from prometheus_client import Counter, Gauge  # type: ignore[import-untyped]
+
+RESPONSE_CACHE_REQUESTS = Counter(
+    "specialist_response_cache_requests_total",
+    "Response cache lookups (outcome: hit, near_hit, miss)",
+    ["agent", "outcome"],
+)
+RESPONSE_CACHE_SECONDS_SAVED = Counter(
+    "specialist_response_cache_seconds_saved_total",
+    "Generation time of cached responses served instead of calling the LLM",
+    ["agent"],
+)
+RESPONSE_CACHE_ENTRIES = Gauge(
+    "specialist_response_cache_entries",
+    "Responses currently cached",
+    ["agent"],
+)
+RESPONSE_CACHE_SKIPPED = Counter(
+    "specialist_response_cache_not_stored_total",
+    "Responses not cached because they repeat ticket- or customer-specific values",
+    ["agent"],
+)
+
+_EMAIL = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+_URL = re.compile(r"https?://\S+")
+_NUMBER = re.compile(r"\d[\d,./:-]*")
+_NON_WORD = re.compile(r"[^a-z<> ]+")
+
+
+def normalize(text: str) -> tuple[str, list[str]]:
+    """Return (normalized text, masked values). Masked values are what made the text customer-specific."""
+    masked: list[str] = []
+
+    def mask(placeholder: str) -> Callable[[re.Match], str]:
+        def _sub(m: re.Match) -> str:
+            masked.append(m.group(0).rstrip(".,:/-"))
+            return f" {placeholder} "
+        return _sub
+
+    text = _EMAIL.sub(mask("<email>"), text)
+    text = _URL.sub(mask("<url>"), text)
+    text = _NUMBER.sub(mask("<num>"), text)
+    text = _NON_WORD.sub(" ", text.lower())
+    return " ".join(text.split()), masked
+
+
+def prompt_version(system_prompt: str) -> str:
+    return hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()[:12]
+
+
+def _shingles(words: list[str]) -> frozenset[str]:
+    if len(words) < 2:
+        return frozenset(words)
+    return frozenset(f"{a} {b}" for a, b in zip(words, words[1:]))
+
+
+def _mentions(text: str, value: str) -> bool:
+    return re.search(rf"(?<!\w){re.escape(value)}(?!\w)", text, re.IGNORECASE) is not None
+
+
+@dataclass
+class CachedResponse:
+    response: str
+    generation_sec: float
+    expires_at: float
+    bucket: str
+    shingles: frozenset[str]
+
+
+class SpecialistResponseCache:
+    """Thread-safe TTL/LRU cache of specialist responses with near-duplicate lookup."""
+
+    def __init__(
+        self,
+        agent: str,
+        system_prompt: str = "",
+        max_entries: int = 1000,
+        ttl_sec: float = 3600.0,
+        similarity: float = 0.9,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.agent = agent
+        self.version = prompt_version(system_prompt)
+        self.max_entries = max_entries
+        self.ttl_sec = ttl_sec
+        self.similarity = similarity
+        self._clock = clock
+        self._entries: OrderedDict[str, CachedResponse] = OrderedDict()
+        self._index: dict[tuple[str, str], set[str]] = {}  # (bucket, shingle) -> keys
+        self._lock = threading.Lock()
+
+    def _key(self, triage_type: str, subject: str, body: str) -> tuple[str, str, frozenset[str], list[str]]:
+        norm_subject, masked_subject = normalize(subject)
+        norm_body, masked_body = normalize(body)
+        bucket = f"{triage_type}\0{self.version}"
+        text = f"{norm_subject}\n{norm_body}"
+        key = hashlib.sha256(f"{bucket}\0{text}".encode("utf-8")).hexdigest()
+        return key, bucket, _shingles(text.split()), masked_subject + masked_body
+
+    def get(self, triage_type: str, subject: str, body: str) -> CachedResponse | None:
+        key, bucket, shingles, _ = self._key(triage_type, subject, body)
+        now = self._clock()
+        with self._lock:
+            entry = self._live(key, now)
+            outcome = "hit"
+            if entry is None and self.similarity < 1.0:
+                entry = self._nearest(bucket, shingles, now)
+                outcome = "near_hit"
+            if entry is None:
+                RESPONSE_CACHE_REQUESTS.labels(agent=self.agent, outcome="miss").inc()
+                return None
+        RESPONSE_CACHE_REQUESTS.labels(agent=self.agent, outcome=outcome).inc()
+        RESPONSE_CACHE_SECONDS_SAVED.labels(agent=self.agent).inc(entry.generation_sec)
+        return entry
+
+    def put(
+        self,
+        triage_type: str,
+        subject: str,
+        body: str,
+        response: str,
+        generation_sec: float,
+        sensitive: Iterable[str] = (),
+    ) -> bool:
+        """Store a guardrail-passing response. Returns False if it repeats ticket or customer values."""
+        if self.max_entries <= 0 or self.ttl_sec <= 0:
+            return False
+        key, bucket, shingles, masked = self._key(triage_type, subject, body)
+        if any(_mentions(response, v) for v in (*masked, *sensitive) if v and len(v) >= 3):
+            RESPONSE_CACHE_SKIPPED.labels(agent=self.agent).inc()
+            return False
+        entry = CachedResponse(response, generation_sec, self._clock() + self.ttl_sec, bucket, shingles)
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = entry
+            for s in shingles:
+                self._index.setdefault((bucket, s), set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+            RESPONSE_CACHE_ENTRIES.labels(agent=self.agent).set(len(self._entries))
+        return True
+
+    def _live(self, key: str, now: float) -> CachedResponse | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if now >= entry.expires_at:
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _nearest(self, bucket: str, shingles: frozenset[str], now: float) -> CachedResponse | None:
+        overlap: dict[str, int] = {}
+        for s in shingles:
+            for key in self._index.get((bucket, s), ()):
+                overlap[key] = overlap.get(key, 0) + 1
+        best_key, best = None, self.similarity
+        for key, shared in overlap.items():
+            other = self._entries[key].shingles
+            score = shared / (len(shingles) + len(other) - shared)
+            if score >= best:
+                best_key, best = key, score
+        return self._live(best_key, now) if best_key is not None else None
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for s in entry.shingles:
+            keys = self._index.get((entry.bucket, s))
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._index[(entry.bucket, s)]
+        RESPONSE_CACHE_ENTRIES.labels(agent=self.agent).set(len(self._entries))
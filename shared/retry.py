@@ -0,0 +1,270 @@
+"""Non-blocking retries through delay topics, with a dead-letter queue.
+
+When a ticket fails for a reason a later attempt may fix (LLM error, guardrail rejection),
+RetryPublisher republishes it to the next retry tier, <input topic>.retry.<delay>. The
+main loop then stores its offset and moves on, so a failure never blocks the partition.
+Retry headers carry the attempt count, reason, due time and the topic to redeliver to.
+After the last tier, or for failures no retry can fix (invalid JSON), the message goes to
+<input topic>.dlq instead.
+
+RetryScheduler runs its own consumer on the tier topics in a background thread. Messages
+in one tier topic are due in append order, so when the head message of a partition is
+not yet due, the scheduler seeks back to it and pauses that partition until the due time.
+Once a message is due, it is produced back to its origin topic.
+
+Circuit-open backend errors (BackendUnavailableError) still rewind and pause the main
+consumer instead; retry topics are for failures of individual tickets.
+"""
+import re
+import threading
+import time
+from typing import Callable
+
+import structlog  # type: ignore[import-untyped]
+from confluent_kafka import KafkaError, KafkaException, TopicPartition
+from prometheus_client import Counter, Gauge  # type: ignore[import-untyped]
+
+from . import kafka
+from .topics import dlq_topic, retry_topic
+
+logger = structlog.get_logger(__name__)
+
+RETRY_SCHEDULED = Counter(
+    "retry_scheduled_total",
+    "Failed messages republished to a retry tier topic (tier) or the dead-letter topic (tier=dlq)",
+    ["agent", "reason", "tier"],
+)
+RETRY_REDELIVERED = Counter(
+    "retry_redelivered_total",
+    "Retry messages produced back to their origin topic once due",
+    ["agent", "tier"],
+)
+RETRY_PARTITIONS_WAITING = Gauge(
+    "retry_partitions_waiting",
+    "Retry topic partitions paused until their next message is due",
+    ["agent"],
+)
+
+HEADER_ATTEMPT = "retry_attempt"
+HEADER_REASON = "retry_reason"
+HEADER_DUE_AT = "retry_due_at"  # epoch milliseconds
+HEADER_ORIGIN = "retry_origin_topic"
+HEADER_ERROR = "retry_error"
+_RETRY_HEADERS = {HEADER_ATTEMPT, HEADER_REASON, HEADER_DUE_AT, HEADER_ORIGIN, HEADER_ERROR}
+
+_DURATION = re.compile(r"^(\d+(?:\.\d+)?)(ms|s|m|h)$")
+_UNIT_SEC = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def parse_tiers(spec: str) -> list[tuple[str, float]]:
+    """"30s,5m,30m" -> [("30s", 30.0), ("5m", 300.0), ("30m", 1800.0)]."""
+    tiers = []
+    for label in (t.strip().lower() for t in spec.split(",")):
+        if not label:
+            continue
+        match = _DURATION.match(label)
+        if match is None:
+            raise ValueError(f"Invalid retry tier {label!r}; use e.g. 30s, 5m, 1h")
+        tiers.append((label, float(match.group(1)) * _UNIT_SEC[match.group(2)]))
+    return tiers
+
+
+def _headers(msg) -> list[tuple[str, bytes]]:
+    return [(k, v if isinstance(v, bytes) else str(v or "").encode("utf-8")) for k, v in (msg.headers() or [])]
+
+
+def header(msg, name: str, default: str = "") -> str:
+    for key, value in _headers(msg):
+        if key == name:
+            return value.decode("utf-8", errors="replace")
+    return default
+
+
+def attempt(msg) -> int:
+    """Retries this message has already been through (0 for a first delivery)."""
+    try:
+        return int(header(msg, HEADER_ATTEMPT, "0"))
+    except ValueError:
+        return 0
+
+
+class RetryRecord:
+    """A failed ticket no longer held as a consumed Message (e.g. a deferred batch ticket).
+
+    Exposes the Message accessors RetryPublisher reads: topic(), key(), value(), headers().
+    """
+
+    def __init__(self, topic: str, key: bytes | None, value: bytes, headers: list | None = None):
+        self._topic = topic
+        self._key = key
+        self._value = value
+        self._headers = headers or []
+
+    def topic(self) -> str:
+        return self._topic
+
+    def key(self) -> bytes | None:
+        return self._key
+
+    def value(self) -> bytes:
+        return self._value
+
+    def headers(self) -> list:
+        return self._headers
+
+
+class RetryPublisher:
+    """Republishes failed messages to the next retry tier or the dead-letter topic.
+
+    msg is a consumed Message or a RetryRecord.
+    """
+
+    def __init__(
+        self,
+        agent: str,
+        producer,
+        tiers: list[tuple[str, float]],
+        clock: Callable[[], float] = time.time,
+    ):
+        self.agent = agent
+        self.producer = producer
+        self.tiers = tiers
+        self.clock = clock
+
+    def schedule(self, msg, reason: str, error: str = "") -> str:
+        """Send msg to its next retry tier (or the DLQ after the last). Returns the tier label or "dlq"."""
+        n = attempt(msg)
+        if n >= len(self.tiers):
+            return self.dead_letter(msg, reason, error)
+        label, delay = self.tiers[n]
+        origin = header(msg, HEADER_ORIGIN) or msg.topic()
+        self._produce(retry_topic(origin, label), msg, {
+            HEADER_ATTEMPT: str(n + 1),
+            HEADER_REASON: reason,
+            HEADER_DUE_AT: str(int((self.clock() + delay) * 1000)),
+            HEADER_ORIGIN: origin,
+            HEADER_ERROR: error[:500],
+        })
+        RETRY_SCHEDULED.labels(agent=self.agent, reason=reason, tier=label).inc()
+        logger.warning("Scheduled retry", reason=reason, tier=label, attempt=n + 1, error=error[:200])
+        return label
+
+    def dead_letter(self, msg, reason: str, error: str = "") -> str:
+        """Send msg straight to the dead-letter topic."""
+        origin = header(msg, HEADER_ORIGIN) or msg.topic()
+        self._produce(dlq_topic(origin), msg, {
+            HEADER_ATTEMPT: str(attempt(msg)),
+            HEADER_REASON: reason,
+            HEADER_ORIGIN: origin,
+            HEADER_ERROR: error[:500],
+        })
+        RETRY_SCHEDULED.labels(agent=self.agent, reason=reason, tier="dlq").inc()
+        logger.error("Sent message to dead-letter topic", reason=reason, attempts=attempt(msg), error=error[:200])
+        return "dlq"
+
+    def _produce(self, topic: str, msg, retry_headers: dict[str, str]) -> None:
+        headers = [(k, v) for k, v in _headers(msg) if k not in _RETRY_HEADERS]
+        headers += [(k, v.encode("utf-8")) for k, v in retry_headers.items()]
+        self.producer.produce(
+            topic,
+            key=msg.key(),
+            value=msg.value(),
+            headers=headers,
+            callback=lambda err, _: logger.error("Retry produce error", topic=topic, error=str(err)) if err else None,
+        )
+        # The caller stores the failed message's offset next, so the copy must be on the broker first.
+        self.producer.flush(timeout=10)
+
+
+class RetryScheduler:
+    """Consumes retry tier topics and redelivers each message to its origin topic once due."""
+
+    def __init__(self, agent: str, consumer, producer, clock: Callable[[], float] = time.time):
+        self.agent = agent
+        self.consumer = consumer
+        self.producer = producer
+        self.clock = clock
+        self._waiting: dict[tuple[str, int], float] = {}  # paused partition -> due (epoch sec)
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def poll_once(self, max_wait: float = 1.0) -> None:
+        now = self.clock()
+        due = [tp for tp, at in self._waiting.items() if at <= now]
+        if due:
+            try:
+                self.consumer.resume([TopicPartition(t, p) for t, p in due])
+            except KafkaException as e:
+                # Revoked while waiting; the new owner picks the message up.
+                logger.debug("Could not resume retry partitions", error=str(e))
+            for tp in due:
+                del self._waiting[tp]
+        timeout = max_wait
+        if self._waiting:
+            timeout = min(max_wait, max(0.01, min(self._waiting.values()) - now))
+        RETRY_PARTITIONS_WAITING.labels(agent=self.agent).set(len(self._waiting))
+        msg = self.consumer.poll(timeout=timeout)
+        if msg is None:
+            return
+        if msg.error():
+            if msg.error().code() != KafkaError._PARTITION_EOF:
+                logger.error("Retry consumer error", error=str(msg.error()))
+            return
+        try:
+            due_at = int(header(msg, HEADER_DUE_AT, "0")) / 1000
+        except ValueError:
+            due_at = 0.0
+        if due_at > self.clock():
+            self.consumer.seek(TopicPartition(msg.topic(), msg.partition(), msg.offset()))
+            self.consumer.pause([TopicPartition(msg.topic(), msg.partition())])
+            self._waiting[(msg.topic(), msg.partition())] = due_at
+            return
+        origin = header(msg, HEADER_ORIGIN)
+        if origin:
+            self.producer.produce(
+                origin,
+                key=msg.key(),
+                value=msg.value(),
+                headers=_headers(msg),
+                callback=lambda err, _: logger.error("Redelivery produce error", error=str(err)) if err else None,
+            )
+            self.producer.flush(timeout=10)
+            RETRY_REDELIVERED.labels(agent=self.agent, tier=msg.topic().rsplit(".", 1)[-1]).inc()
+        else:
+            logger.warning("Retry message without origin topic, dropping", topic=msg.topic())
+        self.consumer.store_offsets(message=msg)
+
+    def run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.poll_once()
+            except Exception:
+                logger.exception("Retry scheduler iteration failed")
+                time.sleep(1.0)
+
+    def start(self) -> "RetryScheduler":
+        self._thread = threading.Thread(target=self.run, name=f"{self.agent}-retry-scheduler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.consumer.close()
+
+
+def start_retry_scheduler(
+    agent: str,
+    bootstrap_servers: str,
+    input_topics: list[str],
+    tiers: list[tuple[str, float]],
+    producer,
+    group_id: str,
+) -> RetryScheduler:
+    """Start the background scheduler for the retry tier topics of input_topics."""
+    consumer = kafka.create_consumer(bootstrap_servers, group_id, agent=agent)
+    topics = sorted({retry_topic(t, label) for t in input_topics for label, _ in tiers})
+    consumer.subscribe(topics)
+    logger.info("Retry scheduler started", topics=topics)
+    return RetryScheduler(agent, consumer, producer).start()
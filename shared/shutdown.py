@@ -0,0 +1,58 @@
+"""Graceful shutdown: SIGTERM stops polling and drains in-flight work before the pod exits.
+
+Each agent entrypoint calls install() before entering its consume loop. The first SIGTERM
+(or Ctrl-C) only sets a flag; the loop stops polling, waits up to SHUTDOWN_GRACE_SEC for
+tickets already being processed, flushes the producer, commits the final offsets and
+closes the consumer (shared.rebalance.drain_and_close). A second signal exits at once.
+Keep the pod's terminationGracePeriodSeconds above SHUTDOWN_GRACE_SEC so the flush and
+commit still fit.
+"""
+import signal
+import threading
+import time
+
+import structlog  # type: ignore[import-untyped]
+
+from .config import SHUTDOWN_GRACE_SEC
+
+logger = structlog.get_logger(__name__)
+
+_requested = threading.Event()
+_deadline = 0.0
+
+
+def request(reason: str = "requested") -> None:
+    """Ask the consume loop to stop; in-flight work gets SHUTDOWN_GRACE_SEC to finish."""
+    global _deadline
+    if not _requested.is_set():
+        _deadline = time.monotonic() + SHUTDOWN_GRACE_SEC
+        logger.info("Shutdown requested, draining in-flight work", reason=reason, grace_sec=SHUTDOWN_GRACE_SEC)
+        _requested.set()
+
+
+def requested() -> bool:
+    return _requested.is_set()
+
+
+def remaining() -> float:
+    """Seconds left of the grace period (SHUTDOWN_GRACE_SEC if no shutdown was requested)."""
+    if not _requested.is_set():
+        return SHUTDOWN_GRACE_SEC
+    return max(0.0, _deadline - time.monotonic())
+
+
+def reset() -> None:
+    _requested.clear()
+
+
+def _handle(signum, frame) -> None:
+    if _requested.is_set():
+        logger.warning("Second shutdown signal, exiting without draining")
+        raise SystemExit(128 + signum)
+    request(signal.Signals(signum).name)
+
+
+def install() -> None:
+    """Handle SIGTERM and SIGINT by draining (call from the main thread)."""
+    signal.signal(signal.SIGTERM, _handle)
+    signal.signal(signal.SIGINT, _handle)
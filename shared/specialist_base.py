@@ -1,93 +1,212 @@
 """Shared logic for specialist agents: consume ticket.triaged, produce ticket.resolved."""
 import json
+import threading
 import time
+from dataclasses import dataclass
 from datetime import datetime, timezone
 from typing import Callable
 
 import structlog  # type: ignore[import-untyped]
-from confluent_kafka import Consumer, Producer, KafkaError
+from confluent_kafka import Consumer, Producer, KafkaError, KafkaException
 
-from .topics import TOPIC_RESOLVED
-from .guardrails import check_response
+from .topics import TOPIC_RESOLVED, lane_topics
+from .guardrails import GuardrailViolation, apply_guardrails, get_engine
+from .backpressure import PartitionPauser
+from .batch import (
+    BATCH_COST_MULTIPLIER,
+    AnthropicBatchBackend,
+    BatchBackend,
+    BatchResult,
+    DeferredBatcher,
+    DeferredTicket,
+    LocalBatchBackend,
+    OpenAIBatchBackend,
+    request_custom_id,
+)
+from .circuit_breaker import BackendUnavailableError
+from .config import (
+    AUTOSCALING_INTERVAL_SEC,
+    AUTOSCALING_TARGET_DRAIN_SEC,
+    AUTOSCALING_WINDOW_SEC,
+    DEFERRED_BATCH_ENABLED,
+    DEFERRED_PRIORITIES,
+    DEFERRED_BATCH_BACKEND,
+    DEFERRED_BATCH_MODEL,
+    DEFERRED_BATCH_MAX_SIZE,
+    DEFERRED_BATCH_MAX_WAIT_SEC,
+    DEFERRED_POLL_INTERVAL_SEC,
+    FAIRNESS_ENABLED,
+    FAIRNESS_LOOKAHEAD,
+    FAIRNESS_QUANTUM,
+    FAIRNESS_REPORT_INTERVAL_SEC,
+    FAIRNESS_TOP_TALKERS,
+    KB_CONTEXT_MIN_SCORE,
+    KB_DIRECT_MARGIN,
+    KB_DIRECT_MIN_SCORE,
+    KB_SNIPPET_CHARS,
+    KB_TOP_K,
+    PARTIAL_EVENTS_ENABLED,
+    PARTIAL_EVENTS_EVERY_MS,
+    PARTIAL_EVENTS_EVERY_TOKENS,
+    PRIORITY_LANE_LAG_INTERVAL_SEC,
+    PRIORITY_LANE_WEIGHTS,
+    PRIORITY_LANES_ENABLED,
+    RESPONSE_CACHE_ENABLED,
+    RESPONSE_CACHE_MAX_ENTRIES,
+    RESPONSE_CACHE_SIMILARITY,
+    RESPONSE_CACHE_TTL_SEC,
+    RETRY_ENABLED,
+    RETRY_TIERS,
+    SPECIALIST_CONCURRENCY,
+    SPECIALIST_ORDERING_KEY,
+    SPECIALIST_MAX_INFLIGHT,
+    SPECIALIST_MAX_INFLIGHT_BYTES,
+)
+from . import headers, kafka, kb, lanes, partials, shutdown, transactions
+from .autoscaling import ScalingSignal
+from .fairness import FairConsumer
+from .offsets import OffsetTracker
+from .rebalance import RebalanceListener, drain_and_close
+from .parallel_consumer import KeyOrderedDispatcher, ordering_key, wait_for_any_capacity
+from .response_cache import SpecialistResponseCache
+from .retry import RetryPublisher, RetryRecord, parse_tiers, start_retry_scheduler
+from .usage import observe_ticket, record_usage, start_ticket, ticket_summary
 
 
 logger = structlog.get_logger(__name__)
 
+# max_tokens for batch requests; matches the real-time Anthropic calls in the specialists.
+BATCH_MAX_TOKENS = 256
 
-def run_specialist(
+
+def format_ticket_prompt(ticket_id: str, subject: str, body: str, reasoning: str, context: str = "") -> str:
+    """User message sent to the LLM for a triaged ticket (real-time and batch).
+
+    context -> knowledge-base snippets (shared.kb) appended for the model to draw on
+    """
+    prompt = f"Ticket: {ticket_id}\nSubject: {subject}\nTriage reasoning: {reasoning}\nBody:\n{body}"
+    if context:
+        prompt += f"\n\nRelevant help-center articles:\n{context}"
+    return prompt
+
+
+def build_batch_backend(
     agent_name: str,
-    input_topic: str,
-    bootstrap_servers: str,
     generate_response: Callable[[str, str, str, str], str],
-    get_trace_id: Callable[[dict], str],
-    on_processed: Callable[[str, str], None] | None = None,
-) -> None:
-    """
-    Main loop: consume from input_topic (ticket.triaged.*), produce ticket.resolved.
+    backend: str = DEFERRED_BATCH_BACKEND,
+    model: str = DEFERRED_BATCH_MODEL,
+) -> BatchBackend:
+    """Create the batch backend for deferred mode. Unknown providers (e.g. ollama) use the local stand-in."""
+    if backend == "anthropic":
+        return AnthropicBatchBackend(model or "claude-3-5-haiku-20241022")
+    if backend == "openai":
+        return OpenAIBatchBackend(model or "gpt-4o-mini")
+    return LocalBatchBackend(
+        lambda request: generate_response(*request["ticket"]),
+        model=model or f"{agent_name}-local",
+    )
 
-    generate_response(ticket_id, subject, body, reasoning) -> response_text
+
+def _customer_values(value: dict) -> list[str]:
+    """Ticket and customer values a cached response must not contain (it would be customer-specific)."""
+    values = [value.get("ticket_id"), value.get("customer_id")]
+    customer = value.get("customer")
+    if isinstance(customer, dict):
+        values.extend(v for v in customer.values() if isinstance(v, str))
+    return [v for v in values if v]
+
+
+def _store_offsets(consumer: Consumer, tracker: OffsetTracker) -> None:
+    offsets = tracker.committable()
+    if not offsets:
+        return
+    try:
+        consumer.store_offsets(offsets=offsets)
+    except KafkaException as e:
+        # Partitions revoked while a ticket was in flight; the new owner reprocesses it.
+        logger.debug("Could not store offsets", error=str(e))
+
+
+@dataclass
+class SpecialistDefinition:
+    """Everything the consumer runtime needs to host one specialist.
+
+    generate_response(ticket_id, subject, body, reasoning[, context]) -> response_text
+        (context is passed, as a keyword, only when the knowledge base found relevant articles)
     get_trace_id(payload) -> trace_id
     on_processed(ticket_id, response) -> optional callback for metrics
+    system_prompt -> specialist system prompt, used for deferred batch requests
+    concurrency -> worker threads (quota) for this specialist
     """
-    kafka_common = {"bootstrap.servers": bootstrap_servers, "log_level": 4}
-    consumer = Consumer({
-        **kafka_common,
-        "group.id": f"{agent_name}-agent",
-        "auto.offset.reset": "earliest",
-    })
-    producer = Producer(kafka_common)
-    consumer.subscribe([input_topic])
-
-    while True:
-        msg = consumer.poll(timeout=1.0)
-        if msg is None:
-            continue
-        structlog.contextvars.clear_contextvars()
-        structlog.contextvars.bind_contextvars(
-            partition=msg.partition(),
-            offset=msg.offset(),
-        )
-        if msg.error():
-            if msg.error().code() == KafkaError._PARTITION_EOF:
-                continue
-            logger.error("Consumer error", error=str(msg.error()))
-            continue
-        try:
-            value = json.loads(msg.value().decode("utf-8"))
-        except (json.JSONDecodeError, AttributeError) as e:
-            logger.warning("Invalid message value", error=str(e))
-            continue
 
-        event_type = value.get("event_type")
-        ticket_id = value.get("ticket_id")
-        trace_id = get_trace_id(value)
-        structlog.contextvars.bind_contextvars(trace_id=trace_id, ticket_id=ticket_id)
+    name: str
+    input_topic: str
+    generate_response: Callable[[str, str, str, str], str]
+    get_trace_id: Callable[[dict], str]
+    on_processed: Callable[[str, str], None] | None = None
+    system_prompt: str = ""
+    batch_backend: BatchBackend | None = None
+    warm_up: Callable[[], None] | None = None
+    concurrency: int = SPECIALIST_CONCURRENCY
 
-        logger.info("Received message", event_type=event_type)
-        if event_type != "ticket.triaged":
-            continue
 
-        subject = value.get("original_subject", value.get("subject", ""))
-        body = value.get("body", "")
-        reasoning = value.get("reasoning", "")
-        triage_type = value.get("type", "")
+class _Specialist:
+    """Per-specialist message handling, batch results and ticket.resolved production."""
 
-        if not ticket_id:
-            logger.warning("Skipping message missing ticket_id")
-            continue
-
-        start_time = time.perf_counter()
-        try:
-            response_text = generate_response(ticket_id, subject, body, reasoning)
-        except Exception as e:
-            logger.exception("Response generation failed", error=str(e))
-            continue
+    def __init__(
+        self,
+        definition: SpecialistDefinition,
+        producer: Producer,
+        tracker: OffsetTracker,
+        retry: RetryPublisher | None = None,
+        scaling: ScalingSignal | None = None,
+        partials_producer: Producer | None = None,
+    ):
+        self.definition = definition
+        self.name = definition.name
+        self.producer = producer
+        self.partials_producer = partials_producer if partials_producer is not None else producer
+        self.tracker = tracker
+        self.retry = retry
+        self.scaling = scaling
+        self.kb = kb.get_kb()
+        get_engine()  # compile the guardrail rules now, not on the first ticket
+        self.cache: SpecialistResponseCache | None = None
+        if RESPONSE_CACHE_ENABLED:
+            self.cache = SpecialistResponseCache(
+                self.name,
+                definition.system_prompt,
+                max_entries=RESPONSE_CACHE_MAX_ENTRIES,
+                ttl_sec=RESPONSE_CACHE_TTL_SEC,
+                similarity=RESPONSE_CACHE_SIMILARITY,
+            )
+        self.batcher: DeferredBatcher | None = None
+        if DEFERRED_BATCH_ENABLED:
+            self.batcher = DeferredBatcher(
+                self.name,
+                definition.batch_backend or build_batch_backend(self.name, definition.generate_response),
+                self.on_batch_result,
+                max_size=DEFERRED_BATCH_MAX_SIZE,
+                max_wait_sec=DEFERRED_BATCH_MAX_WAIT_SEC,
+                poll_interval_sec=DEFERRED_POLL_INTERVAL_SEC,
+            )
+            if not definition.system_prompt and self.batcher.backend.provider != "local":
+                logger.warning(
+                    "Deferred batch mode without system_prompt; batch requests will have no instructions",
+                    agent=self.name,
+                )
 
+    def produce_resolved(
+        self, value: dict, ticket_id: str, trace_id: str, response_text: str, start_time: float
+    ) -> str | None:
+        """Run guardrails and produce ticket.resolved. Returns the produced (redacted) text, None if rejected."""
+        triage_type = value.get("type", "")
         try:
-            response_text = check_response(response_text)
+            checked = apply_guardrails(response_text, agent=self.name)
         except ValueError as e:
             logger.warning("Response failed policy checks, skipping produce", ticket_id=ticket_id, error=str(e))
-            continue
+            return None
+        response_text = checked.text
 
         resolved = {
             "event_type": "ticket.resolved",
@@ -95,24 +214,497 @@ def run_specialist(
             "customer_id": value.get("customer_id", ""),
             "trace_id": trace_id,
             "triage_type": triage_type,
-            "resolved_by": agent_name,
+            "resolved_by": self.name,
             "resolved_at": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
             "response": response_text,
+            "usage": ticket_summary(),
         }
+        if checked.redacted:
+            resolved["redacted"] = True
+            resolved["redactions"] = checked.redactions
+            logger.info("Redacted PII from response", redactions=checked.redactions)
         if "customer" in value:
             resolved["customer"] = value["customer"]
+        observe_ticket(self.name, triage_type, resolved["usage"])
 
         out_value = json.dumps(resolved).encode("utf-8")
-        headers = [("trace_id", trace_id.encode("utf-8"))]
-        producer.produce(
+        self.producer.produce(
             TOPIC_RESOLVED,
             key=ticket_id.encode("utf-8"),
             value=out_value,
-            headers=headers,
+            headers=headers.event_headers(
+                "ticket.resolved", trace_id, priority=value.get("priority"), customer_id=resolved["customer_id"]
+            ),
             callback=lambda err, _: logger.error("Produce error", error=str(err)) if err else None,
         )
-        producer.flush(timeout=10)
+        self.producer.flush(timeout=10)
         elapsed = time.perf_counter() - start_time
         logger.info("Produced ticket.resolved", ticket_id=ticket_id, elapsed_sec=round(elapsed, 2))
-        if on_processed:
-            on_processed(ticket_id, response_text)
+        if self.definition.on_processed:
+            self.definition.on_processed(ticket_id, response_text)
+        return response_text
+
+    def on_batch_result(self, ticket: DeferredTicket, result: BatchResult) -> None:
+        structlog.contextvars.clear_contextvars()
+        ticket_id = ticket.payload["ticket_id"]
+        structlog.contextvars.bind_contextvars(trace_id=ticket.trace_id, ticket_id=ticket_id, deferred=True)
+        if not self.tracker.is_pending(ticket.topic, ticket.partition, ticket.offset):
+            # Its partition was revoked; the new owner resolves the ticket.
+            logger.info("Partition no longer assigned, dropping deferred result")
+            return
+        if result.text is None:
+            logger.warning("Deferred batch request failed, skipping produce", error=result.error)
+            self._retry_deferred(ticket, "llm_error", result.error or "batch request failed")
+        else:
+            start_ticket()
+            record_usage(
+                self.name,
+                self.batcher.backend.provider,
+                self.batcher.backend.model,
+                result.input_tokens,
+                result.output_tokens,
+                cost_multiplier=BATCH_COST_MULTIPLIER,
+            )
+            produced = self.produce_resolved(ticket.payload, ticket_id, ticket.trace_id, result.text, time.perf_counter())
+            if produced is None:
+                self._retry_deferred(ticket, "guardrail", "response failed policy checks")
+        self.tracker.done(ticket.topic, ticket.partition, ticket.offset)
+
+    def _retry(self, msg, reason: str, error: str) -> None:
+        """Hand a failed ticket to the retry topics (no-op without RETRY_ENABLED: it is skipped)."""
+        if self.retry is not None:
+            self.retry.schedule(msg, reason, error)
+
+    def _retry_deferred(self, ticket: DeferredTicket, reason: str, error: str) -> None:
+        """_retry() for a deferred ticket, whose source message is rebuilt from its payload."""
+        self._retry(
+            RetryRecord(
+                ticket.topic,
+                ticket.payload["ticket_id"].encode("utf-8"),
+                json.dumps(ticket.payload).encode("utf-8"),
+                ticket.headers,
+            ),
+            reason,
+            error,
+        )
+
+    def process(self, msg) -> bool:
+        """handle() plus per-lane latency when priority lanes are enabled and the autoscaling signal."""
+        start = time.perf_counter()
+        finished = self.handle(msg)
+        if PRIORITY_LANES_ENABLED:
+            lanes.observe_latency(self.name, msg)
+        if finished and self.scaling is not None:
+            self.scaling.record(time.perf_counter() - start)
+        return finished
+
+    def handle(self, msg) -> bool:
+        """Process one message. Returns False when the ticket was deferred to a batch."""
+        envelope = headers.read(msg)
+        if envelope.trace_id:
+            structlog.contextvars.bind_contextvars(trace_id=envelope.trace_id)
+        if headers.skip(msg, envelope, "ticket.triaged", self.name):
+            return True
+        try:
+            value = json.loads(msg.value().decode("utf-8"))
+        except (json.JSONDecodeError, AttributeError) as e:
+            logger.warning("Invalid message value", error=str(e))
+            if self.retry is not None:
+                self.retry.dead_letter(msg, "invalid_json", str(e))
+            return True
+
+        event_type = value.get("event_type")
+        ticket_id = value.get("ticket_id")
+        trace_id = envelope.trace_id or self.definition.get_trace_id(value)
+        structlog.contextvars.bind_contextvars(trace_id=trace_id, ticket_id=ticket_id)
+
+        logger.info("Received message", event_type=event_type)
+        if event_type != "ticket.triaged":
+            return True
+
+        subject = value.get("original_subject", value.get("subject", ""))
+        body = value.get("body", "")
+        reasoning = value.get("reasoning", "")
+
+        if not ticket_id:
+            logger.warning("Skipping message missing ticket_id")
+            return True
+
+        triage_type = value.get("type", "")
+        context = ""
+        if self.kb is not None:
+            found = kb.answer(
+                self.kb,
+                self.name,
+                triage_type,
+                subject,
+                body,
+                k=KB_TOP_K,
+                direct_min_score=KB_DIRECT_MIN_SCORE,
+                direct_margin=KB_DIRECT_MARGIN,
+                context_min_score=KB_CONTEXT_MIN_SCORE,
+                snippet_chars=KB_SNIPPET_CHARS,
+            )
+            if found.direct is not None:
+                start_time = time.perf_counter()
+                start_ticket()
+                logger.info("Answering from KB article", article=found.direct.article.id, score=round(found.direct.score, 2))
+                response_text = found.render(ticket_id=ticket_id, subject=subject)
+                if self.produce_resolved(value, ticket_id, trace_id, response_text, start_time) is not None:
+                    partials.TIME_TO_FINAL.labels(agent=self.name).observe(time.perf_counter() - start_time)
+                else:
+                    self._retry(msg, "guardrail", "KB answer failed policy checks")
+                return True
+            context = found.context()
+
+        if self.batcher is not None and value.get("priority") in DEFERRED_PRIORITIES:
+            self.batcher.add(DeferredTicket(
+                request={
+                    "custom_id": request_custom_id(msg.topic(), msg.partition(), msg.offset()),
+                    "system": self.definition.system_prompt,
+                    "user": format_ticket_prompt(ticket_id, subject, body, reasoning, context),
+                    "max_tokens": BATCH_MAX_TOKENS,
+                    "ticket": (ticket_id, subject, body, reasoning) + ((context,) if context else ()),
+                },
+                payload=value,
+                trace_id=trace_id,
+                topic=msg.topic(),
+                partition=msg.partition(),
+                offset=msg.offset(),
+                headers=msg.headers() or [],
+            ))
+            logger.info("Deferred ticket to batch", priority=value.get("priority"))
+            return False
+
+        start_time = time.perf_counter()
+        start_ticket()
+        if self.cache is not None:
+            cached = self.cache.get(triage_type, subject, body)
+            if cached is not None:
+                logger.info("Serving cached response", saved_sec=round(cached.generation_sec, 2))
+                if self.produce_resolved(value, ticket_id, trace_id, cached.response, start_time) is not None:
+                    partials.TIME_TO_FINAL.labels(agent=self.name).observe(time.perf_counter() - start_time)
+                return True
+
+        publisher = None
+        if PARTIAL_EVENTS_ENABLED:
+            publisher = partials.PartialPublisher(
+                self.partials_producer,
+                self.name,
+                ticket_id,
+                trace_id,
+                every_tokens=PARTIAL_EVENTS_EVERY_TOKENS,
+                every_ms=PARTIAL_EVENTS_EVERY_MS,
+            )
+        partials.begin(publisher)
+        try:
+            extra = {"context": context} if context else {}
+            response_text = self.definition.generate_response(ticket_id, subject, body, reasoning, **extra)
+        except BackendUnavailableError:
+            # The ticket is redelivered after the rewind; drop the drafts of this attempt.
+            if publisher is not None:
+                publisher.abort()
+            raise
+        except GuardrailViolation as e:
+            # Raised mid-stream, so the rest of the response was never generated.
+            logger.warning("Response failed policy checks during generation, skipping produce", error=str(e))
+            if publisher is not None:
+                publisher.abort()
+            self._retry(msg, "guardrail", str(e))
+            return True
+        except Exception as e:
+            logger.exception("Response generation failed", error=str(e))
+            if publisher is not None:
+                publisher.abort()
+            self._retry(msg, "llm_error", str(e))
+            return True
+        finally:
+            partials.begin(None)
+        generation_sec = time.perf_counter() - start_time
+
+        produced = self.produce_resolved(value, ticket_id, trace_id, response_text, start_time)
+        if produced is not None:
+            partials.TIME_TO_FINAL.labels(agent=self.name).observe(time.perf_counter() - start_time)
+            if self.cache is not None:
+                # Cache what customers saw: the redacted text, checked for customer values.
+                self.cache.put(triage_type, subject, body, produced, generation_sec, sensitive=_customer_values(value))
+        else:
+            if publisher is not None:
+                publisher.abort()
+            self._retry(msg, "guardrail", "response failed policy checks")
+        return True
+
+
+def run_specialist(
+    agent_name: str,
+    input_topic: str,
+    bootstrap_servers: str,
+    generate_response: Callable[[str, str, str, str], str],
+    get_trace_id: Callable[[dict], str],
+    on_processed: Callable[[str, str], None] | None = None,
+    system_prompt: str = "",
+    batch_backend: BatchBackend | None = None,
+) -> None:
+    """
+    Main loop: consume from input_topic (ticket.triaged.*), produce ticket.resolved.
+
+    generate_response(ticket_id, subject, body, reasoning) -> response_text
+    get_trace_id(payload) -> trace_id
+    on_processed(ticket_id, response) -> optional callback for metrics
+    system_prompt -> specialist system prompt, used for deferred batch requests
+
+    When generate_response raises BackendUnavailableError the consumer rewinds to the
+    message (and pauses while the backend's circuit is open) instead of skipping it.
+
+    With SPECIALIST_CONCURRENCY > 1, messages are processed by a key-ordered worker pool
+    (shared.parallel_consumer); offsets are stored only for contiguous completed ranges.
+
+    With DEFERRED_BATCH_ENABLED, tickets whose priority is in DEFERRED_PRIORITIES are
+    resolved through a provider batch job; their offsets are stored only after the
+    batch results have been produced.
+
+    With PRIORITY_LANES_ENABLED, the priority lane topics of input_topic
+    (input_topic.p0..p3) are consumed as well, with weighted fair polling (shared.lanes).
+
+    With RETRY_ENABLED, tickets whose generation fails or whose response fails the
+    guardrails go to input_topic.retry.<tier> and are redelivered later (shared.retry);
+    after the last tier they go to input_topic.dlq.
+    """
+    run_specialists(
+        [SpecialistDefinition(
+            name=agent_name,
+            input_topic=input_topic,
+            generate_response=generate_response,
+            get_trace_id=get_trace_id,
+            on_processed=on_processed,
+            system_prompt=system_prompt,
+            batch_backend=batch_backend,
+        )],
+        bootstrap_servers,
+    )
+
+
+def run_specialists(
+    definitions: list[SpecialistDefinition],
+    bootstrap_servers: str,
+    group_id: str | None = None,
+    agent_label: str | None = None,
+) -> None:
+    """
+    Host one or more specialists on a single consumer and producer.
+
+    Messages are dispatched by topic. With one specialist at concurrency 1 they are
+    processed inline on the poll loop; otherwise each specialist gets its own key-ordered
+    worker pool sized by its concurrency quota, and a specialist at its in-flight limit has
+    its topic paused without holding back the others.
+
+    group_id defaults to "<name>-agent" for a single specialist and "specialists-agent"
+    for a shared host.
+
+    With PRIORITY_LANES_ENABLED each specialist also consumes its priority lane topics,
+    which share PRIORITY_LANE_WEIGHTS-weighted polling rounds.
+
+    With FAIRNESS_ENABLED, polled messages are handed out by deficit round robin over
+    customers (shared.fairness), so one customer's burst cannot starve the others.
+
+    With KAFKA_PROFILE=exactly-once, ticket.resolved events and consumed offsets are
+    committed together in transactions of up to KAFKA_TRANSACTION_MAX_MESSAGES tickets
+    (shared.transactions); this needs a single specialist at concurrency 1.
+    """
+    if not definitions:
+        raise ValueError("At least one specialist definition is required")
+    topics = [d.input_topic for d in definitions]
+    if len(set(topics)) != len(topics):
+        raise ValueError(f"Specialists must consume distinct topics, got {topics}")
+    single = len(definitions) == 1
+    label = agent_label or (definitions[0].name if single else "specialists")
+
+    consumer_group = group_id or (f"{definitions[0].name}-agent" if single else "specialists-agent")
+    transactions.check_supported(
+        label,
+        FAIRNESS_ENABLED=FAIRNESS_ENABLED,
+        DEFERRED_BATCH_ENABLED=DEFERRED_BATCH_ENABLED,
+        parallel_workers=not single or definitions[0].concurrency > 1,
+    )
+    consumer = kafka.create_consumer(
+        bootstrap_servers, consumer_group, settings=transactions.consumer_settings(), agent=label
+    )
+    if FAIRNESS_ENABLED:
+        consumer = FairConsumer(
+            consumer,
+            label,
+            quantum=FAIRNESS_QUANTUM,
+            lookahead=FAIRNESS_LOOKAHEAD,
+            top_talkers=FAIRNESS_TOP_TALKERS,
+            report_interval_sec=FAIRNESS_REPORT_INTERVAL_SEC,
+        )
+    producer = kafka.create_producer(
+        bootstrap_servers, settings=transactions.producer_settings(consumer_group), agent=label
+    )
+    # Subscribed topic -> the input_topic of the specialist handling it.
+    routes = {
+        topic: d.input_topic
+        for d in definitions
+        for topic in ([d.input_topic, *lane_topics(d.input_topic)] if PRIORITY_LANES_ENABLED else [d.input_topic])
+    }
+    pauser = PartitionPauser(label)
+    tracker = OffsetTracker()
+    # Retry redelivery (its own thread) and partial drafts (visible before the ticket commits)
+    # are produced outside the loop's transactions.
+    side_producer = producer
+    batch: transactions.TransactionBatch | None = None
+    if transactions.enabled():
+        batch = transactions.TransactionBatch(label, consumer, producer, tracker=tracker)
+        consumer, producer = batch.consumer, batch.producer
+        side_producer = kafka.create_producer(bootstrap_servers, agent=label)
+    tiers = parse_tiers(RETRY_TIERS) if RETRY_ENABLED else []
+    scaling = ScalingSignal(
+        label,
+        workers=sum(d.concurrency for d in definitions),
+        target_drain_sec=AUTOSCALING_TARGET_DRAIN_SEC,
+        window_sec=AUTOSCALING_WINDOW_SEC,
+        interval_sec=AUTOSCALING_INTERVAL_SEC,
+    )
+    specialists = {
+        d.input_topic: _Specialist(
+            d,
+            producer,
+            tracker,
+            RetryPublisher(d.name, producer, tiers) if RETRY_ENABLED else None,
+            scaling,
+            partials_producer=side_producer,
+        )
+        for d in definitions
+    }
+    retry_scheduler = None
+    if RETRY_ENABLED:
+        retry_scheduler = start_retry_scheduler(
+            label,
+            bootstrap_servers,
+            topics,
+            tiers,
+            side_producer,
+            group_id=f"{consumer_group}-retry",
+        )
+    scheduler: lanes.LaneScheduler | None = None
+    lag_reporter: lanes.LaneLagReporter | None = None
+    if PRIORITY_LANES_ENABLED:
+        scheduler = lanes.LaneScheduler(label, list(routes), PRIORITY_LANE_WEIGHTS)
+        lag_reporter = lanes.LaneLagReporter(
+            {topic: specialists[base].name for topic, base in routes.items()},
+            interval_sec=PRIORITY_LANE_LAG_INTERVAL_SEC,
+        )
+        logger.info("Priority lanes enabled", topics=list(routes), weights=PRIORITY_LANE_WEIGHTS)
+    batchers = [sp.batcher for sp in specialists.values() if sp.batcher is not None]
+
+    dispatchers: dict[str, KeyOrderedDispatcher] = {}
+    capacity = threading.Condition()
+    if not single or definitions[0].concurrency > 1:
+        for topic, sp in specialists.items():
+            dispatchers[topic] = KeyOrderedDispatcher(
+                sp.name,
+                sp.process,
+                tracker,
+                max_workers=sp.definition.concurrency,
+                max_inflight=SPECIALIST_MAX_INFLIGHT,
+                max_inflight_bytes=SPECIALIST_MAX_INFLIGHT_BYTES,
+                key_fn=lambda m: ordering_key(m, SPECIALIST_ORDERING_KEY),
+                condition=capacity,
+            )
+        logger.info(
+            "Parallel consumer enabled",
+            quotas={sp.name: sp.definition.concurrency for sp in specialists.values()},
+            ordering_key=SPECIALIST_ORDERING_KEY,
+        )
+    throttled: set[str] = set()
+
+    def rewind(msg, error: BackendUnavailableError) -> None:
+        logger.warning("LLM backend unavailable, rewinding to retry ticket", error=str(error))
+        pauser.rewind(consumer, msg, error.breaker)
+
+    def throttle() -> bool:
+        """Pause topics of specialists at their in-flight limit. Returns True if all are."""
+        saturated_specialists = {base for base, d in dispatchers.items() if d.saturated()}
+        if len(dispatchers) > 1:
+            saturated = {topic for topic, base in routes.items() if base in saturated_specialists}
+            assignment = consumer.assignment()
+            if saturated:
+                # Re-applied every pass so partitions gained in a rebalance stay paused too.
+                consumer.pause([tp for tp in assignment if tp.topic in saturated])
+            freed = throttled - saturated
+            if freed and not pauser.paused:
+                # Lanes that used up their share stay paused until the scheduler's next round.
+                lane_paused = scheduler.paused if scheduler is not None else set()
+                consumer.resume([tp for tp in assignment if tp.topic in freed - lane_paused])
+                throttled.difference_update(freed)
+            throttled.update(saturated)
+        return len(saturated_specialists) == len(dispatchers)
+
+    # A revocation waits for the revoked partitions' workers, then commits what they finished.
+    # Deferred tickets of revoked partitions are dropped; the new owner resolves them.
+    RebalanceListener(
+        label, tracker, capacity if dispatchers else None, transaction=batch, batchers=batchers
+    ).subscribe(consumer, list(routes))
+
+    while not shutdown.requested():
+        if batch is not None:
+            batch.maybe_commit()
+        for batcher in batchers:
+            batcher.tick()
+        if dispatchers:
+            # Seek each partition back to its lowest failed offset (workers never touch the consumer).
+            earliest: dict[tuple[str, int], tuple] = {}
+            for dispatcher in dispatchers.values():
+                for failed, error in dispatcher.failures():
+                    tp = (failed.topic(), failed.partition())
+                    if tp not in earliest or failed.offset() < earliest[tp][0].offset():
+                        earliest[tp] = (failed, error)
+            for failed, error in earliest.values():
+                rewind(failed, error)
+        if batchers or dispatchers:
+            _store_offsets(consumer, tracker)
+        pauser.maybe_resume(consumer)
+        scaling.maybe_update(consumer)
+        if scheduler is not None:
+            scheduler.apply(consumer)
+            lag_reporter.maybe_update(consumer)
+        if dispatchers and throttle():
+            wait_for_any_capacity(list(dispatchers.values()), timeout=1.0)
+            continue
+        msg = consumer.poll(timeout=scheduler.poll_timeout(1.0) if scheduler is not None else 1.0)
+        if msg is None:
+            if scheduler is not None and not pauser.paused:
+                scheduler.on_idle(consumer, keep_paused=throttled)
+            continue
+        structlog.contextvars.clear_contextvars()
+        structlog.contextvars.bind_contextvars(
+            partition=msg.partition(),
+            offset=msg.offset(),
+        )
+        if msg.error():
+            if msg.error().code() == KafkaError._PARTITION_EOF:
+                continue
+            logger.error("Consumer error", error=str(msg.error()))
+            continue
+        base = routes.get(msg.topic())
+        if base is None:
+            logger.warning("Message from unexpected topic", topic=msg.topic())
+            continue
+        specialist = specialists[base]
+        if scheduler is not None:
+            lanes.LANE_MESSAGES.labels(agent=specialist.name, lane=lanes.lane_label(msg.topic())).inc()
+            scheduler.on_message(consumer, msg.topic(), keep_paused=throttled)
+        tracker.begin(msg.topic(), msg.partition(), msg.offset())
+        if dispatchers:
+            dispatchers[base].submit(msg)
+            continue
+        try:
+            finished = specialist.process(msg)
+        except BackendUnavailableError as e:
+            tracker.discard(msg.topic(), msg.partition(), msg.offset())
+            rewind(msg, e)
+            continue
+        if finished:
+            tracker.done(msg.topic(), msg.partition(), msg.offset())
+        _store_offsets(consumer, tracker)
+    drain_and_close(label, consumer, producer, tracker, dispatchers.values(), retry_scheduler, batch)
@@ -0,0 +1,124 @@
+"""Streaming specialist generation with incremental guardrails.
+
+Responses are read chunk by chunk through a StreamingGuard. A forbidden phrase or PII
+closes the stream immediately and raises GuardrailViolation; reaching MAX_RESPONSE_LENGTH
+closes it and returns the truncated text. Output tokens the model would still have been
+allowed to generate are counted as saved. The checked prefix of the draft is offered to the
+ticket's partial-event publisher (shared.partials) as it grows.
+"""
+from typing import Any, Iterator
+
+import structlog  # type: ignore[import-untyped]
+from prometheus_client import Counter  # type: ignore[import-untyped]
+
+from .guardrails import MAX_RESPONSE_LENGTH, GuardrailViolation, StreamingGuard
+from .partials import publish_draft
+from .usage import estimate_tokens, record_usage
+
+logger = structlog.get_logger(__name__)
+
+GUARDRAIL_STREAM_STOPS = Counter(
+    "guardrail_stream_stops_total",
+    "Streams closed early by the incremental guardrail (reason: pii, forbidden, length)",
+    ["agent", "reason"],
+)
+GUARDRAIL_TOKENS_SAVED = Counter(
+    "guardrail_tokens_saved_total",
+    "Estimated output tokens not generated because a stream was closed early",
+    ["agent", "reason"],
+)
+
+
+def _guarded(agent: str, chunks: Iterator[str], guard: StreamingGuard, max_tokens: int | None) -> tuple[str, str | None]:
+    """Feed chunks to guard. Returns (text so far, stop reason or None); reraises violations after counting them."""
+    budget = max_tokens or estimate_tokens("x" * MAX_RESPONSE_LENGTH)
+    try:
+        for chunk in chunks:
+            if not chunk:
+                continue
+            if not guard.feed(chunk):
+                reason = "length"
+                break
+            publish_draft(guard.safe_text)
+        else:
+            return guard.text, None
+    except GuardrailViolation as e:
+        reason = e.policy
+        _count_stop(agent, reason, budget, guard.text)
+        logger.warning("Stopped streaming response on guardrail violation", policy=reason)
+        raise
+    _count_stop(agent, reason, budget, guard.text)
+    logger.info("Stopped streaming response at length limit", chars=len(guard.text))
+    return guard.text, reason
+
+
+def _count_stop(agent: str, reason: str, budget: int, text: str) -> None:
+    GUARDRAIL_STREAM_STOPS.labels(agent=agent, reason=reason).inc()
+    GUARDRAIL_TOKENS_SAVED.labels(agent=agent, reason=reason).inc(max(0, budget - estimate_tokens(text)))
+
+
+def stream_openai(
+    agent: str,
+    provider: str,
+    client: Any,
+    model: str,
+    system: str,
+    user: str,
+    temperature: float,
+    max_tokens: int | None = None,
+) -> str:
+    """Stream an OpenAI-compatible chat completion (OpenAI, Ollama) through the guardrails."""
+    kwargs: dict[str, Any] = {}
+    if max_tokens:
+        kwargs["max_tokens"] = max_tokens
+    guard = StreamingGuard()
+    usage: list[Any] = []
+
+    def chunks(stream) -> Iterator[str]:
+        for event in stream:
+            if getattr(event, "usage", None):
+                usage.append(event.usage)
+            if event.choices:
+                yield event.choices[0].delta.content or ""
+
+    with client.chat.completions.create(
+        model=model,
+        messages=[{"role": "system", "content": system}, {"role": "user", "content": user}],
+        temperature=temperature,
+        stream=True,
+        stream_options={"include_usage": True},
+        **kwargs,
+    ) as stream:
+        try:
+            text, stopped = _guarded(agent, chunks(stream), guard, max_tokens)
+        except GuardrailViolation:
+            record_usage(agent, provider, model, estimate_tokens(system + user), estimate_tokens(guard.text), estimated=True)
+            raise
+    if usage and not stopped:
+        record_usage(agent, provider, model, int(usage[-1].prompt_tokens), int(usage[-1].completion_tokens))
+    else:
+        record_usage(agent, provider, model, estimate_tokens(system + user), estimate_tokens(text), estimated=True)
+    return guard.finish()
+
+
+def stream_anthropic(agent: str, client: Any, model: str, system: str, user: str, max_tokens: int) -> str:
+    """Stream an Anthropic Messages response through the guardrails."""
+    guard = StreamingGuard()
+    with client.messages.stream(
+        model=model,
+        max_tokens=max_tokens,
+        system=system,
+        messages=[{"role": "user", "content": user}],
+    ) as stream:
+        try:
+            text, stopped = _guarded(agent, stream.text_stream, guard, max_tokens)
+        except GuardrailViolation:
+            record_usage(agent, "anthropic", model, estimate_tokens(system + user), estimate_tokens(guard.text), estimated=True)
+            raise
+        final = None if stopped else stream.get_final_message()
+    usage = getattr(final, "usage", None)
+    if usage is not None:
+        record_usage(agent, "anthropic", model, int(usage.input_tokens), int(usage.output_tokens))
+    else:
+        record_usage(agent, "anthropic", model, estimate_tokens(system + user), estimate_tokens(text), estimated=True)
+    return guard.finish()
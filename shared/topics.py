@@ -14,17 +14,61 @@ TOPIC_TRIAGED_HUMAN = "ticket.triaged.human"
 
 # Resolved output: specialist agents produce here
 TOPIC_RESOLVED = "ticket.resolved"
+# Opt-in draft-so-far events while a specialist is still generating (agent-assist UI)
+TOPIC_RESOLUTION_PARTIAL = "ticket.resolution.partial"
 
 
-def topic_for_triage_type(triage_type: str, route_to_human: bool = False) -> str:
+# Priority lanes: with PRIORITY_LANES_ENABLED, triage appends the lane for the ticket's
+# priority to the type topic (ticket.triaged.billing.p0). The human queue has no lanes.
+PRIORITY_LANES = {"critical": "p0", "high": "p1", "medium": "p2", "low": "p3"}
+LANES = ("p0", "p1", "p2", "p3")
+DEFAULT_LANE = "p2"
+LANED_TOPICS = (
+    TOPIC_TRIAGED_BILLING,
+    TOPIC_TRIAGED_TECHNICAL,
+    TOPIC_TRIAGED_FEATURE_REQUEST,
+    TOPIC_TRIAGED_ACCOUNT,
+    TOPIC_TRIAGED_OTHER,
+)
+
+
+def lane_topics(topic: str) -> list[str]:
+    """Priority lane topics for a type topic, highest priority first."""
+    return [f"{topic}.{lane}" for lane in LANES]
+
+
+def lane_of(topic: str) -> str:
+    """Lane of a triaged topic ("p0".."p3"), or "" for an unlaned topic."""
+    suffix = topic.rsplit(".", 1)[-1]
+    return suffix if suffix in LANES else ""
+
+
+def base_topic(topic: str) -> str:
+    """Topic without its priority lane suffix."""
+    return topic.rsplit(".", 1)[0] if lane_of(topic) else topic
+
+
+def retry_topic(topic: str, tier: str) -> str:
+    """Retry tier topic for an input topic, e.g. ticket.triaged.billing.retry.30s (lanes share one)."""
+    return f"{base_topic(topic)}.retry.{tier}"
+
+
+def dlq_topic(topic: str) -> str:
+    """Dead-letter topic for an input topic, e.g. ticket.triaged.billing.dlq."""
+    return f"{base_topic(topic)}.dlq"
+
+
+def topic_for_triage_type(triage_type: str, route_to_human: bool = False, priority: str | None = None) -> str:
     """Return the Kafka topic for a triage type. Used by triage agent.
 
     When route_to_human is True (low confidence or needs review), always use human queue.
     Unknown types (not in known set) map to human queue instead of being dropped.
+    When priority is given, the topic of its lane is returned (unknown priorities use
+    DEFAULT_LANE).
     """
     if route_to_human:
         return TOPIC_TRIAGED_HUMAN
-    return {
+    topic = {
         "billing": TOPIC_TRIAGED_BILLING,
         "technical": TOPIC_TRIAGED_TECHNICAL,
         "feature_request": TOPIC_TRIAGED_FEATURE_REQUEST,
@@ -32,3 +76,6 @@ def topic_for_triage_type(triage_type: str, route_to_human: bool = False) -> str
         "other": TOPIC_TRIAGED_OTHER,
         "unknown": TOPIC_TRIAGED_HUMAN,
     }.get(triage_type, TOPIC_TRIAGED_HUMAN)
+    if priority is None or topic == TOPIC_TRIAGED_HUMAN:
+        return topic
+    return f"{topic}.{PRIORITY_LANES.get(priority, DEFAULT_LANE)}"
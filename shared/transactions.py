@@ -0,0 +1,247 @@
+"""Exactly-once processing: consumed offsets and produced events committed in one transaction.
+
+With KAFKA_PROFILE=exactly-once the triage and specialist loops run a transactional
+producer (transactional.id = <consumer group>-<pod>). Everything a ticket produces
+(ticket.triaged / ticket.resolved, retry and dead-letter events) goes into the open
+transaction, and the offsets the loop would have stored are sent to the same transaction
+(send_offsets_to_transaction). Output and consumer position commit atomically: after a
+crash either both are visible or neither, so read_committed consumers downstream never
+see a ticket twice and no ticket is lost.
+
+A commit costs a few broker round trips, so one transaction spans up to
+KAFKA_TRANSACTION_MAX_MESSAGES consumed messages or KAFKA_TRANSACTION_MAX_MS, whichever
+comes first (scripts/bench-transactions.py measures throughput against batch size). The
+loops' per-ticket producer.flush() calls no longer wait for delivery; commit_transaction()
+flushes. Downstream sees a ticket's output when its transaction commits, so the window
+adds up to KAFKA_TRANSACTION_MAX_MS of latency.
+
+Partial drafts (ticket.resolution.partial) are produced outside the transaction, on a
+separate non-transactional producer, so they still stream while the ticket is generated;
+they are previews, and a redelivered ticket publishes them again. Retry redelivery,
+which runs on its own thread, uses that producer as well.
+
+The guarantee needs tickets to finish in offset order, so the mode refuses to start with
+parallel workers (SPECIALIST_CONCURRENCY > 1, the specialist host), deferred batches or
+fairness reordering. A commit error that requires an abort rolls the transaction back and
+seeks its partitions to the last committed offsets, so the batch is processed again; a
+fatal error (e.g. the producer was fenced by a newer instance) is raised.
+"""
+import socket
+import time
+from typing import Callable, Iterable
+
+import structlog  # type: ignore[import-untyped]
+from confluent_kafka import OFFSET_BEGINNING, KafkaException, TopicPartition
+from prometheus_client import Counter, Histogram  # type: ignore[import-untyped]
+
+from .config import KAFKA_PROFILE, KAFKA_TRANSACTION_MAX_MESSAGES, KAFKA_TRANSACTION_MAX_MS, POD_NAME
+
+logger = structlog.get_logger(__name__)
+
+TRANSACTIONS = Counter(
+    "kafka_transactions_total",
+    "Transactions by outcome (committed, aborted)",
+    ["agent", "outcome"],
+)
+TRANSACTION_MESSAGES = Histogram(
+    "kafka_transaction_messages",
+    "Consumed messages whose offsets were committed per transaction",
+    ["agent"],
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500, 1000),
+)
+TRANSACTION_COMMIT_SECONDS = Histogram(
+    "kafka_transaction_commit_seconds",
+    "Time to send the offsets and commit one transaction",
+    ["agent"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+
+# Timeout for transactional API calls (init, send offsets, commit, abort).
+_TIMEOUT_SEC = 30.0
+_COMMIT_ATTEMPTS = 3
+
+
+def enabled() -> bool:
+    return KAFKA_PROFILE == "exactly-once"
+
+
+def transactional_id(group_id: str) -> str:
+    """One id per consumer group member, stable across restarts of the same pod."""
+    return f"{group_id}-{POD_NAME or socket.gethostname()}"
+
+
+def producer_settings(group_id: str) -> dict | None:
+    """Producer settings for a loop consuming as group_id (None unless exactly-once is on)."""
+    return {"transactional.id": transactional_id(group_id)} if enabled() else None
+
+
+def consumer_settings() -> dict | None:
+    """Consumer settings for the loops: offsets are committed by the transactions, never by the consumer."""
+    return {"enable.auto.commit": False} if enabled() else None
+
+
+def check_supported(agent: str, **features: bool) -> None:
+    """Raise ValueError if exactly-once mode is on together with out-of-order processing features."""
+    conflicting = sorted(name for name, on in features.items() if on)
+    if enabled() and conflicting:
+        raise ValueError(
+            f"{agent}: KAFKA_PROFILE=exactly-once needs tickets processed in offset order; "
+            f"disable {', '.join(conflicting)}"
+        )
+
+
+class TransactionBatch:
+    """Groups one loop's tickets into transactions of up to max_messages or max_ms.
+
+    The loop uses self.consumer and self.producer in place of its clients and calls
+    maybe_commit() every pass. tracker, if given, forgets the partitions of an aborted
+    transaction, since their offsets are processed again.
+    """
+
+    def __init__(
+        self,
+        agent: str,
+        consumer,
+        producer,
+        max_messages: int = KAFKA_TRANSACTION_MAX_MESSAGES,
+        max_ms: int = KAFKA_TRANSACTION_MAX_MS,
+        tracker=None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.agent = agent
+        self.max_messages = max(1, max_messages)
+        self.max_sec = max_ms / 1000
+        self.tracker = tracker
+        self.clock = clock
+        self._consumer = consumer
+        self._producer = producer
+        self._positions: dict[tuple[str, int], int] = {}
+        self._messages = 0
+        self._opened: float | None = None
+        producer.init_transactions(_TIMEOUT_SEC)
+        self.consumer = TransactionalConsumer(consumer, self)
+        self.producer = TransactionalProducer(producer, self)
+
+    @property
+    def open(self) -> bool:
+        return self._opened is not None
+
+    def begin(self) -> None:
+        if self._opened is None:
+            self._producer.begin_transaction()
+            self._opened = self.clock()
+
+    def record(self, offsets: Iterable[TopicPartition]) -> None:
+        """Commit these positions (next offset to consume) with the open transaction."""
+        for tp in offsets:
+            self.begin()
+            self._positions[(tp.topic, tp.partition)] = tp.offset
+            self._messages += 1
+
+    def maybe_commit(self) -> bool:
+        """Commit once the transaction holds max_messages or has been open for max_ms."""
+        if self._opened is None:
+            return False
+        if self._messages < self.max_messages and self.clock() - self._opened < self.max_sec:
+            return False
+        return self.commit()
+
+    def commit(self) -> bool:
+        """Commit the open transaction with its offsets. Returns False if it had to be aborted."""
+        if self._opened is None:
+            return True
+        start = time.perf_counter()
+        offsets = [TopicPartition(topic, partition, offset) for (topic, partition), offset in self._positions.items()]
+        try:
+            if offsets:
+                self._producer.send_offsets_to_transaction(
+                    offsets, self._consumer.consumer_group_metadata(), _TIMEOUT_SEC
+                )
+            self._commit_transaction()
+        except KafkaException as e:
+            if not e.args[0].txn_requires_abort():
+                raise
+            logger.warning("Transaction failed, aborting and reprocessing its messages", error=str(e))
+            self.abort()
+            return False
+        TRANSACTION_COMMIT_SECONDS.labels(agent=self.agent).observe(time.perf_counter() - start)
+        TRANSACTION_MESSAGES.labels(agent=self.agent).observe(self._messages)
+        TRANSACTIONS.labels(agent=self.agent, outcome="committed").inc()
+        self._reset()
+        return True
+
+    def abort(self) -> None:
+        """Abort the open transaction and seek its partitions back to the last committed offsets."""
+        if self._opened is None:
+            return
+        self._producer.abort_transaction(_TIMEOUT_SEC)
+        TRANSACTIONS.labels(agent=self.agent, outcome="aborted").inc()
+        partitions = [TopicPartition(topic, partition) for topic, partition in self._positions]
+        self._reset()
+        if partitions:
+            self._rewind(partitions)
+
+    def _commit_transaction(self) -> None:
+        for attempt in range(1, _COMMIT_ATTEMPTS + 1):
+            try:
+                self._producer.commit_transaction(_TIMEOUT_SEC)
+                return
+            except KafkaException as e:
+                if not e.args[0].retriable() or attempt == _COMMIT_ATTEMPTS:
+                    raise
+                logger.info("Retrying transaction commit", attempt=attempt, error=str(e))
+
+    def _rewind(self, partitions: list[TopicPartition]) -> None:
+        for tp in self._consumer.committed(partitions, timeout=_TIMEOUT_SEC):
+            if self.tracker is not None:
+                self.tracker.drop_partition(tp.topic, tp.partition)
+            offset = tp.offset if tp.offset >= 0 else OFFSET_BEGINNING
+            try:
+                self._consumer.seek(TopicPartition(tp.topic, tp.partition, offset))
+            except KafkaException as e:
+                # Lost or revoked: the new owner starts from the committed offset anyway.
+                logger.debug("Could not rewind partition", topic=tp.topic, partition=tp.partition, error=str(e))
+
+    def _reset(self) -> None:
+        self._positions = {}
+        self._messages = 0
+        self._opened = None
+
+
+class TransactionalProducer:
+    """Producer wrapper: produce() joins the open transaction; other methods pass through."""
+
+    def __init__(self, producer, batch: TransactionBatch):
+        self._producer = producer
+        self._batch = batch
+
+    def __getattr__(self, name):
+        return getattr(self._producer, name)
+
+    def __len__(self) -> int:
+        return len(self._producer)
+
+    def produce(self, *args, **kwargs) -> None:
+        self._batch.begin()
+        self._producer.produce(*args, **kwargs)
+
+    def flush(self, timeout: float | None = None) -> int:
+        """Serve delivery callbacks without waiting: commit_transaction() flushes. Returns messages queued."""
+        self._producer.poll(0)
+        return len(self._producer)
+
+
+class TransactionalConsumer:
+    """Consumer wrapper: store_offsets() adds the positions to the open transaction instead."""
+
+    def __init__(self, consumer, batch: TransactionBatch):
+        self._consumer = consumer
+        self._batch = batch
+
+    def __getattr__(self, name):
+        return getattr(self._consumer, name)
+
+    def store_offsets(self, message=None, offsets=None) -> None:
+        if message is not None:
+            offsets = [TopicPartition(message.topic(), message.partition(), message.offset() + 1)]
+        self._batch.record(offsets or [])
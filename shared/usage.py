@@ -0,0 +1,206 @@
+"""LLM token usage, cost accounting and hourly budget.
+
+Every LLM call records provider-reported usage (or a character-based estimate when the
+provider does not report it) via record_usage(). Usage goes to Prometheus counters and
+into a per-ticket accumulator that agents attach to ticket.triaged / ticket.resolved.
+"""
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Any
+
+from prometheus_client import Counter  # type: ignore[import-untyped]
+
+from .config import (
+    LLM_PRICING,
+    LLM_HOURLY_TOKEN_BUDGET,
+    LLM_HOURLY_COST_BUDGET_USD,
+    LLM_BUDGET_SOFT_LIMIT,
+    LLM_BUDGET_FALLBACK_PROVIDER,
+)
+
+LLM_TOKENS = Counter(
+    "llm_tokens_total",
+    "LLM tokens consumed (type: input, output)",
+    ["agent", "provider", "model", "type"],
+)
+LLM_COST_USD = Counter(
+    "llm_cost_usd_total",
+    "Estimated LLM cost in USD",
+    ["agent", "provider", "model"],
+)
+LLM_TICKET_COST_USD = Counter(
+    "llm_ticket_cost_usd_total",
+    "Estimated LLM cost in USD per ticket type",
+    ["agent", "ticket_type"],
+)
+LLM_BUDGET_DOWNGRADES = Counter(
+    "llm_budget_downgrades_total",
+    "LLM calls shifted to the fallback provider because the hourly budget is nearly exhausted",
+    ["agent", "from_provider", "to_provider"],
+)
+
+# Rough chars-per-token ratio for English text; used when the provider reports no usage.
+_CHARS_PER_TOKEN = 4
+
+_ticket_calls: ContextVar[list[dict] | None] = ContextVar("ticket_llm_calls", default=None)
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate token count from text length (at least 1 for non-empty text)."""
+    if not text:
+        return 0
+    return max(1, len(text) // _CHARS_PER_TOKEN)
+
+
+def estimate_cost(model: str, input_tokens: int, output_tokens: int) -> float:
+    """Return estimated cost in USD from LLM_PRICING (per 1M tokens). Unknown models cost 0."""
+    price = LLM_PRICING.get(model)
+    if not price:
+        return 0.0
+    return (input_tokens * price.get("input", 0.0) + output_tokens * price.get("output", 0.0)) / 1_000_000
+
+
+class HourlyBudget:
+    """Sliding one-hour window of token and cost spend for this process."""
+
+    def __init__(
+        self,
+        max_tokens: int = 0,
+        max_cost_usd: float = 0.0,
+        soft_limit: float = 0.9,
+        window_sec: float = 3600.0,
+        clock=time.monotonic,
+    ):
+        self.max_tokens = max_tokens
+        self.max_cost_usd = max_cost_usd
+        self.soft_limit = soft_limit
+        self.window_sec = window_sec
+        self._clock = clock
+        self._entries: deque[tuple[float, int, float]] = deque()
+        self._tokens = 0
+        self._cost = 0.0
+        self._lock = threading.Lock()
+
+    def _prune(self, now: float) -> None:
+        cutoff = now - self.window_sec
+        while self._entries and self._entries[0][0] < cutoff:
+            _, tokens, cost = self._entries.popleft()
+            self._tokens -= tokens
+            self._cost -= cost
+
+    def add(self, tokens: int, cost_usd: float) -> None:
+        with self._lock:
+            now = self._clock()
+            self._prune(now)
+            self._entries.append((now, tokens, cost_usd))
+            self._tokens += tokens
+            self._cost += cost_usd
+
+    def utilization(self) -> float:
+        """Highest fraction used across the token and cost budgets (0 when unlimited)."""
+        with self._lock:
+            self._prune(self._clock())
+            used = 0.0
+            if self.max_tokens > 0:
+                used = max(used, self._tokens / self.max_tokens)
+            if self.max_cost_usd > 0:
+                used = max(used, self._cost / self.max_cost_usd)
+            return used
+
+    def near_exhaustion(self) -> bool:
+        return self.utilization() >= self.soft_limit
+
+
+BUDGET = HourlyBudget(
+    max_tokens=LLM_HOURLY_TOKEN_BUDGET,
+    max_cost_usd=LLM_HOURLY_COST_BUDGET_USD,
+    soft_limit=LLM_BUDGET_SOFT_LIMIT,
+)
+
+
+def select_provider(agent: str, provider: str) -> str:
+    """Return the provider to use for the next call.
+
+    When the hourly budget is close to exhaustion, shift to LLM_BUDGET_FALLBACK_PROVIDER
+    (local Ollama by default) instead of failing.
+    """
+    fallback = LLM_BUDGET_FALLBACK_PROVIDER
+    if not fallback or provider == fallback or not BUDGET.near_exhaustion():
+        return provider
+    LLM_BUDGET_DOWNGRADES.labels(agent=agent, from_provider=provider, to_provider=fallback).inc()
+    return fallback
+
+
+def record_usage(
+    agent: str,
+    provider: str,
+    model: str,
+    input_tokens: int,
+    output_tokens: int,
+    estimated: bool = False,
+    cost_multiplier: float = 1.0,
+) -> None:
+    """Record one LLM call: Prometheus counters, hourly budget and current ticket summary.
+
+    cost_multiplier applies provider discounts (e.g. 0.5 for batch APIs).
+    """
+    cost = estimate_cost(model, input_tokens, output_tokens) * cost_multiplier
+    LLM_TOKENS.labels(agent=agent, provider=provider, model=model, type="input").inc(input_tokens)
+    LLM_TOKENS.labels(agent=agent, provider=provider, model=model, type="output").inc(output_tokens)
+    LLM_COST_USD.labels(agent=agent, provider=provider, model=model).inc(cost)
+    BUDGET.add(input_tokens + output_tokens, cost)
+    calls = _ticket_calls.get()
+    if calls is not None:
+        calls.append({
+            "provider": provider,
+            "model": model,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "cost_usd": cost,
+            "estimated": estimated,
+        })
+
+
+def record_openai_usage(agent: str, provider: str, model: str, resp: Any, prompt: str, completion: str) -> None:
+    """Record usage from an OpenAI-compatible response; estimate when usage is missing (e.g. Ollama)."""
+    usage = getattr(resp, "usage", None)
+    prompt_tokens = getattr(usage, "prompt_tokens", None) if usage else None
+    completion_tokens = getattr(usage, "completion_tokens", None) if usage else None
+    if prompt_tokens is None or completion_tokens is None:
+        record_usage(agent, provider, model, estimate_tokens(prompt), estimate_tokens(completion), estimated=True)
+        return
+    record_usage(agent, provider, model, int(prompt_tokens), int(completion_tokens))
+
+
+def record_anthropic_usage(agent: str, model: str, msg: Any, prompt: str, completion: str) -> None:
+    """Record usage from an Anthropic Messages response."""
+    usage = getattr(msg, "usage", None)
+    if usage is None:
+        record_usage(agent, "anthropic", model, estimate_tokens(prompt), estimate_tokens(completion), estimated=True)
+        return
+    record_usage(agent, "anthropic", model, int(usage.input_tokens), int(usage.output_tokens))
+
+
+def start_ticket() -> None:
+    """Start a fresh per-ticket usage accumulator in the current context."""
+    _ticket_calls.set([])
+
+
+def ticket_summary() -> dict:
+    """Summarize LLM usage recorded since start_ticket() (for the outgoing event)."""
+    calls = _ticket_calls.get() or []
+    return {
+        "input_tokens": sum(c["input_tokens"] for c in calls),
+        "output_tokens": sum(c["output_tokens"] for c in calls),
+        "cost_usd": round(sum(c["cost_usd"] for c in calls), 8),
+        "llm_calls": len(calls),
+        "estimated": any(c["estimated"] for c in calls),
+        "models": sorted({c["model"] for c in calls}),
+    }
+
+
+def observe_ticket(agent: str, ticket_type: str, summary: dict) -> None:
+    """Attribute a finished ticket's cost to its ticket type."""
+    LLM_TICKET_COST_USD.labels(agent=agent, ticket_type=ticket_type or "unknown").inc(summary.get("cost_usd", 0.0))
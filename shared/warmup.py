@@ -0,0 +1,45 @@
+"""Startup warm-up run by each agent's __main__ before the consumer subscribes."""
+import time
+from typing import Callable
+
+import structlog  # type: ignore[import-untyped]
+from prometheus_client import Counter, Gauge  # type: ignore[import-untyped]
+
+from .config import WARMUP_ENABLED
+from .health import mark_ready
+
+logger = structlog.get_logger(__name__)
+
+AGENT_WARMUP_SECONDS = Gauge(
+    "agent_warmup_seconds",
+    "Duration of the last startup warm-up per step (step=total for the whole phase)",
+    ["agent", "step"],
+)
+AGENT_WARMUP_FAILURES = Counter(
+    "agent_warmup_failures_total",
+    "Warm-up steps that raised (the agent still starts; the first ticket pays the cost)",
+    ["agent", "step"],
+)
+
+
+def run_warmup(agent: str, steps: list[tuple[str, Callable[[], object]]], enabled: bool = WARMUP_ENABLED) -> float:
+    """Run warm-up steps in order, record their durations, then mark the agent ready.
+
+    A failing step is logged and counted but does not block startup: an unavailable backend
+    is handled by the circuit breaker once tickets flow. Returns total seconds.
+    """
+    start = time.perf_counter()
+    if enabled:
+        for name, fn in steps:
+            t0 = time.perf_counter()
+            try:
+                fn()
+            except Exception as e:
+                AGENT_WARMUP_FAILURES.labels(agent=agent, step=name).inc()
+                logger.warning("Warm-up step failed", step=name, error=str(e))
+            AGENT_WARMUP_SECONDS.labels(agent=agent, step=name).set(time.perf_counter() - t0)
+    total = time.perf_counter() - start
+    AGENT_WARMUP_SECONDS.labels(agent=agent, step="total").set(total)
+    mark_ready()
+    logger.info("Warm-up complete", elapsed_sec=round(total, 2), enabled=enabled)
+    return total
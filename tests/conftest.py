@@ -2,7 +2,11 @@
 import sys
 from pathlib import Path
 
-# Add repo root and agents/triage so triage.llm, triage.enricher, triage.agent can be imported
+# Add repo root and agent directories so triage.*, gateway.*, specialists.* etc. can be imported
 repo_root = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(repo_root))
 sys.path.insert(0, str(repo_root / "agents" / "triage"))
+sys.path.insert(0, str(repo_root / "agents" / "gateway"))
+sys.path.insert(0, str(repo_root / "agents" / "specialists"))
+for _name in ("billing", "technical", "feature"):
+    sys.path.insert(0, str(repo_root / "agents" / _name))
@@ -7,6 +7,11 @@ Requires: MOCK_LLM unset and LLM available (Ollama or API) for real evaluation.
 Usage:
   pytest tests/eval/test_triage_accuracy.py -v -s
   MOCK_LLM= pytest tests/eval/test_triage_accuracy.py -v -s   # Force real LLM
+
+Offline / repeatable runs: record once against a real LLM, then replay from the cassette
+(optionally with the recorded latencies, LLM_CASSETTE_LATENCY_SCALE=1):
+  LLM_CASSETTE_MODE=record LLM_CASSETTE_PATH=triage.cassette.jsonl pytest tests/eval -s
+  LLM_CASSETTE_MODE=replay LLM_CASSETTE_PATH=triage.cassette.jsonl pytest tests/eval -s
 """
 import json
 from pathlib import Path
@@ -0,0 +1,4 @@
+"""Stub OpenAI/Anthropic-compatible LLM server for local load tests."""
+from .server import StubConfig, classify, make_server, parse_latency
+
+__all__ = ["StubConfig", "classify", "make_server", "parse_latency"]
@@ -0,0 +1,48 @@
+"""Entrypoint: python -m tests.stub_llm [--port 11434] [--latency lognormal:0.8,0.5] ...
+
+Point agents at it with LLM_PROVIDER=ollama OLLAMA_BASE_URL=http://localhost:11434/v1
+(or OPENAI_BASE_URL / ANTHROPIC_BASE_URL=http://localhost:11434 for the hosted providers).
+"""
+import argparse
+import os
+
+from .server import StubConfig, make_server, parse_latency
+
+
+def main() -> None:
+    env = os.environ.get
+    parser = argparse.ArgumentParser(description="Stub OpenAI/Anthropic-compatible LLM server")
+    parser.add_argument("--host", default=env("STUB_LLM_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(env("STUB_LLM_PORT", "11434")))
+    parser.add_argument("--latency", default=env("STUB_LLM_LATENCY", "fixed:0.05"),
+                        help="fixed:S | uniform:A,B | lognormal:MEDIAN,SIGMA (seconds)")
+    parser.add_argument("--token-latency", type=float, default=float(env("STUB_LLM_TOKEN_LATENCY", "0")),
+                        help="Seconds between streamed chunks")
+    parser.add_argument("--max-concurrency", type=int, default=int(env("STUB_LLM_MAX_CONCURRENCY", "4")))
+    parser.add_argument("--queue-limit", type=int, default=int(env("STUB_LLM_QUEUE_LIMIT", "64")),
+                        help="Waiting requests beyond this get 429")
+    parser.add_argument("--rate-429", type=float, default=float(env("STUB_LLM_RATE_429", "0")))
+    parser.add_argument("--rate-5xx", type=float, default=float(env("STUB_LLM_RATE_5XX", "0")))
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    parse_latency(args.latency)  # fail fast on a bad profile
+    config = StubConfig(
+        latency=args.latency,
+        token_latency=args.token_latency,
+        max_concurrency=args.max_concurrency,
+        queue_limit=args.queue_limit,
+        rate_429=args.rate_429,
+        rate_5xx=args.rate_5xx,
+        seed=args.seed,
+    )
+    server = make_server(config, host=args.host, port=args.port)
+    print(f"Stub LLM listening on http://{args.host}:{args.port} ({config})", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
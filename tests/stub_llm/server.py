@@ -0,0 +1,320 @@
+"""Stub LLM server speaking the OpenAI chat-completions and Anthropic messages wire formats.
+
+Unlike MOCK_LLM (which short-circuits inside the agent), requests go over real HTTP, so
+client pooling, timeouts, streaming and concurrency behave as they would against Ollama or
+a hosted API. Responses are valid triage JSON (when the system prompt is the triage prompt)
+or short specialist text.
+
+Latency profiles (``--latency``):
+  fixed:S               constant S seconds
+  uniform:A,B           uniform between A and B seconds
+  lognormal:MEDIAN,SIGMA log-normal with the given median (seconds) and sigma
+
+The server models a backend with ``--max-concurrency`` slots: extra requests queue, and
+once ``--queue-limit`` requests are waiting the rest get 429. ``--rate-429`` and
+``--rate-5xx`` inject errors at random.
+"""
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+
+TRIAGE_KEYWORDS = {
+    "billing": ("bill", "charge", "refund", "invoice", "payment", "subscription", "price"),
+    "technical": ("error", "crash", "bug", "login", "password", "slow", "broken", "fail"),
+    "feature_request": ("feature", "would like", "could you add", "suggest", "request", "wish"),
+    "account": ("account", "email address", "username", "delete my"),
+}
+SPECIALIST_TEXT = (
+    "Thank you for reaching out. We have reviewed your ticket and identified the next steps. "
+    "Our team will follow up shortly; please reply if anything else comes up."
+)
+
+
+def parse_latency(spec: str, rng: random.Random | None = None) -> Callable[[], float]:
+    """Build a sampler (seconds) from a latency profile string."""
+    rng = rng or random.Random()
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v.strip()] if args else []
+    if kind == "fixed":
+        value = values[0] if values else 0.0
+        return lambda: value
+    if kind == "uniform" and len(values) == 2:
+        lo, hi = values
+        return lambda: rng.uniform(lo, hi)
+    if kind == "lognormal" and len(values) == 2:
+        median, sigma = values
+        mu = math.log(median)
+        return lambda: rng.lognormvariate(mu, sigma)
+    raise ValueError(f"Invalid latency profile {spec!r} (fixed:S, uniform:A,B, lognormal:MEDIAN,SIGMA)")
+
+
+def classify(text: str) -> dict:
+    """Keyword triage so the stub produces plausible routing for load tests."""
+    lowered = text.lower()
+    for ticket_type, words in TRIAGE_KEYWORDS.items():
+        if any(w in lowered for w in words):
+            break
+    else:
+        ticket_type = "other"
+    priority = "high" if any(w in lowered for w in ("urgent", "asap", "down", "charged twice")) else "medium"
+    return {
+        "type": ticket_type,
+        "priority": priority,
+        "reasoning": f"Stub classification based on keywords ({ticket_type}).",
+        "confidence": 0.9 if ticket_type != "other" else 0.5,
+    }
+
+
+def generate_text(system: str, user: str) -> str:
+    if "triage" in system.lower():
+        return json.dumps(classify(user))
+    return SPECIALIST_TEXT
+
+
+@dataclass
+class StubConfig:
+    latency: str = "fixed:0.05"
+    token_latency: float = 0.0  # seconds between streamed chunks
+    max_concurrency: int = 4
+    queue_limit: int = 64
+    rate_429: float = 0.0
+    rate_5xx: float = 0.0
+    seed: int | None = None
+
+
+@dataclass
+class StubStats:
+    requests: int = 0
+    completed: int = 0
+    rejected_429: int = 0
+    injected_5xx: int = 0
+    peak_inflight: int = 0
+    peak_queued: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def as_dict(self) -> dict:
+        with self.lock:
+            return {k: v for k, v in self.__dict__.items() if k != "lock"}
+
+
+class _Backend:
+    """Concurrency/queue model plus error injection shared by all handler threads."""
+
+    def __init__(self, config: StubConfig):
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.sample_latency = parse_latency(config.latency, self.rng)
+        self.stats = StubStats()
+        self._slots = threading.Semaphore(max(1, config.max_concurrency))
+        self._inflight = 0
+        self._queued = 0
+
+    def admit(self) -> int | None:
+        """Return an HTTP error status to reply with, or None once a slot is held."""
+        cfg = self.config
+        with self.stats.lock:
+            self.stats.requests += 1
+            roll = self.rng.random()
+            if roll < cfg.rate_429 or self._queued >= cfg.queue_limit:
+                self.stats.rejected_429 += 1
+                return 429
+            if roll < cfg.rate_429 + cfg.rate_5xx:
+                self.stats.injected_5xx += 1
+                return 503
+            self._queued += 1
+            self.stats.peak_queued = max(self.stats.peak_queued, self._queued)
+        self._slots.acquire()
+        with self.stats.lock:
+            self._queued -= 1
+            self._inflight += 1
+            self.stats.peak_inflight = max(self.stats.peak_inflight, self._inflight)
+        return None
+
+    def release(self) -> None:
+        with self.stats.lock:
+            self._inflight -= 1
+            self.stats.completed += 1
+        self._slots.release()
+
+
+def _openai_messages(payload: dict) -> tuple[str, str]:
+    system, user = "", ""
+    for m in payload.get("messages", []):
+        content = m.get("content") or ""
+        if isinstance(content, list):
+            content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+        if m.get("role") == "system":
+            system += content
+        elif m.get("role") == "user":
+            user += content
+    return system, user
+
+
+def _anthropic_messages(payload: dict) -> tuple[str, str]:
+    system = payload.get("system") or ""
+    if isinstance(system, list):
+        system = " ".join(part.get("text", "") for part in system)
+    user = ""
+    for m in payload.get("messages", []):
+        content = m.get("content") or ""
+        if isinstance(content, list):
+            content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+        if m.get("role") == "user":
+            user += content
+    return system, user
+
+
+def _tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _chunks(text: str, size: int = 16) -> list[str]:
+    return [text[i:i + size] for i in range(0, len(text), size)] or [""]
+
+
+def _make_handler(backend: _Backend):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _json(self, status: int, obj: dict, extra: dict | None = None) -> None:
+            body = json.dumps(obj).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for k, v in (extra or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _sse_start(self) -> None:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+
+        def _sse(self, data: str, event: str | None = None) -> None:
+            frame = (f"event: {event}\n" if event else "") + f"data: {data}\n\n"
+            self.wfile.write(frame.encode("utf-8"))
+            self.wfile.flush()
+
+        def do_GET(self):
+            path = self.path.split("?", 1)[0]
+            if path in ("/v1/models", "/models"):
+                self._json(200, {"object": "list", "data": [{"id": "stub-model", "object": "model", "owned_by": "stub"}]})
+            elif path == "/api/tags":
+                self._json(200, {"models": [{"name": "stub-model", "model": "stub-model"}]})
+            elif path == "/stats":
+                self._json(200, backend.stats.as_dict())
+            elif path == "/healthz":
+                self._json(200, {"status": "ok"})
+            else:
+                self._json(404, {"error": {"message": "not found"}})
+
+        def do_POST(self):
+            path = self.path.split("?", 1)[0]
+            length = int(self.headers.get("Content-Length", "0"))
+            try:
+                payload = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                self._json(400, {"error": {"message": "invalid JSON", "type": "invalid_request_error"}})
+                return
+            if path in ("/v1/chat/completions", "/chat/completions"):
+                self._serve(payload, self._openai)
+            elif path in ("/v1/messages", "/messages"):
+                self._serve(payload, self._anthropic)
+            else:
+                self._json(404, {"error": {"message": "not found"}})
+
+        def _serve(self, payload: dict, responder) -> None:
+            status = backend.admit()
+            if status == 429:
+                self._json(429, {"error": {"message": "rate limited (stub)", "type": "rate_limit_error"}}, {"Retry-After": "1"})
+                return
+            if status is not None:
+                self._json(status, {"error": {"message": "backend overloaded (stub)", "type": "api_error"}})
+                return
+            try:
+                time.sleep(backend.sample_latency())
+                responder(payload)
+            finally:
+                backend.release()
+
+        def _openai(self, payload: dict) -> None:
+            system, user = _openai_messages(payload)
+            text = generate_text(system, user)
+            max_tokens = payload.get("max_tokens") or payload.get("max_completion_tokens")
+            if max_tokens:
+                text = text[: int(max_tokens) * 4]
+            model = payload.get("model", "stub-model")
+            rid = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+            usage = {"prompt_tokens": _tokens(system + user), "completion_tokens": _tokens(text)}
+            usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+            if not payload.get("stream"):
+                self._json(200, {
+                    "id": rid, "object": "chat.completion", "created": int(time.time()), "model": model,
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                    "usage": usage,
+                })
+                return
+            self._sse_start()
+            base = {"id": rid, "object": "chat.completion.chunk", "created": int(time.time()), "model": model}
+            self._sse(json.dumps({**base, "choices": [{"index": 0, "delta": {"role": "assistant"}, "finish_reason": None}]}))
+            for piece in _chunks(text):
+                if backend.config.token_latency:
+                    time.sleep(backend.config.token_latency)
+                self._sse(json.dumps({**base, "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}))
+            final = {**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+            if (payload.get("stream_options") or {}).get("include_usage"):
+                final["usage"] = usage
+            self._sse(json.dumps(final))
+            self._sse("[DONE]")
+
+        def _anthropic(self, payload: dict) -> None:
+            system, user = _anthropic_messages(payload)
+            text = generate_text(system, user)[: int(payload.get("max_tokens", 1024)) * 4]
+            model = payload.get("model", "stub-model")
+            mid = f"msg_{uuid.uuid4().hex[:12]}"
+            usage = {"input_tokens": _tokens(system + user), "output_tokens": _tokens(text)}
+            if not payload.get("stream"):
+                self._json(200, {
+                    "id": mid, "type": "message", "role": "assistant", "model": model,
+                    "content": [{"type": "text", "text": text}],
+                    "stop_reason": "end_turn", "stop_sequence": None, "usage": usage,
+                })
+                return
+            self._sse_start()
+            start = {"id": mid, "type": "message", "role": "assistant", "model": model, "content": [],
+                     "stop_reason": None, "stop_sequence": None, "usage": {**usage, "output_tokens": 0}}
+            self._sse(json.dumps({"type": "message_start", "message": start}), "message_start")
+            self._sse(json.dumps({"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}}), "content_block_start")
+            for piece in _chunks(text):
+                if backend.config.token_latency:
+                    time.sleep(backend.config.token_latency)
+                delta = {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": piece}}
+                self._sse(json.dumps(delta), "content_block_delta")
+            self._sse(json.dumps({"type": "content_block_stop", "index": 0}), "content_block_stop")
+            self._sse(json.dumps({"type": "message_delta", "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                                  "usage": {"output_tokens": usage["output_tokens"]}}), "message_delta")
+            self._sse(json.dumps({"type": "message_stop"}), "message_stop")
+
+    return Handler
+
+
+def make_server(config: StubConfig, host: str = "127.0.0.1", port: int = 11434) -> ThreadingHTTPServer:
+    """Create (but do not start) a stub server. ``server.stats`` exposes counters for tests."""
+    backend = _Backend(config)
+    server = ThreadingHTTPServer((host, port), _make_handler(backend))
+    server.daemon_threads = True
+    server.stats = backend.stats  # type: ignore[attr-defined]
+    return server
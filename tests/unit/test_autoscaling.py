@@ -0,0 +1,54 @@
+"""Unit tests for the lag-based autoscaling signal."""
+import pytest
+from confluent_kafka import TopicPartition
+
+from shared.autoscaling import DESIRED_REPLICAS, ScalingSignal, desired_replicas
+
+
+def test_desired_replicas_drains_backlog_within_target():
+    # 2s per ticket on one worker = 0.5 tickets/s per replica; keeping up with 1/s needs 2.
+    assert desired_replicas(lag=0, rate=1.0, latency_sec=2.0, workers=1, partitions=6, target_drain_sec=300) == 2
+    # 300 messages behind adds 1/s of drain work within 300s.
+    assert desired_replicas(lag=300, rate=1.0, latency_sec=2.0, workers=1, partitions=6, target_drain_sec=300) == 4
+    # Four workers per replica finish four times as much.
+    assert desired_replicas(lag=300, rate=1.0, latency_sec=2.0, workers=4, partitions=6, target_drain_sec=300) == 1
+
+
+def test_desired_replicas_is_capped_at_assigned_partitions():
+    assert desired_replicas(lag=10**6, rate=5.0, latency_sec=3.0, workers=1, partitions=3, target_drain_sec=60) == 3
+    assert desired_replicas(lag=10**6, rate=5.0, latency_sec=3.0, workers=1, partitions=0, target_drain_sec=60) == 0
+
+
+def test_no_finished_tickets_keeps_replica_only_with_backlog():
+    assert desired_replicas(lag=5, rate=0, latency_sec=None, workers=1, partitions=2, target_drain_sec=60) == 1
+    assert desired_replicas(lag=0, rate=0, latency_sec=None, workers=1, partitions=2, target_drain_sec=60) == 0
+
+
+class LagConsumer:
+    def __init__(self, positions, high):
+        self.positions, self.high = positions, high
+
+    def assignment(self):
+        return [TopicPartition("ticket.events", p) for p in self.positions]
+
+    def position(self, partitions):
+        return [TopicPartition(tp.topic, tp.partition, self.positions[tp.partition]) for tp in partitions]
+
+    def get_watermark_offsets(self, tp, cached=False):
+        return 0, self.high[tp.partition]
+
+
+def test_signal_uses_window_and_consumer_lag():
+    now = [0.0]
+    signal = ScalingSignal("scale-test", target_drain_sec=100, window_sec=10, interval_sec=5, clock=lambda: now[0])
+    now[0] = 20.0
+    for _ in range(10):
+        signal.record(1.0)  # 10 tickets in the 10s window: 1/s, 1s each -> capacity 1/s
+    consumer = LagConsumer({0: 40, 1: -1001}, {0: 90, 1: 50})  # partition 1 has no position yet
+    signal.maybe_update(consumer)
+    # rate 1/s + 50 lag / 100s = 1.5 replicas' worth of work
+    assert DESIRED_REPLICAS.labels(agent="scale-test")._value.get() == pytest.approx(1.5)
+
+    now[0] = 40.0  # window expired: nothing finished recently, but a backlog remains
+    signal.maybe_update(consumer)
+    assert DESIRED_REPLICAS.labels(agent="scale-test")._value.get() == 1
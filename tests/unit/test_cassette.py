@@ -0,0 +1,85 @@
+"""Unit tests for the LLM record/replay cassette."""
+import json
+from unittest.mock import patch
+
+import pytest
+
+from shared.cassette import RECORD, REPLAY, Cassette, CassetteMissError
+
+
+def test_record_then_replay_round_trip(tmp_path):
+    path = tmp_path / "llm.jsonl"
+    recorder = Cassette(RECORD, path)
+    out = {"type": "billing", "priority": "high", "reasoning": "Refund.", "confidence": 0.9}
+    assert recorder.call("triage", "ollama", "qwen2.5:0.5b", ("Refund", "charged twice", "email"), lambda: out) == out
+    assert recorder.call("billing", "ollama", "qwen2.5:0.5b", ("Refund", "charged twice", "r"), lambda: "We will refund.") == "We will refund."
+
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [e["agent"] for e in lines] == ["triage", "billing"]
+    assert all((e["provider"], e["model"]) == ("ollama", "qwen2.5:0.5b") for e in lines)
+    assert all(e["latency_ms"] >= 0 for e in lines)
+
+    player = Cassette(REPLAY, path)
+    live = lambda: pytest.fail("replay must not call the LLM")  # noqa: E731
+    assert player.call("triage", "ollama", "qwen2.5:0.5b", ("Refund", "charged twice", "email"), live) == out
+    assert player.call("billing", "ollama", "qwen2.5:0.5b", ("Refund", "charged twice", "r"), live) == "We will refund."
+    with pytest.raises(CassetteMissError):
+        player.call("triage", "ollama", "qwen2.5:0.5b", ("Other", "ticket", "email"), live)
+    with pytest.raises(CassetteMissError):  # same call, recorded against another model
+        player.call("triage", "ollama", "llama3.2", ("Refund", "charged twice", "email"), live)
+    with pytest.raises(CassetteMissError):
+        player.call("triage", "openai", "qwen2.5:0.5b", ("Refund", "charged twice", "email"), live)
+
+
+def test_replay_reproduces_scaled_latency_and_cycles_repeats(tmp_path):
+    path = tmp_path / "llm.jsonl"
+    path.write_text(
+        json.dumps({"k": Cassette.fingerprint("technical", "openai", "gpt-4o-mini", ("a",)), "agent": "technical", "latency_ms": 800, "response": "one"}) + "\n"
+        + json.dumps({"k": Cassette.fingerprint("technical", "openai", "gpt-4o-mini", ("a",)), "agent": "technical", "latency_ms": 400, "response": "two"}) + "\n"
+    )
+    slept = []
+    player = Cassette(REPLAY, path, latency_scale=0.5, sleep=slept.append)
+    assert [player.call("technical", "openai", "gpt-4o-mini", ("a",), lambda: None) for _ in range(3)] == ["one", "two", "one"]
+    assert slept == [0.4, 0.2, 0.4]
+
+
+def test_replay_requires_existing_cassette(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        Cassette(REPLAY, tmp_path / "missing.jsonl")
+
+
+def test_classify_ticket_replays_without_backend(tmp_path):
+    from triage import llm
+
+    path = tmp_path / "triage.jsonl"
+    recorded = {"type": "technical", "priority": "low", "reasoning": "Bug.", "confidence": 0.7}
+    Cassette(RECORD, path).call("triage", "ollama", "qwen2.5:0.5b", ("App crash", "It crashes", "portal"), lambda: recorded)
+
+    with patch.object(llm, "MOCK_LLM", False), \
+            patch.object(llm, "LLM_PROVIDER", "ollama"), \
+            patch.object(llm, "OLLAMA_MODEL", "qwen2.5:0.5b"), \
+            patch("shared.cassette.get_cassette", return_value=Cassette(REPLAY, path)), \
+            patch.object(llm, "_dispatch", side_effect=AssertionError("live call")):
+        assert llm.classify_ticket("App crash", "It crashes", "portal") == recorded
+
+
+def test_budget_fallback_is_recorded_under_the_provider_called(tmp_path):
+    from billing import llm
+
+    path = tmp_path / "billing.jsonl"
+    called = []
+
+    def dispatch(provider, *args):
+        called.append(provider)
+        return "We will refund."
+
+    with patch.object(llm, "MOCK_LLM", False), \
+            patch.object(llm, "LLM_PROVIDER", "anthropic"), \
+            patch.object(llm, "select_provider", return_value="ollama"), \
+            patch("shared.cassette.get_cassette", return_value=Cassette(RECORD, path)), \
+            patch.object(llm, "_dispatch", side_effect=dispatch):
+        assert llm.generate_response("T-1", "Refund", "charged twice", "r") == "We will refund."
+
+    entry = json.loads(path.read_text())
+    assert called == ["ollama"]
+    assert (entry["provider"], entry["model"]) == ("ollama", llm.OLLAMA_MODEL)
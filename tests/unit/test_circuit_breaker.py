@@ -0,0 +1,192 @@
+"""Unit tests for the LLM circuit breaker and partition pause/resume backpressure."""
+from unittest.mock import MagicMock
+
+import pytest
+
+from shared.backpressure import PartitionPauser
+from shared.circuit_breaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    BackendUnavailableError,
+    CircuitBreaker,
+    CircuitOpenError,
+)
+
+
+def _breaker(now, threshold=2, reset=10.0):
+    return CircuitBreaker("test", "ollama", failure_threshold=threshold, reset_timeout=reset, clock=lambda: now[0])
+
+
+def _fail():
+    raise ConnectionError("connection refused")
+
+
+def test_breaker_opens_after_consecutive_failures():
+    now = [0.0]
+    breaker = _breaker(now)
+    for _ in range(2):
+        with pytest.raises(BackendUnavailableError):
+            breaker.call(_fail)
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: "never called")
+
+
+def test_breaker_half_open_trial_closes_on_success():
+    now = [0.0]
+    breaker = _breaker(now, threshold=1)
+    with pytest.raises(BackendUnavailableError):
+        breaker.call(_fail)
+    assert not breaker.ready()
+    now[0] = 10.0
+    assert breaker.ready()
+    assert breaker.call(lambda: "ok") == "ok"
+    assert breaker.state == CLOSED
+
+
+def test_breaker_half_open_allows_single_trial():
+    now = [0.0]
+    breaker = _breaker(now, threshold=1)
+    with pytest.raises(BackendUnavailableError):
+        breaker.call(_fail)
+    now[0] = 10.0
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+
+def test_breaker_output_errors_do_not_trip():
+    """Bad LLM output (ValueError/JSONDecodeError) propagates unchanged and keeps the circuit closed."""
+    breaker = _breaker([0.0], threshold=1)
+
+    def bad_json():
+        raise ValueError("Expecting value")
+
+    with pytest.raises(ValueError):
+        breaker.call(bad_json)
+    assert breaker.state == CLOSED
+
+
+class _StatusError(Exception):
+    """Stands in for the provider SDKs' APIStatusError."""
+
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def test_breaker_client_errors_pass_through_and_overload_trips():
+    """4xx (context too long, auth, unknown model) are per-ticket errors; 429/5xx/timeouts are outages."""
+    breaker = _breaker([0.0], threshold=1)
+    for status in (400, 401, 403, 404, 413, 422):
+        def rejected(status=status):
+            raise _StatusError(status)
+
+        with pytest.raises(_StatusError):
+            breaker.call(rejected)
+    assert breaker.state == CLOSED
+
+    for cause in (_StatusError(429), _StatusError(503), TimeoutError("read timed out")):
+        breaker = _breaker([0.0], threshold=1)
+
+        def failing(cause=cause):
+            raise cause
+
+        with pytest.raises(BackendUnavailableError):
+            breaker.call(failing)
+        assert breaker.state == OPEN
+
+
+def _msg(offset=42):
+    msg = MagicMock()
+    msg.topic.return_value = "ticket.events"
+    msg.partition.return_value = 3
+    msg.offset.return_value = offset
+    return msg
+
+
+def test_pauser_rewinds_without_pausing_while_closed():
+    consumer = MagicMock()
+    breaker = _breaker([0.0], threshold=5)
+    pauser = PartitionPauser("test")
+    pauser.rewind(consumer, _msg(), breaker)
+    tp = consumer.seek.call_args[0][0]
+    assert (tp.topic, tp.partition, tp.offset) == ("ticket.events", 3, 42)
+    consumer.pause.assert_not_called()
+    assert not pauser.paused
+
+
+def test_pauser_pauses_while_open_and_resumes_when_ready():
+    now = [0.0]
+    consumer = MagicMock()
+    consumer.assignment.return_value = ["tp0", "tp1"]
+    breaker = _breaker(now, threshold=1)
+    breaker.record_failure()
+    pauser = PartitionPauser("test")
+
+    pauser.rewind(consumer, _msg(), breaker)
+    consumer.pause.assert_called_with(["tp0", "tp1"])
+    assert pauser.maybe_resume(consumer) is True
+    consumer.resume.assert_not_called()
+
+    now[0] = 10.0
+    assert pauser.maybe_resume(consumer) is False
+    consumer.resume.assert_called_once_with(["tp0", "tp1"])
+    assert not pauser.paused
+
+
+def test_triage_handle_message_propagates_backend_failure_without_producing():
+    """An unavailable backend must not be swallowed: the loop rewinds instead of committing."""
+    import json
+    from unittest.mock import patch
+
+    from triage.agent import handle_message
+
+    msg = _msg()
+    msg.value.return_value = json.dumps({
+        "event_type": "ticket.created",
+        "ticket_id": "TKT-1",
+        "customer_id": "cust-1",
+        "subject": "Charge",
+        "body": "Charged twice",
+    }).encode("utf-8")
+    producer = MagicMock()
+    error = BackendUnavailableError(_breaker([0.0]), ConnectionError("down"))
+    with patch("triage.agent.classify_ticket", side_effect=error):
+        with pytest.raises(BackendUnavailableError):
+            handle_message(msg, producer)
+    producer.produce.assert_not_called()
+
+
+def test_triage_client_error_goes_to_retry_path_instead_of_rewinding():
+    """A deterministic 400 for one ticket must not pause the partitions: it is a per-ticket llm_error."""
+    import json
+    from unittest.mock import patch
+
+    from triage.agent import handle_message
+
+    msg = _msg()
+    msg.value.return_value = json.dumps({
+        "event_type": "ticket.created",
+        "ticket_id": "TKT-2",
+        "customer_id": "cust-1",
+        "subject": "Huge",
+        "body": "x" * 1000,
+    }).encode("utf-8")
+    breaker = _breaker([0.0], threshold=1)
+
+    def classify(**kwargs):
+        def too_long():
+            raise _StatusError(400)
+
+        return breaker.call(too_long)
+
+    retry = MagicMock()
+    with patch("triage.agent.classify_ticket", side_effect=classify):
+        handle_message(msg, MagicMock(), retry)
+    retry.schedule.assert_called_once()
+    assert retry.schedule.call_args[0][1] == "llm_error"
+    assert breaker.state == CLOSED
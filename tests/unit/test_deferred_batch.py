@@ -0,0 +1,258 @@
+"""Unit tests for deferred batch resolution and contiguous offset tracking."""
+import json
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from shared.batch import (
+    ENDED,
+    IN_PROGRESS,
+    AnthropicBatchBackend,
+    DeferredBatcher,
+    DeferredTicket,
+    LocalBatchBackend,
+    OpenAIBatchBackend,
+    request_custom_id,
+)
+from shared.offsets import OffsetTracker
+
+
+def _ticket(ticket_id: str, offset: int) -> DeferredTicket:
+    return DeferredTicket(
+        request={"custom_id": ticket_id, "system": "sys", "user": f"Ticket: {ticket_id}", "max_tokens": 256},
+        payload={"ticket_id": ticket_id, "priority": "low"},
+        trace_id=f"trace-{ticket_id}",
+        topic="ticket.triaged.billing",
+        partition=0,
+        offset=offset,
+    )
+
+
+def test_offset_tracker_never_commits_past_in_flight():
+    tracker = OffsetTracker()
+    tracker.begin("t", 0, 5)  # deferred
+    tracker.begin("t", 0, 6)
+    tracker.done("t", 0, 6)
+    assert [(tp.topic, tp.partition, tp.offset) for tp in tracker.committable()] == [("t", 0, 5)]
+    tracker.done("t", 0, 5)
+    assert [tp.offset for tp in tracker.committable()] == [7]
+    assert tracker.committable() == []
+
+
+def test_offset_tracker_discard_allows_redelivery():
+    tracker = OffsetTracker()
+    tracker.begin("t", 1, 10)
+    tracker.done("t", 1, 10)
+    tracker.begin("t", 1, 11)
+    tracker.discard("t", 1, 11)
+    assert [tp.offset for tp in tracker.committable()] == [11]
+
+
+def test_batcher_submits_when_full_and_delivers_results():
+    now = [0.0]
+    backend = LocalBatchBackend(lambda r: f"answer for {r['custom_id']}", clock=lambda: now[0])
+    delivered = []
+    batcher = DeferredBatcher(
+        "billing", backend, lambda t, r: delivered.append((t.custom_id, r.text)),
+        max_size=2, max_wait_sec=300, poll_interval_sec=60, clock=lambda: now[0],
+    )
+    batcher.add(_ticket("T1", 1))
+    batcher.tick()
+    assert delivered == [] and batcher.pending_count == 1
+    batcher.add(_ticket("T2", 2))
+    batcher.tick()  # submit + first poll
+    assert sorted(delivered) == [("T1", "answer for T1"), ("T2", "answer for T2")]
+    assert batcher.pending_count == 0
+
+
+def test_redelivered_ticket_gets_its_own_custom_id():
+    tracker = OffsetTracker()
+    submitted, delivered = [], []
+
+    class Backend(LocalBatchBackend):
+        def submit(self, requests):
+            ids = [r["custom_id"] for r in requests]
+            assert len(set(ids)) == len(ids), "batch APIs reject duplicate custom_ids"
+            submitted.extend(ids)
+            return super().submit(requests)
+
+    def on_result(ticket, result):
+        delivered.append((ticket.payload["ticket_id"], ticket.offset))
+        tracker.done(ticket.topic, ticket.partition, ticket.offset)
+
+    batcher = DeferredBatcher("billing", Backend(lambda r: "ok"), on_result, max_size=2, poll_interval_sec=0)
+    for offset in (5, 6):  # triage delivered ticket.triaged for T1 twice
+        ticket = _ticket("T1", offset)
+        ticket.request["custom_id"] = request_custom_id(ticket.topic, ticket.partition, offset)
+        tracker.begin(ticket.topic, ticket.partition, offset)
+        batcher.add(ticket)
+    batcher.add(ticket)  # the same message again (a rewind) while it is pending
+    batcher.tick()
+
+    assert submitted == ["ticket_triaged_billing-0-5", "ticket_triaged_billing-0-6"]
+    assert delivered == [("T1", 5), ("T1", 6)]
+    assert [tp.offset for tp in tracker.committable()] == [7]
+
+
+def test_request_custom_id_fits_batch_api_charset():
+    assert request_custom_id("ticket.triaged.billing.p0", 3, 42) == "ticket_triaged_billing_p0-3-42"
+    long_id = request_custom_id("t" * 100, 0, 1)
+    assert len(long_id) == 64 and long_id.endswith("-0-1")
+    assert long_id != request_custom_id("t" * 99, 0, 1)
+
+
+def test_batcher_submits_after_max_wait_and_polls_on_interval():
+    now = [0.0]
+    backend = LocalBatchBackend(lambda r: "ok", complete_after=100, clock=lambda: now[0])
+    delivered = []
+    batcher = DeferredBatcher(
+        "feature", backend, lambda t, r: delivered.append(t.custom_id),
+        max_size=10, max_wait_sec=30, poll_interval_sec=60, clock=lambda: now[0],
+    )
+    batcher.add(_ticket("T1", 1))
+    now[0] = 30.0
+    batcher.tick()  # submitted, still in progress
+    now[0] = 90.0
+    batcher.tick()  # polled, still in progress
+    assert delivered == []
+    now[0] = 150.0
+    batcher.tick()
+    assert delivered == ["T1"]
+
+
+def test_batcher_requeues_failed_requests_then_reports_failure():
+    calls = []
+
+    def generate(request):
+        calls.append(request["custom_id"])
+        raise RuntimeError("model overloaded")
+
+    backend = LocalBatchBackend(generate)
+    delivered = []
+    batcher = DeferredBatcher(
+        "billing", backend, lambda t, r: delivered.append((t.custom_id, r.text, r.error)),
+        max_size=1, max_wait_sec=0, poll_interval_sec=0, max_attempts=2,
+    )
+    batcher.add(_ticket("T1", 1))
+    batcher.tick()
+    assert delivered == [] and batcher.pending_count == 1
+    batcher.tick()
+    assert delivered == [("T1", None, "model overloaded")]
+    assert calls == ["T1", "T1"]
+
+
+def test_anthropic_backend_request_and_result_shape():
+    client = MagicMock()
+    client.messages.batches.create.return_value = SimpleNamespace(id="msgbatch_1")
+    client.messages.batches.retrieve.return_value = SimpleNamespace(processing_status="in_progress")
+    backend = AnthropicBatchBackend("claude-3-5-haiku-20241022", client=client)
+
+    assert backend.submit([_ticket("T1", 1).request]) == "msgbatch_1"
+    sent = client.messages.batches.create.call_args.kwargs["requests"][0]
+    assert sent["custom_id"] == "T1"
+    assert sent["params"]["system"] == "sys"
+    assert sent["params"]["messages"] == [{"role": "user", "content": "Ticket: T1"}]
+    assert backend.status("msgbatch_1") == IN_PROGRESS
+
+    message = SimpleNamespace(content=[SimpleNamespace(text=" Hi ")], usage=SimpleNamespace(input_tokens=9, output_tokens=3))
+    client.messages.batches.results.return_value = [
+        SimpleNamespace(custom_id="T1", result=SimpleNamespace(type="succeeded", message=message)),
+        SimpleNamespace(custom_id="T2", result=SimpleNamespace(type="errored")),
+    ]
+    results = backend.results("msgbatch_1")
+    assert (results["T1"].text, results["T1"].input_tokens) == ("Hi", 9)
+    assert results["T2"].text is None
+
+
+def test_openai_backend_writes_jsonl_and_parses_output():
+    client = MagicMock()
+    client.files.create.return_value = SimpleNamespace(id="file-in")
+    client.batches.create.return_value = SimpleNamespace(id="batch_1")
+    client.batches.retrieve.return_value = SimpleNamespace(status="completed", output_file_id="file-out")
+    output = {
+        "custom_id": "T1",
+        "response": {"status_code": 200, "body": {
+            "choices": [{"message": {"content": "Answer"}}],
+            "usage": {"prompt_tokens": 12, "completion_tokens": 4},
+        }},
+    }
+    client.files.content.return_value = SimpleNamespace(text=json.dumps(output) + "\n")
+    backend = OpenAIBatchBackend("gpt-4o-mini", client=client)
+
+    assert backend.submit([_ticket("T1", 1).request]) == "batch_1"
+    _, data = client.files.create.call_args.kwargs["file"]
+    line = json.loads(data.decode("utf-8"))
+    assert line["url"] == "/v1/chat/completions"
+    assert line["body"]["messages"][0] == {"role": "system", "content": "sys"}
+    assert backend.status("batch_1") == ENDED
+    result = backend.results("batch_1")["T1"]
+    assert (result.text, result.input_tokens, result.output_tokens) == ("Answer", 12, 4)
+
+
+def test_offset_tracker_holds_rewound_offset_until_redelivered():
+    tracker = OffsetTracker()
+    for offset in (3, 4, 5):
+        tracker.begin("t", 0, offset)
+    tracker.discard("t", 0, 3)  # backend down: seek back to 3
+    tracker.done("t", 0, 4)
+    tracker.done("t", 0, 5)
+    assert [tp.offset for tp in tracker.committable()] == [3]
+    tracker.begin("t", 0, 3)  # redelivered
+    tracker.done("t", 0, 3)
+    assert [tp.offset for tp in tracker.committable()] == [6]
+
+
+def test_failed_and_rejected_batch_results_go_to_retry(monkeypatch):
+    import shared.specialist_base as specialist_base
+    from shared.batch import BatchResult
+    from shared.retry import HEADER_ATTEMPT, HEADER_REASON, RetryPublisher
+
+    class Producer:
+        def __init__(self):
+            self.produced = []
+
+        def produce(self, topic, key=None, value=None, headers=None, callback=None):
+            self.produced.append((topic, key, json.loads(value), dict(headers or [])))
+
+        def flush(self, timeout=None):
+            return 0
+
+    def reject(text, agent):
+        raise ValueError("blocked term")
+
+    monkeypatch.setattr(specialist_base, "DEFERRED_BATCH_ENABLED", False)
+    monkeypatch.setattr(specialist_base, "apply_guardrails", reject)
+    producer, retry_producer = Producer(), Producer()
+    tracker = OffsetTracker()
+    definition = specialist_base.SpecialistDefinition(
+        name="billing",
+        input_topic="ticket.triaged.billing",
+        generate_response=lambda *args, **kwargs: "",
+        get_trace_id=lambda payload: "trace",
+    )
+    specialist = specialist_base._Specialist(
+        definition, producer, tracker, RetryPublisher("billing", retry_producer, [("30s", 30.0)])
+    )
+    specialist.batcher = SimpleNamespace(backend=SimpleNamespace(provider="local", model="local"))
+
+    failed, rejected = _ticket("T-1", 5), _ticket("T-2", 6)
+    rejected.headers = [(HEADER_ATTEMPT, b"1")]
+    for ticket in (failed, rejected):
+        tracker.begin(ticket.topic, ticket.partition, ticket.offset)
+    specialist.on_batch_result(failed, BatchResult(None, error="request expired"))
+    specialist.on_batch_result(rejected, BatchResult("Your card number is ..."))
+
+    assert producer.produced == []
+    (t1_topic, t1_key, t1_value, t1_headers), (t2_topic, _, t2_value, t2_headers) = retry_producer.produced
+    assert (t1_topic, t1_key, t1_value) == ("ticket.triaged.billing.retry.30s", b"T-1", failed.payload)
+    assert t1_headers[HEADER_REASON] == b"llm_error"
+    # The second ticket already used the only tier, so it is dead-lettered.
+    assert (t2_topic, t2_value) == ("ticket.triaged.billing.dlq", rejected.payload)
+    assert t2_headers[HEADER_REASON] == b"guardrail"
+    assert [(tp.topic, tp.offset) for tp in tracker.committable()] == [("ticket.triaged.billing", 7)]
+
+    # A result for a revoked partition (dropped from the tracker) is not acted on.
+    tracker.begin("ticket.triaged.billing", 0, 7)
+    tracker.drop_partition("ticket.triaged.billing", 0)
+    specialist.on_batch_result(_ticket("T-3", 7), BatchResult(None, error="request expired"))
+    assert len(retry_producer.produced) == 2
+    assert tracker.committable() == []
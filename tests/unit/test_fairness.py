@@ -0,0 +1,147 @@
+"""Unit tests for per-customer fair consumption."""
+from confluent_kafka import TopicPartition
+
+from shared.fairness import FAIR_DEFERRED, FAIR_TOP_TALKERS, FairConsumer
+
+TOPIC = "ticket.events"
+
+
+class FakeMsg:
+    def __init__(self, offset, customer, partition=0):
+        self._offset, self._partition = offset, partition
+        self._headers = [("customer_id", customer.encode("utf-8"))] if customer else None
+
+    def topic(self):
+        return TOPIC
+
+    def partition(self):
+        return self._partition
+
+    def offset(self):
+        return self._offset
+
+    def value(self):
+        return b"{}"
+
+    def headers(self):
+        return self._headers
+
+    def error(self):
+        return None
+
+
+class FakeConsumer:
+    def __init__(self, msgs):
+        self.queue = list(msgs)
+        self.stored = []
+        self.seeks = []
+        self.subscribed = None
+
+    def poll(self, timeout):
+        return self.queue.pop(0) if self.queue else None
+
+    def store_offsets(self, offsets):
+        self.stored.append([(tp.partition, tp.offset) for tp in offsets])
+
+    def seek(self, partition):
+        self.seeks.append((partition.partition, partition.offset))
+
+    def pause(self, partitions):
+        pass
+
+    def resume(self, partitions):
+        pass
+
+    def subscribe(self, topics, **callbacks):
+        self.subscribed = (topics, callbacks)
+
+
+def _drain(consumer):
+    out = []
+    while (msg := consumer.poll(0)) is not None:
+        out.append(msg)
+    return out
+
+
+def test_noisy_customer_gets_one_turn_per_round():
+    msgs = [FakeMsg(i, "noisy") for i in range(6)] + [FakeMsg(6, "a"), FakeMsg(7, "b"), FakeMsg(8, "a")]
+    fair = FairConsumer(FakeConsumer(msgs), "fair-test")
+    order = [m.offset() for m in _drain(fair)]
+    # Round robin over noisy, a, b; noisy's backlog is served last but nothing is dropped.
+    assert order == [0, 6, 7, 1, 8, 2, 3, 4, 5]
+    assert FAIR_DEFERRED.labels(agent="fair-test")._value.get() == 6  # noisy 1-5 and a's second
+
+
+def test_quantum_lets_a_customer_take_several_per_turn():
+    msgs = [FakeMsg(i, "noisy") for i in range(4)] + [FakeMsg(4, "a")]
+    fair = FairConsumer(FakeConsumer(msgs), "fair-quantum", quantum=2)
+    assert [m.offset() for m in _drain(fair)] == [0, 1, 4, 2, 3]
+
+
+def test_lookahead_bounds_the_buffer():
+    inner = FakeConsumer([FakeMsg(i, "noisy") for i in range(10)] + [FakeMsg(10, "a")])
+    fair = FairConsumer(inner, "fair-lookahead", lookahead=3)
+    assert fair.poll(0).offset() == 0
+    assert len(fair) == 2 and len(inner.queue) == 8
+
+
+def test_stored_offsets_never_pass_buffered_messages():
+    inner = FakeConsumer([FakeMsg(0, "noisy"), FakeMsg(1, "noisy"), FakeMsg(2, "a")])
+    fair = FairConsumer(inner, "fair-offsets", track_offsets=True)
+    first, second = fair.poll(0), fair.poll(0)
+    assert (first.offset(), second.offset()) == (0, 2)
+    fair.store_offsets(message=second)  # offset 0 is still in flight
+    fair.store_offsets(message=first)  # offset 1 is still buffered
+    assert inner.stored == [[(0, 0)], [(0, 1)]]
+    fair.store_offsets(message=fair.poll(0))
+    assert inner.stored[-1] == [(0, 3)]
+
+    # Without track_offsets the loop's own positions are clamped below buffered messages.
+    inner = FakeConsumer([FakeMsg(0, "noisy"), FakeMsg(1, "noisy"), FakeMsg(2, "a")])
+    fair = FairConsumer(inner, "fair-clamp")
+    fair.poll(0), fair.poll(0)
+    fair.store_offsets(offsets=[TopicPartition(TOPIC, 0, 3)])
+    assert inner.stored == [[(0, 1)]]
+
+
+def test_seek_and_revoke_drop_buffered_messages():
+    inner = FakeConsumer([FakeMsg(0, "noisy"), FakeMsg(1, "noisy"), FakeMsg(2, "a"), FakeMsg(0, "b", partition=1)])
+    fair = FairConsumer(inner, "fair-seek")
+    assert fair.poll(0).offset() == 0
+    fair.seek(TopicPartition(TOPIC, 0, 0))
+    assert inner.seeks == [(0, 0)]
+    assert [(m.partition(), m.offset()) for m in _drain(fair)] == [(1, 0)]
+
+    fair.subscribe([TOPIC])
+    topics, callbacks = inner.subscribed
+    assert set(callbacks) == {"on_revoke", "on_lost"}
+    inner.queue = [FakeMsg(5, "a"), FakeMsg(6, "b", partition=1)]
+    fair.poll(0)  # buffers both, hands out one
+    callbacks["on_revoke"](inner, [TopicPartition(TOPIC, 0), TopicPartition(TOPIC, 1)])
+    assert len(fair) == 0
+
+
+def test_paused_partitions_are_not_handed_out():
+    inner = FakeConsumer([FakeMsg(0, "noisy"), FakeMsg(0, "a", partition=1)])
+    fair = FairConsumer(inner, "fair-pause")
+    fair.pause([TopicPartition(TOPIC, 0)])
+    assert fair.poll(0).partition() == 1
+    assert fair.poll(0) is None
+    fair.resume([TopicPartition(TOPIC, 0)])
+    assert fair.poll(0).offset() == 0
+
+
+def test_top_talkers_are_exported_and_expire():
+    now = [0.0]
+    inner = FakeConsumer([FakeMsg(i, "noisy") for i in range(3)] + [FakeMsg(3, "a")])
+    fair = FairConsumer(inner, "fair-top", top_talkers=1, report_interval_sec=10, clock=lambda: now[0])
+    _drain(fair)
+    now[0] = 11
+    inner.queue = [FakeMsg(4, "a")]
+    _drain(fair)
+    assert FAIR_TOP_TALKERS.labels(agent="fair-top", customer="noisy")._value.get() == 3
+    now[0] = 22
+    inner.queue = [FakeMsg(5, "b")]
+    _drain(fair)
+    samples = {s.labels["customer"] for s in FAIR_TOP_TALKERS.collect()[0].samples if s.labels["agent"] == "fair-top"}
+    assert samples == {"b"}
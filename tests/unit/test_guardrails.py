@@ -1,7 +1,24 @@
 """Unit tests for response guardrails."""
+import time
+
 import pytest
 
-from shared.guardrails import check_response
+import shared.guardrails as guardrails
+from shared.guardrails import (
+    FORBIDDEN_PHRASES,
+    GUARDRAIL_POLICY_SECONDS,
+    GUARDRAIL_REDACTIONS,
+    GuardrailEngine,
+    GuardrailResult,
+    GuardrailViolation,
+    StreamingGuard,
+    apply_guardrails,
+    check_response,
+    check_responses,
+    load_phrases,
+    luhn_valid,
+    redact_pii,
+)
 
 
 def test_check_response_passes_clean():
@@ -20,16 +37,48 @@ def test_check_response_forbidden_phrase_raises():
         check_response("Thank you. I am not a lawyer, but here is my view.")
 
 
-def test_check_response_pii_credit_card_raises():
+def test_check_response_pii_credit_card_raises(monkeypatch):
+    monkeypatch.setattr(guardrails, "PII_MODE", "reject")
     with pytest.raises(ValueError, match="PII"):
         check_response("Your refund will be sent to card 4111-1111-1111-1111.")
 
 
-def test_check_response_pii_ssn_raises():
+def test_check_response_pii_ssn_raises(monkeypatch):
+    monkeypatch.setattr(guardrails, "PII_MODE", "reject")
     with pytest.raises(ValueError, match="PII"):
         check_response("The SSN on file is 123-45-6789.")
 
 
+def test_redact_mode_masks_pii_in_place():
+    result = apply_guardrails(
+        "Card 4111 1111 1111 1111, SSN 123-45-6789, reach jo@example.com.", agent="redact-test", pii_mode="redact"
+    )
+    assert result.text == "Card [REDACTED CARD], SSN [REDACTED SSN], reach [REDACTED EMAIL]."
+    assert result.redactions == {"card": 1, "ssn": 1, "email": 1}
+    assert GUARDRAIL_REDACTIONS.labels(agent="redact-test", pattern="card")._value.get() == 1
+
+
+def test_card_numbers_must_pass_luhn():
+    assert luhn_valid("4111111111111111")
+    assert not luhn_valid("4111111111111112")
+    result = apply_guardrails("Order 1234 5678 9012 3456 has shipped.", pii_mode="redact")
+    assert not result.redacted
+    assert check_response("Order 1234-5678-9012-3456 has shipped.", policies=("pii",)) == "Order 1234-5678-9012-3456 has shipped."
+
+
+def test_allowed_email_domains_are_kept(monkeypatch):
+    monkeypatch.setattr(guardrails, "GUARDRAIL_ALLOWED_EMAIL_DOMAINS", ("example.com",))
+    text, counts = redact_pii("Write to billing@support.example.com or jo@gmail.com.")
+    assert text == "Write to billing@support.example.com or [REDACTED EMAIL]."
+    assert counts == {"email": 1}
+
+
+def test_forbidden_content_is_still_rejected_in_redact_mode():
+    with pytest.raises(GuardrailViolation) as exc:
+        apply_guardrails("Card 4111 1111 1111 1111. This is legal advice.", pii_mode="redact")
+    assert exc.value.policy == "forbidden"
+
+
 def test_check_response_policies_subset():
     # With only "length" policy, forbidden phrases are not checked
     result = check_response("I am not a doctor.", policies=("length",))
@@ -41,3 +90,115 @@ def test_check_response_forbidden_phrase_after_truncation_point_rejects():
     long_with_forbidden = "x" * 4500 + " I am not a lawyer."
     with pytest.raises(ValueError, match="forbidden phrase"):
         check_response(long_with_forbidden)
+
+
+def _feed_all(guard, chunks):
+    for chunk in chunks:
+        if not guard.feed(chunk):
+            return False
+    return True
+
+
+def test_streaming_guard_catches_pii_split_across_chunks():
+    guard = StreamingGuard(pii_mode="reject")
+    assert guard.feed("Your refund goes to card 4111-11")
+    with pytest.raises(GuardrailViolation) as exc:
+        _feed_all(guard, ["11-1111-11", "11 today."])
+    assert exc.value.policy == "pii"
+
+
+def test_streaming_guard_catches_forbidden_phrase_split_across_chunks():
+    guard = StreamingGuard()
+    with pytest.raises(GuardrailViolation, match="forbidden phrase"):
+        _feed_all(guard, ["Thanks. I am not a ", "law", "yer, but you qualify."])
+
+
+def test_streaming_guard_waits_for_match_to_complete():
+    """16 digits at the end of the buffer may still grow into a longer, non-PII number."""
+    guard = StreamingGuard()
+    assert guard.feed("Reference 1234567890123456")
+    assert guard.feed("78 was logged.")
+    assert guard.finish() == "Reference 123456789012345678 was logged."
+
+
+def test_streaming_guard_checks_trailing_match_on_finish():
+    guard = StreamingGuard(pii_mode="reject")
+    assert guard.feed("SSN 123-45-6789")
+    with pytest.raises(GuardrailViolation):
+        guard.finish()
+
+
+def test_streaming_guard_stops_at_max_length():
+    guard = StreamingGuard(max_length=100)
+    assert not _feed_all(guard, ["x" * 40] * 10)
+    assert guard.truncated and len(guard.text) == 120
+    assert guard.finish().endswith("[Response truncated for length.]")
+
+
+def test_streaming_guard_redact_mode_masks_draft_and_defers_final_masking():
+    guard = StreamingGuard(pii_mode="redact")
+    assert _feed_all(guard, ["Your card 4111 1111 ", "1111 1111 is on file. ", "x" * 60])
+    assert "[REDACTED CARD]" in guard.safe_text
+    assert "4111" not in guard.safe_text
+    assert "4111 1111 1111 1111" in guard.finish()
+
+
+def test_streaming_guard_never_shows_part_of_a_card_in_the_draft():
+    guard = StreamingGuard(pii_mode="redact")
+    guard.feed("y" * 50 + " 4111 1111 1111 1111 " + "z" * 30)
+    assert "4111" not in guard.safe_text and "1111" not in guard.safe_text
+
+
+def test_engine_matches_thousands_of_phrases_case_insensitively():
+    phrases = [f"do not say {i} things" for i in range(2000)] + ["Wire (now)", "wire"]
+    engine = GuardrailEngine(phrases)
+    found = engine.scan("Please WIRE (NOW). Also, Do Not Say 1999 Things.")
+    assert [(kind, engine.phrase(m)) for kind, m in found] == [
+        ("forbidden", "wire"),  # the shorter phrase ends the branch
+        ("forbidden", "do not say 1999 things"),
+    ]
+    assert engine.scan("Do not say 20000 things.") == []
+
+
+def test_ssn_next_to_a_rejected_card_is_still_found():
+    # Card pattern swallows "123-45-6789 1234" (13 digits) but it fails Luhn; the SSN inside counts.
+    text, counts = redact_pii("SSN 123-45-6789 1234 on file.")
+    assert text == "SSN [REDACTED SSN] 1234 on file."
+    assert counts == {"ssn": 1}
+
+
+def test_email_scan_does_not_backtrack_on_dotted_runs():
+    text = "a." * 50_000
+    engine = GuardrailEngine()
+    t0 = time.perf_counter()
+    assert engine.scan(text) == []
+    assert time.perf_counter() - t0 < 1.0
+
+
+def test_check_responses_returns_violations_in_place(monkeypatch):
+    monkeypatch.setattr(guardrails, "PII_MODE", "redact")
+    results = check_responses([
+        "  Your refund is on its way. ",
+        "This is legal advice.",
+        "Reach jo@gmail.com, SSN 123-45-6789.",
+        "y" * 5000,
+    ], agent="batch-test")
+    assert results[0] == GuardrailResult("Your refund is on its way.")
+    assert isinstance(results[1], GuardrailViolation) and results[1].policy == "forbidden"
+    assert results[2].text == "Reach [REDACTED EMAIL], SSN [REDACTED SSN]."
+    assert results[3].text.endswith("[Response truncated for length.]")
+    assert GUARDRAIL_POLICY_SECONDS.labels(policy="forbidden+pii")._sum.get() > 0
+
+
+def test_forbidden_phrases_file(tmp_path):
+    path = tmp_path / "phrases.txt"
+    path.write_text("# legal\nWe guarantee a win\n\n  act now  \n", encoding="utf-8")
+    engine = GuardrailEngine(FORBIDDEN_PHRASES + tuple(load_phrases(str(path))))
+    assert [engine.phrase(m) for _, m in engine.scan("Act now: we guarantee a WIN.")] == ["act now", "We guarantee a win"]
+
+
+def test_linear_time_engine_finds_the_same_matches():
+    pytest.importorskip("re2")
+    text = "SSN 123-45-6789 1234, card 4111 1111 1111 1111, mail jo@gmail.com. I am NOT a doctor."
+    backtracking, linear = GuardrailEngine(), GuardrailEngine(linear_time=True)
+    assert [(k, m.span()) for k, m in linear.scan(text)] == [(k, m.span()) for k, m in backtracking.scan(text)]
@@ -0,0 +1,45 @@
+"""Unit tests for header-first event routing."""
+from shared import headers
+from shared.headers import DECODE_BYTES_AVOIDED, HEADER_SKIPS, HEADERLESS_MESSAGES, Envelope
+
+
+class FakeMsg:
+    def __init__(self, value, msg_headers):
+        self._value, self._headers = value, msg_headers
+
+    def value(self):
+        return self._value
+
+    def headers(self):
+        return self._headers
+
+
+def test_event_headers_round_trip():
+    stamped = headers.event_headers("ticket.triaged", "t-1", priority="high", customer_id="C-1")
+    assert headers.read(FakeMsg(b"{}", stamped)) == Envelope(
+        event_type="ticket.triaged", schema_version="1", trace_id="t-1", priority="high", customer_id="C-1"
+    )
+    # Optional headers are left out rather than sent empty.
+    assert [k for k, _ in headers.event_headers("ticket.resolution.partial", "t-2")] == [
+        "event_type", "schema_version", "trace_id"
+    ]
+
+
+def test_read_ignores_unrelated_and_missing_headers():
+    assert headers.read(FakeMsg(b"{}", None)) == Envelope()
+    msg = FakeMsg(b"{}", [("retry_attempt", b"2"), ("trace_id", b"t-3"), ("priority", None)])
+    assert headers.read(msg) == Envelope(trace_id="t-3")
+
+
+def test_skip_counts_avoided_decodes():
+    other = FakeMsg(b'{"event_type": "ticket.resolved", "padding": "xxxxxxxx"}', [("event_type", b"ticket.resolved")])
+    assert headers.skip(other, headers.read(other), "ticket.triaged", "hdr-test")
+    assert HEADER_SKIPS.labels(agent="hdr-test", event_type="ticket.resolved")._value.get() == 1
+    assert DECODE_BYTES_AVOIDED.labels(agent="hdr-test")._value.get() == len(other.value())
+
+    wanted = FakeMsg(b"{}", [("event_type", b"ticket.triaged")])
+    assert not headers.skip(wanted, headers.read(wanted), "ticket.triaged", "hdr-test")
+
+    legacy = FakeMsg(b"{}", None)
+    assert not headers.skip(legacy, headers.read(legacy), "ticket.triaged", "hdr-test")
+    assert HEADERLESS_MESSAGES.labels(agent="hdr-test")._value.get() == 1
@@ -0,0 +1,51 @@
+"""Unit tests for the Kafka client factory profiles."""
+import pytest
+
+from shared import kafka
+
+
+def test_profiles_tune_producer_and_consumer():
+    low = kafka.producer_config("broker:9092", "low-latency")
+    bulk = kafka.producer_config("broker:9092", "high-throughput")
+    assert low["linger.ms"] == 0 and low["compression.type"] == "lz4"
+    assert bulk["linger.ms"] > low["linger.ms"] and bulk["compression.type"] == "zstd"
+    for name in kafka.PROFILES:
+        conf = kafka.producer_config("broker:9092", name)
+        assert conf["enable.idempotence"] is True and conf["acks"] == "all"
+    assert kafka.consumer_config("broker:9092", "g", "exactly-once")["isolation.level"] == "read_committed"
+
+
+def test_consumer_defaults_keep_manual_offset_storage():
+    conf = kafka.consumer_config("broker:9092", "triage-agent")
+    assert conf["group.id"] == "triage-agent"
+    assert conf["bootstrap.servers"] == "broker:9092"
+    assert conf["enable.auto.offset.store"] is False
+    assert conf["auto.offset.reset"] == "earliest"
+
+
+def test_env_overrides_apply_on_top_of_profile_and_settings_win(monkeypatch):
+    monkeypatch.setattr(kafka, "KAFKA_PRODUCER_OVERRIDES", "linger.ms=20, compression.type=gzip")
+    conf = kafka.producer_config("broker:9092", "high-throughput", {"compression.type": "none"})
+    assert conf["linger.ms"] == "20"
+    assert conf["compression.type"] == "none"
+    assert conf["batch.size"] == kafka.PROFILES["high-throughput"]["producer"]["batch.size"]
+
+
+def test_invalid_profile_and_overrides_fail_fast():
+    with pytest.raises(ValueError, match="Unknown Kafka profile"):
+        kafka.producer_config("broker:9092", "turbo")
+    with pytest.raises(ValueError, match="expected key=value"):
+        kafka.parse_overrides("linger.ms")
+    assert kafka.parse_overrides("") == {}
+
+
+def test_consumers_use_cooperative_assignor_and_static_membership(monkeypatch):
+    monkeypatch.setattr(kafka, "POD_NAME", "")
+    conf = kafka.consumer_config("broker:9092", "billing-agent")
+    assert conf["partition.assignment.strategy"] == "cooperative-sticky"
+    assert "group.instance.id" not in conf
+    monkeypatch.setattr(kafka, "POD_NAME", "billing-agent-0")
+    monkeypatch.setattr(kafka, "KAFKA_STATIC_MEMBERSHIP", False)
+    assert "group.instance.id" not in kafka.consumer_config("broker:9092", "billing-agent")
+    monkeypatch.setattr(kafka, "KAFKA_STATIC_MEMBERSHIP", True)
+    assert kafka.consumer_config("broker:9092", "billing-agent")["group.instance.id"] == "billing-agent-0"
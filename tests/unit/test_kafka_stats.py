@@ -0,0 +1,71 @@
+"""Unit tests for the librdkafka statistics exporter."""
+import json
+
+from shared.kafka_stats import (
+    BATCH_SIZE_BYTES,
+    BROKER_RTT,
+    CONSUMER_LAG,
+    FETCH_QUEUE_MESSAGES,
+    PRODUCER_QUEUE_MESSAGES,
+    KafkaStatsExporter,
+)
+
+
+def _window(p50, p99, avg, cnt=10):
+    return {"p50": p50, "p99": p99, "avg": avg, "cnt": cnt}
+
+
+def _partition(lag, fetchq=0, state="active"):
+    return {"fetch_state": state, "fetchq_cnt": fetchq, "fetchq_size": fetchq * 100,
+            "consumer_lag": lag + 5, "consumer_lag_stored": lag}
+
+
+def _consumer_stats(partitions):
+    return {
+        "type": "consumer",
+        "brokers": {
+            "kafka:9092/bootstrap": {"nodeid": -1, "rtt": _window(1, 1, 1)},
+            "kafka:9092/1": {"nodeid": 1, "nodename": "kafka:9092", "rtt": _window(2000, 9000, 2500)},
+        },
+        "topics": {"ticket.events": {"partitions": {"-1": _partition(0), **partitions}}},
+    }
+
+
+def _value(gauge, **labels):
+    return gauge.labels(**labels)._value.get()
+
+
+def test_consumer_lag_fetch_queue_and_rtt():
+    exporter = KafkaStatsExporter("stats-consumer")
+    exporter(json.dumps(_consumer_stats({"0": _partition(12, fetchq=3), "1": _partition(0, state="none")})))
+    assert _value(CONSUMER_LAG, agent="stats-consumer", topic="ticket.events", partition="0") == 12
+    assert _value(FETCH_QUEUE_MESSAGES, agent="stats-consumer", topic="ticket.events", partition="0") == 3
+    assert _value(BROKER_RTT, agent="stats-consumer", client="consumer", broker="kafka:9092", quantile="0.99") == 0.009
+    exported = {s.labels["partition"] for s in CONSUMER_LAG.collect()[0].samples if s.labels["agent"] == "stats-consumer"}
+    assert exported == {"0"}  # unassigned and internal partitions are skipped
+    brokers = {s.labels["broker"] for s in BROKER_RTT.collect()[0].samples if s.labels["agent"] == "stats-consumer"}
+    assert brokers == {"kafka:9092"}
+
+
+def test_revoked_partitions_are_removed():
+    exporter = KafkaStatsExporter("stats-revoke")
+    exporter(json.dumps(_consumer_stats({"0": _partition(1), "1": _partition(2)})))
+    exporter(json.dumps(_consumer_stats({"1": _partition(4)})))
+    exported = {s.labels["partition"] for s in CONSUMER_LAG.collect()[0].samples if s.labels["agent"] == "stats-revoke"}
+    assert exported == {"1"}
+
+
+def test_producer_queue_and_batch_sizes():
+    exporter = KafkaStatsExporter("stats-producer")
+    exporter(json.dumps({
+        "type": "producer",
+        "msg_cnt": 7,
+        "msg_size": 9000,
+        "topics": {"ticket.resolved": {"batchsize": _window(1200, 64000, 3000), "batchcnt": _window(1, 40, 3)}},
+    }))
+    assert _value(PRODUCER_QUEUE_MESSAGES, agent="stats-producer") == 7
+    assert _value(BATCH_SIZE_BYTES, agent="stats-producer", topic="ticket.resolved", quantile="0.5") == 1200
+
+
+def test_malformed_statistics_are_ignored():
+    KafkaStatsExporter("stats-bad")("not json")
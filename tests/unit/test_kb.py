@@ -0,0 +1,93 @@
+"""Unit tests for the memory-mapped BM25 knowledge base."""
+from shared.kb import Article, KnowledgeBase, answer, build_index, load_articles, parse_markdown, tokenize
+
+ARTICLES = [
+    Article(
+        "invoice-copy",
+        "How do I get a copy of an invoice?",
+        "Invoices are listed under Billing > Invoices. Each invoice can be downloaded as a PDF.",
+        "Hi, you can download invoices for $subject from Billing > Invoices.",
+        ("billing",),
+    ),
+    Article(
+        "reset-password",
+        "Resetting your password",
+        "Use the Forgot password link on the login page to get a reset email.\n\nReset links expire after one hour.",
+        "Use the Forgot password link on the login page.",
+    ),
+    Article("sso-setup", "Configuring SAML SSO", "Admins can configure SAML single sign-on under Settings > Security."),
+    Article("api-keys", "Managing API keys", "Create and revoke API keys under Settings > API. Keys are shown once."),
+]
+
+
+def _kb(tmp_path, articles=ARTICLES):
+    build_index(articles, tmp_path / "index")
+    return KnowledgeBase(tmp_path / "index")
+
+
+def test_tokenize_drops_stopwords_and_folds_plurals():
+    assert tokenize("How do I download my Invoices and copies?") == ["download", "invoice", "copy"]
+
+
+def test_search_ranks_matching_article_first(tmp_path):
+    kb = _kb(tmp_path)
+    results = kb.search("forgot my password, need a reset link", k=2)
+    assert kb.article(results[0][0]).id == "reset-password"
+    assert len(results) <= 2 and results[0][1] > (results[1][1] if len(results) > 1 else 0)
+    assert kb.search("completely unrelated words", k=3) == []
+
+
+def test_direct_answer_renders_template(tmp_path):
+    kb = _kb(tmp_path)
+    result = answer(kb, "billing", "billing", "Invoice copy", "How do I download a copy of my invoice PDF?", direct_min_score=1.0)
+    assert result.direct is not None and result.direct.article.id == "invoice-copy"
+    assert result.render(subject="Invoice copy", ticket_id="T-1") == "Hi, you can download invoices for Invoice copy from Billing > Invoices."
+
+
+def test_direct_answer_respects_types_and_thresholds(tmp_path):
+    kb = _kb(tmp_path)
+    text = ("Invoice copy", "How do I download a copy of my invoice PDF?")
+    # The article is limited to billing; other specialists get it as context instead.
+    other = answer(kb, "technical", "technical", *text, direct_min_score=1.0, context_min_score=0.1)
+    assert other.direct is None
+    assert other.hits[0].article.id == "invoice-copy"
+    assert "[How do I get a copy of an invoice?]" in other.context()
+    assert answer(kb, "billing", "billing", *text, direct_min_score=1000.0).direct is None
+
+
+def test_articles_without_template_only_provide_context(tmp_path):
+    kb = _kb(tmp_path)
+    result = answer(kb, "technical", "technical", "SAML SSO", "How do admins configure SAML single sign-on?", direct_min_score=0.1)
+    assert result.direct is None
+    assert result.hits and result.hits[0].article.id == "sso-setup"
+
+
+def test_snippet_is_the_best_matching_paragraph(tmp_path):
+    kb = _kb(tmp_path)
+    (hit,) = kb.hits("reset link expire", k=1)
+    assert hit.snippet == "Reset links expire after one hour."
+
+
+def test_load_markdown_and_json_articles(tmp_path):
+    src = tmp_path / "src"
+    src.mkdir()
+    (src / "refunds.md").write_text(
+        "---\nid: refund-policy\ntypes: billing, feature\n---\n# Refund policy\nRefunds take 5 days.\n\n## Response\nRefunds take 5 days.\n",
+        encoding="utf-8",
+    )
+    (src / "faq.json").write_text('[{"id": "trial", "title": "Trials", "body": "Trials last 14 days."}]', encoding="utf-8")
+    articles = {a.id: a for a in load_articles(src)}
+    assert articles["refund-policy"].types == ("billing", "feature")
+    assert articles["refund-policy"].title == "Refund policy"
+    assert articles["refund-policy"].template == "Refunds take 5 days."
+    assert articles["trial"].body == "Trials last 14 days."
+    assert parse_markdown("No front matter here", "plain").title == "plain"
+
+
+def test_reopened_index_is_memory_mapped(tmp_path):
+    meta = build_index(ARTICLES, tmp_path / "index")
+    assert meta["n_docs"] == len(ARTICLES)
+    first = KnowledgeBase(tmp_path / "index").search("api keys", k=1)
+    second = KnowledgeBase(tmp_path / "index").search("api keys", k=1)
+    assert first == second
+    assert KnowledgeBase(tmp_path / "index").article(first[0][0]).id == "api-keys"
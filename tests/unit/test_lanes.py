@@ -0,0 +1,110 @@
+"""Unit tests for priority lane routing and weighted lane polling."""
+from collections import Counter
+
+from shared.lanes import LaneScheduler
+from shared.topics import lane_of, lane_topics, topic_for_triage_type
+
+BILLING = "ticket.triaged.billing"
+
+
+class FakeTP:
+    def __init__(self, topic):
+        self.topic = topic
+
+
+class LaneConsumer:
+    """Serves per-topic backlogs round robin (as fetches interleave partitions), skipping paused topics."""
+
+    def __init__(self, backlog):
+        self.backlog = dict(backlog)
+        self.paused: set[str] = set()
+        self._next = 0
+
+    def assignment(self):
+        return [FakeTP(t) for t in self.backlog]
+
+    def pause(self, partitions):
+        self.paused.update(tp.topic for tp in partitions)
+
+    def resume(self, partitions):
+        self.paused.difference_update(tp.topic for tp in partitions)
+
+    def poll(self):
+        topics = list(self.backlog)
+        for i in range(len(topics)):
+            topic = topics[(self._next + i) % len(topics)]
+            if self.backlog[topic] and topic not in self.paused:
+                self.backlog[topic] -= 1
+                self._next = (self._next + i + 1) % len(topics)
+                return topic
+        return None
+
+
+def _drain(scheduler, consumer, n):
+    served = []
+    while len(served) < n:
+        topic = consumer.poll()
+        if topic is None:
+            scheduler.on_idle(consumer)
+            continue
+        served.append(topic)
+        scheduler.on_message(consumer, topic)
+    return served
+
+
+def test_topic_for_triage_type_routes_by_priority_lane():
+    assert topic_for_triage_type("billing", priority="critical") == "ticket.triaged.billing.p0"
+    assert topic_for_triage_type("technical", priority="low") == "ticket.triaged.technical.p3"
+    assert topic_for_triage_type("billing", priority="bogus") == "ticket.triaged.billing.p2"
+    assert topic_for_triage_type("billing") == BILLING
+    assert topic_for_triage_type("unknown", priority="critical") == "ticket.triaged.human"
+    assert topic_for_triage_type("billing", route_to_human=True, priority="high") == "ticket.triaged.human"
+
+
+def test_lane_helpers():
+    assert lane_topics(BILLING)[0] == "ticket.triaged.billing.p0"
+    assert lane_of("ticket.triaged.billing.p3") == "p3"
+    assert lane_of(BILLING) == ""
+
+
+def test_weighted_share_under_load():
+    topics = [BILLING, *lane_topics(BILLING)]
+    consumer = LaneConsumer({t: 1000 for t in topics})
+    scheduler = LaneScheduler("lanes-test", topics, {"p0": 8, "p1": 4, "p2": 2, "p3": 1})
+    served = Counter(_drain(scheduler, consumer, 17 * 10))  # ten rounds of 8 + 4 + 2 + 2 + 1
+    # The unlaned topic counts as p2.
+    assert served["ticket.triaged.billing.p0"] == 80
+    assert served["ticket.triaged.billing.p1"] == 40
+    assert served[BILLING] == served["ticket.triaged.billing.p2"] == 20
+    assert served["ticket.triaged.billing.p3"] == 10
+
+
+def test_lone_lane_is_never_paused():
+    topics = lane_topics(BILLING)
+    consumer = LaneConsumer({"ticket.triaged.billing.p3": 50})
+    scheduler = LaneScheduler("lanes-test", topics, {"p0": 8, "p3": 1})
+    assert len(_drain(scheduler, consumer, 50)) == 50
+    assert not consumer.paused
+
+
+def test_low_lane_resumes_when_high_lane_drains():
+    topics = lane_topics(BILLING)
+    consumer = LaneConsumer({"ticket.triaged.billing.p0": 3, "ticket.triaged.billing.p3": 10})
+    scheduler = LaneScheduler("lanes-test", topics, {"p0": 8, "p3": 1})
+    served = _drain(scheduler, consumer, 13)
+    assert served.count("ticket.triaged.billing.p0") == 3
+    assert served[-6:] == ["ticket.triaged.billing.p3"] * 6
+    assert not scheduler.paused
+
+
+def test_keep_paused_topics_are_not_resumed():
+    topics = lane_topics(BILLING)
+    consumer = LaneConsumer({t: 5 for t in topics})
+    scheduler = LaneScheduler("lanes-test", topics, {"p0": 2, "p1": 1, "p2": 1, "p3": 1})
+    scheduler.on_message(consumer, "ticket.triaged.billing.p0")
+    scheduler.on_message(consumer, "ticket.triaged.billing.p3")
+    assert "ticket.triaged.billing.p3" in scheduler.paused
+    assert scheduler.poll_timeout(1.0) == 0.1
+    scheduler.new_round(consumer, keep_paused={"ticket.triaged.billing.p3"})
+    assert "ticket.triaged.billing.p3" in consumer.paused
+    assert not scheduler.paused
@@ -0,0 +1,223 @@
+"""Unit tests for the LLM gateway: coalescing, caching and upstream limits."""
+import http.client
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from gateway.coalesce import ResponseCache, SingleFlight
+from gateway.server import Gateway, make_server
+
+
+class _StubUpstream:
+    """OpenAI-compatible upstream that counts calls and tracks peak concurrency."""
+
+    def __init__(self, delay: float = 0.2):
+        self.delay = delay
+        self.calls = 0
+        self.inflight = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with stub._lock:
+                    stub.calls += 1
+                    stub.inflight += 1
+                    stub.peak = max(stub.peak, stub.inflight)
+                time.sleep(stub.delay)
+                with stub._lock:
+                    stub.inflight -= 1
+                body = json.dumps({
+                    "choices": [{"message": {"content": payload["messages"][-1]["content"].upper()}}],
+                    "usage": {"prompt_tokens": 5, "completion_tokens": 2},
+                }).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}/v1"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+
+
+@pytest.fixture
+def stub():
+    s = _StubUpstream()
+    yield s
+    s.close()
+
+
+def _serve(gateway: Gateway):
+    server = make_server(gateway, host="127.0.0.1", port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _post(port: int, content: str, headers: dict | None = None) -> tuple[dict, str]:
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    body = json.dumps({"model": "llama3.2", "messages": [{"role": "user", "content": content}]})
+    conn.request("POST", "/v1/chat/completions", body=body, headers={"Content-Type": "application/json", **(headers or {})})
+    resp = conn.getresponse()
+    data = json.loads(resp.read())
+    outcome = resp.getheader("X-Gateway-Outcome")
+    conn.close()
+    return data, outcome
+
+
+def _post_concurrently(port: int, contents: list[str]) -> list[tuple[dict, str]]:
+    results: list = [None] * len(contents)
+
+    def worker(i):
+        results[i] = _post(port, contents[i])
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(contents))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_identical_concurrent_requests_share_one_upstream_call(stub):
+    server = _serve(Gateway({"ollama": stub.url}, cache_ttl_sec=0))
+    try:
+        results = _post_concurrently(server.server_port, ["same ticket"] * 5)
+    finally:
+        server.shutdown()
+    assert stub.calls == 1
+    assert all(data["choices"][0]["message"]["content"] == "SAME TICKET" for data, _ in results)
+    assert sorted(outcome for _, outcome in results) == ["coalesced"] * 4 + ["upstream"]
+
+
+def test_cache_serves_repeat_requests_and_no_cache_bypasses(stub):
+    stub.delay = 0
+    server = _serve(Gateway({"ollama": stub.url}))
+    try:
+        assert _post(server.server_port, "hello")[1] == "upstream"
+        assert _post(server.server_port, "hello")[1] == "cache_hit"
+        assert _post(server.server_port, "hello", {"Cache-Control": "no-cache"})[1] == "upstream"
+        # Different credentials never share a cached response.
+        assert _post(server.server_port, "hello", {"Authorization": "Bearer other"})[1] == "upstream"
+    finally:
+        server.shutdown()
+    assert stub.calls == 3
+
+
+def test_upstream_concurrency_limit_is_global(stub):
+    server = _serve(Gateway({"ollama": stub.url}, max_concurrency=2, cache_ttl_sec=0))
+    try:
+        _post_concurrently(server.server_port, [f"ticket {i}" for i in range(6)])
+    finally:
+        server.shutdown()
+    assert stub.calls == 6
+    assert stub.peak <= 2
+
+
+def test_model_prefix_routing():
+    gateway = Gateway({"ollama": "http://ollama:11434/v1", "openai": "https://api.openai.com/v1"}, {"gpt-": "openai"})
+    assert gateway.route("gpt-4o-mini").name == "openai"
+    assert gateway.route("llama3.2").name == "ollama"
+
+
+def test_singleflight_propagates_errors_to_waiters():
+    sf = SingleFlight()
+    started = threading.Event()
+    errors = []
+
+    def slow_fail():
+        started.set()
+        time.sleep(0.1)
+        raise ConnectionError("down")
+
+    def follower():
+        started.wait()
+        try:
+            sf.do("k", lambda: "unused")
+        except ConnectionError as e:
+            errors.append(e)
+
+    t = threading.Thread(target=follower)
+    t.start()
+    with pytest.raises(ConnectionError):
+        sf.do("k", slow_fail)
+    t.join()
+    assert len(errors) == 1
+
+
+def test_response_cache_ttl_and_lru():
+    now = [0.0]
+    cache = ResponseCache(max_entries=2, ttl_sec=10, clock=lambda: now[0])
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)  # evicts b (least recently used)
+    assert cache.get("b") is None and cache.get("a") == 1
+    now[0] = 10.0
+    assert cache.get("a") is None
+
+
+def test_malformed_upstream_response_is_a_502():
+    import socket
+
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen()
+
+    def answer_garbage():
+        while True:
+            conn, _ = listener.accept()
+            conn.recv(65536)
+            conn.sendall(b"not http\r\n\r\n")
+            conn.close()
+
+    threading.Thread(target=answer_garbage, daemon=True).start()
+    server = _serve(Gateway({"ollama": f"http://127.0.0.1:{listener.getsockname()[1]}/v1"}, cache_ttl_sec=0))
+    try:
+        payload = {"model": "llama3.2", "messages": [{"role": "user", "content": "hi"}]}
+        for method, path, body in (
+            ("POST", "/v1/chat/completions", payload),
+            ("POST", "/v1/chat/completions", {**payload, "stream": True}),
+            ("GET", "/v1/models", None),
+        ):
+            conn = http.client.HTTPConnection("127.0.0.1", server.server_port, timeout=10)
+            conn.request(method, path, body=json.dumps(body) if body else None)
+            resp = conn.getresponse()
+            assert resp.status == 502
+            assert "unavailable" in json.loads(resp.read())["error"]["message"]
+            conn.close()
+    finally:
+        server.shutdown()
+        listener.close()
+
+
+def test_bad_content_length_is_a_400(stub):
+    server = _serve(Gateway({"ollama": stub.url}))
+    try:
+        for length in ("abc", "-5"):
+            conn = http.client.HTTPConnection("127.0.0.1", server.server_port, timeout=10)
+            conn.putrequest("POST", "/v1/chat/completions")
+            conn.putheader("Content-Length", length)
+            conn.endheaders()
+            resp = conn.getresponse()
+            assert resp.status == 400
+            assert json.loads(resp.read())["error"]["message"] == "invalid Content-Length"
+            conn.close()
+    finally:
+        server.shutdown()
+    assert stub.calls == 0
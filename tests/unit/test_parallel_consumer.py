@@ -0,0 +1,163 @@
+"""Unit tests for the key-ordered parallel consumer."""
+import json
+import threading
+import time
+
+import pytest
+
+from shared.circuit_breaker import BackendUnavailableError, CircuitBreaker
+from shared.offsets import OffsetTracker
+from shared.parallel_consumer import KeyOrderedDispatcher, ordering_key, wait_for_any_capacity
+
+
+class FakeMsg:
+    def __init__(self, offset, key, value=b"{}", partition=0, topic="ticket.triaged.billing", headers=None):
+        self._offset, self._key, self._value = offset, key, value
+        self._partition, self._topic, self._headers = partition, topic, headers
+
+    def offset(self):
+        return self._offset
+
+    def key(self):
+        return self._key
+
+    def value(self):
+        return self._value
+
+    def partition(self):
+        return self._partition
+
+    def topic(self):
+        return self._topic
+
+    def headers(self):
+        return self._headers
+
+
+def _submit_all(dispatcher, tracker, msgs):
+    for m in msgs:
+        tracker.begin(m.topic(), m.partition(), m.offset())
+        dispatcher.submit(m)
+
+
+def test_same_key_in_order_different_keys_in_parallel():
+    tracker = OffsetTracker()
+    log, lock = [], threading.Lock()
+    active, peak = [0], [0]
+
+    def handler(msg):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+            log.append((msg.key(), msg.offset()))
+        return True
+
+    dispatcher = KeyOrderedDispatcher("billing", handler, tracker, max_workers=4)
+    msgs = [FakeMsg(i, b"A" if i % 2 == 0 else b"B") for i in range(8)]
+    _submit_all(dispatcher, tracker, msgs)
+    assert dispatcher.wait_idle(timeout=5)
+    dispatcher.shutdown()
+
+    assert [o for k, o in log if k == b"A"] == [0, 2, 4, 6]
+    assert [o for k, o in log if k == b"B"] == [1, 3, 5, 7]
+    assert peak[0] == 2  # one running per key
+    assert [tp.offset for tp in tracker.committable()] == [8]
+
+
+def test_commits_only_contiguous_completed_range():
+    tracker = OffsetTracker()
+    release = threading.Event()
+
+    def handler(msg):
+        if msg.offset() == 0:
+            release.wait(5)
+        return True
+
+    dispatcher = KeyOrderedDispatcher("technical", handler, tracker, max_workers=4)
+    _submit_all(dispatcher, tracker, [FakeMsg(0, b"slow"), FakeMsg(1, b"x"), FakeMsg(2, b"y")])
+    time.sleep(0.1)
+    assert [tp.offset for tp in tracker.committable()] == [0]
+    release.set()
+    assert dispatcher.wait_idle(timeout=5)
+    assert [tp.offset for tp in tracker.committable()] == [3]
+    dispatcher.shutdown()
+
+
+def test_inflight_limits_by_count_and_bytes():
+    release = threading.Event()
+    tracker = OffsetTracker()
+    dispatcher = KeyOrderedDispatcher(
+        "feature", lambda m: release.wait(5), tracker, max_workers=2, max_inflight=3, max_inflight_bytes=1000,
+    )
+    _submit_all(dispatcher, tracker, [FakeMsg(0, b"a"), FakeMsg(1, b"b")])
+    assert not dispatcher.saturated()
+    _submit_all(dispatcher, tracker, [FakeMsg(2, b"c")])
+    assert dispatcher.saturated() and not dispatcher.wait_for_capacity(timeout=0.05)
+    release.set()
+    assert dispatcher.wait_for_capacity(timeout=5)
+    assert dispatcher.wait_idle(timeout=5)
+
+    release.clear()
+    _submit_all(dispatcher, tracker, [FakeMsg(3, b"d", value=b"x" * 1200)])
+    assert dispatcher.saturated()
+    release.set()
+    assert dispatcher.wait_idle(timeout=5)
+    dispatcher.shutdown()
+
+
+def test_wait_for_any_capacity_wakes_when_one_shared_dispatcher_frees_up():
+    release = threading.Event()
+    tracker = OffsetTracker()
+    capacity = threading.Condition()
+    billing, technical = (
+        KeyOrderedDispatcher(name, lambda m: release.wait(5), tracker, max_inflight=1, condition=capacity)
+        for name in ("billing", "technical")
+    )
+    _submit_all(billing, tracker, [FakeMsg(0, b"a")])
+    assert wait_for_any_capacity([billing, technical], timeout=0.05)
+    _submit_all(technical, tracker, [FakeMsg(0, b"b", topic="ticket.triaged.technical")])
+    assert not wait_for_any_capacity([billing, technical], timeout=0.05)
+    release.set()
+    assert wait_for_any_capacity([billing, technical], timeout=5)
+    with pytest.raises(ValueError):
+        wait_for_any_capacity([billing, KeyOrderedDispatcher("feature", lambda m: True, tracker)], timeout=0)
+    for d in (billing, technical):
+        d.shutdown()
+
+
+def test_backend_failure_is_reported_and_queued_work_on_partition_dropped():
+    tracker = OffsetTracker()
+    breaker = CircuitBreaker("billing", "ollama")
+    started = threading.Event()
+    release = threading.Event()
+
+    def handler(msg):
+        if msg.offset() == 0:
+            started.set()
+            release.wait(5)
+            raise BackendUnavailableError(breaker, ConnectionError("down"))
+        return True
+
+    dispatcher = KeyOrderedDispatcher("billing", handler, tracker, max_workers=2)
+    _submit_all(dispatcher, tracker, [FakeMsg(0, b"A")])
+    started.wait(5)
+    _submit_all(dispatcher, tracker, [FakeMsg(1, b"A"), FakeMsg(2, b"A")])  # queued behind offset 0
+    release.set()
+    assert dispatcher.wait_idle(timeout=5)
+    failures = dispatcher.failures()
+    assert [m.offset() for m, _ in failures] == [0]
+    assert failures[0][1].breaker is breaker
+    assert [tp.offset for tp in tracker.committable()] == [0]
+    dispatcher.shutdown()
+
+
+def test_ordering_key_variants():
+    msg = FakeMsg(5, b"T-1", value=json.dumps({"customer_id": "C-9"}).encode())
+    assert ordering_key(msg) == "T-1"
+    assert ordering_key(msg, "customer_id") == "customer:C-9"
+    assert ordering_key(FakeMsg(6, None, partition=3)) == "partition:ticket.triaged.billing:3"
+    # The customer_id header wins, so the payload is not decoded.
+    assert ordering_key(FakeMsg(7, b"T-2", value=b"not json", headers=[("customer_id", b"C-3")]), "customer_id") == "customer:C-3"
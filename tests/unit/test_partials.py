@@ -0,0 +1,123 @@
+"""Unit tests for ticket.resolution.partial publishing."""
+import json
+from types import SimpleNamespace
+
+from shared import partials
+from shared.guardrails import StreamingGuard
+from shared.partials import PartialPublisher
+from shared.streaming import stream_openai
+
+
+class FakeProducer:
+    def __init__(self):
+        self.events = []
+
+    def produce(self, topic, key, value, headers):
+        self.events.append((topic, json.loads(value)))
+
+    def poll(self, timeout):
+        return 0
+
+
+def test_publishes_every_n_tokens_or_m_ms():
+    now = [0.0]
+    producer = FakeProducer()
+    pub = PartialPublisher(producer, "billing", "T-1", "trace-1", every_tokens=5, every_ms=100, clock=lambda: now[0])
+    pub.update("a" * 8)  # 2 tokens, 0 ms: wait
+    assert producer.events == []
+    pub.update("a" * 20)  # 5 tokens
+    now[0] = 0.05
+    pub.update("a" * 24)  # 1 new token, 50 ms since last: wait
+    now[0] = 0.2
+    pub.update("a" * 20)  # no growth past the last event: nothing to send
+    pub.update("a" * 28)  # 2 new tokens, 200 ms since last
+    events = [e for _, e in producer.events]
+    assert [e["sequence"] for e in events] == [1, 2]
+    assert [len(e["draft"]) for e in events] == [20, 28]
+    assert all(e["trace_id"] == "trace-1" and e["ticket_id"] == "T-1" and not e["aborted"] for e in events)
+    assert producer.events[0][0] == "ticket.resolution.partial"
+
+
+def test_abort_only_after_a_partial_was_sent():
+    producer = FakeProducer()
+    pub = PartialPublisher(producer, "billing", "T-1", "trace-1", every_tokens=1)
+    pub.abort()
+    assert producer.events == []
+    pub.update("Thanks for writing")
+    pub.abort()
+    assert producer.events[-1][1]["aborted"] is True and producer.events[-1][1]["draft"] == ""
+
+
+def test_streamed_drafts_never_include_the_unchecked_tail():
+    producer = FakeProducer()
+    texts = ["Thanks for reaching out about your invoice. ", "We have refunded the duplicate charge ", "to card 4111 1111 "]
+    events = [SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=t))], usage=None) for t in texts]
+
+    class Stream(list):
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            pass
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=lambda **kw: Stream(events))))
+    partials.begin(PartialPublisher(producer, "billing", "T-1", "trace-1", every_tokens=1))
+    try:
+        stream_openai("partials-test", "ollama", client, "m", "sys", "user", temperature=0.3)
+    finally:
+        partials.begin(None)
+    drafts = [e["draft"] for _, e in producer.events]
+    assert drafts and all("4111" not in d for d in drafts)
+    assert [e["sequence"] for _, e in producer.events] == list(range(1, len(drafts) + 1))
+
+
+def test_guard_safe_text_lags_by_scan_window():
+    guard = StreamingGuard()
+    guard.feed("x" * 100)
+    assert guard.safe_text == "x" * (100 - 40)
+
+
+def test_drafts_are_aborted_when_generation_fails(monkeypatch):
+    import pytest
+
+    import shared.specialist_base as specialist_base
+    from shared.circuit_breaker import BackendUnavailableError, CircuitBreaker
+
+    class Msg:
+        def topic(self):
+            return "ticket.triaged.billing"
+
+        def partition(self):
+            return 0
+
+        def offset(self):
+            return 0
+
+        def value(self):
+            return json.dumps({"event_type": "ticket.triaged", "ticket_id": "T-1", "subject": "Refund"}).encode()
+
+        def headers(self):
+            return []
+
+    errors = [RuntimeError("stream reset"), BackendUnavailableError(CircuitBreaker("billing", "ollama"))]
+
+    def generate(ticket_id, subject, body, reasoning, **kwargs):
+        partials.publish_draft("Thanks for writing, your refund")
+        raise errors.pop(0)
+
+    monkeypatch.setattr(specialist_base, "DEFERRED_BATCH_ENABLED", False)
+    monkeypatch.setattr(specialist_base, "PARTIAL_EVENTS_ENABLED", True)
+    monkeypatch.setattr(specialist_base, "PARTIAL_EVENTS_EVERY_TOKENS", 1)
+    producer = FakeProducer()
+    definition = specialist_base.SpecialistDefinition(
+        name="billing",
+        input_topic="ticket.triaged.billing",
+        generate_response=generate,
+        get_trace_id=lambda payload: "trace-1",
+    )
+    specialist = specialist_base._Specialist(definition, producer, None, partials_producer=producer)
+
+    assert specialist.handle(Msg()) is True  # llm_error: skipped (no retry topics)
+    with pytest.raises(BackendUnavailableError):
+        specialist.handle(Msg())
+    assert [e["aborted"] for _, e in producer.events] == [False, True, False, True]
@@ -0,0 +1,183 @@
+"""Unit tests for the rebalance callbacks and drain-on-close."""
+import threading
+
+from confluent_kafka import TopicPartition
+
+from shared import shutdown
+from shared.batch import DeferredBatcher, DeferredTicket, LocalBatchBackend
+from shared.offsets import OffsetTracker
+from shared.rebalance import REBALANCE_SECONDS, REVOKED_INFLIGHT, RebalanceListener, drain_and_close
+
+
+class FakeConsumer:
+    def __init__(self):
+        self.stored = {}
+        self.commits = 0
+        self.closed = False
+
+    def subscribe(self, topics, **callbacks):
+        self.callbacks = callbacks
+
+    def store_offsets(self, offsets):
+        for tp in offsets:
+            self.stored[(tp.topic, tp.partition)] = tp.offset
+
+    def commit(self, asynchronous=True):
+        self.commits += 1
+
+    def close(self):
+        self.closed = True
+
+
+class FakeProducer:
+    def flush(self, timeout=None):
+        return 0
+
+
+def _sample(metric, **labels):
+    value = metric.labels(**labels)
+    return value._value.get() if hasattr(value, "_value") else value._sum.get()
+
+
+def test_revoke_waits_for_inflight_then_commits_finished_offsets():
+    tracker = OffsetTracker()
+    capacity = threading.Condition()
+    listener = RebalanceListener("test-revoke", tracker, capacity, drain_sec=2)
+    consumer = FakeConsumer()
+    listener.subscribe(consumer, ["t"])
+    tracker.begin("t", 0, 0)
+    tracker.begin("t", 0, 1)
+
+    def finish():
+        with capacity:
+            tracker.done("t", 0, 0)
+            tracker.done("t", 0, 1)
+            capacity.notify_all()
+
+    threading.Timer(0.05, finish).start()
+    consumer.callbacks["on_revoke"](consumer, [TopicPartition("t", 0)])
+
+    assert consumer.stored == {("t", 0): 2}
+    assert consumer.commits == 1
+    assert tracker.in_flight() == 0
+
+
+def test_revoke_counts_tickets_still_inflight_after_drain_timeout():
+    tracker = OffsetTracker()
+    listener = RebalanceListener("test-abandon", tracker, threading.Condition(), drain_sec=0.01)
+    consumer = FakeConsumer()
+    tracker.begin("t", 0, 0)
+    tracker.begin("t", 0, 1)
+    tracker.done("t", 0, 0)
+    tracker.begin("t", 1, 5)
+
+    listener.on_revoke(consumer, [TopicPartition("t", 0)])
+
+    # Offset 0 is committed; 1 is abandoned to the next owner; partition 1 is untouched.
+    assert consumer.stored[("t", 0)] == 1
+    assert _sample(REVOKED_INFLIGHT, agent="test-abandon", reason="revoke") == 1
+    assert tracker.in_flight("t", 0) == 0
+    assert tracker.in_flight("t", 1) == 1
+
+
+def test_revoke_drops_deferred_tickets_of_revoked_partitions():
+    now = [0.0]
+    tracker = OffsetTracker()
+    delivered = []
+    batcher = DeferredBatcher(
+        "billing",
+        LocalBatchBackend(lambda r: "ok", complete_after=60, clock=lambda: now[0]),
+        lambda t, r: delivered.append((t.partition, t.offset)),
+        max_size=2,
+        poll_interval_sec=0,
+        clock=lambda: now[0],
+    )
+    listener = RebalanceListener("test-deferred", tracker, drain_sec=0, batchers=[batcher])
+
+    def defer(partition, offset):
+        tracker.begin("t", partition, offset)
+        batcher.add(DeferredTicket(
+            request={"custom_id": f"t-{partition}-{offset}", "ticket": ("T", "s", "b", "r")},
+            payload={"ticket_id": "T"}, trace_id="", topic="t", partition=partition, offset=offset,
+        ))
+
+    defer(0, 0)
+    defer(1, 5)
+    batcher.tick()  # submitted, in progress
+    defer(0, 1)  # buffered
+    listener.on_revoke(FakeConsumer(), [TopicPartition("t", 0)])
+
+    assert batcher.pending_count == 1
+    now[0] = 60.0
+    batcher.tick()
+    assert delivered == [(1, 5)]
+
+
+def test_assign_observes_rebalance_duration_and_lost_does_not_commit():
+    now = [100.0]
+    tracker = OffsetTracker()
+    listener = RebalanceListener("test-timing", tracker, clock=lambda: now[0])
+    consumer = FakeConsumer()
+    listener.subscribe(consumer, ["t"])
+    now[0] = 103.0
+    listener.on_assign(consumer, [TopicPartition("t", 0)])
+    assert _sample(REBALANCE_SECONDS, agent="test-timing") == 3.0
+
+    tracker.begin("t", 0, 7)
+    listener.on_lost(consumer, [TopicPartition("t", 0)])
+    assert consumer.commits == 0
+    assert _sample(REVOKED_INFLIGHT, agent="test-timing", reason="lost") == 1
+
+
+def test_drain_and_close_commits_and_closes_after_dispatchers_go_idle():
+    calls = []
+
+    class Dispatcher:
+        def wait_idle(self, timeout=None):
+            calls.append(("wait_idle", timeout))
+            tracker.done("t", 0, 0)
+
+        def shutdown(self, wait=True):
+            calls.append(("shutdown", wait))
+
+    tracker = OffsetTracker()
+    tracker.begin("t", 0, 0)
+    consumer = FakeConsumer()
+    try:
+        shutdown.request("test")
+        drain_and_close("test-drain", consumer, FakeProducer(), tracker, [Dispatcher()])
+    finally:
+        shutdown.reset()
+
+    assert calls[0][0] == "wait_idle" and 0 < calls[0][1] <= shutdown.SHUTDOWN_GRACE_SEC
+    assert calls[1] == ("shutdown", False)
+    assert consumer.stored == {("t", 0): 1}
+    assert consumer.commits == 1 and consumer.closed
+
+
+def test_transaction_is_committed_on_revoke_and_aborted_on_loss():
+    class Transaction:
+        def __init__(self):
+            self.calls = []
+
+        def record(self, offsets):
+            self.calls.append(("record", [(tp.topic, tp.partition, tp.offset) for tp in offsets]))
+
+        def commit(self):
+            self.calls.append("commit")
+
+        def abort(self):
+            self.calls.append("abort")
+
+    tracker = OffsetTracker()
+    transaction = Transaction()
+    listener = RebalanceListener("test-txn", tracker, transaction=transaction)
+    consumer = FakeConsumer()
+    tracker.begin("t", 0, 4)
+    tracker.done("t", 0, 4)
+
+    listener.on_revoke(consumer, [TopicPartition("t", 0)])
+    listener.on_lost(consumer, [TopicPartition("t", 1)])
+
+    assert transaction.calls == [("record", [("t", 0, 5)]), "commit", "abort"]
+    assert consumer.stored == {} and consumer.commits == 0
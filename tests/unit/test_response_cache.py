@@ -0,0 +1,58 @@
+"""Unit tests for the specialist response cache."""
+from shared.response_cache import RESPONSE_CACHE_REQUESTS, SpecialistResponseCache, normalize
+
+
+def _cache(**kwargs):
+    now = [0.0]
+    cache = SpecialistResponseCache("cache-test", "You are a billing specialist.", clock=lambda: now[0], **kwargs)
+    return cache, now
+
+
+def test_normalize_masks_customer_specific_values():
+    text, masked = normalize("Copy of invoice #10442 for jo@example.com, please!")
+    assert text == "copy of invoice <num> for <email> please"
+    assert masked == ["jo@example.com", "10442"]
+
+
+def test_exact_hit_ignores_case_punctuation_and_numbers():
+    cache, _ = _cache()
+    assert cache.put("billing", "Invoice copy", "How do I get a copy of invoice 1001?", "Open Billing > Invoices and click Download.", 2.0)
+    hit = cache.get("billing", "invoice COPY", "how do i get a copy of invoice 2002")
+    assert hit is not None and hit.response.startswith("Open Billing")
+    assert cache.get("technical", "Invoice copy", "How do I get a copy of invoice 1001?") is None
+
+
+def test_near_duplicate_hit_and_threshold():
+    cache, _ = _cache(similarity=0.6)
+    body = "Hi, how do I get a copy of my last invoice from the billing portal"
+    cache.put("billing", "Invoice", body, "Open Billing > Invoices.", 1.5)
+    before = RESPONSE_CACHE_REQUESTS.labels(agent="cache-test", outcome="near_hit")._value.get()
+    assert cache.get("billing", "Invoice", "hello, how do I get a copy of my last invoice from the billing portal?") is not None
+    assert RESPONSE_CACHE_REQUESTS.labels(agent="cache-test", outcome="near_hit")._value.get() == before + 1
+    assert cache.get("billing", "Invoice", "Why was I charged twice this month?") is None
+
+
+def test_prompt_version_is_part_of_the_key():
+    cache, _ = _cache()
+    cache.put("billing", "SSO", "Do you support SSO?", "Yes, on the Enterprise plan.", 1.0)
+    other = SpecialistResponseCache("cache-test", "A new prompt.")
+    assert other.get("billing", "SSO", "Do you support SSO?") is None
+
+
+def test_customer_specific_responses_are_not_stored():
+    cache, _ = _cache()
+    assert not cache.put("billing", "Refund", "Refund for order 88123", "We refunded order 88123 today.", 1.0)
+    assert not cache.put("billing", "Plan", "Which plan am I on?", "You are on the Premium tier.", 1.0, sensitive=["premium"])
+    assert cache.put("billing", "Plan", "Which plan am I on?", "See Settings > Plan.", 1.0, sensitive=["premium"])
+
+
+def test_ttl_and_lru_eviction():
+    cache, now = _cache(max_entries=2, ttl_sec=60)
+    cache.put("billing", "a", "first question here", "A", 1.0)
+    cache.put("billing", "b", "second question here", "B", 1.0)
+    cache.get("billing", "a", "first question here")
+    cache.put("billing", "c", "third question here", "C", 1.0)  # evicts b
+    assert cache.get("billing", "b", "second question here") is None
+    assert cache.get("billing", "a", "first question here").response == "A"
+    now[0] = 60.0
+    assert cache.get("billing", "a", "first question here") is None
@@ -0,0 +1,126 @@
+"""Unit tests for retry tiers, the dead-letter topic and the retry scheduler."""
+import pytest
+
+from shared.retry import (
+    HEADER_ATTEMPT,
+    HEADER_DUE_AT,
+    HEADER_ORIGIN,
+    RetryPublisher,
+    RetryScheduler,
+    attempt,
+    header,
+    parse_tiers,
+)
+
+TIERS = [("30s", 30.0), ("5m", 300.0)]
+
+
+class Msg:
+    def __init__(self, topic, headers=None, offset=0, partition=0, value=b'{"ticket_id": "T-1"}'):
+        self._topic, self._headers, self._offset, self._partition, self._value = topic, headers, offset, partition, value
+
+    def topic(self):
+        return self._topic
+
+    def partition(self):
+        return self._partition
+
+    def offset(self):
+        return self._offset
+
+    def key(self):
+        return b"T-1"
+
+    def value(self):
+        return self._value
+
+    def headers(self):
+        return self._headers
+
+    def error(self):
+        return None
+
+
+class Producer:
+    def __init__(self):
+        self.produced = []
+
+    def produce(self, topic, key, value, headers, callback=None):
+        self.produced.append(Msg(topic, headers, value=value))
+
+    def flush(self, timeout=None):
+        return 0
+
+
+class SchedulerConsumer:
+    def __init__(self, msgs):
+        self.msgs = list(msgs)
+        self.paused, self.seeks, self.stored = set(), [], []
+
+    def poll(self, timeout):
+        for i, msg in enumerate(self.msgs):
+            if (msg.topic(), msg.partition()) not in self.paused:
+                return self.msgs.pop(i)
+        return None
+
+    def seek(self, tp):
+        self.seeks.append((tp.topic, tp.partition, tp.offset))
+
+    def pause(self, partitions):
+        self.paused.update((tp.topic, tp.partition) for tp in partitions)
+
+    def resume(self, partitions):
+        self.paused.difference_update((tp.topic, tp.partition) for tp in partitions)
+
+    def store_offsets(self, message):
+        self.stored.append(message.offset())
+
+
+def test_parse_tiers():
+    assert parse_tiers("30s, 5m,1h") == [("30s", 30.0), ("5m", 300.0), ("1h", 3600.0)]
+    with pytest.raises(ValueError):
+        parse_tiers("soon")
+
+
+def test_failures_escalate_through_tiers_then_dead_letter():
+    producer = Producer()
+    publisher = RetryPublisher("retry-test", producer, TIERS, clock=lambda: 1000.0)
+    msg = Msg("ticket.triaged.billing.p0", headers=[("trace_id", b"abc")])
+
+    assert publisher.schedule(msg, "llm_error", "boom") == "30s"
+    first = producer.produced[-1]
+    assert first.topic() == "ticket.triaged.billing.retry.30s"
+    assert attempt(first) == 1
+    assert header(first, HEADER_ORIGIN) == "ticket.triaged.billing.p0"
+    assert header(first, HEADER_DUE_AT) == "1030000"
+    assert header(first, "trace_id") == "abc"
+
+    assert publisher.schedule(first, "llm_error") == "5m"
+    second = producer.produced[-1]
+    assert second.topic() == "ticket.triaged.billing.retry.5m"
+    assert attempt(second) == 2
+    assert [k for k, _ in second.headers()].count(HEADER_ATTEMPT) == 1
+
+    assert publisher.schedule(second, "guardrail") == "dlq"
+    assert producer.produced[-1].topic() == "ticket.triaged.billing.dlq"
+
+
+def test_scheduler_waits_for_due_time_then_redelivers():
+    now = [1000.0]
+    due = Msg("ticket.events.retry.30s", headers=[(HEADER_DUE_AT, b"1030000"), (HEADER_ORIGIN, b"ticket.events")], offset=7)
+    consumer = SchedulerConsumer([due])
+    producer = Producer()
+    scheduler = RetryScheduler("retry-test", consumer, producer, clock=lambda: now[0])
+
+    scheduler.poll_once()
+    assert consumer.paused == {("ticket.events.retry.30s", 0)}
+    assert consumer.seeks == [("ticket.events.retry.30s", 0, 7)]
+    assert producer.produced == [] and consumer.stored == []
+
+    # The seek put the message back; the fake replays it once the partition resumes.
+    consumer.msgs.append(due)
+    now[0] = 1031.0
+    scheduler.poll_once()
+    assert not consumer.paused
+    assert [m.topic() for m in producer.produced] == ["ticket.events"]
+    assert consumer.stored == [7]
@@ -0,0 +1,77 @@
+"""Unit tests for triage shadow-mode evaluation."""
+import json
+import threading
+from unittest.mock import MagicMock, patch
+
+from triage.shadow import ShadowEvaluator, sampled
+from triage.telemetry import SHADOW_AGREEMENT, SHADOW_REQUESTS
+
+PRIMARY = {"type": "billing", "priority": "high", "reasoning": "Refund.", "confidence": 0.9}
+
+
+def _wait(evaluator: ShadowEvaluator) -> None:
+    evaluator.shutdown(wait=True)
+
+
+def test_sampling_is_deterministic_per_ticket():
+    ids = [f"T-{i}" for i in range(2000)]
+    picked = [t for t in ids if sampled(t, 0.1)]
+    assert 100 < len(picked) < 300
+    assert picked == [t for t in ids if sampled(t, 0.1)]
+    assert not sampled("T-1", 0) and sampled("T-1", 1)
+
+
+def test_records_agreement_latency_and_tokens(tmp_path):
+    results = tmp_path / "shadow.jsonl"
+    evaluator = ShadowEvaluator("ollama", "qwen2.5:0.5b", sample_rate=1.0, results_path=results)
+    candidate = {"type": "billing", "priority": "medium", "reasoning": "Bill.", "confidence": 0.95}
+    before = SHADOW_AGREEMENT.labels(candidate="ollama:qwen2.5:0.5b", field="priority", agree="false")._value.get()
+    with patch.object(evaluator, "classify", return_value=(candidate, 120, 30)):
+        assert evaluator.submit("T1", "trace-1", "Refund", "charged twice", "email", PRIMARY, 1.5)
+        _wait(evaluator)
+
+    record = json.loads(results.read_text())
+    assert record["agree"] == {"type": True, "priority": False, "route": True}
+    assert (record["input_tokens"], record["output_tokens"]) == (120, 30)
+    assert record["primary_latency_ms"] == 1500.0
+    after = SHADOW_AGREEMENT.labels(candidate="ollama:qwen2.5:0.5b", field="priority", agree="false")._value.get()
+    assert after == before + 1
+
+
+def test_candidate_failure_is_recorded_not_raised(tmp_path):
+    results = tmp_path / "shadow.jsonl"
+    evaluator = ShadowEvaluator("openai", "gpt-4o-mini", sample_rate=1.0, results_path=results)
+    with patch.object(evaluator, "classify", side_effect=TimeoutError("slow")):
+        evaluator.submit("T2", "trace-2", "s", "b", "portal", PRIMARY, 0.2)
+        _wait(evaluator)
+    assert json.loads(results.read_text())["error"] == "slow"
+
+
+def test_submit_drops_instead_of_queueing_when_saturated():
+    release = threading.Event()
+    evaluator = ShadowEvaluator("ollama", "llama3.2", sample_rate=1.0, max_concurrency=1, max_pending=1)
+    before = SHADOW_REQUESTS.labels(candidate="ollama:llama3.2", outcome="dropped")._value.get()
+    with patch.object(evaluator, "classify", side_effect=lambda *a: (release.wait(5), (PRIMARY, 1, 1))[1]):
+        assert evaluator.submit("T3", "t", "s", "b", "portal", PRIMARY, 0.1)
+        assert not evaluator.submit("T4", "t", "s", "b", "portal", PRIMARY, 0.1)
+        release.set()
+        _wait(evaluator)
+    assert SHADOW_REQUESTS.labels(candidate="ollama:llama3.2", outcome="dropped")._value.get() == before + 1
+
+
+def test_handle_message_routes_on_primary_and_submits_shadow():
+    import triage.agent as agent
+
+    msg = MagicMock()
+    msg.value.return_value = json.dumps({
+        "event_type": "ticket.created", "ticket_id": "T5", "customer_id": "C1",
+        "subject": "Refund", "body": "charged twice",
+    }).encode("utf-8")
+    producer = MagicMock()
+    shadow = MagicMock()
+    with patch.object(agent, "classify_ticket", return_value=PRIMARY), \
+            patch.object(agent, "get_shadow", return_value=shadow):
+        agent.handle_message(msg, producer)
+    assert producer.produce.call_args.args[0] == "ticket.triaged.billing"
+    args = shadow.submit.call_args.args
+    assert (args[0], args[2:5], args[5]) == ("T5", ("Refund", "charged twice", "portal"), PRIMARY)
@@ -0,0 +1,505 @@
+"""Unit tests for hosting several specialists on one consumer."""
+import json
+import threading
+import time
+
+import pytest
+
+import shared.kafka as shared_kafka
+import shared.partials as partials
+import shared.shutdown as shutdown
+import shared.transactions as transactions
+import shared.specialist_base as specialist_base
+from shared.specialist_base import SpecialistDefinition, run_specialists
+from shared.guardrails import GuardrailResult
+from shared.kb import Article, KnowledgeBase, build_index
+from specialists.host import load_definitions
+
+
+class _Stop(Exception):
+    pass
+
+
+class FakeMsg:
+    def __init__(self, topic, offset, ticket_id, partition=0, headers=None, **fields):
+        self._topic, self._offset, self._partition, self._headers = topic, offset, partition, headers
+        self._value = json.dumps({"event_type": "ticket.triaged", "ticket_id": ticket_id, **fields}).encode("utf-8")
+        self._key = ticket_id.encode("utf-8")
+
+    def topic(self):
+        return self._topic
+
+    def partition(self):
+        return self._partition
+
+    def offset(self):
+        return self._offset
+
+    def key(self):
+        return self._key
+
+    def value(self):
+        return self._value
+
+    def timestamp(self):
+        return 1, 0
+
+    def headers(self):
+        return self._headers
+
+    def error(self):
+        return None
+
+
+class FakeTopicPartition:
+    def __init__(self, topic, partition):
+        self.topic, self.partition = topic, partition
+
+
+class FakeConsumer:
+    """Serves queued messages from unpaused topics, then stops the loop once everything is stored."""
+
+    instances: list = []
+
+    def __init__(self, conf):
+        self.conf = conf
+        self.queue: list[FakeMsg] = []
+        self.topics: list[str] = []
+        self.paused: set[str] = set()
+        self.stored: dict[tuple[str, int], int] = {}
+        self.expected = 0
+        self.commits = 0
+        self.closed = False
+        FakeConsumer.instances.append(self)
+
+    def subscribe(self, topics, **callbacks):
+        self.topics = list(topics)
+        self.callbacks = callbacks
+
+    def assignment(self):
+        return [FakeTopicPartition(t, 0) for t in self.topics]
+
+    def pause(self, partitions):
+        self.paused.update(tp.topic for tp in partitions)
+
+    def resume(self, partitions):
+        self.paused.difference_update(tp.topic for tp in partitions)
+
+    def position(self, partitions):
+        return []
+
+    def store_offsets(self, offsets):
+        for tp in offsets:
+            self.stored[(tp.topic, tp.partition)] = tp.offset
+
+    def commit(self, asynchronous=True):
+        self.commits += 1
+
+    def consumer_group_metadata(self):
+        return "metadata"
+
+    def close(self):
+        self.closed = True
+
+    def poll(self, timeout):
+        for i, msg in enumerate(self.queue):
+            if msg.topic() not in self.paused:
+                return self.queue.pop(i)
+        if sum(self.stored.values()) >= self.expected:
+            raise _Stop
+        return None
+
+
+class FakeProducer:
+    instances: list = []
+
+    def __init__(self, conf):
+        self.conf = conf
+        self.produced = []
+        self.topics = []
+        self.headers = []
+        self.transactions = []
+        FakeProducer.instances.append(self)
+
+    def __len__(self):
+        return 0
+
+    def poll(self, timeout):
+        return 0
+
+    def init_transactions(self, timeout):
+        pass
+
+    def begin_transaction(self):
+        self.transactions.append({})
+
+    def send_offsets_to_transaction(self, offsets, metadata, timeout):
+        self.transactions[-1].update({(tp.topic, tp.partition): tp.offset for tp in offsets})
+
+    def commit_transaction(self, timeout):
+        pass
+
+    def produce(self, topic, key, value, headers, callback=None):
+        self.topics.append(topic)
+        self.produced.append(json.loads(value))
+        self.headers.append(dict(headers))
+
+    def flush(self, timeout=None):
+        return 0
+
+
+@pytest.fixture
+def kafka(monkeypatch):
+    FakeConsumer.instances = []
+    FakeProducer.instances = []
+    monkeypatch.setattr(shared_kafka, "Consumer", FakeConsumer)
+    monkeypatch.setattr(shared_kafka, "Producer", FakeProducer)
+    monkeypatch.setattr(specialist_base, "DEFERRED_BATCH_ENABLED", False)
+    monkeypatch.setattr(specialist_base, "apply_guardrails", lambda text, agent: GuardrailResult(text))
+    return FakeConsumer
+
+
+def _definition(name, topic, generate, concurrency=1, on_processed=None):
+    return SpecialistDefinition(
+        name=name,
+        input_topic=topic,
+        generate_response=generate,
+        get_trace_id=lambda payload: "trace",
+        on_processed=on_processed,
+        concurrency=concurrency,
+    )
+
+
+def _run(kafka, definitions, msgs, **kwargs):
+    original_init = kafka.__init__
+
+    def init(self, conf):
+        original_init(self, conf)
+        self.queue = list(msgs)
+        self.expected = len(msgs)
+
+    kafka.__init__ = init
+    try:
+        with pytest.raises(_Stop):
+            run_specialists(definitions, "localhost:9092", **kwargs)
+    finally:
+        kafka.__init__ = original_init
+    return kafka.instances[-1]
+
+
+def test_dispatches_by_topic_and_commits_each_partition(kafka):
+    seen = []
+    lock = threading.Lock()
+
+    def generate(name):
+        def _generate(ticket_id, subject, body, reasoning):
+            with lock:
+                seen.append((name, ticket_id))
+            return f"{name} reply"
+        return _generate
+
+    definitions = [
+        _definition("billing", "ticket.triaged.billing", generate("billing")),
+        _definition("technical", "ticket.triaged.technical", generate("technical"), concurrency=2),
+    ]
+    msgs = [FakeMsg("ticket.triaged.billing", i, f"b{i}") for i in range(3)]
+    msgs += [FakeMsg("ticket.triaged.technical", i, f"t{i}") for i in range(4)]
+    consumer = _run(kafka, definitions, msgs)
+
+    assert consumer.conf["group.id"] == "specialists-agent"
+    assert sorted(consumer.topics) == ["ticket.triaged.billing", "ticket.triaged.technical"]
+    assert sorted(seen) == sorted([("billing", f"b{i}") for i in range(3)] + [("technical", f"t{i}") for i in range(4)])
+    assert consumer.stored == {("ticket.triaged.billing", 0): 3, ("ticket.triaged.technical", 0): 4}
+
+
+def test_saturated_specialist_pauses_only_its_topic(kafka, monkeypatch):
+    monkeypatch.setattr(specialist_base, "SPECIALIST_MAX_INFLIGHT", 1)
+    release = threading.Event()
+    technical_done, timed_out = [], []
+
+    def slow_billing(ticket_id, subject, body, reasoning):
+        if not release.wait(timeout=5):
+            timed_out.append(ticket_id)
+        return "billing reply"
+
+    def technical(ticket_id, subject, body, reasoning):
+        technical_done.append(ticket_id)
+        if len(technical_done) == 3:
+            release.set()  # billing is still blocked until every technical ticket got through
+        return "technical reply"
+
+    definitions = [
+        _definition("billing", "ticket.triaged.billing", slow_billing),
+        _definition("technical", "ticket.triaged.technical", technical),
+    ]
+    msgs = [FakeMsg("ticket.triaged.billing", i, f"b{i}") for i in range(2)]
+    msgs += [FakeMsg("ticket.triaged.technical", i, f"t{i}") for i in range(3)]
+    consumer = _run(kafka, definitions, msgs)
+
+    assert technical_done == ["t0", "t1", "t2"]
+    assert not timed_out
+    assert consumer.stored[("ticket.triaged.billing", 0)] == 2
+
+
+def test_single_specialist_keeps_its_group(kafka):
+    definition = _definition("billing", "ticket.triaged.billing", lambda *args: "reply")
+    consumer = _run(kafka, [definition], [FakeMsg("ticket.triaged.billing", 0, "b0")])
+    assert consumer.conf["group.id"] == "billing-agent"
+    assert consumer.stored == {("ticket.triaged.billing", 0): 1}
+
+
+def test_rejects_duplicate_topics():
+    generate = lambda *args: "reply"  # noqa: E731
+    with pytest.raises(ValueError):
+        run_specialists(
+            [_definition("a", "ticket.triaged.billing", generate), _definition("b", "ticket.triaged.billing", generate)],
+            "localhost:9092",
+        )
+
+
+def test_load_definitions_applies_quotas():
+    definitions = load_definitions(["billing", "feature"], {"billing": 3}, default_quota=1)
+    assert [(d.name, d.input_topic, d.concurrency) for d in definitions] == [
+        ("billing", "ticket.triaged.billing", 3),
+        ("feature", "ticket.triaged.feature_request", 1),
+    ]
+    with pytest.raises(ValueError):
+        load_definitions(["billing"], {"technical": 2})
+
+
+def test_response_cache_skips_generation_for_repeat_questions(kafka, monkeypatch):
+    monkeypatch.setattr(specialist_base, "RESPONSE_CACHE_ENABLED", True)
+    calls = []
+
+    def generate(ticket_id, subject, body, reasoning):
+        calls.append(ticket_id)
+        return "Open Billing > Invoices and click Download."
+
+    definition = _definition("billing", "ticket.triaged.billing", generate)
+    msgs = [FakeMsg("ticket.triaged.billing", i, f"b{i}") for i in range(3)]
+    _run(kafka, [definition], msgs)
+    assert calls == ["b0"]
+
+
+def test_response_cache_stores_the_redacted_response(kafka, monkeypatch):
+    monkeypatch.setattr(specialist_base, "RESPONSE_CACHE_ENABLED", True)
+    monkeypatch.setattr(
+        specialist_base,
+        "apply_guardrails",
+        lambda text, agent: GuardrailResult(text.replace("555-0100", "[PHONE]"), {"phone": 1}),
+    )
+    stored = []
+    monkeypatch.setattr(specialist_base.SpecialistResponseCache, "put", lambda self, *args, **kwargs: stored.append(args[3]))
+
+    definition = _definition("billing", "ticket.triaged.billing", lambda *args: "Call us on 555-0100.")
+    _run(kafka, [definition], [FakeMsg("ticket.triaged.billing", 0, "b0")])
+    assert [e["response"] for p in FakeProducer.instances for e in p.produced] == ["Call us on [PHONE]."]
+    assert stored == ["Call us on [PHONE]."]
+
+
+def test_kb_answers_directly_or_passes_context(kafka, monkeypatch, tmp_path):
+    build_index([
+        Article("invoice-copy", "Invoice copies", "Download any invoice PDF from Billing > Invoices.",
+                "Invoices for $ticket_id are under Billing > Invoices.", ("billing",)),
+    ], tmp_path)
+    monkeypatch.setattr(specialist_base.kb, "get_kb", lambda: KnowledgeBase(tmp_path))
+    monkeypatch.setattr(specialist_base, "KB_DIRECT_MIN_SCORE", 0.5)
+    monkeypatch.setattr(specialist_base, "KB_CONTEXT_MIN_SCORE", 0.1)
+    calls, resolved = [], {}
+
+    def generate(ticket_id, subject, body, reasoning, context=""):
+        calls.append((ticket_id, context))
+        return "Drafted reply."
+
+    def on_processed(ticket_id, response):
+        resolved[ticket_id] = response
+
+    definitions = [
+        _definition("billing", "ticket.triaged.billing", generate, on_processed=on_processed),
+        _definition("technical", "ticket.triaged.technical", generate, on_processed=on_processed),
+    ]
+    body = "Where can I download my invoice PDF?"
+    msgs = [
+        FakeMsg("ticket.triaged.billing", 0, "b0", type="billing", body=body),
+        FakeMsg("ticket.triaged.technical", 0, "t0", type="technical", body=body),
+    ]
+    _run(kafka, definitions, msgs)
+    assert resolved["b0"] == "Invoices for b0 are under Billing > Invoices."
+    # Limited to billing, so the technical specialist gets the article as LLM context instead.
+    assert [c[0] for c in calls] == ["t0"]
+    assert "[Invoice copies]" in calls[0][1]
+
+
+def test_priority_lanes_are_consumed_by_the_type_specialist(kafka, monkeypatch):
+    monkeypatch.setattr(specialist_base, "PRIORITY_LANES_ENABLED", True)
+    seen = []
+
+    def generate(ticket_id, subject, body, reasoning):
+        seen.append(ticket_id)
+        return "ok"
+
+    msgs = [
+        FakeMsg("ticket.triaged.billing.p3", 0, "low"),
+        FakeMsg("ticket.triaged.billing.p0", 0, "critical"),
+        FakeMsg("ticket.triaged.billing", 0, "legacy"),
+    ]
+    consumer = _run(kafka, [_definition("billing", "ticket.triaged.billing", generate)], msgs)
+    assert consumer.topics == [
+        "ticket.triaged.billing",
+        "ticket.triaged.billing.p0",
+        "ticket.triaged.billing.p1",
+        "ticket.triaged.billing.p2",
+        "ticket.triaged.billing.p3",
+    ]
+    assert sorted(seen) == ["critical", "legacy", "low"]
+    assert consumer.stored[("ticket.triaged.billing.p0", 0)] == 1
+
+
+def test_failed_generation_goes_to_retry_topic(kafka, monkeypatch):
+    monkeypatch.setattr(specialist_base, "RETRY_ENABLED", True)
+    monkeypatch.setattr(specialist_base, "RETRY_TIERS", "30s")
+    schedulers = []
+    monkeypatch.setattr(specialist_base, "start_retry_scheduler", lambda *args, **kwargs: schedulers.append(kwargs))
+
+    def generate(ticket_id, subject, body, reasoning):
+        raise RuntimeError("model overloaded")
+
+    consumer = _run(kafka, [_definition("billing", "ticket.triaged.billing", generate)], [FakeMsg("ticket.triaged.billing", 0, "b0")])
+    assert FakeProducer.instances[-1].topics == ["ticket.triaged.billing.retry.30s"]
+    assert schedulers == [{"group_id": "billing-agent-retry"}]
+    # The failed ticket is not holding the partition: its offset is stored.
+    assert consumer.stored[("ticket.triaged.billing", 0)] == 1
+
+
+def test_headers_filter_without_decoding_and_are_stamped_on_resolved(kafka):
+    seen = []
+
+    def generate(ticket_id, subject, body, reasoning):
+        seen.append(ticket_id)
+        return "reply"
+
+    other = FakeMsg("ticket.triaged.billing", 0, "b0", headers=[("event_type", b"ticket.resolved")])
+    other._value = b"not json"  # never decoded, so never dead-lettered either
+    triaged = FakeMsg(
+        "ticket.triaged.billing",
+        1,
+        "b1",
+        headers=[("event_type", b"ticket.triaged"), ("trace_id", b"hdr-trace")],
+        priority="high",
+        customer_id="C-1",
+    )
+    consumer = _run(kafka, [_definition("billing", "ticket.triaged.billing", generate)], [other, triaged])
+
+    assert seen == ["b1"]
+    assert consumer.stored[("ticket.triaged.billing", 0)] == 2
+    producer = FakeProducer.instances[-1]
+    assert producer.produced[0]["trace_id"] == "hdr-trace"
+    assert producer.headers[0] == {
+        "event_type": b"ticket.resolved",
+        "schema_version": b"1",
+        "trace_id": b"hdr-trace",
+        "priority": b"high",
+        "customer_id": b"C-1",
+    }
+
+
+def test_shutdown_stops_polling_and_drains_inflight_before_closing(kafka):
+    def generate(ticket_id, subject, body, reasoning):
+        shutdown.request("test")
+        time.sleep(0.1)
+        return "reply"
+
+    msgs = [FakeMsg("ticket.triaged.billing", i, f"b{i}") for i in range(6)]
+    original_init = kafka.__init__
+
+    def init(self, conf):
+        original_init(self, conf)
+        self.queue = list(msgs)
+        self.expected = len(msgs)
+
+    kafka.__init__ = init
+    try:
+        run_specialists([_definition("billing", "ticket.triaged.billing", generate, concurrency=2)], "localhost:9092")
+    finally:
+        kafka.__init__ = original_init
+        shutdown.reset()
+
+    consumer = kafka.instances[-1]
+    polled = len(msgs) - len(consumer.queue)
+    # Everything polled before the shutdown finished and was committed; the rest stays for the next owner.
+    assert 0 < polled
+    assert consumer.stored[("ticket.triaged.billing", 0)] == polled
+    assert len(FakeProducer.instances[-1].produced) == polled
+    assert consumer.commits == 1 and consumer.closed
+
+
+def test_exactly_once_commits_offsets_in_the_transaction_not_the_consumer(kafka, monkeypatch):
+    monkeypatch.setattr(transactions, "KAFKA_PROFILE", "exactly-once")
+    monkeypatch.setattr(specialist_base, "PARTIAL_EVENTS_ENABLED", True)
+    monkeypatch.setattr(specialist_base, "PARTIAL_EVENTS_EVERY_TOKENS", 1)
+    processed = []
+
+    def generate(ticket_id, subject, body, reasoning):
+        partials.publish_draft("Thanks for reaching out, we are looking into the charge")
+        return "reply"
+
+    def on_processed(ticket_id, response):
+        processed.append(ticket_id)
+        if len(processed) == 3:
+            shutdown.request("test")
+
+    msgs = [FakeMsg("ticket.triaged.billing", i, f"b{i}") for i in range(3)]
+    original_init = kafka.__init__
+
+    def init(self, conf):
+        original_init(self, conf)
+        self.queue = list(msgs)
+        self.expected = len(msgs) + 1  # never reached: offsets go to the transaction
+
+    kafka.__init__ = init
+    try:
+        definition = _definition("billing", "ticket.triaged.billing", generate, on_processed=on_processed)
+        run_specialists([definition], "localhost:9092")
+    finally:
+        kafka.__init__ = original_init
+        shutdown.reset()
+
+    consumer = kafka.instances[-1]
+    producer = next(p for p in FakeProducer.instances if "transactional.id" in p.conf)
+    assert producer.conf["transactional.id"].startswith("billing-agent-")
+    assert consumer.conf["enable.auto.commit"] is False
+    assert producer.topics == ["ticket.resolved"] * 3
+    assert producer.transactions[-1][("ticket.triaged.billing", 0)] == 3
+    # Drafts stream outside the transaction, so read_committed consumers see them before the commit.
+    side = next(p for p in FakeProducer.instances if p is not producer and p.topics)
+    assert side.topics == ["ticket.resolution.partial"] * 3
+    assert "transactional.id" not in side.conf
+    assert consumer.stored == {} and consumer.commits == 0 and consumer.closed
+
+
+def test_exactly_once_refuses_parallel_workers(kafka, monkeypatch):
+    monkeypatch.setattr(transactions, "KAFKA_PROFILE", "exactly-once")
+    with pytest.raises(ValueError, match="parallel_workers"):
+        run_specialists([_definition("billing", "ticket.triaged.billing", lambda *a: "r", concurrency=2)], "localhost:9092")
+
+
+def test_rejected_kb_answer_goes_to_retry_topic(kafka, monkeypatch, tmp_path):
+    build_index([
+        Article("invoice-copy", "Invoice copies", "Download any invoice PDF from Billing > Invoices.",
+                "Invoices for $ticket_id are under Billing > Invoices.", ("billing",)),
+    ], tmp_path)
+    monkeypatch.setattr(specialist_base.kb, "get_kb", lambda: KnowledgeBase(tmp_path))
+    monkeypatch.setattr(specialist_base, "KB_DIRECT_MIN_SCORE", 0.5)
+    monkeypatch.setattr(specialist_base, "RETRY_ENABLED", True)
+    monkeypatch.setattr(specialist_base, "RETRY_TIERS", "30s")
+    monkeypatch.setattr(specialist_base, "start_retry_scheduler", lambda *args, **kwargs: None)
+
+    def reject(text, agent):
+        raise ValueError("forbidden phrase")
+
+    monkeypatch.setattr(specialist_base, "apply_guardrails", reject)
+    definition = _definition("billing", "ticket.triaged.billing", lambda *args, **kwargs: pytest.fail("KB answers directly"))
+    msg = FakeMsg("ticket.triaged.billing", 0, "b0", type="billing", body="Where can I download my invoice PDF?")
+    consumer = _run(kafka, [definition], [msg])
+    assert FakeProducer.instances[-1].topics == ["ticket.triaged.billing.retry.30s"]
+    assert consumer.stored[("ticket.triaged.billing", 0)] == 1
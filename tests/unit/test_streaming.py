@@ -0,0 +1,76 @@
+"""Unit tests for streaming generation with incremental guardrails."""
+from types import SimpleNamespace
+
+import pytest
+
+import shared.guardrails as guardrails
+from shared.guardrails import GuardrailViolation
+from shared.streaming import GUARDRAIL_STREAM_STOPS, GUARDRAIL_TOKENS_SAVED, stream_anthropic, stream_openai
+
+
+class FakeStream:
+    def __init__(self, items):
+        self.items = items
+        self.consumed = 0
+        self.closed = False
+
+    def __iter__(self):
+        for item in self.items:
+            self.consumed += 1
+            yield item
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.closed = True
+
+
+def _openai_client(texts, usage=None):
+    events = [SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=t))], usage=None) for t in texts]
+    events.append(SimpleNamespace(choices=[], usage=usage))
+    stream = FakeStream(events)
+    calls = []
+
+    def create(**kwargs):
+        calls.append(kwargs)
+        return stream
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    return client, stream, calls
+
+
+def _value(counter, **labels):
+    return counter.labels(**labels)._value.get()
+
+
+def test_openai_stream_returns_checked_text():
+    usage = SimpleNamespace(prompt_tokens=20, completion_tokens=5)
+    client, stream, calls = _openai_client(["Thanks for ", "writing in. ", ""], usage)
+    text = stream_openai("stream-test", "ollama", client, "m", "sys", "user", temperature=0.3)
+    assert text == "Thanks for writing in."
+    assert calls[0]["stream"] is True
+    assert stream.closed
+
+
+def test_openai_stream_aborts_on_pii_and_counts_saved_tokens(monkeypatch):
+    monkeypatch.setattr(guardrails, "PII_MODE", "reject")
+    before = _value(GUARDRAIL_TOKENS_SAVED, agent="stream-abort", reason="pii")
+    chunks = ["Card ", "4111 1111 ", "1111 1111 ", "is on file."] + ["More text. "] * 50
+    client, stream, _ = _openai_client(chunks)
+    with pytest.raises(GuardrailViolation):
+        stream_openai("stream-abort", "ollama", client, "m", "sys", "user", temperature=0.3, max_tokens=256)
+    assert stream.consumed == 3  # stopped as soon as the card number was complete
+    assert stream.closed
+    assert _value(GUARDRAIL_STREAM_STOPS, agent="stream-abort", reason="pii") == 1
+    assert _value(GUARDRAIL_TOKENS_SAVED, agent="stream-abort", reason="pii") - before > 240
+
+
+def test_anthropic_stream_stops_at_length():
+    stream = FakeStream(["y" * 1000] * 10)
+    stream.text_stream = iter(stream)
+    client = SimpleNamespace(messages=SimpleNamespace(stream=lambda **kwargs: stream))
+    text = stream_anthropic("stream-length", client, "claude", "sys", "user", max_tokens=4096)
+    assert stream.consumed == 5
+    assert text.endswith("[Response truncated for length.]")
+    assert _value(GUARDRAIL_STREAM_STOPS, agent="stream-length", reason="length") == 1
@@ -0,0 +1,104 @@
+"""Unit tests for the stub LLM server (tests/stub_llm)."""
+import http.client
+import json
+import random
+import threading
+
+import pytest
+
+from tests.stub_llm import StubConfig, classify, make_server, parse_latency
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def _start(**kwargs):
+        server = make_server(StubConfig(**{"latency": "fixed:0", **kwargs}), port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield _start
+    for s in servers:
+        s.shutdown()
+
+
+def _post(server, path: str, payload: dict) -> tuple[int, bytes]:
+    conn = http.client.HTTPConnection("127.0.0.1", server.server_port, timeout=10)
+    conn.request("POST", path, body=json.dumps(payload), headers={"Content-Type": "application/json"})
+    resp = conn.getresponse()
+    data = resp.read()
+    conn.close()
+    return resp.status, data
+
+
+def test_openai_triage_response_is_valid_json(serve):
+    server = serve()
+    status, data = _post(server, "/v1/chat/completions", {
+        "model": "llama3.2",
+        "messages": [
+            {"role": "system", "content": "You are a support ticket triage agent."},
+            {"role": "user", "content": "Subject: Refund\nBody:\nI was charged twice"},
+        ],
+    })
+    assert status == 200
+    body = json.loads(data)
+    out = json.loads(body["choices"][0]["message"]["content"])
+    assert (out["type"], out["priority"]) == ("billing", "high")
+    assert body["usage"]["completion_tokens"] > 0
+
+
+def test_openai_streaming_reassembles_to_full_text(serve):
+    server = serve()
+    status, data = _post(server, "/v1/chat/completions", {
+        "model": "m", "stream": True, "stream_options": {"include_usage": True},
+        "messages": [{"role": "system", "content": "billing specialist"}, {"role": "user", "content": "hi"}],
+    })
+    assert status == 200
+    events = [line[len("data: "):] for line in data.decode().splitlines() if line.startswith("data: ")]
+    assert events[-1] == "[DONE]"
+    chunks = [json.loads(e) for e in events[:-1]]
+    text = "".join(c["choices"][0]["delta"].get("content", "") for c in chunks)
+    assert text.startswith("Thank you for reaching out.")
+    assert "usage" in chunks[-1]
+
+
+def test_anthropic_messages_format(serve):
+    server = serve()
+    status, data = _post(server, "/v1/messages", {
+        "model": "claude-3-5-haiku-20241022", "max_tokens": 256, "system": "You are a triage agent.",
+        "messages": [{"role": "user", "content": "The app crashes on login"}],
+    })
+    body = json.loads(data)
+    assert status == 200 and body["type"] == "message"
+    assert json.loads(body["content"][0]["text"])["type"] == "technical"
+    assert set(body["usage"]) == {"input_tokens", "output_tokens"}
+
+
+def test_error_injection_and_queue_model(serve):
+    server = serve(rate_429=1.0)
+    status, _ = _post(server, "/v1/chat/completions", {"messages": []})
+    assert status == 429
+
+    server = serve(rate_5xx=1.0)
+    assert _post(server, "/v1/messages", {"messages": []})[0] == 503
+
+    server = serve(latency="fixed:0.1", max_concurrency=2)
+    threads = [threading.Thread(target=_post, args=(server, "/v1/chat/completions", {"messages": []})) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    stats = server.stats.as_dict()
+    assert stats["completed"] == 6 and stats["peak_inflight"] <= 2
+
+
+def test_latency_profiles():
+    rng = random.Random(1)
+    assert parse_latency("fixed:0.25")() == 0.25
+    assert 0.1 <= parse_latency("uniform:0.1,0.2", rng)() <= 0.2
+    assert parse_latency("lognormal:0.5,0.3", rng)() > 0
+    with pytest.raises(ValueError):
+        parse_latency("gamma:1")
+    assert classify("Could you add dark mode? Feature request")["type"] == "feature_request"
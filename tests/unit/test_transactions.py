@@ -0,0 +1,158 @@
+"""Unit tests for exactly-once transaction batching."""
+import pytest
+from confluent_kafka import OFFSET_BEGINNING, KafkaError, KafkaException, TopicPartition
+
+from shared import transactions
+from shared.offsets import OffsetTracker
+from shared.transactions import TRANSACTIONS, TransactionBatch
+
+
+class FakeMsg:
+    def __init__(self, topic, partition, offset):
+        self._topic, self._partition, self._offset = topic, partition, offset
+
+    def topic(self):
+        return self._topic
+
+    def partition(self):
+        return self._partition
+
+    def offset(self):
+        return self._offset
+
+
+class FakeProducer:
+    def __init__(self, fail_commit=()):
+        self.calls = []
+        self.queued = 0
+        self.fail_commit = list(fail_commit)
+
+    def __len__(self):
+        return self.queued
+
+    def init_transactions(self, timeout):
+        self.calls.append("init")
+
+    def begin_transaction(self):
+        self.calls.append("begin")
+
+    def produce(self, topic, key=None, value=None, headers=None, callback=None):
+        self.queued += 1
+        self.calls.append(("produce", topic))
+
+    def poll(self, timeout):
+        return 0
+
+    def flush(self, timeout=None):
+        raise AssertionError("flush must be left to commit_transaction")
+
+    def send_offsets_to_transaction(self, offsets, metadata, timeout):
+        self.calls.append(("offsets", {(tp.topic, tp.partition): tp.offset for tp in offsets}, metadata))
+
+    def commit_transaction(self, timeout):
+        if self.fail_commit:
+            raise KafkaException(self.fail_commit.pop(0))
+        self.queued = 0
+        self.calls.append("commit")
+
+    def abort_transaction(self, timeout):
+        self.queued = 0
+        self.calls.append("abort")
+
+
+class FakeConsumer:
+    def __init__(self, committed=None):
+        self.seeks = []
+        self._committed = committed or {}
+
+    def consumer_group_metadata(self):
+        return "group-metadata"
+
+    def committed(self, partitions, timeout=None):
+        return [
+            TopicPartition(tp.topic, tp.partition, self._committed.get((tp.topic, tp.partition), -1001))
+            for tp in partitions
+        ]
+
+    def seek(self, tp):
+        self.seeks.append((tp.topic, tp.partition, tp.offset))
+
+
+def _sample(agent, outcome):
+    return TRANSACTIONS.labels(agent=agent, outcome=outcome)._value.get()
+
+
+def test_transaction_commits_output_and_offsets_after_max_messages():
+    producer = FakeProducer()
+    batch = TransactionBatch("test-txn", FakeConsumer(), producer, max_messages=2, max_ms=60_000)
+
+    for offset in (0, 1):
+        batch.producer.produce("ticket.resolved", key=b"k", value=b"v")
+        assert batch.producer.flush(10) == offset + 1  # nothing waits for delivery per ticket
+        batch.consumer.store_offsets(message=FakeMsg("ticket.triaged.billing", 0, offset))
+        batch.maybe_commit()
+
+    assert producer.calls == [
+        "init",
+        "begin",
+        ("produce", "ticket.resolved"),
+        ("produce", "ticket.resolved"),
+        ("offsets", {("ticket.triaged.billing", 0): 2}, "group-metadata"),
+        "commit",
+    ]
+    assert not batch.open
+
+
+def test_transaction_commits_when_window_elapses():
+    now = [0.0]
+    producer = FakeProducer()
+    batch = TransactionBatch("test-window", FakeConsumer(), producer, max_messages=100, max_ms=500, clock=lambda: now[0])
+    batch.consumer.store_offsets(offsets=[TopicPartition("t", 3, 8)])
+    assert batch.maybe_commit() is False
+    now[0] = 0.5
+    assert batch.maybe_commit() is True
+    assert producer.calls[-2:] == [("offsets", {("t", 3): 8}, "group-metadata"), "commit"]
+    assert batch.maybe_commit() is False  # nothing open
+
+
+def test_abortable_commit_error_aborts_and_rewinds_to_committed_offsets():
+    tracker = OffsetTracker()
+    producer = FakeProducer(fail_commit=[KafkaError(KafkaError._STATE, "fenced epoch", txn_requires_abort=True)])
+    consumer = FakeConsumer(committed={("t", 0): 40})
+    batch = TransactionBatch("test-abort", consumer, producer, tracker=tracker)
+    tracker.begin("t", 0, 40)
+    tracker.done("t", 0, 40)
+    batch.producer.produce("ticket.resolved")
+    batch.consumer.store_offsets(offsets=tracker.committable() + [TopicPartition("t", 1, 5)])
+
+    assert batch.commit() is False
+    assert producer.calls[-1] == "abort"
+    assert consumer.seeks == [("t", 0, 40), ("t", 1, OFFSET_BEGINNING)]
+    assert tracker.committable() == []
+    assert _sample("test-abort", "aborted") == 1
+
+
+def test_retriable_commit_error_is_retried_and_fatal_errors_raise():
+    producer = FakeProducer(fail_commit=[KafkaError(KafkaError._TIMED_OUT, "slow coordinator", retriable=True)])
+    batch = TransactionBatch("test-retry", FakeConsumer(), producer)
+    batch.producer.produce("ticket.triaged.billing")
+    assert batch.commit() is True
+    assert producer.calls[-1] == "commit"
+
+    producer.fail_commit = [KafkaError(KafkaError._FENCED, "fenced", fatal=True)]
+    batch.producer.produce("ticket.triaged.billing")
+    with pytest.raises(KafkaException):
+        batch.commit()
+
+
+def test_exactly_once_mode_settings_and_unsupported_features(monkeypatch):
+    monkeypatch.setattr(transactions, "KAFKA_PROFILE", "low-latency")
+    assert transactions.producer_settings("billing-agent") is None
+    transactions.check_supported("billing", FAIRNESS_ENABLED=True)
+
+    monkeypatch.setattr(transactions, "KAFKA_PROFILE", "exactly-once")
+    monkeypatch.setattr(transactions, "POD_NAME", "billing-agent-0")
+    assert transactions.producer_settings("billing-agent") == {"transactional.id": "billing-agent-billing-agent-0"}
+    assert transactions.consumer_settings() == {"enable.auto.commit": False}
+    with pytest.raises(ValueError, match="FAIRNESS_ENABLED"):
+        transactions.check_supported("billing", FAIRNESS_ENABLED=True, DEFERRED_BATCH_ENABLED=False)
@@ -0,0 +1,79 @@
+"""Unit tests for LLM usage accounting and hourly budget."""
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from shared import usage
+from shared.usage import (
+    HourlyBudget,
+    estimate_cost,
+    estimate_tokens,
+    record_openai_usage,
+    record_usage,
+    select_provider,
+    start_ticket,
+    ticket_summary,
+)
+
+
+def test_estimate_tokens_uses_chars_per_token():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abc") == 1
+    assert estimate_tokens("x" * 400) == 100
+
+
+def test_estimate_cost_known_and_unknown_model():
+    assert estimate_cost("gpt-4o-mini", 1_000_000, 1_000_000) == 0.15 + 0.60
+    assert estimate_cost("qwen2.5:0.5b", 1000, 1000) == 0.0
+
+
+def test_ticket_summary_accumulates_calls():
+    start_ticket()
+    record_usage("billing", "openai", "gpt-4o-mini", 100, 20)
+    record_usage("billing", "ollama", "qwen2.5:0.5b", 50, 10, estimated=True)
+    summary = ticket_summary()
+    assert summary["input_tokens"] == 150
+    assert summary["output_tokens"] == 30
+    assert summary["llm_calls"] == 2
+    assert summary["estimated"] is True
+    assert summary["models"] == ["gpt-4o-mini", "qwen2.5:0.5b"]
+
+
+def test_record_openai_usage_estimates_when_usage_missing():
+    start_ticket()
+    resp = SimpleNamespace(usage=None)
+    record_openai_usage("triage", "ollama", "qwen2.5:0.5b", resp, "p" * 80, "c" * 40)
+    summary = ticket_summary()
+    assert summary["input_tokens"] == 20
+    assert summary["output_tokens"] == 10
+    assert summary["estimated"] is True
+
+
+def test_record_openai_usage_prefers_reported_usage():
+    start_ticket()
+    resp = SimpleNamespace(usage=SimpleNamespace(prompt_tokens=7, completion_tokens=3))
+    record_openai_usage("triage", "openai", "gpt-4o-mini", resp, "ignored", "ignored")
+    summary = ticket_summary()
+    assert (summary["input_tokens"], summary["output_tokens"], summary["estimated"]) == (7, 3, False)
+
+
+def test_hourly_budget_window_expires_old_spend():
+    now = [0.0]
+    budget = HourlyBudget(max_tokens=1000, soft_limit=0.9, clock=lambda: now[0])
+    budget.add(950, 0.0)
+    assert budget.near_exhaustion()
+    now[0] = 3601.0
+    assert budget.utilization() == 0.0
+    assert not budget.near_exhaustion()
+
+
+def test_select_provider_shifts_to_fallback_near_budget():
+    budget = HourlyBudget(max_cost_usd=1.0, soft_limit=0.5)
+    budget.add(0, 0.6)
+    with patch.object(usage, "BUDGET", budget), patch.object(usage, "LLM_BUDGET_FALLBACK_PROVIDER", "ollama"):
+        assert select_provider("triage", "anthropic") == "ollama"
+        assert select_provider("triage", "ollama") == "ollama"
+
+
+def test_select_provider_unlimited_budget_keeps_provider():
+    with patch.object(usage, "BUDGET", HourlyBudget()):
+        assert select_provider("billing", "openai") == "openai"
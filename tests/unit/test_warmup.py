@@ -0,0 +1,80 @@
+"""Unit tests for startup warm-up and the /ready endpoint."""
+import urllib.error
+import urllib.request
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+import shared.health
+from shared.aws import dynamodb
+from shared.health import start_health_server
+from shared.warmup import AGENT_WARMUP_FAILURES, AGENT_WARMUP_SECONDS, run_warmup
+
+
+@pytest.fixture
+def health_server():
+    shared.health._ready.clear()
+    server = start_health_server(0, addr="127.0.0.1")
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    shared.health._ready.clear()
+
+
+def _status(url: str) -> int:
+    try:
+        with urllib.request.urlopen(url, timeout=5) as resp:
+            return resp.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def test_ready_only_after_warmup_and_metrics_served(health_server):
+    assert _status(health_server + "/ready") == 503
+    assert _status(health_server + "/healthz") == 200
+    calls = []
+    run_warmup("billing", [("llm", lambda: calls.append("llm"))], enabled=True)
+    assert calls == ["llm"]
+    assert _status(health_server + "/ready") == 200
+    with urllib.request.urlopen(health_server + "/metrics", timeout=5) as resp:
+        assert b"agent_warmup_seconds" in resp.read()
+
+
+def test_failed_step_is_counted_and_does_not_block_readiness(health_server):
+    def boom():
+        raise ConnectionError("ollama not reachable")
+
+    before = AGENT_WARMUP_FAILURES.labels(agent="triage", step="llm")._value.get()
+    run_warmup("triage", [("llm", boom), ("dynamodb", lambda: None)], enabled=True)
+    assert AGENT_WARMUP_FAILURES.labels(agent="triage", step="llm")._value.get() == before + 1
+    assert AGENT_WARMUP_SECONDS.labels(agent="triage", step="dynamodb")._value.get() >= 0
+    assert _status(health_server + "/ready") == 200
+
+
+def test_disabled_warmup_skips_steps_but_marks_ready(health_server):
+    steps = MagicMock()
+    run_warmup("feature", [("llm", steps)], enabled=False)
+    steps.assert_not_called()
+    assert _status(health_server + "/ready") == 200
+
+
+def test_dynamodb_warm_up_issues_get_item_on_shared_client():
+    client = MagicMock()
+    with patch.object(dynamodb, "_client", return_value=client):
+        dynamodb.warm_up(None)
+        client.get_item.assert_not_called()
+        dynamodb.warm_up("support-customers")
+    client.get_item.assert_called_once_with(
+        TableName="support-customers", Key={"customer_id": {"S": dynamodb.WARMUP_CUSTOMER_ID}},
+    )
+
+
+def test_llm_warm_up_skipped_under_mock():
+    from triage import llm
+
+    with patch.object(llm, "MOCK_LLM", True), patch.object(llm, "prime") as prime:
+        llm.warm_up()
+    prime.assert_not_called()
+    with patch.object(llm, "MOCK_LLM", False), patch.object(llm, "LLM_PROVIDER", "ollama"), \
+            patch.object(llm, "prime") as prime:
+        llm.warm_up()
+    assert prime.call_args.args == ("ollama", llm.OLLAMA_MODEL)